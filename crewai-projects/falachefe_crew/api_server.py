@@ -5,22 +5,122 @@ Roda no Railway e é chamado via Upstash QStash
 
 Endpoints:
 - POST /process - Processa mensagem com CrewAI e envia resposta via UAZAPI
+- POST /import - Importa planilha CSV / extrato OFX para o fluxo de caixa (em background)
 - GET /health - Health check
+- GET /debug/crew-traces - Traces verbose de crews de requisições com falha (DEBUG_TRACES_TOKEN)
+
+Com PROCESS_MODE=queue o /process apenas valida e enfileira; o crew roda
+nos crew workers (crew_worker.py), que escalam por réplicas.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify
 from flask_cors import CORS
 import os
 import sys
 import json
+import uuid
+import hashlib
+import threading
+import contextlib
 import requests
 from datetime import datetime
 from time import time
+from typing import Callable, Optional
 
 # Adicionar src ao path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
+# Logs estruturados/assíncronos antes de qualquer print (inclusive do import do crew)
+from falachefe_crew.observability.structured_logging import (
+    REQUEST_ID_HEADER,
+    begin_request,
+    configure_logging,
+    crew_trace,
+    crew_verbose,
+    current_request_id,
+    end_request,
+    failed_crew_traces,
+    render_prometheus_metrics as render_logging_metrics,
+)
+configure_logging()
+
 from falachefe_crew.crew import FalachefeCrew
+from falachefe_crew.resilience.dependency_guard import (
+    get_guard,
+    DependencyUnavailableError,
+    render_prometheus_metrics,
+)
+from falachefe_crew.resilience.execution_budget import (
+    execution_budget,
+    render_prometheus_metrics as render_budget_metrics,
+)
+from falachefe_crew.resilience.idempotency import source_message_scope
+from falachefe_crew.resilience.request_deadline import (
+    DEADLINE_FALLBACK_ANSWER,
+    current_deadline,
+    held_through_late_runs,
+    request_deadline,
+    run_before_deadline,
+    render_prometheus_metrics as render_deadline_metrics,
+)
+from falachefe_crew.caching.llm_cache import llm_cache_stats
+from falachefe_crew.caching.tool_memo import tool_memo_scope
+from falachefe_crew.analytics.financial_digest import format_financial_digest, get_financial_digest
+from falachefe_crew.caching.semantic_cache import (
+    get_semantic_cache,
+    render_prometheus_metrics as render_semantic_cache_metrics,
+)
+from falachefe_crew.ingestion.bulk_import import BulkImporter
+from falachefe_crew.ingestion.statement_parser import iter_statement_transactions
+from falachefe_crew.observability.usage_ledger import (
+    CLASSIFIER,
+    record_openai_usage,
+    usage_scope,
+    render_prometheus_metrics as render_usage_metrics,
+)
+from falachefe_crew.observability.traffic_capture import (
+    capture_request,
+    capture_stage,
+    note_capture,
+    render_prometheus_metrics as render_capture_metrics,
+)
+from falachefe_crew.runtime.worker_pool import (
+    WARM_CREW_STATE,
+    warm_crew_state,
+    render_prometheus_metrics as render_worker_metrics,
+)
+from falachefe_crew.routing.cashflow_command import parse_cashflow_command, execute_cashflow_command
+from falachefe_crew.routing.model_router import get_model_router, routed_agent
+from falachefe_crew.security.inbound_dedup import (
+    DONE,
+    claim_inbound_message,
+    complete_inbound_message,
+    inbound_message_id,
+    release_inbound_message,
+)
+from falachefe_crew.security.file_url import check_file_url, file_url_error
+from falachefe_crew.security.qstash_signature import verify_qstash_jwt
+from falachefe_crew.scheduling.message_coalescer import (
+    get_coalescer,
+    merge_payloads,
+    should_coalesce,
+)
+from falachefe_crew.scheduling.job_queue import (
+    get_job_queue,
+    render_prometheus_metrics as render_job_queue_metrics,
+)
+from falachefe_crew.scheduling.fair_share import (
+    busy_message,
+    busy_retry_after,
+    check_rate_limit,
+    tenant_scope,
+    render_prometheus_metrics as render_fair_share_metrics,
+)
+from falachefe_crew.scheduling.priority_lanes import (
+    lane_for_task,
+    lane_slot,
+    render_prometheus_metrics as render_lane_metrics,
+)
 from crewai import Crew, Process, Task
 
 app = Flask(__name__)
@@ -31,11 +131,28 @@ UAZAPI_BASE_URL = os.getenv("UAZAPI_BASE_URL", "https://falachefe.uazapi.com")
 UAZAPI_TOKEN = os.getenv("UAZAPI_TOKEN", "")
 QSTASH_CURRENT_SIGNING_KEY = os.getenv("QSTASH_CURRENT_SIGNING_KEY", "")
 QSTASH_NEXT_SIGNING_KEY = os.getenv("QSTASH_NEXT_SIGNING_KEY", "")
+# URL pública do serviço (ex: https://api.falachefe.app.br) para validar o claim sub
+QSTASH_PUBLIC_BASE_URL = os.getenv("QSTASH_PUBLIC_BASE_URL", "")
+# Bearer token do /debug/crew-traces (vazio = endpoint desligado)
+DEBUG_TRACES_TOKEN = os.getenv("DEBUG_TRACES_TOKEN", "")
+# sync: /process roda o crew na requisição; queue: ingress sem estado que
+# enfileira para os crew workers (crew_worker.py, exige REDIS_URL)
+PROCESS_MODE = os.getenv("PROCESS_MODE", "sync").lower()
+# Quanto o ingress espera pela resposta do chat web antes de responder 202
+JOB_RESULT_WAIT_SECONDS = float(os.getenv("JOB_RESULT_WAIT_SECONDS", "110"))
 
 # Cache do crew (inicializar apenas uma vez)
 crew_instance = None
 _crew_initialization_attempted = False
 
+# Comandos de transação ("recebi 500 de vendas") gravados sem crew
+CASHFLOW_FAST_PATH_ENABLED = os.getenv("CASHFLOW_FAST_PATH_ENABLED", "true").lower() == "true"
+
+# Último perfil conhecido por usuário - fallback quando o Supabase está lento/fora
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "5000"))
+_profile_cache = {}
+_profile_cache_lock = threading.Lock()
+
 
 def get_crew():
     """Retorna instância singleton do crew"""
@@ -47,6 +164,9 @@ def get_crew():
         try:
             crew_instance = FalachefeCrew()
             print("✅ FalachefeCrew initialized successfully!", file=sys.stderr)
+            if WARM_CREW_STATE:
+                warmed = warm_crew_state(crew_instance)
+                print(f"🔥 Warmed {warmed} agents/tasks (shared by preloaded workers)", file=sys.stderr)
         except Exception as e:
             print(f"❌ Failed to initialize CrewAI: {e}", file=sys.stderr)
             print(f"⚠️  Server will continue but requests may fail", file=sys.stderr)
@@ -57,8 +177,79 @@ def get_crew():
 
 
 # ✨ NOVO: Pré-inicializar CrewAI quando módulo for importado (para Gunicorn)
-print("📦 Module api_server loaded, pre-initializing CrewAI...", file=sys.stderr)
-get_crew()  # Chama inicialização ao carregar módulo
+# Com preload (gunicorn.conf.py) roda uma vez no master, antes do fork dos workers
+if PROCESS_MODE == "queue":
+    # Ingress não roda crew (o crew_worker.py inicializa o seu)
+    print("📦 Module api_server loaded in queue mode (ingress only)", file=sys.stderr)
+else:
+    print("📦 Module api_server loaded, pre-initializing CrewAI...", file=sys.stderr)
+    get_crew()  # Chama inicialização ao carregar módulo
+
+
+def default_company_data(company_name: str) -> dict:
+    """Perfil genérico usado quando não há dados reais do usuário"""
+    return {
+        "company_name": company_name,
+        "company_sector": "não especificado",
+        "company_size": "não especificado",
+        "user_name": "Cliente",
+        "user_role": "não especificado"
+    }
+
+
+def supabase_config() -> tuple:
+    """Retorna (url, headers) do Supabase REST ou (url, None) se a chave não estiver configurada"""
+    supabase_url = os.getenv("SUPABASE_URL", "https://zpdartuyaergbxmbmtur.supabase.co")
+    supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY", "")
+    
+    if not supabase_key:
+        return supabase_url, None
+    
+    return supabase_url, {
+        "apikey": supabase_key,
+        "Authorization": f"Bearer {supabase_key}",
+        "Content-Type": "application/json"
+    }
+
+
+def user_onboarding_url(supabase_url: str, user_id: str) -> str:
+    return f"{supabase_url}/rest/v1/user_onboarding?user_id=eq.{user_id}&select=first_name,last_name,whatsapp_phone,company_name,industry,company_size,position"
+
+
+def profile_from_onboarding(user_id: str, rows: list) -> dict:
+    """Converte linhas de user_onboarding em perfil e atualiza o cache de fallback"""
+    if not rows:
+        print(f"⚠️ User not found in user_onboarding: {user_id}", file=sys.stderr)
+        return default_company_data("Empresa não cadastrada")
+    
+    data = rows[0]
+    full_name = f"{data.get('first_name', '')} {data.get('last_name', '')}".strip()
+    profile = {
+        "company_name": data.get("company_name", "Empresa"),
+        "company_sector": data.get("industry", "não especificado"),
+        "company_size": data.get("company_size", "não especificado"),
+        "user_name": full_name or "Cliente",
+        "user_role": data.get("position", "não especificado")
+    }
+    
+    # Atualizar cache de fallback (descarta o mais antigo quando cheio)
+    with _profile_cache_lock:
+        _profile_cache.pop(user_id, None)
+        if len(_profile_cache) >= PROFILE_CACHE_MAX_ENTRIES:
+            _profile_cache.pop(next(iter(_profile_cache)), None)
+        _profile_cache[user_id] = profile
+    
+    return dict(profile)
+
+
+def cached_profile_fallback(user_id: str) -> dict:
+    """Supabase indisponível → usar último perfil conhecido"""
+    with _profile_cache_lock:
+        cached = _profile_cache.get(user_id)
+    if cached:
+        print(f"⚡ Supabase unavailable, using cached profile for {user_id}", file=sys.stderr)
+        return dict(cached)
+    return default_company_data("Empresa (dados temporariamente indisponíveis)")
 
 
 def get_user_company_data(user_id: str) -> dict:
@@ -73,61 +264,51 @@ def get_user_company_data(user_id: str) -> dict:
     - user_role: Cargo do usuário
     """
     try:
-        # URL do Supabase
-        supabase_url = os.getenv("SUPABASE_URL", "https://zpdartuyaergbxmbmtur.supabase.co")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY", "")
+        supabase_url, headers = supabase_config()
         
-        if not supabase_key:
+        if not headers:
             print("⚠️ SUPABASE_SERVICE_ROLE_KEY not configured, using defaults", file=sys.stderr)
-            return {
-                "company_name": "Empresa não identificada",
-                "company_sector": "não especificado",
-                "company_size": "não especificado",
-                "user_name": "Cliente",
-                "user_role": "não especificado"
-            }
-        
-        headers = {
-            "apikey": supabase_key,
-            "Authorization": f"Bearer {supabase_key}",
-            "Content-Type": "application/json"
-        }
+            return default_company_data("Empresa não identificada")
         
-        # Buscar dados do usuário via user_onboarding
-        response = requests.get(
-            f"{supabase_url}/rest/v1/user_onboarding?user_id=eq.{user_id}&select=first_name,last_name,whatsapp_phone,company_name,industry,company_size,position",
-            headers=headers
+        # Buscar dados do usuário via user_onboarding (protegido pelo guard do Supabase)
+        response = get_guard("supabase").call(
+            lambda timeout: requests.get(
+                user_onboarding_url(supabase_url, user_id),
+                headers=headers,
+                timeout=timeout
+            ),
+            is_failure=lambda r: r.status_code >= 500,
+            fallback=lambda exc: None
         )
         
-        if response.status_code == 200 and response.json():
-            data = response.json()[0]
-            full_name = f"{data.get('first_name', '')} {data.get('last_name', '')}".strip()
-            return {
-                "company_name": data.get("company_name", "Empresa"),
-                "company_sector": data.get("industry", "não especificado"),
-                "company_size": data.get("company_size", "não especificado"),
-                "user_name": full_name or "Cliente",
-                "user_role": data.get("position", "não especificado")
-            }
-        else:
-            print(f"⚠️ User not found in user_onboarding: {user_id}", file=sys.stderr)
-            return {
-                "company_name": "Empresa não cadastrada",
-                "company_sector": "não especificado",
-                "company_size": "não especificado",
-                "user_name": "Cliente",
-                "user_role": "não especificado"
-            }
+        if response is None or response.status_code >= 500:
+            return cached_profile_fallback(user_id)
+        
+        return profile_from_onboarding(user_id, response.json() if response.status_code == 200 else [])
             
     except Exception as e:
         print(f"⚠️ Error fetching user data: {e}", file=sys.stderr)
-        return {
-            "company_name": "Erro ao buscar dados",
-            "company_sector": "não especificado",
-            "company_size": "não especificado",
-            "user_name": "Cliente",
-            "user_role": "não especificado"
-        }
+        return default_company_data("Erro ao buscar dados")
+
+
+def build_agent_message_payload(
+    conversation_id: str,
+    agent_id: str,
+    content: str,
+    metadata: dict = None
+) -> dict:
+    """Monta a linha da tabela messages para uma resposta do agente"""
+    return {
+        "conversation_id": conversation_id,
+        "sender_id": agent_id,
+        "sender_type": "agent",
+        "content": content,
+        "message_type": "text",
+        "status": "delivered",
+        "metadata": metadata or {},
+        "sent_at": datetime.now().isoformat(),
+        "delivered_at": datetime.now().isoformat()
+    }
 
 
 def save_agent_message(
@@ -149,38 +330,26 @@ def save_agent_message(
         True se salvou com sucesso, False caso contrário
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL", "https://zpdartuyaergbxmbmtur.supabase.co")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY", "")
+        supabase_url, headers = supabase_config()
         
-        if not supabase_key:
+        if not headers:
             print("⚠️ SUPABASE_SERVICE_ROLE_KEY not configured, cannot save agent message", file=sys.stderr)
             return False
         
-        headers = {
-            "apikey": supabase_key,
-            "Authorization": f"Bearer {supabase_key}",
-            "Content-Type": "application/json",
-            "Prefer": "return=representation"
-        }
+        headers = {**headers, "Prefer": "return=representation"}
         
         # Preparar payload
-        payload = {
-            "conversation_id": conversation_id,
-            "sender_id": agent_id,
-            "sender_type": "agent",
-            "content": content,
-            "message_type": "text",
-            "status": "delivered",
-            "metadata": metadata or {},
-            "sent_at": datetime.now().isoformat(),
-            "delivered_at": datetime.now().isoformat()
-        }
+        payload = build_agent_message_payload(conversation_id, agent_id, content, metadata)
         
         # Salvar no Supabase
-        response = requests.post(
-            f"{supabase_url}/rest/v1/messages",
-            json=payload,
-            headers=headers
+        response = get_guard("supabase").call(
+            lambda timeout: requests.post(
+                f"{supabase_url}/rest/v1/messages",
+                json=payload,
+                headers=headers,
+                timeout=timeout
+            ),
+            is_failure=lambda r: r.status_code >= 500
         )
         
         if response.status_code in [200, 201]:
@@ -202,98 +371,103 @@ def save_agent_message(
         return False
 
 
+# Mensagens de status financeiro quando não há dados para resumir
+FINANCIAL_STATUS_NOT_CONFIGURED = "Status financeiro não disponível. Cliente está iniciando uso da plataforma."
+FINANCIAL_STATUS_UNAVAILABLE = "Status financeiro temporariamente indisponível. Use as ferramentas para consultar dados atualizados."
+FINANCIAL_STATUS_FETCH_FAILED = "Sem dados financeiros registrados ainda."
+FINANCIAL_STATUS_ERROR = "Erro ao buscar status financeiro. Cliente será orientado a registrar dados."
+
+
+def financial_data_url(supabase_url: str, user_id: str) -> str:
+    return f"{supabase_url}/rest/v1/financial_data?user_id=eq.{user_id}&select=type,amount,description,category,date&order=date.desc&limit=100"
+
+
+def summarize_financial_transactions(transactions: list) -> str:
+    """Resume as transações de financial_data (valores em centavos) para o prompt"""
+    if not transactions or len(transactions) == 0:
+        return "Nenhuma transação financeira registrada ainda. Cliente está começando a usar o sistema."
+    
+    # Calcular totais
+    total_receitas = sum(t['amount'] for t in transactions if t['type'] == 'receita')
+    total_despesas = sum(t['amount'] for t in transactions if t['type'] == 'despesa')
+    saldo = total_receitas - total_despesas
+    
+    # Formatar valores (de centavos para reais)
+    receitas_brl = total_receitas / 100
+    despesas_brl = total_despesas / 100
+    saldo_brl = saldo / 100
+    
+    # Pegar últimas 3 transações
+    ultimas_transacoes = transactions[:3]
+    transacoes_texto = []
+    for t in ultimas_transacoes:
+        valor_brl = t['amount'] / 100
+        tipo_emoji = "💰" if t['type'] == 'receita' else "💸"
+        transacoes_texto.append(
+            f"{tipo_emoji} R$ {valor_brl:.2f} - {t['description']} ({t['category']})"
+        )
+    
+    # Montar resumo
+    return f"""Resumo Financeiro:
+- Total Receitas: R$ {receitas_brl:.2f}
+- Total Despesas: R$ {despesas_brl:.2f}
+- Saldo Atual: R$ {saldo_brl:.2f}
+- Total de Transações: {len(transactions)}
+
+Últimas Transações:
+{chr(10).join(transacoes_texto)}"""
+
+
 def get_financial_status(user_id: str) -> str:
     """
     Busca status financeiro real do usuário do Supabase
     
-    Retorna resumo do fluxo de caixa baseado em financial_data:
+    Usa o digest pré-calculado (financial_digests, uma leitura em cache).
+    Sem digest válido, recalcula a partir de financial_data:
     - Total de receitas
     - Total de despesas
     - Saldo atual
     - Últimas 3 transações
     """
     try:
-        supabase_url = os.getenv("SUPABASE_URL", "https://zpdartuyaergbxmbmtur.supabase.co")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY", "")
+        digest = get_financial_digest(user_id)
+        if digest is not None:
+            return format_financial_digest(digest)
         
-        if not supabase_key:
-            return "Status financeiro não disponível. Cliente está iniciando uso da plataforma."
+        supabase_url, headers = supabase_config()
         
-        headers = {
-            "apikey": supabase_key,
-            "Authorization": f"Bearer {supabase_key}",
-            "Content-Type": "application/json"
-        }
+        if not headers:
+            return FINANCIAL_STATUS_NOT_CONFIGURED
         
         # Buscar todas transações do usuário
-        response = requests.get(
-            f"{supabase_url}/rest/v1/financial_data?user_id=eq.{user_id}&select=type,amount,description,category,date&order=date.desc&limit=100",
-            headers=headers
+        response = get_guard("supabase").call(
+            lambda timeout: requests.get(
+                financial_data_url(supabase_url, user_id),
+                headers=headers,
+                timeout=timeout
+            ),
+            is_failure=lambda r: r.status_code >= 500,
+            fallback=lambda exc: None
         )
         
+        if response is None:
+            return FINANCIAL_STATUS_UNAVAILABLE
+        
         if response.status_code != 200:
             print(f"⚠️ Failed to fetch financial data: {response.status_code}", file=sys.stderr)
-            return "Sem dados financeiros registrados ainda."
-        
-        transactions = response.json()
-        
-        if not transactions or len(transactions) == 0:
-            return "Nenhuma transação financeira registrada ainda. Cliente está começando a usar o sistema."
-        
-        # Calcular totais
-        total_receitas = sum(t['amount'] for t in transactions if t['type'] == 'receita')
-        total_despesas = sum(t['amount'] for t in transactions if t['type'] == 'despesa')
-        saldo = total_receitas - total_despesas
-        
-        # Formatar valores (de centavos para reais)
-        receitas_brl = total_receitas / 100
-        despesas_brl = total_despesas / 100
-        saldo_brl = saldo / 100
-        
-        # Pegar últimas 3 transações
-        ultimas_transacoes = transactions[:3]
-        transacoes_texto = []
-        for t in ultimas_transacoes:
-            valor_brl = t['amount'] / 100
-            tipo_emoji = "💰" if t['type'] == 'receita' else "💸"
-            transacoes_texto.append(
-                f"{tipo_emoji} R$ {valor_brl:.2f} - {t['description']} ({t['category']})"
-            )
+            return FINANCIAL_STATUS_FETCH_FAILED
         
-        # Montar resumo
-        resumo = f"""Resumo Financeiro:
-- Total Receitas: R$ {receitas_brl:.2f}
-- Total Despesas: R$ {despesas_brl:.2f}
-- Saldo Atual: R$ {saldo_brl:.2f}
-- Total de Transações: {len(transactions)}
-
-Últimas Transações:
-{chr(10).join(transacoes_texto)}"""
-        
-        return resumo
+        return summarize_financial_transactions(response.json())
         
     except Exception as e:
         print(f"⚠️ Error fetching financial status: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc(file=sys.stderr)
-        return "Erro ao buscar status financeiro. Cliente será orientado a registrar dados."
+        return FINANCIAL_STATUS_ERROR
 
 
-def classify_message_with_llm(message: str, conversation_history: list = None) -> dict:
-    """
-    Classificador inteligente com LLM
-    
-    Analisa a mensagem e retorna:
-    - type: 'greeting', 'acknowledgment', 'financial_task', 'marketing_query', 'sales_query', 'hr_query', 'general'
-    - specialist: qual agente deve responder ('none', 'financial_expert', 'marketing_expert', etc)
-    - response: resposta direta (se não precisa especialista)
-    - needs_specialist: bool
-    - confidence: 0-1
-    """
-    import openai
-    
-    # Prompt para o classificador
-    system_prompt = """Você é um classificador de intenções para uma plataforma de consultoria empresarial.
+# Prompt do classificador (compartilhado com o servidor ASGI)
+CLASSIFIER_SYSTEM_PROMPT = """Você é um classificador de intenções para uma plataforma de consultoria empresarial.
 
 Analise a mensagem do usuário e classifique em UMA das categorias:
 
@@ -314,80 +488,143 @@ Retorne APENAS um JSON no formato:
   "reasoning": "breve explicação"
 }"""
 
+# Tipos de mensagem atendidos pela Ana (reception_agent)
+RECEPTION_TYPES = ['greeting', 'acknowledgment', 'general', 'continuation']
+
+# Modelo rápido e barato para a classificação de intenção
+CLASSIFIER_MODEL = "gpt-4o-mini"
+
+
+def parse_confidence(value) -> Optional[float]:
+    """confidence do classificador como float; None se ausente ou não numérico"""
+    try:
+        confidence = float(value)
+    except (TypeError, ValueError):
+        return None
+    # NaN não é comparável com os limites das regras
+    return None if confidence != confidence else confidence
+
+
+def parse_classification_response(result_text: str) -> dict:
+    """Converte a resposta textual do classificador LLM em dict de classificação"""
+    result_text = result_text.strip()
+    
+    # Remover markdown se houver
+    if result_text.startswith('```'):
+        result_text = result_text.split('```')[1]
+        if result_text.startswith('json'):
+            result_text = result_text[4:]
+    
+    classification = json.loads(result_text)
+    # Roteamento de modelo compara confidence com números ("0.9" em string quebraria)
+    classification['confidence'] = parse_confidence(classification.get('confidence'))
+    
+    # ✅ CORREÇÃO: Ana deve SEMPRE processar saudações e agradecimentos
+    # Remover respostas hardcoded para permitir personalização
+    classification['response'] = None
+    
+    # Ana processa: saudações, agradecimentos, mensagens gerais, continuações
+    if classification['type'] in RECEPTION_TYPES:
+        classification['needs_specialist'] = True  # Ana é uma especialista!
+    else:
+        classification['needs_specialist'] = True
+    
+    return classification
+
+
+def classify_message_by_keywords(message: str) -> dict:
+    """Fallback: classificação básica por keywords (sem LLM)"""
+    message_lower = message.lower().strip()
+    
+    # Saudações - Ana vai processar
+    greetings = ['oi', 'olá', 'ola', 'hey', 'e aí', 'eae', 'opa', 'bom dia', 'boa tarde', 'boa noite']
+    if message_lower in greetings or len(message_lower) <= 3:
+        return {
+            'type': 'greeting',
+            'specialist': 'reception_agent',  # Ana
+            'confidence': 0.9,
+            'response': None,
+            'needs_specialist': True  # Ana vai personalizar
+        }
+    
+    # Keywords financeiras (ampliado para detectar mais variações)
+    financial_kw = [
+        'fluxo de caixa', 'receita', 'despesa', 'financeiro', 'dinheiro', 
+        'reais', 'lucro', 'prejuízo', 'saldo', 'pagar', 'receber', 
+        'faturamento', 'custos', 'gastos', 'investimento', 'capital',
+        'balanço', 'resultado', 'transação', 'pagamento', 'cobrança'
+    ]
+    if any(kw in message_lower for kw in financial_kw):
+        return {
+            'type': 'financial_task',
+            'specialist': 'financial_expert',
+            'confidence': 0.7,
+            'needs_specialist': True
+        }
+    
+    # Default: questão geral - Ana faz triagem
+    return {
+        'type': 'general',
+        'specialist': 'reception_agent',  # Ana
+        'confidence': 0.5,
+        'needs_specialist': True  # Ana vai triar
+    }
+
+
+def classify_message_with_llm(message: str, conversation_history: list = None) -> dict:
+    """
+    Classificador inteligente com LLM
+    
+    Analisa a mensagem e retorna:
+    - type: 'greeting', 'acknowledgment', 'financial_task', 'marketing_query', 'sales_query', 'hr_query', 'general'
+    - specialist: qual agente deve responder ('none', 'financial_expert', 'marketing_expert', etc)
+    - response: resposta direta (se não precisa especialista)
+    - needs_specialist: bool
+    - confidence: 0-1
+    """
+    import openai
+
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",  # Modelo rápido e barato
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Mensagem: {message}"}
-            ],
-            temperature=0.3,
-            max_tokens=150
+        started = time()
+        response = get_guard("openai").call(
+            lambda timeout: openai.chat.completions.create(
+                model=CLASSIFIER_MODEL,
+                messages=[
+                    {"role": "system", "content": CLASSIFIER_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Mensagem: {message}"}
+                ],
+                temperature=0.3,
+                max_tokens=150,
+                timeout=timeout
+            )
         )
+        record_openai_usage(CLASSIFIER, CLASSIFIER_MODEL, response, time() - started)
         
         # Parse da resposta
-        result_text = response.choices[0].message.content.strip()
-        
-        # Remover markdown se houver
-        if result_text.startswith('```'):
-            result_text = result_text.split('```')[1]
-            if result_text.startswith('json'):
-                result_text = result_text[4:]
-        
-        classification = json.loads(result_text)
-        
-        # ✅ CORREÇÃO: Ana deve SEMPRE processar saudações e agradecimentos
-        # Remover respostas hardcoded para permitir personalização
-        classification['response'] = None
-        
-        # Ana processa: saudações, agradecimentos, mensagens gerais, continuações
-        if classification['type'] in ['greeting', 'acknowledgment', 'general', 'continuation']:
-            classification['needs_specialist'] = True  # Ana é uma especialista!
-        else:
-            classification['needs_specialist'] = True
-        
-        return classification
+        return parse_classification_response(response.choices[0].message.content)
         
     except Exception as e:
         print(f"⚠️ LLM classification failed: {e}", file=sys.stderr)
         print("Falling back to keyword-based classification", file=sys.stderr)
-        
-        # Fallback: classificação básica por keywords
-        message_lower = message.lower().strip()
-        
-        # Saudações - Ana vai processar
-        greetings = ['oi', 'olá', 'ola', 'hey', 'e aí', 'eae', 'opa', 'bom dia', 'boa tarde', 'boa noite']
-        if message_lower in greetings or len(message_lower) <= 3:
-            return {
-                'type': 'greeting',
-                'specialist': 'reception_agent',  # Ana
-                'confidence': 0.9,
-                'response': None,
-                'needs_specialist': True  # Ana vai personalizar
-            }
-        
-        # Keywords financeiras (ampliado para detectar mais variações)
-        financial_kw = [
-            'fluxo de caixa', 'receita', 'despesa', 'financeiro', 'dinheiro', 
-            'reais', 'lucro', 'prejuízo', 'saldo', 'pagar', 'receber', 
-            'faturamento', 'custos', 'gastos', 'investimento', 'capital',
-            'balanço', 'resultado', 'transação', 'pagamento', 'cobrança'
-        ]
-        if any(kw in message_lower for kw in financial_kw):
-            return {
-                'type': 'financial_task',
-                'specialist': 'financial_expert',
-                'confidence': 0.7,
-                'needs_specialist': True
-            }
-        
-        # Default: questão geral - Ana faz triagem
-        return {
-            'type': 'general',
-            'specialist': 'reception_agent',  # Ana
-            'confidence': 0.5,
-            'needs_specialist': True  # Ana vai triar
-        }
+        return classify_message_by_keywords(message)
+
+
+def qstash_expected_url(path: str) -> str:
+    """URL publicada no QStash (claim sub); vazia se QSTASH_PUBLIC_BASE_URL não estiver definida"""
+    return f"{QSTASH_PUBLIC_BASE_URL.rstrip('/')}{path}" if QSTASH_PUBLIC_BASE_URL else ""
+
+
+def check_qstash_signature(signature: str, body: bytes, path: str) -> bool:
+    """Verificação do JWT do QStash com a chave atual e a próxima (rotação)"""
+    if not QSTASH_CURRENT_SIGNING_KEY:
+        # Se não configurado, aceitar (desenvolvimento)
+        return True
+    return verify_qstash_jwt(
+        signature,
+        body,
+        [QSTASH_CURRENT_SIGNING_KEY, QSTASH_NEXT_SIGNING_KEY],
+        url=qstash_expected_url(path)
+    )
 
 
 def verify_qstash_signature(request):
@@ -395,17 +632,25 @@ def verify_qstash_signature(request):
     Verifica assinatura do QStash para segurança
     Ref: https://upstash.com/docs/qstash/features/security
     """
-    if not QSTASH_CURRENT_SIGNING_KEY:
-        # Se não configurado, aceitar (desenvolvimento)
-        return True
+    return check_qstash_signature(request.headers.get('Upstash-Signature'), request.get_data(), request.path)
+
+
+def uazapi_text_request(phone_number: str, message: str) -> tuple:
+    """Retorna (url, payload, headers) para POST /send/text da UAZAPI"""
+    url = f"{UAZAPI_BASE_URL}/send/text"
     
-    signature = request.headers.get('Upstash-Signature')
-    if not signature:
-        return False
+    payload = {
+        "number": phone_number,
+        "text": message,
+        "readchat": True
+    }
     
-    # TODO: Implementar verificação completa de assinatura
-    # Por enquanto, apenas verificar se header existe
-    return True
+    headers = {
+        "token": UAZAPI_TOKEN,
+        "Content-Type": "application/json"
+    }
+    
+    return url, payload, headers
 
 
 def send_to_uazapi(phone_number: str, message: str) -> dict:
@@ -420,22 +665,14 @@ def send_to_uazapi(phone_number: str, message: str) -> dict:
         dict: Resposta da API UAZAPI
     """
     try:
-        url = f"{UAZAPI_BASE_URL}/send/text"
-        
-        payload = {
-            "number": phone_number,
-            "text": message,
-            "readchat": True
-        }
-        
-        headers = {
-            "token": UAZAPI_TOKEN,
-            "Content-Type": "application/json"
-        }
+        url, payload, headers = uazapi_text_request(phone_number, message)
         
         print(f"📤 Sending to UAZAPI: {phone_number}", file=sys.stderr)
         
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
+        response = get_guard("uazapi").call(
+            lambda timeout: requests.post(url, json=payload, headers=headers, timeout=timeout),
+            is_failure=lambda r: r.status_code >= 500
+        )
         response.raise_for_status()
         
         result = response.json()
@@ -447,7 +684,7 @@ def send_to_uazapi(phone_number: str, message: str) -> dict:
             "status": result.get("status")
         }
         
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, DependencyUnavailableError) as e:
         print(f"❌ Error sending to UAZAPI: {str(e)}", file=sys.stderr)
         return {
             "success": False,
@@ -455,38 +692,32 @@ def send_to_uazapi(phone_number: str, message: str) -> dict:
         }
 
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Health check endpoint"""
+def build_health_payload(uptime: float, cpu_interval: float = 1) -> dict:
+    """Corpo do health check (compartilhado com o servidor ASGI)"""
     import psutil
     
-    # Calcular uptime
-    uptime = time() - getattr(app, 'start_time', time())
-    
-    return jsonify({
+    return {
         "status": "healthy",
         "service": "falachefe-crewai-api",
         "version": "1.0.0",
         "timestamp": datetime.now().isoformat(),
         "uptime_seconds": int(uptime),
         "crew_initialized": crew_instance is not None,
+        "process_mode": PROCESS_MODE,
         "uazapi_configured": bool(UAZAPI_TOKEN),
         "qstash_configured": bool(QSTASH_CURRENT_SIGNING_KEY),
         "system": {
-            "cpu_percent": psutil.cpu_percent(interval=1),
+            "cpu_percent": psutil.cpu_percent(interval=cpu_interval),
             "memory_percent": psutil.virtual_memory().percent,
             "disk_percent": psutil.disk_usage('/').percent
         }
-    })
+    }
 
 
-@app.route('/metrics', methods=['GET'])
-def metrics():
-    """Métricas para Prometheus (formato básico)"""
+def build_metrics_text(uptime: float) -> str:
+    """Métricas no formato texto do Prometheus (compartilhado com o servidor ASGI)"""
     import psutil
     
-    uptime = time() - getattr(app, 'start_time', time())
-    
     metrics_text = f"""# HELP falachefe_uptime_seconds Uptime do serviço
 # TYPE falachefe_uptime_seconds gauge
 falachefe_uptime_seconds {int(uptime)}
@@ -506,9 +737,828 @@ falachefe_memory_percent {psutil.virtual_memory().percent}
 # HELP falachefe_disk_percent Uso de disco
 # TYPE falachefe_disk_percent gauge
 falachefe_disk_percent {psutil.disk_usage('/').percent}
+
 """
     
-    return metrics_text, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    # Circuit breakers, timeouts adaptativos e bulkheads por dependência
+    metrics_text += render_prometheus_metrics()
+    
+    # Intervenções do orçamento de execução (saídas antecipadas, limites)
+    metrics_text += render_budget_metrics()
+    
+    # Respostas de fallback no deadline da requisição e entregas tardias
+    metrics_text += render_deadline_metrics()
+    
+    # Execuções por tier de modelo (latência, tokens, custo, escaladas)
+    metrics_text += get_model_router().render_prometheus_metrics()
+    
+    # Tokens, custo e latência por tipo de chamada/especialista/task (ledger de uso)
+    metrics_text += render_usage_metrics()
+    
+    # Logs descartados (fila/amostragem) e traces de crew guardados
+    metrics_text += render_logging_metrics()
+    
+    # Captura de tráfego (registros gravados/descartados)
+    metrics_text += render_capture_metrics()
+    
+    # Memória privada/compartilhada do worker (preload copy-on-write)
+    metrics_text += render_worker_metrics()
+    
+    # Faixas de prioridade: cota, execução, espera e rejeições por faixa
+    metrics_text += render_lane_metrics()
+    
+    # Rate limit por usuário/empresa e avisos de ocupado
+    metrics_text += render_fair_share_metrics()
+    
+    # Fila de jobs: lag, idade e réplicas de crew worker sugeridas (autoscaling)
+    if PROCESS_MODE == "queue":
+        metrics_text += render_job_queue_metrics()
+    
+    # Cache semântico de respostas dos especialistas (hits exatos/semânticos e misses)
+    metrics_text += render_semantic_cache_metrics()
+    
+    # Cache de chamadas ao LLM (CachedLLM)
+    llm_stats = llm_cache_stats()
+    metrics_text += "\n# HELP falachefe_llm_cache_calls_total Chamadas ao LLM por resultado do cache\n"
+    metrics_text += "# TYPE falachefe_llm_cache_calls_total counter\n"
+    for outcome, count in llm_stats.items():
+        metrics_text += f'falachefe_llm_cache_calls_total{{outcome="{outcome}"}} {count}\n'
+    
+    return metrics_text
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Health check endpoint"""
+    # Calcular uptime
+    uptime = time() - getattr(app, 'start_time', time())
+    
+    return jsonify(build_health_payload(uptime))
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas para Prometheus (formato básico)"""
+    uptime = time() - getattr(app, 'start_time', time())
+    
+    return build_metrics_text(uptime), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+
+def build_crew_traces_response(authorization: Optional[str]) -> tuple:
+    """Ring buffer de traces de crew (compartilhado com o servidor ASGI)"""
+    if not DEBUG_TRACES_TOKEN:
+        return {"success": False, "error": "Not found"}, 404
+    if authorization != f"Bearer {DEBUG_TRACES_TOKEN}":
+        return {"success": False, "error": "Unauthorized"}, 401
+    traces = failed_crew_traces()
+    return {"success": True, "count": len(traces), "traces": traces}, 200
+
+
+@app.route('/debug/crew-traces', methods=['GET'])
+def crew_traces():
+    """Últimos traces verbose de crews em requisições com falha (deste worker)"""
+    body, status = build_crew_traces_response(request.headers.get('Authorization'))
+    return jsonify(body), status
+
+
+# ============================================
+# CORRELAÇÃO DE LOGS (request_id)
+# ============================================
+
+@app.before_request
+def open_request_log_context():
+    g.log_context_token = begin_request(request.headers.get(REQUEST_ID_HEADER))
+
+
+@app.after_request
+def tag_request_id(response):
+    response.headers[REQUEST_ID_HEADER] = current_request_id() or ''
+    g.request_failed = response.status_code >= 500
+    return response
+
+
+@app.teardown_request
+def close_request_log_context(error=None):
+    token = g.pop('log_context_token', None)
+    if token is not None:
+        end_request(token, failed=error is not None or g.pop('request_failed', False))
+
+
+def validate_process_payload(data: dict) -> str:
+    """Retorna a mensagem de erro de validação do body de /process, ou None se válido"""
+    if not data:
+        return "No JSON data provided"
+    if not data.get('message', ''):
+        return "message is required"
+    if not data.get('userId', ''):
+        return "userId is required"
+    if not data.get('phoneNumber', ''):
+        return "phoneNumber is required"
+    return None
+
+
+def build_company_context(user_company_data: dict) -> str:
+    """Monta contexto da empresa com dados reais"""
+    return f"""Empresa: {user_company_data['company_name']}
+Setor: {user_company_data['company_sector']}
+Porte: {user_company_data['company_size']}
+Contato: {user_company_data['user_name']} ({user_company_data['user_role']})"""
+
+
+def build_crew_inputs(
+    user_message: str,
+    user_id: str,
+    phone_number: str,
+    context: dict,
+    user_company_data: dict,
+    financial_status: str
+) -> dict:
+    """Inputs base (todas as variáveis possíveis que as tasks dos especialistas podem usar)"""
+    company_context = build_company_context(user_company_data)
+    
+    return {
+        # Variáveis básicas
+        "user_id": user_id,  # ID do usuário
+        "user_request": user_message,
+        "user_context": user_company_data['user_name'],
+        "whatsapp_number": phone_number,
+        "phone_number": phone_number,
+        "user_message": user_message,
+        "message": user_message,
+        
+        # Para financial_advice task (DADOS REAIS)
+        "question": user_message,  # Pergunta/solicitação do usuário
+        "company_context": company_context,  # Contexto real da empresa
+        "financial_status": financial_status,  # Status financeiro real
+        
+        # Para outras tasks financeiras
+        "period": "atual",
+        "cashflow_data": {},
+        "transaction_type": "consulta",
+        "transaction_data": {},
+        
+        # Para marketing
+        "topic": user_message,
+        "area": "geral",
+        "marketing_question": user_message,
+        "company_info": company_context,
+        "marketing_goal": "conforme solicitação do cliente",
+        "budget": "a definir com o cliente",
+        
+        # Para sales
+        "sales_question": user_message,
+        "sales_type": "a definir conforme contexto",
+        "product_info": "produtos/serviços da empresa",
+        "current_challenge": user_message,
+        
+        # Para HR
+        "hr_question": user_message,
+        "employee_count": "não especificado",
+        
+        **context
+    }
+
+
+def kickoff_routed_crew(
+    crew_class,
+    agent_name: str,
+    task_name: str,
+    inputs: dict,
+    specialist: str,
+    classification: dict,
+    user_message: str
+) -> str:
+    """
+    Crew de 1 agente + 1 task no modelo escolhido pelo roteador de tiers
+    
+    Escala para um modelo mais forte se a resposta não passar na validação
+    (quando a regra permitir).
+    """
+    router = get_model_router()
+    choice = router.select(
+        specialist=specialist,
+        task=task_name,
+        confidence=classification.get('confidence'),
+        message=user_message
+    )
+    print(f"🎚️ Model tier: {choice.tier} ({choice.model}) for {agent_name}/{task_name}", file=sys.stderr)
+    
+    def run(model: str):
+        agent = routed_agent(getattr(crew_class, agent_name)(), model)
+        base_task = getattr(crew_class, task_name)()
+        task = Task(
+            config=crew_class.tasks_config[task_name],
+            agent=agent,
+            output_file=base_task.output_file
+        )
+        # Crew simples: 1 agente, 1 task, processo sequencial
+        simple_crew = Crew(
+            agents=[agent],
+            tasks=[task],
+            process=Process.sequential,
+            verbose=crew_verbose()
+        )
+        # Orçamento de tempo/tokens e saída antecipada após ferramenta terminal;
+        # leituras repetidas de ferramentas respondidas da memória da execução
+        with execution_budget(task_name), tool_memo_scope(task_name):
+            return simple_crew.kickoff(inputs=inputs)
+    
+    # Saída verbose em memória, guardada só se a requisição falhar (CREW_VERBOSE=false)
+    with crew_trace(f"{agent_name}/{task_name}"):
+        return router.run(choice, run)
+
+
+def crew_task_for_classification(classification: dict) -> Optional[tuple]:
+    """(agent_name, task_name) do crew da classificação; None = resposta padrão sem crew"""
+    if classification['type'] in RECEPTION_TYPES:
+        return 'reception_agent', 'reception_and_triage'
+    specialist_type = classification['specialist']
+    if specialist_type == 'financial_expert':
+        # Criar crew com APENAS financial_expert + task
+        return 'financial_expert', 'financial_advice'
+    if specialist_type in ['marketing_expert', 'sales_expert', 'marketing_sales_expert']:
+        # Unificado: Marketing + Vendas = Max
+        return 'marketing_sales_expert', 'marketing_sales_plan'
+    if specialist_type == 'hr_expert':
+        return 'hr_expert', 'hr_guidance'
+    return None
+
+
+def lane_for_classification(classification: dict) -> str:
+    """Faixa de prioridade (quick/tools/long) do crew que a classificação vai rodar"""
+    route = crew_task_for_classification(classification)
+    return lane_for_task(route[1] if route else None)
+
+
+def run_crew_for_message(
+    classification: dict,
+    user_message: str,
+    user_id: str,
+    phone_number: str,
+    context: dict,
+    user_company_data: dict,
+    financial_status: str
+) -> tuple:
+    """
+    Executa o crew adequado à classificação (bloqueante - dura o tempo das chamadas ao LLM)
+    
+    Returns:
+        (response_text, agent_id)
+    """
+    start_time = time()
+    crew_class = get_crew()
+    
+    # Verificar se precisa de recepção/triagem (saudação, agradecimento, geral)
+    if classification['type'] in RECEPTION_TYPES:
+        # Usar Ana (reception_agent) para acolhimento personalizado
+        print(f"👋 Using reception_agent (Ana) for {classification['type']}", file=sys.stderr)
+        
+        # Preparar inputs com contexto completo
+        reception_inputs = {
+            "user_id": user_id,
+            "user_message": user_message,
+            "user_context": user_company_data['user_name'],
+            "message": user_message,
+            "phone_number": phone_number,
+            "whatsapp_number": phone_number,
+        }
+        
+        # Crew simples: Ana sozinha
+        result = kickoff_routed_crew(
+            crew_class, 'reception_agent', 'reception_and_triage', reception_inputs,
+            'reception_agent', classification, user_message
+        )
+        print(f"✅ Ana (reception) completed in {int((time() - start_time) * 1000)}ms", file=sys.stderr)
+        
+        return result, 'crewai'
+    
+    # Mensagem precisa de especialista → usar CrewAI
+    specialist_type = classification['specialist']
+    print(f"🤖 Routing to {specialist_type}...", file=sys.stderr)
+    
+    base_inputs = build_crew_inputs(
+        user_message, user_id, phone_number, context, user_company_data, financial_status
+    )
+    
+    # Rotear para agente específico OU orquestrador
+    route = crew_task_for_classification(classification)
+    if route:
+        agent_name, task_name = route
+    else:
+        # Questão geral → resposta padrão
+        print("ℹ️ General query without specific specialist", file=sys.stderr)
+        return "Olá! Sou o assistente do FalaChefe. Como posso ajudá-lo com sua empresa hoje? Posso auxiliar em:\n\n💰 Finanças (fluxo de caixa, custos)\n📱 Marketing e Vendas\n👥 Gestão de Pessoas", specialist_type
+    
+    result = kickoff_routed_crew(
+        crew_class, agent_name, task_name, base_inputs,
+        agent_name, classification, user_message
+    )
+    
+    print(f"✅ CrewAI completed in {int((time() - start_time) * 1000)}ms", file=sys.stderr)
+    
+    return result, specialist_type
+
+
+def run_in_lane_before_deadline(data: dict, start_time: float, classification: dict, work: Callable[[], tuple]):
+    """
+    work() com uma vaga na faixa de prioridade da classificação, dentro do
+    deadline da requisição (a espera pela vaga conta no prazo).
+
+    Returns:
+        (True, resultado de work) ou (False, None) se o prazo acabou antes:
+        o chamador responde DEADLINE_FALLBACK_ANSWER e work continua em
+        segundo plano, com a vaga, até entregar a resposta completa
+        (deliver_late_crew_answer; work retorna (response_text, agent_id, ...))
+    """
+    lane = lane_for_classification(classification)
+
+    def in_lane():
+        # Na thread da execução o deadline é o da própria execução (estendido no
+        # fallback): passado ele a resposta tardia é abandonada, então a espera
+        # pela vaga termina ali (LaneTimeoutError) e work() nem começa
+        deadline = current_deadline()
+        with lane_slot(lane, deadline.remaining if deadline is not None else None):
+            return work()
+
+    finished, result = run_before_deadline(
+        in_lane,
+        on_late_result=lambda late: deliver_late_crew_answer(data, start_time, classification, late)
+    )
+    if not finished:
+        print(f"⏰ Lane {lane} wait + crew still running at the request deadline ({int((time() - start_time) * 1000)}ms), sending fallback answer", file=sys.stderr)
+    return finished, result
+
+
+def answer_with_specialist(
+    classification: dict,
+    user_message: str,
+    user_id: str,
+    phone_number: str,
+    context: dict
+) -> tuple:
+    """
+    Perfil, status financeiro, cache semântico e crew (executado com a vaga da faixa).
+
+    Returns:
+        (response_text, agent_id, cache_hit, user_company_data)
+    """
+    # Buscar dados REAIS do usuário e empresa para TODOS os casos
+    print(f"📊 Fetching real user and company data for {user_id}...", file=sys.stderr)
+    with capture_stage('profile'):
+        user_company_data = get_user_company_data(user_id)
+    with capture_stage('financial_status'):
+        financial_status = get_financial_status(user_id)
+
+    print(f"✅ Company: {user_company_data['company_name']} | Sector: {user_company_data['company_sector']}", file=sys.stderr)
+
+    # Perguntas genéricas já respondidas → cache semântico (sem crew)
+    with capture_stage('semantic_cache'):
+        cache_hit = cached_specialist_response(classification, user_message, user_company_data)
+    if cache_hit:
+        note_capture(classification, 'semantic_cache')
+        return cache_hit['answer'], classification['specialist'], cache_hit, user_company_data
+
+    note_capture(classification, 'crew')
+    with capture_stage('crew'):
+        response_text, agent_id = run_crew_for_message(
+            classification, user_message, user_id, phone_number, context, user_company_data, financial_status
+        )
+    return response_text, agent_id, None, user_company_data
+
+
+def deliver_late_crew_answer(data: dict, start_time: float, classification: dict, result: tuple) -> None:
+    """Grava e envia a resposta do crew que passou do deadline (o usuário já recebeu o fallback)"""
+    response_text, agent_id = result[:2]
+    user_id = data.get('userId', '')
+    context = data.get('context', {})
+    processing_time = int((time() - start_time) * 1000)
+    print(f"📨 Delivering late crew answer after {processing_time}ms", file=sys.stderr)
+
+    metadata = build_message_metadata(agent_id, processing_time, classification, context)
+    metadata["after_deadline"] = True
+    save_agent_message(
+        conversation_id=resolve_conversation_id(data, user_id),
+        agent_id=agent_id,
+        content=response_text,
+        metadata=metadata
+    )
+    # Chat web: a resposta aparece na conversa (a requisição já respondeu com o fallback)
+    if context.get('source') != 'web-chat':
+        send_to_uazapi(data.get('phoneNumber', ''), response_text)
+
+
+def try_cashflow_fast_path(user_message: str, user_id: str):
+    """
+    Comandos como "recebi 500 de vendas hoje" → grava a transação direto
+    (sem classificador e sem crew). None se a mensagem não for um comando claro.
+    
+    Returns:
+        (response_text, classification) ou None
+    """
+    if not CASHFLOW_FAST_PATH_ENABLED or not user_id:
+        return None
+    
+    command = parse_cashflow_command(user_message)
+    if not command:
+        return None
+    
+    print(f"⚡ Cashflow fast path: {command['transaction_type']} {command['amount']} ({command['category']}, {command['date']})", file=sys.stderr)
+    response_text, recorded = execute_cashflow_command(user_id, command)
+    
+    classification = {
+        'type': 'cashflow_command',
+        'specialist': 'financial_expert',
+        'confidence': 1.0,
+        'fast_path': True,
+        'recorded': recorded
+    }
+    return response_text, classification
+
+
+def cached_specialist_response(classification: dict, user_message: str, user_company_data: dict):
+    """Resposta do cache semântico para perguntas genéricas (None = rodar crew)"""
+    if classification['type'] in RECEPTION_TYPES:
+        return None
+    try:
+        cache_hit = get_semantic_cache().lookup(classification['specialist'], user_message, user_company_data)
+    except Exception as e:
+        print(f"⚠️ Semantic cache lookup failed: {e}", file=sys.stderr)
+        return None
+    if cache_hit:
+        print(f"⚡ Semantic cache hit ({cache_hit['type']}, similarity {cache_hit['similarity']}) for {classification['specialist']}", file=sys.stderr)
+    return cache_hit
+
+
+def remember_specialist_response(classification: dict, user_message: str, user_company_data: dict, response_text: str) -> None:
+    """Grava a resposta do crew no cache semântico (ignorado se não for genérica)"""
+    if classification['type'] in RECEPTION_TYPES or response_text == DEADLINE_FALLBACK_ANSWER:
+        return
+    try:
+        get_semantic_cache().store_answer(classification['specialist'], user_message, user_company_data, response_text)
+    except Exception as e:
+        print(f"⚠️ Semantic cache store failed: {e}", file=sys.stderr)
+
+
+def conversation_turn(data: dict, inbound_id: Optional[str] = None):
+    """
+    Vez do usuário de rodar o crew (coalescida para WhatsApp, imediata para web chat).
+
+    Produz (lote, ids de deduplicação do lote) ou None se outra requisição
+    drenou esta mensagem.
+    """
+    if should_coalesce(data):
+        return get_coalescer().turn(data.get('userId') or data.get('phoneNumber', ''), data, inbound_id)
+    return contextlib.nullcontext(([data], [inbound_id] if inbound_id else []))
+
+
+@contextlib.contextmanager
+def message_turn(data: dict, inbound_id: Optional[str] = None):
+    """
+    conversation_turn + mensagem de origem das gravações (chaves de idempotência)
+    e do ledger de uso de LLM.
+
+    Quem recebe o lote responde pelos ids de todas as mensagens dele: sem erro
+    marca todos como respondidos, com erro libera todos (um reenvio da mesma
+    mensagem volta a ser processado). Quem foi drenado (None) deixa o próprio
+    id em "processing" para o dono do lote.
+
+    Crew que passou do deadline: o lock do usuário e os ids ficam com o lote
+    até a resposta completa ser entregue (ou abandonada), para a próxima
+    mensagem não ser respondida antes dela.
+    """
+    with held_through_late_runs(conversation_turn(data, inbound_id)) as turn:
+        if turn is None:
+            yield None
+            return
+        batch, inbound_ids = turn
+        with queued_message_turn(batch, inbound_ids):
+            yield batch
+
+
+@contextlib.contextmanager
+def queued_message_turn(batch: list, inbound_ids: list):
+    """Escopo do lote com os ids de deduplicação de todas as mensagens (usado também pelo crew worker)"""
+    with held_through_late_runs(settled_inbound_messages(inbound_ids)), batch_scope(batch):
+        yield batch
+
+
+@contextlib.contextmanager
+def settled_inbound_messages(inbound_ids: list):
+    """Sem erro marca os ids como respondidos; com erro libera (reenvio volta a ser processado)"""
+    try:
+        yield
+    except BaseException:
+        for inbound_id in inbound_ids:
+            release_inbound_message(inbound_id)
+        raise
+    for inbound_id in inbound_ids:
+        complete_inbound_message(inbound_id)
+
+
+@contextlib.contextmanager
+def batch_scope(batch: list):
+    """Mensagem de origem do lote nas gravações (idempotência) e no ledger de uso; cliente no fair queuing"""
+    message_id = source_message_id(batch)
+    with source_message_scope(message_id), batch_usage_scope(batch, message_id), tenant_scope(batch[-1]):
+        yield batch
+
+
+def batch_usage_scope(batch: list, message_id: Optional[str]):
+    """Atribui tokens/custo das chamadas do lote à mensagem, usuário e conversa (ledger de uso)"""
+    latest = batch[-1]
+    context = latest.get('context') or {}
+    return usage_scope(message_id, latest.get('userId'), latest.get('conversationId') or context.get('conversationId'))
+
+
+def source_message_id(batch: list) -> Optional[str]:
+    """
+    Identificador estável das mensagens do lote.
+
+    Usa o messageId da UAZAPI; sem ele, o hash do payload (o timestamp é
+    gerado pelo Next.js no envio, então uma reentrega do QStash repete o valor).
+    """
+    ids = []
+    for payload in batch:
+        message_id = payload.get('messageId')
+        if not message_id:
+            context = payload.get('context') or {}
+            if not context.get('timestamp'):
+                return None
+            raw = "|".join([
+                payload.get('userId', ''),
+                payload.get('conversationId') or context.get('conversationId', ''),
+                context['timestamp'],
+                payload.get('message', '')
+            ])
+            message_id = hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+        ids.append(str(message_id))
+    return ",".join(ids) or None
+
+
+def build_duplicate_response(data: dict, state: str) -> tuple:
+    """
+    Resposta para cópias de uma mensagem já recebida (webhook repetido).
+
+    Já respondida → 200; ainda em processamento → 202 (a resposta sai pela
+    execução original). Nenhum chamador reenvia, então não há código de erro.
+    """
+    body = {
+        "success": True,
+        "duplicate": True,
+        "message": "Message already processed" if state == DONE else "Message is already being processed",
+        "metadata": {
+            "userId": data.get('userId', ''),
+            "phoneNumber": data.get('phoneNumber', ''),
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+    return body, 200 if state == DONE else 202
+
+
+def build_coalesced_response(data: dict) -> dict:
+    """Resposta para mensagens que serão respondidas junto com uma mais nova"""
+    return {
+        "success": True,
+        "coalesced": True,
+        "message": "Message merged into a newer request from the same user",
+        "metadata": {
+            "userId": data.get('userId', ''),
+            "phoneNumber": data.get('phoneNumber', ''),
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+
+def build_busy_response(data: dict, wait: float) -> dict:
+    """
+    Lote descartado pelo rate limit (fair share).
+
+    Nada reentrega o /process: 200 com o pedido para reenviar em `response`
+    (exibido pelo chat web; no WhatsApp o mesmo texto vai pela UAZAPI).
+    """
+    context = data.get('context') or {}
+    return {
+        "success": True,
+        "rate_limited": True,
+        "response": busy_message(wait),
+        "source": "web-chat" if context.get('source') == 'web-chat' else "whatsapp",
+        "metadata": {
+            "userId": data.get('userId', ''),
+            "phoneNumber": data.get('phoneNumber', ''),
+            "retry_after_seconds": busy_retry_after(wait),
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+
+def rate_limited_response(data: dict, wait: float) -> dict:
+    """Avisa o usuário do lote descartado (WhatsApp pela UAZAPI) e monta a resposta do /process"""
+    print(f"🚦 Rate limited {data.get('userId', '')} for {wait:.1f}s, asking to resend", file=sys.stderr)
+    note_capture(path='rate_limited')
+    body = build_busy_response(data, wait)
+    context = data.get('context') or {}
+    if data.get('phoneNumber') and context.get('source') != 'web-chat':
+        send_to_uazapi(data['phoneNumber'], body['response'])
+    return body
+
+
+def build_queued_response(data: dict, job: dict) -> dict:
+    """Resposta do ingress (PROCESS_MODE=queue): a resposta chega pelo WhatsApp/conversa"""
+    return {
+        "success": True,
+        "queued": True,
+        "job_id": job['id'],
+        "message": "Message queued for processing",
+        "metadata": {
+            "userId": data.get('userId', ''),
+            "phoneNumber": data.get('phoneNumber', ''),
+            "partition": job['partition'],
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+
+def enqueue_process_job(data: dict, inbound_id: Optional[str]) -> tuple:
+    """
+    Ingress (PROCESS_MODE=queue): enfileira para os crew workers.
+
+    WhatsApp recebe 202 na hora (a resposta vai pela UAZAPI); o chat web
+    espera a resposta do job por até JOB_RESULT_WAIT_SECONDS.
+    """
+    try:
+        job = get_job_queue().enqueue(
+            data, data.get('userId') or data.get('phoneNumber', ''), inbound_id, current_request_id()
+        )
+    except Exception as e:
+        # 503 → QStash reentrega mais tarde
+        print(f"❌ Job enqueue failed: {e}", file=sys.stderr)
+        release_inbound_message(inbound_id)
+        return {"success": False, "error": "Job queue unavailable"}, 503
+    print(f"📬 Queued job {job['id']} (partition {job['partition']})", file=sys.stderr)
+
+    context = data.get('context') or {}
+    if context.get('source') == 'web-chat':
+        try:
+            result = get_job_queue().wait_result(job['id'], JOB_RESULT_WAIT_SECONDS)
+        except Exception as e:
+            print(f"⚠️ Job result wait failed: {e}", file=sys.stderr)
+            result = None
+        if result:
+            return result['body'], result['status']
+    return build_queued_response(data, job), 202
+
+
+def resolve_conversation_id(data: dict, user_id: str) -> str:
+    """conversationId vem no nível raiz do payload, não em context"""
+    context = data.get('context', {})
+    return data.get('conversationId') or context.get('conversationId', f'conv_{user_id}_{int(time())}')
+
+
+def build_message_metadata(agent_id: str, processing_time: int, classification: dict, context: dict, cache_hit: dict = None) -> dict:
+    """Metadados salvos junto com a resposta do agente"""
+    metadata = {
+        "specialist_type": agent_id,
+        "processing_time_ms": processing_time,
+        "classification": classification.get('type', 'unknown') if classification else 'unknown',
+        "source": context.get('source', 'whatsapp'),
+        "timestamp": datetime.now().isoformat()
+    }
+    if cache_hit:
+        metadata["cache"] = {
+            "hit": True,
+            "type": cache_hit['type'],
+            "similarity": cache_hit['similarity'],
+            "age_seconds": cache_hit['age_seconds']
+        }
+    return metadata
+
+
+def build_process_response(
+    response_text: str,
+    send_result: dict,
+    processing_time: int,
+    user_id: str,
+    phone_number: str,
+    is_web_chat: bool
+) -> dict:
+    """Contrato JSON de sucesso de /process (consumido pelo Next.js)"""
+    return {
+        "success": True,
+        "response": response_text,
+        "sent_to_user": send_result.get("success", True),  # True para web chat
+        "uazapi_messageid": send_result.get("messageid"),
+        "source": send_result.get("source", "whatsapp"),
+        "metadata": {
+            "processed_at": datetime.now().isoformat(),
+            "processing_time_ms": processing_time,
+            "user_id": user_id,
+            "phone_number": phone_number if not is_web_chat else "web-chat"
+        }
+    }
+
+
+def build_process_error_response(error: Exception, start_time: float) -> dict:
+    """Contrato JSON de erro de /process"""
+    return {
+        "success": False,
+        "error": str(error),
+        "error_type": type(error).__name__,
+        "metadata": {
+            "processed_at": datetime.now().isoformat(),
+            "processing_time_ms": int((time() - start_time) * 1000)
+        }
+    }
+
+
+# Mensagem enviada ao usuário quando o processamento falha
+PROCESSING_ERROR_MESSAGE = "Desculpe, houve um erro ao processar sua mensagem. Tente novamente em alguns instantes."
+
+
+def process_merged_message(data: dict, start_time: float) -> dict:
+    """
+    Fluxo do /process para o payload já coalescido: fast path, classificação,
+    cache semântico ou crew, gravação e envio.
+
+    Compartilhado entre a rota síncrona e o crew_worker.py (PROCESS_MODE=queue).
+    
+    Returns:
+        corpo de sucesso do /process (exceções sobem para quem chamou)
+    """
+    # Fair share: 1 token por lote coalescido; sem saldo o lote é descartado
+    # e o usuário recebe o pedido para reenviar
+    rate_limit_wait = check_rate_limit(data)
+    if rate_limit_wait:
+        return rate_limited_response(data, rate_limit_wait)
+
+    # Extrair dados
+    user_message = data.get('message', '')
+    user_id = data.get('userId', '')
+    phone_number = data.get('phoneNumber', '')
+    context = data.get('context', {})
+
+    print(f"📥 Processing message from {phone_number}", file=sys.stderr)
+    print(f"💬 Message: {user_message[:50]}...", file=sys.stderr)
+
+    # Comando estruturado de transação → grava direto (sem classificador/crew)
+    with capture_stage('fast_path'):
+        fast_path = try_cashflow_fast_path(user_message, user_id)
+    if fast_path:
+        response_text, classification = fast_path
+        agent_id, cache_hit = 'financial_expert', None
+        note_capture(classification, 'fast_path')
+    else:
+        # Classificar mensagem com LLM
+        with capture_stage('classify'):
+            classification = classify_message_with_llm(user_message)
+        print(f"🔍 Classification: {classification['type']} → {classification['specialist']} (confidence: {classification.get('confidence', 0)})", file=sys.stderr)
+
+        # A classificação define a faixa: contexto, cache e crew só com vaga nela
+        finished, specialist = run_in_lane_before_deadline(
+            data, start_time, classification,
+            lambda: answer_with_specialist(classification, user_message, user_id, phone_number, context)
+        )
+        if finished:
+            response_text, agent_id, cache_hit, user_company_data = specialist
+        else:
+            response_text, agent_id, cache_hit, user_company_data = (
+                DEADLINE_FALLBACK_ANSWER, classification['specialist'], None, None
+            )
+    processing_time = int((time() - start_time) * 1000)
+
+    # Salvar mensagem do agente no banco de dados
+    with capture_stage('save_message'):
+        save_agent_message(
+            conversation_id=resolve_conversation_id(data, user_id),
+            agent_id=agent_id,
+            content=response_text,
+            metadata=build_message_metadata(agent_id, processing_time, classification, context, cache_hit)
+        )
+
+    # Detectar se é chat web ou WhatsApp baseado APENAS no context.source
+    # Usuários do chat web têm telefone válido mas acessam pela página
+    is_web_chat = context.get('source') == 'web-chat'
+
+    send_result = {
+        "success": True,
+        "source": "web-chat" if is_web_chat else "whatsapp"
+    }
+
+    # Enviar resposta via UAZAPI apenas para WhatsApp
+    if not is_web_chat:
+        print("📤 Sending response to WhatsApp user...", file=sys.stderr)
+        with capture_stage('send'):
+            send_result = send_to_uazapi(phone_number, response_text)
+    else:
+        print("💬 Web chat - skipping UAZAPI send", file=sys.stderr)
+    
+    if not cache_hit and not fast_path and user_company_data is not None:
+        with capture_stage('semantic_cache'):
+            remember_specialist_response(classification, user_message, user_company_data, response_text)
+
+    # Retornar resultado
+    return build_process_response(
+        response_text, send_result, processing_time, user_id, phone_number, is_web_chat
+    )
 
 
 @app.route('/process', methods=['POST'])
@@ -529,6 +1579,8 @@ def process_message():
     }
     """
     start_time = time()
+    phone_number = ''
+    context = {}
     
     try:
         # Verificar assinatura do QStash (segurança)
@@ -541,239 +1593,38 @@ def process_message():
         # Parse do body
         data = request.get_json()
         
-        if not data:
-            return jsonify({
-                "success": False,
-                "error": "No JSON data provided"
-            }), 400
-        
-        # Extrair dados
-        user_message = data.get('message', '')
-        user_id = data.get('userId', '')
-        phone_number = data.get('phoneNumber', '')
-        context = data.get('context', {})
-        
         # Validações
-        if not user_message:
-            return jsonify({
-                "success": False,
-                "error": "message is required"
-            }), 400
-        
-        if not user_id:
-            return jsonify({
-                "success": False,
-                "error": "userId is required"
-            }), 400
-        
-        if not phone_number:
+        validation_error = validate_process_payload(data)
+        if validation_error:
             return jsonify({
                 "success": False,
-                "error": "phoneNumber is required"
+                "error": validation_error
             }), 400
         
-        print(f"📥 Processing message from {phone_number}", file=sys.stderr)
-        print(f"💬 Message: {user_message[:50]}...", file=sys.stderr)
-        
-        # Classificar mensagem com LLM
-        classification = classify_message_with_llm(user_message)
-        print(f"🔍 Classification: {classification['type']} → {classification['specialist']} (confidence: {classification.get('confidence', 0)})", file=sys.stderr)
-        
-        # Buscar dados REAIS do usuário e empresa para TODOS os casos
-        print(f"📊 Fetching real user and company data for {user_id}...", file=sys.stderr)
-        user_company_data = get_user_company_data(user_id)
-        financial_status = get_financial_status(user_id)
-        
-        print(f"✅ Company: {user_company_data['company_name']} | Sector: {user_company_data['company_sector']}", file=sys.stderr)
-        
-        # Obter crew
-        crew_class = get_crew()
-        
-        # Montar contexto da empresa com dados reais
-        company_context = f"""Empresa: {user_company_data['company_name']}
-Setor: {user_company_data['company_sector']}
-Porte: {user_company_data['company_size']}
-Contato: {user_company_data['user_name']} ({user_company_data['user_role']})"""
-        
-        # Verificar se precisa de recepção/triagem (saudação, agradecimento, geral)
-        needs_reception = classification['type'] in ['greeting', 'acknowledgment', 'general', 'continuation']
-        
-        if needs_reception:
-            # Usar Ana (reception_agent) para acolhimento personalizado
-            print(f"👋 Using reception_agent (Ana) for {classification['type']}", file=sys.stderr)
-            
-            agent = crew_class.reception_agent()
-            task = crew_class.reception_and_triage()
-            
-            # Preparar inputs com contexto completo
-            reception_inputs = {
-                "user_id": user_id,
-                "user_message": user_message,
-                "user_context": user_company_data['user_name'],
-                "message": user_message,
-                "phone_number": phone_number,
-                "whatsapp_number": phone_number,
-            }
-            
-            # Crew simples: Ana sozinha
-            simple_crew = Crew(
-                agents=[agent],
-                tasks=[task],
-                process=Process.sequential,
-                verbose=True
-            )
-            result = simple_crew.kickoff(inputs=reception_inputs)
-            processing_time = int((time() - start_time) * 1000)
-            print(f"✅ Ana (reception) completed in {processing_time}ms", file=sys.stderr)
-            
-            # Extrair resposta
-            response_text = str(result)
-        else:
-            # Mensagem precisa de especialista → usar CrewAI
-            specialist_type = classification['specialist']
-            print(f"🤖 Routing to {specialist_type}...", file=sys.stderr)
-            
-            # Preparar inputs base (todas as variáveis possíveis que as tasks podem usar)
-            base_inputs = {
-                # Variáveis básicas
-                "user_id": user_id,  # ID do usuário
-                "user_request": user_message,
-                "user_context": user_company_data['user_name'],
-                "whatsapp_number": phone_number,
-                "phone_number": phone_number,
-                "user_message": user_message,
-                "message": user_message,
-                
-                # Para financial_advice task (DADOS REAIS)
-                "question": user_message,  # Pergunta/solicitação do usuário
-                "company_context": company_context,  # Contexto real da empresa
-                "financial_status": financial_status,  # Status financeiro real
-                
-                # Para outras tasks financeiras
-                "period": "atual",
-                "cashflow_data": {},
-                "transaction_type": "consulta",
-                "transaction_data": {},
-                
-                # Para marketing
-                "topic": user_message,
-                "area": "geral",
-                "marketing_question": user_message,
-                "company_info": company_context,
-                "marketing_goal": "conforme solicitação do cliente",
-                "budget": "a definir com o cliente",
-                
-                # Para sales
-                "sales_question": user_message,
-                "sales_type": "a definir conforme contexto",
-                "product_info": "produtos/serviços da empresa",
-                "current_challenge": user_message,
-                
-                # Para HR
-                "hr_question": user_message,
-                "employee_count": "não especificado",
-                
-                **context
-            }
-            
-            # Rotear para agente específico OU orquestrador
-            if specialist_type == 'financial_expert':
-                # Criar crew com APENAS financial_expert + task
-                agent = crew_class.financial_expert()
-                task = crew_class.financial_advice()
-                
-                # Crew simples: 1 agente, 1 task, processo sequencial
-                simple_crew = Crew(
-                    agents=[agent],
-                    tasks=[task],
-                    process=Process.sequential,
-                    verbose=True
-                )
-                result = simple_crew.kickoff(inputs=base_inputs)
-            
-            elif specialist_type in ['marketing_expert', 'sales_expert', 'marketing_sales_expert']:
-                # Unificado: Marketing + Vendas = Max
-                agent = crew_class.marketing_sales_expert()
-                task = crew_class.marketing_sales_plan()
-                simple_crew = Crew(
-                    agents=[agent],
-                    tasks=[task],
-                    process=Process.sequential,
-                    verbose=True
-                )
-                result = simple_crew.kickoff(inputs=base_inputs)
-            
-            elif specialist_type == 'hr_expert':
-                agent = crew_class.hr_expert()
-                task = crew_class.hr_guidance()
-                simple_crew = Crew(
-                    agents=[agent],
-                    tasks=[task],
-                    process=Process.sequential,
-                    verbose=True
-                )
-                result = simple_crew.kickoff(inputs=base_inputs)
-            
-            else:
-                # Questão geral → resposta padrão
-                print("ℹ️ General query without specific specialist", file=sys.stderr)
-                result = "Olá! Sou o assistente do FalaChefe. Como posso ajudá-lo com sua empresa hoje? Posso auxiliar em:\n\n💰 Finanças (fluxo de caixa, custos)\n📱 Marketing e Vendas\n👥 Gestão de Pessoas"
-            
-            processing_time = int((time() - start_time) * 1000)
-            
-            print(f"✅ CrewAI completed in {processing_time}ms", file=sys.stderr)
-            
-            # Extrair resposta (pode ser string ou objeto)
-            response_text = str(result)
-        
-        # Salvar mensagem do agente no banco de dados
-        # conversationId vem no nível raiz do payload, não em context
-        conversation_id = data.get('conversationId') or context.get('conversationId', f'conv_{user_id}_{int(time())}')
-        agent_id = specialist_type if 'specialist_type' in locals() else 'crewai'
-        
-        save_agent_message(
-            conversation_id=conversation_id,
-            agent_id=agent_id,
-            content=response_text,
-            metadata={
-                "specialist_type": agent_id,
-                "processing_time_ms": processing_time,
-                "classification": classification.get('type', 'unknown') if 'classification' in locals() else 'unknown',
-                "source": context.get('source', 'whatsapp'),
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        # Cópias da mesma mensagem (webhook repetido) não rodam o crew de novo
+        inbound_id = inbound_message_id(data, request.headers)
+        duplicate_state = claim_inbound_message(inbound_id)
+        if duplicate_state:
+            print(f"🔁 Duplicate delivery ignored ({inbound_id}, {duplicate_state})", file=sys.stderr)
+            body, status = build_duplicate_response(data, duplicate_state)
+            return jsonify(body), status
         
-        # Detectar se é chat web ou WhatsApp baseado APENAS no context.source
-        # Usuários do chat web têm telefone válido mas acessam pela página
-        is_web_chat = context.get('source') == 'web-chat'
+        # Ingress sem estado: o crew roda nos crew workers
+        if PROCESS_MODE == "queue":
+            body, status = enqueue_process_job(data, inbound_id)
+            return jsonify(body), status
         
-        send_result = {
-            "success": True,
-            "source": "web-chat" if is_web_chat else "whatsapp"
-        }
-        
-        # Enviar resposta via UAZAPI apenas para WhatsApp
-        if not is_web_chat:
-            print("📤 Sending response to WhatsApp user...", file=sys.stderr)
-            send_result = send_to_uazapi(phone_number, response_text)
-        else:
-            print("💬 Web chat - skipping UAZAPI send", file=sys.stderr)
-        
-        # Retornar resultado
-        return jsonify({
-            "success": True,
-            "response": response_text,
-            "sent_to_user": send_result.get("success", True),  # True para web chat
-            "uazapi_messageid": send_result.get("messageid"),
-            "source": send_result.get("source", "whatsapp"),
-            "metadata": {
-                "processed_at": datetime.now().isoformat(),
-                "processing_time_ms": processing_time,
-                "user_id": user_id,
-                "phone_number": phone_number if not is_web_chat else "web-chat"
-            }
-        })
+        # Captura anonimizada (TRAFFIC_CAPTURE_ENABLED) para replay e dimensionamento;
+        # deadline desde a chegada: classificação, contexto, crew e entrega dentro do prazo
+        with capture_request(data), request_deadline(start_time), message_turn(data, inbound_id) as batch:
+            if batch is None:
+                print(f"🧩 Message from {data.get('phoneNumber', '')} merged into a newer request", file=sys.stderr)
+                note_capture(path='coalesced')
+                return jsonify(build_coalesced_response(data))
+            data = merge_payloads(batch)
+            phone_number = data.get('phoneNumber', '')
+            context = data.get('context', {})
+            return jsonify(process_merged_message(data, start_time))
         
     except Exception as e:
         print(f"❌ Error processing message: {str(e)}", file=sys.stderr)
@@ -783,20 +1634,111 @@ Contato: {user_company_data['user_name']} ({user_company_data['user_role']})"""
         # Tentar enviar mensagem de erro ao usuário (apenas WhatsApp)
         is_web_chat = context.get('source') == 'web-chat'
         if phone_number and not is_web_chat:
-            send_to_uazapi(
-                phone_number,
-                "Desculpe, houve um erro ao processar sua mensagem. Tente novamente em alguns instantes."
-            )
+            send_to_uazapi(phone_number, PROCESSING_ERROR_MESSAGE)
         
+        return jsonify(build_process_error_response(e, start_time)), 500
+
+
+# ============================================
+# IMPORTAÇÃO EM LOTE (CSV / OFX)
+# ============================================
+
+IMPORT_DOWNLOAD_TIMEOUT = int(os.getenv("IMPORT_DOWNLOAD_TIMEOUT", "60"))
+
+
+def iter_remote_lines(file_url: str):
+    """Baixa o arquivo em streaming e produz linhas decodificadas (UTF-8 ou Latin-1)"""
+    # Host permitido e com endereço público (SSRF); redirects não seriam verificados
+    check_file_url(file_url)
+    with requests.get(file_url, stream=True, timeout=IMPORT_DOWNLOAD_TIMEOUT, allow_redirects=False) as response:
+        if response.is_redirect:
+            raise ValueError(f"Redirect not allowed for import download ({response.status_code})")
+        response.raise_for_status()
+        for raw_line in response.iter_lines():
+            try:
+                yield raw_line.decode("utf-8")
+            except UnicodeDecodeError:
+                # Extratos de bancos brasileiros costumam vir em Latin-1
+                yield raw_line.decode("latin-1")
+
+
+def run_bulk_import(import_id: str, user_id: str, phone_number: str, file_url: str,
+                    file_name: str = "", file_format: str = None) -> dict:
+    """Executa a importação completa e notifica o usuário pelo WhatsApp"""
+    notify = (lambda text: send_to_uazapi(phone_number, text)) if phone_number else None
+    importer = BulkImporter(user_id, notify=notify, source="whatsapp-import")
+
+    print(f"📥 Import {import_id} started for {user_id} ({file_name or file_url})", file=sys.stderr)
+    summary = importer.run(iter_statement_transactions(iter_remote_lines(file_url), file_name, file_format))
+    print(f"📥 Import {import_id} finished: {summary['inserted']} inserted, {summary['duplicates']} duplicates, {summary['rejected']} rejected", file=sys.stderr)
+    return summary
+
+
+def validate_import_payload(data: dict):
+    if not data:
+        return "No JSON body provided"
+    if not data.get('userId'):
+        return "Missing required field: userId"
+    if not data.get('fileUrl'):
+        return "Missing required field: fileUrl"
+    url_error = file_url_error(data['fileUrl'])
+    if url_error:
+        return url_error
+    if data.get('format') not in (None, 'csv', 'ofx'):
+        return "format must be 'csv' or 'ofx'"
+    return None
+
+
+@app.route('/import', methods=['POST'])
+def import_transactions():
+    """
+    Importa planilha/extrato para o fluxo de caixa em background
+    
+    Body esperado:
+    {
+        "userId": "ID do usuário",
+        "phoneNumber": "Número do WhatsApp (progresso e resumo)",
+        "fileUrl": "URL https do arquivo em host permitido (IMPORT_ALLOWED_HOSTS: UAZAPI, Supabase)",
+        "fileName": "extrato.ofx",
+        "format": "csv" | "ofx" (opcional, detectado automaticamente)
+    }
+    """
+    if not verify_qstash_signature(request):
         return jsonify({
             "success": False,
-            "error": str(e),
-            "error_type": type(e).__name__,
-            "metadata": {
-                "processed_at": datetime.now().isoformat(),
-                "processing_time_ms": int((time() - start_time) * 1000)
-            }
-        }), 500
+            "error": "Invalid QStash signature"
+        }), 401
+    
+    data = request.get_json(silent=True)
+    validation_error = validate_import_payload(data)
+    if validation_error:
+        return jsonify({
+            "success": False,
+            "error": validation_error
+        }), 400
+    
+    import_id = uuid.uuid4().hex[:12]
+    phone_number = data.get('phoneNumber', '')
+    
+    def worker():
+        try:
+            run_bulk_import(import_id, data['userId'], phone_number, data['fileUrl'],
+                            data.get('fileName', ''), data.get('format'))
+        except Exception as e:
+            print(f"❌ Import {import_id} failed: {e}", file=sys.stderr)
+            if phone_number:
+                send_to_uazapi(phone_number, "❌ Não consegui ler seu arquivo. Envie uma planilha CSV ou extrato OFX.")
+    
+    threading.Thread(target=worker, name=f"import-{import_id}", daemon=True).start()
+    
+    if phone_number:
+        send_to_uazapi(phone_number, "📥 Recebi seu arquivo! Estou importando as transações e te aviso quando terminar.")
+    
+    return jsonify({
+        "success": True,
+        "importId": import_id,
+        "status": "processing"
+    }), 202
 
 
 if __name__ == '__main__':
@@ -0,0 +1,746 @@
+#!/usr/bin/env python3
+"""
+API Server ASGI para processar mensagens com CrewAI
+Variante assíncrona do api_server.py (mesmos endpoints e mesmo contrato JSON)
+
+No api_server.py (Flask + gunicorn sync) cada conversa ocupa uma thread do
+SO durante toda a execução do crew. Aqui as chamadas de I/O (Supabase,
+UAZAPI, OpenAI) são assíncronas e apenas o kickoff do crew roda em um
+executor limitado, então um único processo mantém centenas de conversas
+aguardando o LLM.
+
+Endpoints:
+- POST /process - Processa mensagem com CrewAI e envia resposta via UAZAPI
+- POST /import - Importa planilha CSV / extrato OFX para o fluxo de caixa (em background)
+- GET /health - Health check
+- GET /metrics - Métricas Prometheus
+- GET /debug/crew-traces - Traces verbose de crews de requisições com falha (DEBUG_TRACES_TOKEN)
+
+Rodar:
+    uvicorn asgi_server:app --host 0.0.0.0 --port 8000 --workers 1
+"""
+
+import os
+import sys
+import asyncio
+import uuid
+import contextlib
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+# Reaproveita configuração, crew singleton e regras de negócio do servidor Flask
+from api_server import (
+    CLASSIFIER_MODEL,
+    CLASSIFIER_SYSTEM_PROMPT,
+    FINANCIAL_STATUS_ERROR,
+    FINANCIAL_STATUS_FETCH_FAILED,
+    FINANCIAL_STATUS_NOT_CONFIGURED,
+    FINANCIAL_STATUS_UNAVAILABLE,
+    PROCESSING_ERROR_MESSAGE,
+    batch_scope,
+    build_agent_message_payload,
+    build_busy_response,
+    build_crew_traces_response,
+    build_coalesced_response,
+    build_duplicate_response,
+    build_health_payload,
+    build_message_metadata,
+    build_metrics_text,
+    build_process_error_response,
+    build_process_response,
+    cached_profile_fallback,
+    cached_specialist_response,
+    check_qstash_signature,
+    classify_message_by_keywords,
+    default_company_data,
+    financial_data_url,
+    lane_for_classification,
+    parse_classification_response,
+    profile_from_onboarding,
+    remember_specialist_response,
+    resolve_conversation_id,
+    run_bulk_import,
+    run_crew_for_message,
+    run_in_lane_before_deadline,
+    summarize_financial_transactions,
+    supabase_config,
+    try_cashflow_fast_path,
+    uazapi_text_request,
+    user_onboarding_url,
+    validate_import_payload,
+    validate_process_payload,
+)
+from falachefe_crew.analytics.financial_digest import (
+    cached_digest,
+    clear_digest_stale,
+    digest_from_rows,
+    digest_url,
+    format_financial_digest,
+    is_digest_stale,
+    refresh_url,
+    store_digest,
+)
+from falachefe_crew.resilience.dependency_guard import get_guard, DependencyUnavailableError
+from falachefe_crew.resilience.request_deadline import (
+    DEADLINE_FALLBACK_ANSWER,
+    hold_late_runs,
+    request_deadline,
+    wait_late_runs,
+)
+from falachefe_crew.observability.usage_ledger import CLASSIFIER, record_openai_usage
+from falachefe_crew.observability.structured_logging import (
+    REQUEST_ID_HEADER,
+    begin_request,
+    current_request_id,
+    end_request,
+)
+from falachefe_crew.security.inbound_dedup import (
+    claim_inbound_message,
+    complete_inbound_message,
+    inbound_message_id,
+    release_inbound_message,
+)
+from falachefe_crew.scheduling.message_coalescer import get_coalescer, merge_payloads, should_coalesce
+from falachefe_crew.scheduling.fair_share import check_rate_limit
+from falachefe_crew.scheduling.priority_lanes import LANES
+
+# ============================================
+# CONFIGURAÇÃO
+# ============================================
+
+# Threads dedicadas ao kickoff dos crews (cada uma espera o LLM, não usa CPU)
+CREW_EXECUTOR_WORKERS = int(os.getenv("ASGI_CREW_WORKERS", "64"))
+# Conversas aguardando vaga no executor antes de responder 503
+CREW_MAX_PENDING = int(os.getenv("ASGI_CREW_MAX_PENDING", "500"))
+
+SERVICE_START_TIME = time()
+
+# Um executor por faixa de prioridade: saudações não entram na fila atrás de
+# planos longos. A vaga na faixa (cota + fair queuing entre clientes) é
+# esperada dentro do deadline; CREW_MAX_PENDING limita o total
+crew_executors = {
+    lane: ThreadPoolExecutor(max_workers=CREW_EXECUTOR_WORKERS, thread_name_prefix=f"crew-{lane}")
+    for lane in LANES
+}
+_crews_pending = 0
+# Alterado pelas threads do executor (o pending só pelo event loop)
+_crews_running = 0
+_crews_running_lock = threading.Lock()
+
+# Clientes assíncronos (criados no lifespan)
+http_client: httpx.AsyncClient = None
+openai_client = None
+
+
+# ============================================
+# CHAMADAS EXTERNAS ASSÍNCRONAS
+# ============================================
+
+async def get_user_company_data_async(user_id: str) -> dict:
+    """Versão assíncrona de api_server.get_user_company_data"""
+    try:
+        supabase_url, headers = supabase_config()
+
+        if not headers:
+            print("⚠️ SUPABASE_SERVICE_ROLE_KEY not configured, using defaults", file=sys.stderr)
+            return default_company_data("Empresa não identificada")
+
+        response = await get_guard("supabase").acall(
+            lambda timeout: http_client.get(
+                user_onboarding_url(supabase_url, user_id),
+                headers=headers,
+                timeout=timeout
+            ),
+            is_failure=lambda r: r.status_code >= 500,
+            fallback=lambda exc: None
+        )
+
+        if response is None or response.status_code >= 500:
+            return cached_profile_fallback(user_id)
+
+        return profile_from_onboarding(user_id, response.json() if response.status_code == 200 else [])
+
+    except Exception as e:
+        print(f"⚠️ Error fetching user data: {e}", file=sys.stderr)
+        return default_company_data("Erro ao buscar dados")
+
+
+async def get_financial_digest_async(user_id: str, supabase_url: str, headers: dict):
+    """Versão assíncrona de financial_digest.get_financial_digest"""
+    stale = is_digest_stale(user_id)
+    if not stale:
+        digest = cached_digest(user_id)
+        if digest is not None:
+            return digest
+
+    try:
+        if stale:
+            await get_guard("supabase").acall(
+                lambda timeout: http_client.post(
+                    refresh_url(supabase_url), json={"p_user_id": user_id}, headers=headers, timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
+            )
+            clear_digest_stale(user_id)
+
+        response = await get_guard("supabase").acall(
+            lambda timeout: http_client.get(digest_url(supabase_url, user_id), headers=headers, timeout=timeout),
+            is_failure=lambda r: r.status_code >= 500
+        )
+        if response.status_code != 200:
+            return None
+        digest = digest_from_rows(response.json())
+    except Exception as e:
+        print(f"⚠️ Financial digest lookup failed: {e}", file=sys.stderr)
+        return None
+
+    if digest is not None:
+        store_digest(user_id, digest)
+    return digest
+
+
+async def get_financial_status_async(user_id: str) -> str:
+    """Versão assíncrona de api_server.get_financial_status"""
+    try:
+        supabase_url, headers = supabase_config()
+
+        if not headers:
+            return FINANCIAL_STATUS_NOT_CONFIGURED
+
+        digest = await get_financial_digest_async(user_id, supabase_url, headers)
+        if digest is not None:
+            return format_financial_digest(digest)
+
+        response = await get_guard("supabase").acall(
+            lambda timeout: http_client.get(
+                financial_data_url(supabase_url, user_id),
+                headers=headers,
+                timeout=timeout
+            ),
+            is_failure=lambda r: r.status_code >= 500,
+            fallback=lambda exc: None
+        )
+
+        if response is None:
+            return FINANCIAL_STATUS_UNAVAILABLE
+
+        if response.status_code != 200:
+            print(f"⚠️ Failed to fetch financial data: {response.status_code}", file=sys.stderr)
+            return FINANCIAL_STATUS_FETCH_FAILED
+
+        return summarize_financial_transactions(response.json())
+
+    except Exception as e:
+        print(f"⚠️ Error fetching financial status: {e}", file=sys.stderr)
+        return FINANCIAL_STATUS_ERROR
+
+
+async def classify_message_async(message: str) -> dict:
+    """Versão assíncrona de api_server.classify_message_with_llm"""
+    try:
+        started = time()
+        response = await get_guard("openai").acall(
+            lambda timeout: openai_client.chat.completions.create(
+                model=CLASSIFIER_MODEL,
+                messages=[
+                    {"role": "system", "content": CLASSIFIER_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Mensagem: {message}"}
+                ],
+                temperature=0.3,
+                max_tokens=150,
+                timeout=timeout
+            )
+        )
+        record_openai_usage(CLASSIFIER, CLASSIFIER_MODEL, response, time() - started)
+        return parse_classification_response(response.choices[0].message.content)
+
+    except Exception as e:
+        print(f"⚠️ LLM classification failed: {e}", file=sys.stderr)
+        print("Falling back to keyword-based classification", file=sys.stderr)
+        return classify_message_by_keywords(message)
+
+
+async def save_agent_message_async(conversation_id: str, agent_id: str, content: str, metadata: dict = None) -> bool:
+    """Versão assíncrona de api_server.save_agent_message"""
+    try:
+        supabase_url, headers = supabase_config()
+
+        if not headers:
+            print("⚠️ SUPABASE_SERVICE_ROLE_KEY not configured, cannot save agent message", file=sys.stderr)
+            return False
+
+        payload = build_agent_message_payload(conversation_id, agent_id, content, metadata)
+        response = await get_guard("supabase").acall(
+            lambda timeout: http_client.post(
+                f"{supabase_url}/rest/v1/messages",
+                json=payload,
+                headers={**headers, "Prefer": "return=representation"},
+                timeout=timeout
+            ),
+            is_failure=lambda r: r.status_code >= 500
+        )
+
+        if response.status_code in [200, 201]:
+            print("✅ Agent message saved", file=sys.stderr)
+            return True
+
+        print(f"⚠️ Failed to save agent message: {response.status_code} - {response.text}", file=sys.stderr)
+        return False
+
+    except Exception as e:
+        print(f"⚠️ Error saving agent message: {e}", file=sys.stderr)
+        return False
+
+
+async def send_to_uazapi_async(phone_number: str, message: str) -> dict:
+    """Versão assíncrona de api_server.send_to_uazapi"""
+    try:
+        url, payload, headers = uazapi_text_request(phone_number, message)
+
+        print(f"📤 Sending to UAZAPI: {phone_number}", file=sys.stderr)
+
+        response = await get_guard("uazapi").acall(
+            lambda timeout: http_client.post(url, json=payload, headers=headers, timeout=timeout),
+            is_failure=lambda r: r.status_code >= 500
+        )
+        response.raise_for_status()
+
+        result = response.json()
+        print(f"✅ Message sent: {result.get('messageid')}", file=sys.stderr)
+
+        return {
+            "success": True,
+            "messageid": result.get("messageid"),
+            "status": result.get("status")
+        }
+
+    except (httpx.HTTPError, DependencyUnavailableError) as e:
+        print(f"❌ Error sending to UAZAPI: {str(e)}", file=sys.stderr)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+def conversation_turn_async(data: dict, inbound_id: Optional[str] = None):
+    """Versão assíncrona de api_server.conversation_turn"""
+    if should_coalesce(data):
+        return get_coalescer().aturn(data.get('userId') or data.get('phoneNumber', ''), data, inbound_id)
+    return contextlib.nullcontext(([data], [inbound_id] if inbound_id else []))
+
+
+# Saídas de vez adiadas até a entrega de crews tardios (referência até terminarem)
+_held_turn_tasks = set()
+
+
+async def _exit_after_late_runs(runs: list, manager, exc_info: tuple) -> None:
+    await asyncio.to_thread(wait_late_runs, runs)
+    try:
+        await manager.__aexit__(*exc_info)
+    except Exception as e:
+        print(f"⚠️ Release after late runs failed: {e}", file=sys.stderr)
+
+
+@contextlib.asynccontextmanager
+async def held_through_late_runs_async(manager):
+    """Versão assíncrona de held_through_late_runs (saída adiada em uma task do event loop)"""
+    value = await manager.__aenter__()
+    exc_info = (None, None, None)
+    with hold_late_runs() as runs:
+        try:
+            yield value
+        except BaseException:
+            exc_info = sys.exc_info()
+            raise
+        finally:
+            if runs:
+                task = asyncio.create_task(_exit_after_late_runs(runs, manager, exc_info))
+                _held_turn_tasks.add(task)
+                task.add_done_callback(_held_turn_tasks.discard)
+            else:
+                await manager.__aexit__(*exc_info)
+
+
+@contextlib.asynccontextmanager
+async def settled_inbound_messages_async(inbound_ids: list):
+    """Versão assíncrona de api_server.settled_inbound_messages"""
+    try:
+        yield
+    except BaseException:
+        for merged_id in inbound_ids:
+            await asyncio.to_thread(release_inbound_message, merged_id)
+        raise
+    for merged_id in inbound_ids:
+        await asyncio.to_thread(complete_inbound_message, merged_id)
+
+
+@contextlib.asynccontextmanager
+async def message_turn_async(data: dict, inbound_id: Optional[str] = None):
+    """Versão assíncrona de api_server.message_turn (ids de todo o lote ficam com o dono até crews tardios entregarem)"""
+    async with held_through_late_runs_async(conversation_turn_async(data, inbound_id)) as turn:
+        if turn is None:
+            yield None
+            return
+        batch, inbound_ids = turn
+        async with held_through_late_runs_async(settled_inbound_messages_async(inbound_ids)):
+            with batch_scope(batch):
+                yield batch
+
+
+async def verify_qstash_signature_async(request: Request) -> bool:
+    """Versão assíncrona de api_server.verify_qstash_signature (lê o corpo com await)"""
+    return check_qstash_signature(request.headers.get('Upstash-Signature'), await request.body(), request.url.path)
+
+
+async def run_crew_in_executor(data: dict, start_time: float, classification: dict, *args) -> tuple:
+    """Crew com vaga na faixa da classificação e dentro do deadline, no executor da faixa (contabiliza fila e execução)"""
+    global _crews_pending, _crews_running
+
+    loop = asyncio.get_running_loop()
+    _crews_pending += 1
+
+    def _run():
+        global _crews_running
+        with _crews_running_lock:
+            _crews_running += 1
+        try:
+            finished, result = run_in_lane_before_deadline(
+                data, start_time, classification, lambda: run_crew_for_message(classification, *args)
+            )
+            return result if finished else (DEADLINE_FALLBACK_ANSWER, classification['specialist'])
+        finally:
+            with _crews_running_lock:
+                _crews_running -= 1
+
+    try:
+        # copy_context: o executor não propaga ContextVars (mensagem de origem)
+        executor = crew_executors[lane_for_classification(classification)]
+        return await loop.run_in_executor(executor, contextvars.copy_context().run, _run)
+    finally:
+        _crews_pending -= 1
+
+
+# ============================================
+# ENDPOINTS
+# ============================================
+
+async def health(request: Request) -> JSONResponse:
+    """Health check endpoint"""
+    uptime = time() - SERVICE_START_TIME
+    payload = await asyncio.to_thread(build_health_payload, uptime)
+    payload["server"] = "asgi"
+    return JSONResponse(payload)
+
+
+async def metrics(request: Request) -> PlainTextResponse:
+    """Métricas para Prometheus (formato básico)"""
+    uptime = time() - SERVICE_START_TIME
+    metrics_text = await asyncio.to_thread(build_metrics_text, uptime)
+
+    metrics_text += f"""
+# HELP falachefe_asgi_crews_pending Conversas aguardando ou executando crew
+# TYPE falachefe_asgi_crews_pending gauge
+falachefe_asgi_crews_pending {_crews_pending}
+
+# HELP falachefe_asgi_crews_running Crews em execução no executor
+# TYPE falachefe_asgi_crews_running gauge
+falachefe_asgi_crews_running {_crews_running}
+
+# HELP falachefe_asgi_crew_workers Tamanho do executor de crews
+# TYPE falachefe_asgi_crew_workers gauge
+falachefe_asgi_crew_workers {CREW_EXECUTOR_WORKERS}
+"""
+    return PlainTextResponse(metrics_text, media_type="text/plain; charset=utf-8")
+
+
+async def process_message(request: Request) -> JSONResponse:
+    """
+    Processa mensagem com CrewAI e envia resposta via UAZAPI
+
+    Mesmo body e mesma resposta de api_server.process_message
+    """
+    start_time = time()
+    phone_number = ''
+    context = {}
+
+    try:
+        # Verificar assinatura do QStash (segurança)
+        if not await verify_qstash_signature_async(request):
+            return JSONResponse({
+                "success": False,
+                "error": "Invalid QStash signature"
+            }, status_code=401)
+
+        # Parse do body
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+
+        validation_error = validate_process_payload(data)
+        if validation_error:
+            return JSONResponse({
+                "success": False,
+                "error": validation_error
+            }, status_code=400)
+
+        if _crews_pending >= CREW_MAX_PENDING:
+            print(f"🚦 Crew queue full ({_crews_pending} pending), rejecting request", file=sys.stderr)
+            return JSONResponse({
+                "success": False,
+                "error": "Server busy, retry later"
+            }, status_code=503, headers={"Retry-After": "5"})
+
+        # Cópias da mesma mensagem (webhook repetido) não rodam o crew de novo
+        inbound_id = inbound_message_id(data, request.headers)
+        duplicate_state = await asyncio.to_thread(claim_inbound_message, inbound_id)
+        if duplicate_state:
+            print(f"🔁 Duplicate delivery ignored ({inbound_id}, {duplicate_state})", file=sys.stderr)
+            body, status = build_duplicate_response(data, duplicate_state)
+            return JSONResponse(body, status_code=status)
+
+        # Coalescer rajadas do mesmo usuário em um único crew (ordem garantida);
+        # deadline desde a chegada, copiado para o executor junto com o contexto
+        with request_deadline(start_time):
+            async with message_turn_async(data, inbound_id) as batch:
+                if batch is None:
+                    print(f"🧩 Message from {data.get('phoneNumber', '')} merged into a newer request", file=sys.stderr)
+                    return JSONResponse(build_coalesced_response(data))
+                data = merge_payloads(batch)
+
+                # Fair share: 1 token por lote coalescido; sem saldo, pedido para reenviar
+                rate_limit_wait = await asyncio.to_thread(check_rate_limit, data)
+                if rate_limit_wait:
+                    print(f"🚦 Rate limited {data.get('userId', '')} for {rate_limit_wait:.1f}s, asking to resend", file=sys.stderr)
+                    body = build_busy_response(data, rate_limit_wait)
+                    if data.get('phoneNumber') and (data.get('context') or {}).get('source') != 'web-chat':
+                        await send_to_uazapi_async(data['phoneNumber'], body['response'])
+                    return JSONResponse(body)
+
+                # Extrair dados
+                user_message = data.get('message', '')
+                user_id = data.get('userId', '')
+                phone_number = data.get('phoneNumber', '')
+                context = data.get('context', {})
+
+                print(f"📥 Processing message from {phone_number}", file=sys.stderr)
+                print(f"💬 Message: {user_message[:50]}...", file=sys.stderr)
+
+                # Comando estruturado de transação → grava direto (sem classificador/crew)
+                fast_path = await asyncio.to_thread(try_cashflow_fast_path, user_message, user_id)
+                if fast_path:
+                    response_text, classification = fast_path
+                    agent_id, cache_hit = 'financial_expert', None
+                else:
+                    # Classificação e contexto em paralelo (todos I/O)
+                    classification, user_company_data, financial_status = await asyncio.gather(
+                        classify_message_async(user_message),
+                        get_user_company_data_async(user_id),
+                        get_financial_status_async(user_id),
+                    )
+                    print(f"🔍 Classification: {classification['type']} → {classification['specialist']} (confidence: {classification.get('confidence', 0)})", file=sys.stderr)
+                    print(f"✅ Company: {user_company_data['company_name']} | Sector: {user_company_data['company_sector']}", file=sys.stderr)
+
+                    # Perguntas genéricas já respondidas → cache semântico (sem crew)
+                    cache_hit = await asyncio.to_thread(
+                        cached_specialist_response, classification, user_message, user_company_data
+                    )
+                    if cache_hit:
+                        response_text, agent_id = cache_hit['answer'], classification['specialist']
+                    else:
+                        response_text, agent_id = await run_crew_in_executor(
+                            data,
+                            start_time,
+                            classification,
+                            user_message,
+                            user_id,
+                            phone_number,
+                            context,
+                            user_company_data,
+                            financial_status
+                        )
+                processing_time = int((time() - start_time) * 1000)
+
+                is_web_chat = context.get('source') == 'web-chat'
+
+                send_result = {
+                    "success": True,
+                    "source": "web-chat" if is_web_chat else "whatsapp"
+                }
+
+                # Salvar e enviar em paralelo
+                save_coro = save_agent_message_async(
+                    resolve_conversation_id(data, user_id),
+                    agent_id,
+                    response_text,
+                    build_message_metadata(agent_id, processing_time, classification, context, cache_hit)
+                )
+                if not is_web_chat:
+                    print("📤 Sending response to WhatsApp user...", file=sys.stderr)
+                    _, send_result = await asyncio.gather(save_coro, send_to_uazapi_async(phone_number, response_text))
+                else:
+                    print("💬 Web chat - skipping UAZAPI send", file=sys.stderr)
+                    await save_coro
+
+                if not cache_hit and not fast_path:
+                    await asyncio.to_thread(
+                        remember_specialist_response, classification, user_message, user_company_data, response_text
+                    )
+
+                return JSONResponse(build_process_response(
+                    response_text, send_result, processing_time, user_id, phone_number, is_web_chat
+                ))
+
+    except Exception as e:
+        print(f"❌ Error processing message: {str(e)}", file=sys.stderr)
+        import traceback
+        traceback.print_exc(file=sys.stderr)
+
+        # Tentar enviar mensagem de erro ao usuário (apenas WhatsApp)
+        is_web_chat = context.get('source') == 'web-chat'
+        if phone_number and not is_web_chat:
+            await send_to_uazapi_async(phone_number, PROCESSING_ERROR_MESSAGE)
+
+        return JSONResponse(build_process_error_response(e, start_time), status_code=500)
+
+
+# Importações em andamento (referência evita coleta da task pelo GC)
+_import_tasks = set()
+
+
+async def import_transactions(request: Request) -> JSONResponse:
+    """Importa planilha/extrato em background (mesmo contrato de api_server /import)"""
+    if not await verify_qstash_signature_async(request):
+        return JSONResponse({"success": False, "error": "Invalid QStash signature"}, status_code=401)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+
+    validation_error = validate_import_payload(data)
+    if validation_error:
+        return JSONResponse({"success": False, "error": validation_error}, status_code=400)
+
+    import_id = uuid.uuid4().hex[:12]
+    phone_number = data.get('phoneNumber', '')
+
+    async def worker():
+        try:
+            # Download e parsing são bloqueantes: thread fora do executor dos crews
+            await asyncio.to_thread(
+                run_bulk_import, import_id, data['userId'], phone_number, data['fileUrl'],
+                data.get('fileName', ''), data.get('format')
+            )
+        except Exception as e:
+            print(f"❌ Import {import_id} failed: {e}", file=sys.stderr)
+            if phone_number:
+                await send_to_uazapi_async(phone_number, "❌ Não consegui ler seu arquivo. Envie uma planilha CSV ou extrato OFX.")
+
+    task = asyncio.create_task(worker())
+    _import_tasks.add(task)
+    task.add_done_callback(_import_tasks.discard)
+
+    if phone_number:
+        await send_to_uazapi_async(phone_number, "📥 Recebi seu arquivo! Estou importando as transações e te aviso quando terminar.")
+
+    return JSONResponse({"success": True, "importId": import_id, "status": "processing"}, status_code=202)
+
+
+async def crew_traces(request: Request) -> JSONResponse:
+    """Últimos traces verbose de crews em requisições com falha (deste worker)"""
+    body, status = build_crew_traces_response(request.headers.get('Authorization'))
+    return JSONResponse(body, status_code=status)
+
+
+# ============================================
+# APP
+# ============================================
+
+class RequestLogContextMiddleware:
+    """request_id nos logs e no header da resposta; traces de crew guardados se a resposta for 5xx"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        token = begin_request(headers.get(REQUEST_ID_HEADER.lower()))
+        request_id = current_request_id()
+        status = {"code": 500}
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER.lower().encode("latin-1"), request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        failed = True
+        try:
+            await self.app(scope, receive, send_with_request_id)
+            failed = status["code"] >= 500
+        finally:
+            end_request(token, failed)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Cria e fecha os clientes HTTP assíncronos compartilhados"""
+    global http_client, openai_client
+    from openai import AsyncOpenAI
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+    )
+    openai_client = AsyncOpenAI()
+    print(f"🚀 ASGI server ready (crew workers: {CREW_EXECUTOR_WORKERS})", file=sys.stderr)
+
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+        await openai_client.close()
+        for executor in crew_executors.values():
+            executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/process', process_message, methods=['POST']),
+        Route('/import', import_transactions, methods=['POST']),
+        Route('/debug/crew-traces', crew_traces, methods=['GET']),
+    ],
+    middleware=[
+        # Permitir CORS para chamadas do QStash
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(RequestLogContextMiddleware),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('PORT', 8000))
+    print(f"🚀 Starting Falachefe CrewAI ASGI API on port {port}", file=sys.stderr)
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,4 @@
+"""
+Benchmarks do Falachefe CrewAI
+Medições offline (sem OpenAI, Supabase ou UAZAPI reais) para comparar mudanças de desempenho
+"""
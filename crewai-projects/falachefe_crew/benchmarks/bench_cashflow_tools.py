@@ -0,0 +1,69 @@
+"""
+Microbenchmarks das ferramentas de fluxo de caixa
+
+- montagem do CashflowFrame a partir do payload colunar da API
+- agregações (summary) e projeção (forecast_cashflow)
+- _run das ferramentas com o frame já carregado (formatação da resposta)
+"""
+
+from datetime import date
+
+import pytest
+
+from benchmarks.datasets import HISTORY_SIZES, TODAY, cashflow_columns
+
+
+def build_frame(size):
+    from falachefe_crew.analytics.cashflow_analytics import CashflowFrame
+
+    columns = cashflow_columns(size)
+    return CashflowFrame.from_columns(columns["dates"], columns["types"], columns["amounts"], columns["categories"])
+
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def bench_frame_from_columns(benchmark, size):
+    cashflow_columns(size)
+    frame = benchmark(build_frame, size)
+    assert len(frame) == size
+
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def bench_frame_summary(benchmark, size):
+    frame = build_frame(size)
+    summary = benchmark(frame.summary, date(2025, 10, 1), date(2025, 12, 31), TODAY)
+    assert summary["months"]
+
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def bench_forecast_cashflow(benchmark, size):
+    from falachefe_crew.analytics import cashflow_forecast
+
+    frame = build_frame(size)
+    # Sem o cache por frame: mede o cálculo completo a cada rodada
+    benchmark(cashflow_forecast._compute_forecast, frame, 8, TODAY)
+
+
+@pytest.fixture
+def cashflow_tools(monkeypatch):
+    """Módulo das ferramentas com o frame vindo do dataset (sem API, sem digest)"""
+    pytest.importorskip("crewai")
+    from falachefe_crew.tools import cashflow_tools as module
+
+    monkeypatch.setattr(module, "get_financial_digest", lambda user_id: None)
+    return module
+
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def bench_summary_tool_run(benchmark, cashflow_tools, monkeypatch, size):
+    frame = build_frame(size)
+    monkeypatch.setattr(cashflow_tools, "get_cashflow_frame", lambda user_id: frame)
+    output = benchmark(cashflow_tools.GetCashflowSummaryTool()._run, "bench-user", "2025-Q4")
+    assert "R$" in output
+
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def bench_categories_tool_run(benchmark, cashflow_tools, monkeypatch, size):
+    frame = build_frame(size)
+    monkeypatch.setattr(cashflow_tools, "get_cashflow_frame", lambda user_id: frame)
+    output = benchmark(cashflow_tools.GetCashflowCategoriesTool()._run, "bench-user", "2025")
+    assert "R$" in output
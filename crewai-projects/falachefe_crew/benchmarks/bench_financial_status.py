@@ -0,0 +1,29 @@
+"""
+Microbenchmarks do status financeiro enviado ao prompt (get_financial_status)
+
+- summarize_financial_transactions: fallback sobre financial_data (escala com o histórico)
+- format_financial_digest: caminho normal (digest pré-calculado)
+"""
+
+import pytest
+
+from benchmarks.datasets import HISTORY_SIZES, digest, financial_data_rows
+
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def bench_summarize_financial_transactions(benchmark, size):
+    pytest.importorskip("crewai")
+    pytest.importorskip("flask")
+    from api_server import summarize_financial_transactions
+
+    rows = financial_data_rows(size)
+    text = benchmark(summarize_financial_transactions, rows)
+    assert "Saldo" in text
+
+
+@pytest.mark.parametrize("anomalies", [0, 5])
+def bench_format_financial_digest(benchmark, anomalies):
+    from falachefe_crew.analytics.financial_digest import format_financial_digest
+
+    text = benchmark(format_financial_digest, digest(anomalies))
+    assert "Saldo Atual" in text
@@ -0,0 +1,47 @@
+"""
+Microbenchmarks do caminho de cada mensagem (antes e depois do crew)
+
+- fallback de classificação por palavras-chave (classify_message_by_keywords)
+- detecção de comando de caixa (parse_cashflow_command)
+- FormatResponseTool._run
+"""
+
+import pytest
+
+from benchmarks.datasets import cashflow_command, long_message
+
+MESSAGE_SIZES = (10, 200, 2_000)
+# Acima de MAX_COMMAND_CHARS (160) o parser recusa sem trabalho: mede só comandos aceitos
+COMMAND_SIZES = (40, 100, 160)
+
+
+@pytest.mark.parametrize("chars", COMMAND_SIZES)
+def bench_parse_cashflow_command(benchmark, chars):
+    from falachefe_crew.routing.cashflow_command import MAX_COMMAND_CHARS, parse_cashflow_command
+
+    message = cashflow_command(chars)
+    assert len(message) <= MAX_COMMAND_CHARS
+    result = benchmark(parse_cashflow_command, message)
+    assert result is not None
+
+
+@pytest.mark.parametrize("words", MESSAGE_SIZES)
+def bench_classify_by_keywords(benchmark, words):
+    pytest.importorskip("crewai")
+    pytest.importorskip("flask")
+    from api_server import classify_message_by_keywords
+
+    message = long_message(words)
+    result = benchmark(classify_message_by_keywords, message)
+    assert "type" in result
+
+
+@pytest.mark.parametrize("format_type", ["text", "structured"])
+@pytest.mark.parametrize("words", MESSAGE_SIZES)
+def bench_format_response_tool(benchmark, words, format_type):
+    pytest.importorskip("crewai")
+    from falachefe_crew.tools.uazapi_tools import FormatResponseTool
+
+    tool = FormatResponseTool()
+    response = long_message(words)
+    benchmark(tool._run, response, format_type=format_type)
@@ -0,0 +1,44 @@
+"""
+Configuração dos microbenchmarks (pytest-benchmark)
+
+- baselines em benchmarks/baselines, independente do diretório de onde o
+  pytest foi chamado
+- com baseline salvo, toda execução compara com o mais recente e falha se
+  a mediana piorar mais que REGRESSION_TOLERANCE
+"""
+
+import os
+import sys
+
+import pytest
+from pytest_benchmark.utils import parse_compare_fail
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARKS_DIR)
+BASELINE_STORAGE = os.path.join(BENCHMARKS_DIR, "baselines")
+REGRESSION_TOLERANCE = os.getenv("BENCH_REGRESSION_TOLERANCE", "median:30%")
+
+# Mesmos imports do api_server (falachefe_crew em src/)
+sys.path.insert(0, os.path.join(PROJECT_DIR, "src"))
+sys.path.insert(0, PROJECT_DIR)
+
+
+def has_baseline() -> bool:
+    for _, _, files in os.walk(BASELINE_STORAGE):
+        if any(name.endswith(".json") for name in files):
+            return True
+    return False
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    option = config.option
+    if getattr(option, "benchmark_storage", None) != "file://./.benchmarks":
+        return
+    option.benchmark_storage = f"file://{BASELINE_STORAGE}"
+
+    saving = option.benchmark_save or option.benchmark_autosave
+    if not option.benchmark_compare and not saving and has_baseline():
+        option.benchmark_compare = True
+    if option.benchmark_compare and not option.benchmark_compare_fail:
+        option.benchmark_compare_fail = [parse_compare_fail(REGRESSION_TOLERANCE)]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Datasets sintéticos fixos para os microbenchmarks
+=================================================
+
+Gerados com seed: o mesmo tamanho produz sempre os mesmos dados, então os
+resultados são comparáveis entre execuções e com o baseline salvo.
+"""
+
+import random
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List
+
+# Tamanhos de histórico do usuário (transações)
+HISTORY_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+TODAY = date(2026, 1, 15)
+SEED = 20260115
+
+CATEGORIES = ["vendas", "servicos", "fornecedores", "aluguel", "salarios", "marketing",
+              "impostos", "contas_consumo", "manutencao", "outros"]
+WORDS = ["preciso", "saber", "como", "está", "meu", "fluxo", "de", "caixa", "vendas", "clientes",
+         "marketing", "instagram", "funcionário", "contratar", "mês", "que", "vem", "folha", "pagamento"]
+
+
+@lru_cache(maxsize=None)
+def financial_data_rows(size: int) -> List[dict]:
+    """Linhas no formato de financial_data (centavos, receita/despesa), mais recentes primeiro"""
+    rng = random.Random(SEED + size)
+    return [
+        {
+            "type": "receita" if rng.random() < 0.55 else "despesa",
+            "amount": rng.randrange(500, 2_000_000),
+            "description": f"Lançamento {i}",
+            "category": rng.choice(CATEGORIES),
+            "date": (TODAY - timedelta(days=i * 730 // size)).isoformat(),
+        }
+        for i in range(size)
+    ]
+
+
+@lru_cache(maxsize=None)
+def cashflow_columns(size: int) -> Dict[str, list]:
+    """Payload colunar de /api/financial/crewai/transactions (2 anos de histórico)"""
+    rng = random.Random(SEED + size)
+    days = [rng.randrange(730) for _ in range(size)]
+    return {
+        "dates": [(TODAY - timedelta(days=d)).isoformat() for d in days],
+        "types": ["entrada" if rng.random() < 0.55 else "saida" for _ in range(size)],
+        "amounts": [round(rng.uniform(5, 20_000), 2) for _ in range(size)],
+        "categories": [rng.choice(CATEGORIES) for _ in range(size)],
+    }
+
+
+def long_message(words: int, seed: int = SEED) -> str:
+    """Mensagem de WhatsApp longa (texto colado, áudio transcrito)"""
+    rng = random.Random(seed + words)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+# Complemento neutro (sem verbo, valor, data ou categoria) para alongar comandos de caixa
+COMMAND_FILLER = ["referente", "ao", "combinado", "com", "o", "pessoal", "do", "escritório",
+                  "conforme", "nota", "da", "semana", "passada", "certinho", "tudo", "ok"]
+
+
+def cashflow_command(chars: int, seed: int = SEED) -> str:
+    """Comando de caixa válido ("paguei R$ 1.200,00 de aluguel ontem ...") com até `chars` caracteres"""
+    rng = random.Random(seed + chars)
+    message = "paguei R$ 1.200,00 de aluguel ontem"
+    while True:
+        word = rng.choice(COMMAND_FILLER)
+        if len(message) + 1 + len(word) > chars:
+            return message
+        message += " " + word
+
+
+def digest(anomalies: int = 5) -> dict:
+    """Digest de financial_digests no formato gravado por refresh_financial_digests"""
+    return {
+        "entradas_total": 152_340.55, "saidas_total": 131_002.10, "saldo": 21_338.45,
+        "entradas_mes": 12_400.00, "saidas_mes": 9_870.30,
+        "resultado_30d": 2_529.70, "resultado_30d_anterior": 1_870.00,
+        "total_transacoes": 4_812, "ultima_transacao": TODAY.isoformat(),
+        "top_saidas": [{"category": c, "amount": 10_000.0 - i * 1000} for i, c in enumerate(CATEGORIES[2:5])],
+        "anomalias": [
+            {"date": TODAY.isoformat(), "category": "fornecedores", "type": "saida",
+             "amount": 9_000.0 + i, "description": f"Compra atípica {i}"}
+            for i in range(anomalies)
+        ],
+        "computed_at": "2026-01-15T06:00:00+00:00",
+    }
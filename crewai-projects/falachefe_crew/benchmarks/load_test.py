@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Load test offline do /process
+=============================
+
+Sobe os serviços falsos (benchmarks.stub_services), inicia o api_server
+apontando para eles e reproduz um arquivo de tráfego (benchmarks.traffic)
+em malha aberta: cada requisição sai no instante gravado, independente
+das anteriores terem terminado. A latência é medida a partir do instante
+agendado, então filas no servidor aparecem nos percentis.
+
+Relatório:
+- p50 / p95 / p99 / máximo, vazão e erros (geral e por tipo de mensagem)
+- tempo médio por requisição em cada dependência (LLM do classificador,
+  LLM do crew, embeddings, Supabase, API Falachefe, UAZAPI) e o restante
+  ("server"), que é CPU/filas do próprio api_server
+
+Uso (a partir de crewai-projects/falachefe_crew):
+    python -m benchmarks.load_test --requests 300 --rate 5
+    python -m benchmarks.load_test --traffic traffic.jsonl --output baseline.json
+    python -m benchmarks.load_test --server-cmd "python asgi_server.py"
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import socket
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+from .stub_services import StubConfig, StubServices
+from .traffic import generate_traffic, load_traffic
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Mesmo comando do Dockerfile (workers/threads), em porta local
+DEFAULT_SERVER_CMD = "gunicorn api_server:app --bind 127.0.0.1:{port} --workers 2 --threads 4 --timeout 120"
+REQUEST_TIMEOUT_SECONDS = 180
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_environment(stub_url: str, port: int, with_caches: bool) -> dict:
+    """Variáveis que apontam o api_server para os serviços falsos"""
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"{stub_url}/v1",
+        "OPENAI_API_BASE": f"{stub_url}/v1",
+        "SUPABASE_URL": stub_url,
+        "SUPABASE_SERVICE_ROLE_KEY": "benchmark",
+        "UAZAPI_BASE_URL": stub_url,
+        "UAZAPI_TOKEN": "benchmark",
+        "FALACHEFE_API_URL": stub_url,
+        "CREWAI_SERVICE_TOKEN": "benchmark",
+        "QSTASH_CURRENT_SIGNING_KEY": "",
+        "CREWAI_TELEMETRY_OPT_OUT": "true",
+        "OTEL_SDK_DISABLED": "true",
+        "PYTHONUNBUFFERED": "1",
+    })
+    env.pop("REDIS_URL", None)
+    if not with_caches:
+        # Mede o custo real de cada mensagem (sem respostas vindas de cache)
+        env["LLM_CACHE_BACKEND"] = "off"
+        env["SEMANTIC_CACHE_ENABLED"] = "false"
+    return env
+
+
+def start_server(command: str, env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(shlex.split(command), cwd=PROJECT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_healthy(base_url: str, process: Optional[subprocess.Popen], timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"api_server exited with code {process.returncode} (see server log)")
+        try:
+            if requests.get(f"{base_url}/health", timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    raise RuntimeError(f"api_server not healthy after {timeout:.0f}s")
+
+
+# ============================================
+# EXECUÇÃO
+# ============================================
+
+def replay(base_url: str, entries: List[dict], concurrency: int) -> List[dict]:
+    """Envia cada entrada no seu instante (malha aberta) e devolve os resultados"""
+    results: List[Optional[dict]] = [None] * len(entries)
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+    started = time.perf_counter()
+
+    def send(index: int, entry: dict) -> None:
+        scheduled = started + entry["at"]
+        sent = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/process", json=entry["payload"], timeout=REQUEST_TIMEOUT_SECONDS)
+            status = response.status_code
+            ok = status == 200 and response.json().get("success", False)
+        except (requests.RequestException, ValueError) as e:
+            status, ok = type(e).__name__, False
+        finished = time.perf_counter()
+        results[index] = {
+            "kind": entry["kind"],
+            "status": status,
+            "ok": ok,
+            "latency": finished - scheduled,
+            "service_time": finished - sent,
+            "finished_at": finished - started,
+        }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for index, entry in enumerate(entries):
+            delay = started + entry["at"] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, index, entry)
+
+    return [r for r in results if r is not None]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_summary(results: List[dict]) -> dict:
+    latencies = [r["latency"] for r in results]
+    return {
+        "requests": len(results),
+        "errors": sum(1 for r in results if not r["ok"]),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+    }
+
+
+def build_report(results: List[dict], stages: dict, settings: dict) -> dict:
+    wall = max((r["finished_at"] for r in results), default=0.0)
+    completed = sum(1 for r in results if r["ok"])
+    total_latency = sum(r["service_time"] for r in results)
+    count = max(len(results), 1)
+
+    # Tempo médio por requisição em cada dependência; o resto é o próprio servidor
+    breakdown = {
+        stage: {
+            "calls_per_request": round(values["calls"] / count, 2),
+            "ms_per_request": round(values["seconds"] / count * 1000, 1),
+        }
+        for stage, values in sorted(stages.items())
+    }
+    dependency_ms = sum(values["seconds"] for values in stages.values()) / count * 1000
+    breakdown["server"] = {
+        "calls_per_request": None,
+        "ms_per_request": round(max(total_latency / count * 1000 - dependency_ms, 0.0), 1),
+    }
+
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+
+    by_kind: Dict[str, List[dict]] = {}
+    for r in results:
+        by_kind.setdefault(r["kind"], []).append(r)
+
+    return {
+        "settings": settings,
+        "overall": {
+            **latency_summary(results),
+            "wall_seconds": round(wall, 2),
+            "throughput_rps": round(completed / wall, 2) if wall else 0.0,
+            "statuses": statuses,
+        },
+        "by_kind": {kind: latency_summary(items) for kind, items in sorted(by_kind.items())},
+        "stages": breakdown,
+    }
+
+
+def print_report(report: dict) -> None:
+    overall = report["overall"]
+    print(f"\n📊 /process — {overall['requests']} requests in {overall['wall_seconds']}s "
+          f"({overall['throughput_rps']} req/s ok, {overall['errors']} errors, statuses {overall['statuses']})")
+    print(f"   p50 {overall['p50_ms']} ms | p95 {overall['p95_ms']} ms | p99 {overall['p99_ms']} ms | max {overall['max_ms']} ms")
+
+    print("\n   por tipo de mensagem:")
+    for kind, summary in report["by_kind"].items():
+        print(f"   {kind:<20} n={summary['requests']:<5} p50 {summary['p50_ms']:>8} ms  "
+              f"p95 {summary['p95_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms  erros {summary['errors']}")
+
+    print("\n   tempo médio por requisição (etapas):")
+    for stage, values in report["stages"].items():
+        calls = "" if values["calls_per_request"] is None else f"  ({values['calls_per_request']} chamadas)"
+        print(f"   {stage:<20} {values['ms_per_request']:>8} ms{calls}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Load test offline do /process com serviços falsos")
+    parser.add_argument("--traffic", help="arquivo JSONL de benchmarks.traffic (senão gera com os parâmetros abaixo)")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=5.0, help="chegadas por segundo")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--warmup", type=int, default=10, help="requisições iniciais fora da medição")
+    parser.add_argument("--concurrency", type=int, default=256, help="máximo de requisições em voo no cliente")
+    parser.add_argument("--server-cmd", default=DEFAULT_SERVER_CMD, help="comando do servidor ({port} é substituído)")
+    parser.add_argument("--url", help="usar um servidor já rodando (ele deve apontar para --stub-port)")
+    parser.add_argument("--stub-port", type=int, default=0)
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    parser.add_argument("--with-caches", action="store_true", help="mantém cache de LLM e semântico ligados")
+    parser.add_argument("--llm-latency-ms", type=float, default=StubConfig.llm_latency_ms)
+    parser.add_argument("--llm-ms-per-token", type=float, default=StubConfig.llm_ms_per_token)
+    parser.add_argument("--completion-tokens", type=int, default=StubConfig.completion_tokens)
+    parser.add_argument("--supabase-latency-ms", type=float, default=StubConfig.supabase_latency_ms)
+    parser.add_argument("--uazapi-latency-ms", type=float, default=StubConfig.uazapi_latency_ms)
+    parser.add_argument("--history-rows", type=int, default=StubConfig.history_rows)
+    parser.add_argument("--output", help="grava o relatório JSON")
+    parser.add_argument("--server-log", default="load_test_server.log")
+    args = parser.parse_args(argv)
+
+    if args.traffic:
+        entries = load_traffic(args.traffic)
+    else:
+        entries = list(generate_traffic(args.requests + args.warmup, args.rate, args.users, args.seed))
+    warmup, measured = entries[:args.warmup], entries[args.warmup:]
+    if measured:
+        # Reinicia o relógio do tráfego medido
+        offset = measured[0]["at"]
+        measured = [dict(entry, at=entry["at"] - offset) for entry in measured]
+
+    config = StubConfig(
+        llm_latency_ms=args.llm_latency_ms,
+        llm_ms_per_token=args.llm_ms_per_token,
+        completion_tokens=args.completion_tokens,
+        supabase_latency_ms=args.supabase_latency_ms,
+        uazapi_latency_ms=args.uazapi_latency_ms,
+        history_rows=args.history_rows,
+        seed=args.seed,
+        classifications={entry["payload"]["message"]: entry["classification"] for entry in entries},
+    )
+    stubs = StubServices(config, port=args.stub_port).start()
+    print(f"🧪 Stub services on {stubs.url}", file=sys.stderr)
+
+    process = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            command = args.server_cmd.format(port=port)
+            print(f"🚀 Starting server: {command} (log: {args.server_log})", file=sys.stderr)
+            process = start_server(command, server_environment(stubs.url, port, args.with_caches), args.server_log)
+        wait_until_healthy(base_url, process, args.startup_timeout)
+
+        if warmup:
+            print(f"🔥 Warmup: {len(warmup)} requests", file=sys.stderr)
+            replay(base_url, [dict(entry, at=0.0) for entry in warmup], min(args.concurrency, 8))
+        stubs.stats.reset()
+
+        print(f"⏱️ Measuring {len(measured)} requests...", file=sys.stderr)
+        results = replay(base_url, measured, args.concurrency)
+        settings = {
+            "requests": len(measured),
+            "rate": args.rate,
+            "seed": args.seed,
+            "traffic": args.traffic,
+            "server_cmd": None if args.url else args.server_cmd,
+            "with_caches": args.with_caches,
+            "stub": {k: v for k, v in vars(config).items() if k != "classifications"},
+        }
+        report = build_report(results, stubs.stats.snapshot(), settings)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        stubs.stop()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Report written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Replay de tráfego capturado em produção
+=======================================
+
+Reproduz arquivos da captura de tráfego (TRAFFIC_CAPTURE_ENABLED no
+api_server, ver falachefe_crew/observability/traffic_capture.py) contra
+um servidor, em malha aberta e N× a velocidade original, e compara as
+distribuições de latência:
+
+- com a produção (total_ms gravado na captura), por tipo de mensagem
+- com outro relatório de replay (--compare), para comparar versões
+
+Modos de LLM:
+- stub (padrão): OpenAI falso com a classificação gravada na captura
+- live: OpenAI real (OPENAI_API_KEY do ambiente); Supabase, API Falachefe
+  e UAZAPI continuam falsos, então nada é gravado nem enviado a usuários
+
+O relatório inclui a concorrência observada na captura (requisições em voo)
+e uma sugestão de workers × threads do gunicorn para o Dockerfile.
+
+Uso (a partir de crewai-projects/falachefe_crew):
+    python -m benchmarks.replay_capture /data/traffic/traffic-20260105-*.jsonl.gz
+    python -m benchmarks.replay_capture captures/ --speed 3 --output v2.json --compare v1.json
+    python -m benchmarks.replay_capture captures/ --llm live --limit 200
+    python -m benchmarks.replay_capture captures/ --capacity-only
+"""
+
+import os
+import sys
+import glob
+import gzip
+import json
+import math
+import time
+import argparse
+import subprocess
+from typing import Dict, List, Optional
+
+from .load_test import (
+    DEFAULT_SERVER_CMD,
+    build_report,
+    free_port,
+    latency_summary,
+    percentile,
+    print_report,
+    replay,
+    server_environment,
+    start_server,
+    wait_until_healthy,
+)
+from .stub_services import StubConfig, StubServices
+
+# Threads por worker do Dockerfile (--threads)
+DEFAULT_THREADS_PER_WORKER = 4
+# Folga sobre o p99 de requisições em voo ao sugerir workers × threads
+CAPACITY_HEADROOM = 1.25
+LIVE_LLM_VARIABLES = ("OPENAI_API_KEY", "OPENAI_BASE_URL", "OPENAI_API_BASE")
+
+
+# ============================================
+# LEITURA DA CAPTURA
+# ============================================
+
+def capture_files(paths: List[str]) -> List[str]:
+    """Arquivos .jsonl/.jsonl.gz a partir de arquivos, diretórios ou globs"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "*.jsonl.gz")) + glob.glob(os.path.join(path, "*.jsonl")))
+        else:
+            files.extend(glob.glob(path) or [path])
+    return sorted(set(files))
+
+
+def read_capture(path: str) -> List[dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    records = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+        except (EOFError, ValueError) as e:
+            # Último lote truncado (worker morto durante a escrita)
+            print(f"⚠️ {path}: stopped at truncated record ({e})", file=sys.stderr)
+    return records
+
+
+def load_capture(paths: List[str], limit: Optional[int] = None) -> List[dict]:
+    """Registros de todos os workers em ordem de chegada"""
+    records = []
+    for path in capture_files(paths):
+        records.extend(read_capture(path))
+    records.sort(key=lambda record: record["captured_at"])
+    return records[:limit] if limit else records
+
+
+def to_traffic(records: List[dict], speed: float, run_id: str) -> List[dict]:
+    """
+    Registros da captura → entradas de tráfego (formato de benchmarks.traffic)
+
+    Os instantes são divididos por `speed`; messageId ganha o sufixo da
+    execução para a deduplicação de entrada não descartar um segundo replay.
+    """
+    if not records:
+        return []
+    first = records[0]["captured_at"]
+    entries = []
+    for record in records:
+        payload = dict(record["payload"])
+        if payload.get("messageId"):
+            payload["messageId"] = f"{payload['messageId']}-{run_id}"
+        entries.append({
+            "at": round((record["captured_at"] - first) / speed, 4),
+            "kind": record.get("kind", "unknown"),
+            "classification": record.get("classification") or {},
+            "payload": payload,
+        })
+    return entries
+
+
+# ============================================
+# PRODUÇÃO × REPLAY
+# ============================================
+
+def captured_summary(records: List[dict]) -> dict:
+    """Distribuições de latência gravadas em produção (mesmo formato do relatório)"""
+    def summarize(items: List[dict]) -> dict:
+        results = [{"latency": r["total_ms"] / 1000, "ok": r.get("status") == "ok"} for r in items]
+        return latency_summary(results)
+
+    by_kind: Dict[str, List[dict]] = {}
+    for record in records:
+        by_kind.setdefault(record.get("kind", "unknown"), []).append(record)
+    return {
+        "overall": summarize(records),
+        "by_kind": {kind: summarize(items) for kind, items in sorted(by_kind.items())},
+    }
+
+
+def capacity_estimate(records: List[dict], threads_per_worker: int = DEFAULT_THREADS_PER_WORKER) -> dict:
+    """
+    Concorrência observada na captura e workers × threads sugeridos
+
+    Cada requisição ocupa uma thread do gunicorn do início ao fim
+    (worker sync + threads), então o número de requisições em voo é o
+    número de threads necessárias.
+    """
+    if not records:
+        return {}
+    events = []
+    for record in records:
+        events.append((record["captured_at"], 1))
+        events.append((record["captured_at"] + record["total_ms"] / 1000, -1))
+    events.sort()
+
+    # Amostra a concorrência a cada evento, ponderada pelo tempo em cada nível
+    in_flight, peak, previous = 0, 0, events[0][0]
+    time_at_level: Dict[int, float] = {}
+    for moment, delta in events:
+        time_at_level[in_flight] = time_at_level.get(in_flight, 0.0) + (moment - previous)
+        in_flight += delta
+        peak = max(peak, in_flight)
+        previous = moment
+    total_time = sum(time_at_level.values()) or 1.0
+
+    def level_percentile(q: float) -> int:
+        accumulated = 0.0
+        for level in sorted(time_at_level):
+            accumulated += time_at_level[level]
+            if accumulated / total_time >= q:
+                return level
+        return peak
+
+    # Pico de chegadas em janelas de 1 minuto (ou a captura inteira, se menor)
+    starts = [record["captured_at"] for record in records]
+    duration = max(starts[-1] - starts[0], 1.0)
+    window = min(60.0, duration)
+    peak_in_window, left = 0, 0
+    for right, moment in enumerate(starts):
+        while moment - starts[left] >= window:
+            left += 1
+        peak_in_window = max(peak_in_window, right - left + 1)
+    peak_rps = peak_in_window / window
+
+    service_times = [record["total_ms"] / 1000 for record in records]
+    p99_in_flight = level_percentile(0.99)
+    threads_needed = max(1, math.ceil(p99_in_flight * CAPACITY_HEADROOM))
+    return {
+        "requests": len(records),
+        "duration_seconds": round(duration, 1),
+        "mean_rps": round(len(records) / duration, 3),
+        "peak_rps_1m": round(peak_rps, 3),
+        "mean_service_ms": round(sum(service_times) / len(service_times) * 1000, 1),
+        "p95_service_ms": round(percentile(service_times, 0.95) * 1000, 1),
+        "p50_in_flight": level_percentile(0.50),
+        "p95_in_flight": level_percentile(0.95),
+        "p99_in_flight": p99_in_flight,
+        "peak_in_flight": peak,
+        # Lei de Little no pico de chegadas: threads ocupadas = λ × W
+        "littles_law_peak_threads": round(peak_rps * sum(service_times) / len(service_times), 2),
+        "suggested_threads_total": threads_needed,
+        "suggested_workers": max(1, math.ceil(threads_needed / threads_per_worker)),
+        "threads_per_worker": threads_per_worker,
+    }
+
+
+def diff_summaries(baseline: dict, candidate: dict) -> dict:
+    """Diferença de p50/p95/p99 (ms e %) entre duas distribuições, geral e por tipo"""
+    def diff(before: dict, after: dict) -> dict:
+        result = {}
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            delta = after[key] - before[key]
+            result[key] = {
+                "baseline": before[key],
+                "candidate": after[key],
+                "delta_ms": round(delta, 1),
+                "delta_pct": round(delta / before[key] * 100, 1) if before[key] else None,
+            }
+        return result
+
+    kinds = sorted(set(baseline["by_kind"]) & set(candidate["by_kind"]))
+    return {
+        "overall": diff(baseline["overall"], candidate["overall"]),
+        "by_kind": {kind: diff(baseline["by_kind"][kind], candidate["by_kind"][kind]) for kind in kinds},
+    }
+
+
+def print_diff(title: str, diff: dict) -> None:
+    print(f"\n🔀 {title}")
+    rows = [("geral", diff["overall"])] + list(diff["by_kind"].items())
+    for name, values in rows:
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            value = values[key]
+            pct = "" if value["delta_pct"] is None else f" ({value['delta_pct']:+.1f}%)"
+            cells.append(f"{key[:3]} {value['baseline']:>8} → {value['candidate']:>8} ms{pct}")
+        print(f"   {name:<20} " + "  ".join(cells))
+
+
+def print_capacity(capacity: dict) -> None:
+    if not capacity:
+        return
+    print(f"\n🧮 Capacidade observada ({capacity['requests']} requisições em {capacity['duration_seconds']}s)")
+    print(f"   chegadas: média {capacity['mean_rps']} req/s | pico (1 min) {capacity['peak_rps_1m']} req/s")
+    print(f"   tempo de serviço: média {capacity['mean_service_ms']} ms | p95 {capacity['p95_service_ms']} ms")
+    print(f"   em voo: p50 {capacity['p50_in_flight']} | p95 {capacity['p95_in_flight']} | "
+          f"p99 {capacity['p99_in_flight']} | pico {capacity['peak_in_flight']} "
+          f"(Little no pico: {capacity['littles_law_peak_threads']})")
+    print(f"   sugestão: --workers {capacity['suggested_workers']} --threads {capacity['threads_per_worker']} "
+          f"(≥ {capacity['suggested_threads_total']} threads = p99 em voo × {CAPACITY_HEADROOM})")
+
+
+# ============================================
+# EXECUÇÃO
+# ============================================
+
+def replay_environment(stub_url: str, port: int, llm: str, with_caches: bool) -> dict:
+    """Ambiente do servidor local: tudo falso, exceto o LLM no modo live"""
+    env = server_environment(stub_url, port, with_caches)
+    if llm == "live":
+        for name in LIVE_LLM_VARIABLES:
+            if name in os.environ:
+                env[name] = os.environ[name]
+            else:
+                env.pop(name, None)
+    return env
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Replay de tráfego capturado do /process")
+    parser.add_argument("captures", nargs="+", help="arquivos, diretórios ou globs da captura (.jsonl.gz)")
+    parser.add_argument("--speed", type=float, default=1.0, help="multiplicador de velocidade (3 = 3× mais rápido)")
+    parser.add_argument("--limit", type=int, help="reproduzir só as primeiras N requisições")
+    parser.add_argument("--llm", choices=("stub", "live"), default="stub")
+    parser.add_argument("--url", help="servidor já rodando (não sobe servidor nem serviços falsos)")
+    parser.add_argument("--server-cmd", default=DEFAULT_SERVER_CMD, help="comando do servidor ({port} é substituído)")
+    parser.add_argument("--concurrency", type=int, default=256, help="máximo de requisições em voo no cliente")
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    parser.add_argument("--with-caches", action="store_true", help="mantém cache de LLM e semântico ligados")
+    parser.add_argument("--llm-latency-ms", type=float, default=StubConfig.llm_latency_ms)
+    parser.add_argument("--threads-per-worker", type=int, default=DEFAULT_THREADS_PER_WORKER)
+    parser.add_argument("--capacity-only", action="store_true", help="só analisa a captura, sem replay")
+    parser.add_argument("--compare", help="relatório JSON de um replay anterior para comparar")
+    parser.add_argument("--output", help="grava o relatório JSON")
+    parser.add_argument("--server-log", default="replay_server.log")
+    args = parser.parse_args(argv)
+
+    records = load_capture(args.captures, args.limit)
+    if not records:
+        parser.error("no captured requests found")
+    print(f"📼 {len(records)} captured requests loaded", file=sys.stderr)
+
+    capacity = capacity_estimate(records, args.threads_per_worker)
+    production = captured_summary(records)
+    if args.capacity_only:
+        print_capacity(capacity)
+        return
+
+    entries = to_traffic(records, args.speed, run_id=f"replay{int(time.time())}")
+    config = StubConfig(
+        llm_latency_ms=args.llm_latency_ms,
+        classifications={entry["payload"]["message"]: entry["classification"] for entry in entries},
+    )
+
+    stubs = None
+    process = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            stubs = StubServices(config).start()
+            print(f"🧪 Stub services on {stubs.url} (LLM: {args.llm})", file=sys.stderr)
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            command = args.server_cmd.format(port=port)
+            print(f"🚀 Starting server: {command} (log: {args.server_log})", file=sys.stderr)
+            process = start_server(command, replay_environment(stubs.url, port, args.llm, args.with_caches), args.server_log)
+        wait_until_healthy(base_url, process, args.startup_timeout)
+
+        print(f"▶️ Replaying {len(entries)} requests at {args.speed}× speed...", file=sys.stderr)
+        results = replay(base_url, entries, args.concurrency)
+        settings = {
+            "captures": capture_files(args.captures),
+            "requests": len(entries),
+            "speed": args.speed,
+            "llm": args.llm,
+            "url": args.url,
+            "server_cmd": None if args.url else args.server_cmd,
+            "with_caches": args.with_caches,
+        }
+        report = build_report(results, stubs.stats.snapshot() if stubs else {}, settings)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if stubs is not None:
+            stubs.stop()
+
+    report["production"] = production
+    report["capacity"] = capacity
+    report["diff_vs_production"] = diff_summaries(production, report)
+
+    print_report(report)
+    print_diff("Produção (captura) → replay", report["diff_vs_production"])
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["diff_vs_compare"] = diff_summaries(baseline, report)
+        print_diff(f"{args.compare} → replay", report["diff_vs_compare"])
+    print_capacity(capacity)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Report written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Serviços falsos para o load test (OpenAI, PostgREST, API Falachefe, UAZAPI)
+==========================================================================
+
+Um único servidor HTTP local responde no lugar de todas as dependências
+externas do api_server, com latência configurável:
+
+- OpenAI:    POST /v1/chat/completions, POST /v1/embeddings
+- Supabase:  /rest/v1/user_onboarding, financial_data, financial_digests,
+             messages, rpc/*
+- Falachefe: /api/financial/crewai (+ /batch, /transactions)
+- UAZAPI:    POST /send/text, /send/menu, /send/media
+
+Cada chamada é contabilizada por etapa (llm_classifier, llm_crew,
+embeddings, supabase, falachefe_api, uazapi); GET /__stats devolve os
+totais e POST /__reset zera.
+
+Nenhuma mensagem real é enviada e nenhum token é consumido.
+"""
+
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# Marcador do prompt do classificador (api_server.CLASSIFIER_SYSTEM_PROMPT)
+CLASSIFIER_MARKER = "Retorne APENAS um JSON"
+FILLER_WORDS = ("fluxo", "caixa", "vendas", "cliente", "margem", "estoque", "custo", "planejamento")
+
+
+@dataclass
+class StubConfig:
+    """Latências em milissegundos; jitter é a fração aleatória (+/-) aplicada"""
+    llm_latency_ms: float = 400.0
+    llm_ms_per_token: float = 15.0
+    classifier_tokens: int = 40
+    completion_tokens: int = 120
+    embedding_latency_ms: float = 60.0
+    supabase_latency_ms: float = 30.0
+    api_latency_ms: float = 40.0
+    uazapi_latency_ms: float = 80.0
+    jitter: float = 0.2
+    history_rows: int = 100
+    seed: int = 42
+    # Mensagem → classificação devolvida ao classificador (do arquivo de tráfego)
+    classifications: Dict[str, dict] = field(default_factory=dict)
+
+
+class StageStats:
+    """Chamadas e tempo total por etapa (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, list] = {}
+
+    def record(self, stage: str, seconds: float, tokens: int = 0) -> None:
+        with self._lock:
+            stats = self._stages.setdefault(stage, [0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] += tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                stage: {"calls": calls, "seconds": round(seconds, 4), "completion_tokens": tokens}
+                for stage, (calls, seconds, tokens) in self._stages.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+
+class StubServices:
+    """Servidor HTTP falso em background (start/stop)"""
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StubConfig()
+        self.stats = StageStats()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._ids = 0
+        handler = type("BoundStubHandler", (StubHandler,), {"services": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServices":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sleep(self, base_ms: float) -> None:
+        with self._rng_lock:
+            factor = 1 + self._rng.uniform(-self.config.jitter, self.config.jitter)
+        time.sleep(max(0.0, base_ms * factor) / 1000)
+
+    def next_id(self) -> int:
+        with self._rng_lock:
+            self._ids += 1
+            return self._ids
+
+    # ============================================
+    # RESPOSTAS
+    # ============================================
+
+    def chat_completion(self, body: dict) -> tuple:
+        """(stage, resposta, completion_tokens)"""
+        messages = body.get("messages") or []
+        system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4 + 1
+
+        if CLASSIFIER_MARKER in system:
+            stage, tokens = "llm_classifier", self.config.classifier_tokens
+            user_text = str(messages[-1].get("content", "")).replace("Mensagem: ", "", 1)
+            classification = dict(self.config.classifications.get(
+                user_text, {"type": "general", "specialist": "none", "confidence": 0.5}
+            ))
+            classification.setdefault("reasoning", "benchmark")
+            content = json.dumps(classification, ensure_ascii=False)
+        else:
+            stage, tokens = "llm_crew", self.config.completion_tokens
+            words = " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(tokens))
+            content = f"Thought: Já tenho as informações necessárias.\nFinal Answer: {words}"
+
+        self.sleep(self.config.llm_latency_ms + self.config.llm_ms_per_token * tokens)
+        response = {
+            "id": f"chatcmpl-bench-{self.next_id()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                      "total_tokens": prompt_tokens + tokens},
+        }
+        return stage, response, tokens
+
+    def embeddings(self, body: dict) -> dict:
+        inputs = body.get("input")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        dimensions = int(body.get("dimensions") or 256)
+        self.sleep(self.config.embedding_latency_ms)
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": deterministic_embedding(str(text), dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": 8, "total_tokens": 8},
+        }
+
+    def financial_rows(self, user_id: str) -> list:
+        """Histórico sintético de financial_data (centavos, receita/despesa)"""
+        rng = random.Random(f"{self.config.seed}:{user_id}")
+        today = date.today()
+        return [
+            {
+                "type": "receita" if rng.random() < 0.55 else "despesa",
+                "amount": rng.randrange(1000, 500000),
+                "description": f"Lançamento {i}",
+                "category": rng.choice(["vendas", "fornecedores", "aluguel", "salarios", "marketing"]),
+                "date": (today - timedelta(days=i // 3)).isoformat(),
+            }
+            for i in range(self.config.history_rows)
+        ]
+
+
+def deterministic_embedding(text: str, dimensions: int) -> list:
+    """Vetor unitário derivado do hash do texto (mesmo texto → mesmo vetor)"""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    services: StubServices = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _query_user(self, query: str) -> str:
+        for part in query.split("&"):
+            if part.startswith("user_id=eq."):
+                return part[len("user_id=eq."):]
+        return ""
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def _dispatch(self, method: str) -> None:
+        services = self.services
+        config = services.config
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip("/")
+        body = self._body() if method != "GET" else {}
+        started = time.perf_counter()
+        stage, tokens = None, 0
+
+        if path == "/__stats":
+            return self._send(200, services.stats.snapshot())
+        if path == "/__reset":
+            services.stats.reset()
+            return self._send(200, {"success": True})
+
+        if path.endswith("/chat/completions"):
+            stage, response, tokens = services.chat_completion(body)
+            status = 200
+        elif path.endswith("/embeddings"):
+            stage, status, response = "embeddings", 200, services.embeddings(body)
+        elif path.startswith("/rest/v1/"):
+            stage = "supabase"
+            services.sleep(config.supabase_latency_ms)
+            table = path[len("/rest/v1/"):]
+            user_id = self._query_user(parsed.query)
+            if table == "user_onboarding":
+                status, response = 200, [{
+                    "first_name": "Bench", "last_name": user_id[-5:], "whatsapp_phone": "",
+                    "company_name": "Padaria Benchmark", "industry": "alimentação",
+                    "company_size": "micro", "position": "proprietário",
+                }]
+            elif table == "financial_data":
+                status, response = 200, services.financial_rows(user_id)
+            elif table.startswith("rpc/"):
+                status, response = 200, 0
+            elif method == "POST":
+                status, response = 201, []
+            else:
+                status, response = 200, []
+        elif path.startswith("/api/financial/crewai"):
+            stage = "falachefe_api"
+            services.sleep(config.api_latency_ms)
+            if path.endswith("/transactions"):
+                status, response = 200, {"success": True, "dates": [], "types": [], "amounts": [], "categories": []}
+            elif path.endswith("/batch"):
+                rows = body.get("transactions") or []
+                status, response = 201, {"success": True, "inserted": len(rows),
+                                         "ids": [str(services.next_id()) for _ in rows], "duplicates": [], "rejected": []}
+            elif method == "POST":
+                status, response = 201, {"success": True, "data": {"id": f"bench-tx-{services.next_id()}"}}
+            else:
+                status, response = 200, {"success": True, "data": {"balance": 0, "transactions": []}}
+        elif path.startswith("/send/"):
+            stage = "uazapi"
+            services.sleep(config.uazapi_latency_ms)
+            status, response = 200, {"messageid": f"bench-msg-{services.next_id()}", "status": "sent"}
+        else:
+            status, response = 404, {"error": f"stub: no route for {method} {path}"}
+
+        if stage:
+            services.stats.record(stage, time.perf_counter() - started, tokens)
+        self._send(status, response)
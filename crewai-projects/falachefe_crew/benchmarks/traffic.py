@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Mix de tráfego reproduzível para o load test
+============================================
+
+Gera (com seed) uma sequência de payloads de /process com instantes de
+chegada Poisson e grava em JSONL; o mesmo arquivo pode ser reexecutado
+contra versões diferentes do servidor para comparar resultados.
+
+Cada linha:
+    {"at": 0.42, "kind": "financial_question", "classification": {...}, "payload": {...}}
+
+`classification` é a resposta que o OpenAI falso devolve ao classificador
+para aquela mensagem (o load test não depende do LLM acertar).
+
+Uso:
+    python -m benchmarks.traffic --requests 500 --rate 5 --seed 7 -o traffic.jsonl
+"""
+
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+
+# Tipo de mensagem → (peso, classificação, modelos de texto)
+TRAFFIC_MIX: Dict[str, dict] = {
+    "greeting": {
+        "weight": 0.20,
+        "classification": {"type": "greeting", "specialist": "none", "confidence": 0.98},
+        "templates": ["Oi, bom dia!", "Olá, tudo bem?", "Boa tarde!", "Opa, e aí?", "Obrigado pela ajuda!"],
+    },
+    "cashflow_command": {
+        "weight": 0.25,
+        "classification": {"type": "financial_task", "specialist": "financial_expert", "confidence": 0.95},
+        "templates": [
+            "vendi {amount} reais hoje", "paguei {amount} de luz", "paguei {amount} de aluguel",
+            "recebi {amount} de vendas", "paguei {amount} de fornecedor", "gastei {amount} com internet",
+        ],
+    },
+    "financial_question": {
+        "weight": 0.25,
+        "classification": {"type": "financial_task", "specialist": "financial_expert", "confidence": 0.92},
+        "templates": [
+            "Como está meu fluxo de caixa este mês?",
+            "Quanto eu gastei com fornecedores nos últimos 3 meses?",
+            "Vou ter dinheiro para pagar a folha mês que vem?",
+            "Qual foi meu saldo no último trimestre?",
+        ],
+    },
+    "marketing_question": {
+        "weight": 0.15,
+        "classification": {"type": "marketing_query", "specialist": "marketing_sales_expert", "confidence": 0.9},
+        "templates": [
+            "Como posso divulgar minha loja no Instagram?",
+            "Que promoção eu faço para o dia das mães?",
+            "Como melhorar minhas vendas pelo WhatsApp?",
+        ],
+    },
+    "hr_question": {
+        "weight": 0.15,
+        "classification": {"type": "hr_query", "specialist": "hr_expert", "confidence": 0.9},
+        "templates": [
+            "Como formalizar a contratação de um funcionário?",
+            "Como calcular as férias de um funcionário?",
+            "Posso contratar um estagiário para o caixa?",
+        ],
+    },
+}
+
+
+def generate_traffic(requests: int, rate: float, users: int, seed: int,
+                     mix: Dict[str, dict] = TRAFFIC_MIX) -> Iterator[dict]:
+    """Entradas de tráfego em ordem de chegada (instantes Poisson com média `rate` req/s)"""
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind]["weight"] for kind in kinds]
+    base_time = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+    at = 0.0
+
+    for index in range(requests):
+        kind = rng.choices(kinds, weights)[0]
+        message = rng.choice(mix[kind]["templates"]).format(amount=rng.choice([35, 89, 150, 230, 480, 1200]))
+        user = rng.randrange(users)
+        phone = f"5511900{user:06d}"
+        yield {
+            "at": round(at, 4),
+            "kind": kind,
+            "classification": mix[kind]["classification"],
+            "payload": {
+                "message": message,
+                "userId": f"bench-user-{user:05d}",
+                "userName": f"Usuário {user}",
+                "phoneNumber": phone,
+                "conversationId": f"bench-conv-{user:05d}",
+                "messageId": f"bench-{seed}-{index:07d}",
+                "context": {
+                    "source": "whatsapp",
+                    "messageType": "text",
+                    "chatName": f"Usuário {user}",
+                    "timestamp": (base_time + timedelta(seconds=at)).isoformat(),
+                },
+            },
+        }
+        at += rng.expovariate(rate) if rate > 0 else 0.0
+
+
+def save_traffic(entries: Iterator[dict], path: str) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def load_traffic(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Gera mix de tráfego reproduzível para /process")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=5.0, help="chegadas por segundo (Poisson)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", default="traffic.jsonl")
+    args = parser.parse_args(argv)
+
+    count = save_traffic(generate_traffic(args.requests, args.rate, args.users, args.seed), args.output)
+    print(f"✅ {count} requests written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Crew worker: consome a fila de jobs do /process
+Par do api_server.py em PROCESS_MODE=queue (ingress sem estado que apenas enfileira)
+
+Cada réplica assume partições da fila (Redis Streams, uma partição por vez
+por consumidor → mensagens do mesmo usuário em ordem) e roda o mesmo fluxo
+do /process síncrono: fast path, classificação, cache semântico ou crew,
+gravação e envio pela UAZAPI. Capacidade = réplicas × CREW_WORKER_CONCURRENCY
+(até JOB_QUEUE_PARTITIONS); o /metrics do ingress sugere o número de réplicas.
+
+Ver src/falachefe_crew/scheduling/job_queue.py
+
+Rodar:
+    python crew_worker.py                  # consumidor
+    python crew_worker.py --stats          # lag/idade/dead-letter (JSON)
+    python crew_worker.py --requeue-dead   # reenfileira o dead-letter
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from falachefe_crew.scheduling.job_queue import (
+    CREW_WORKER_CONCURRENCY,
+    CrewWorker,
+    get_job_queue,
+)
+
+# Tocado a cada rodada de leases (healthcheck do container pelo mtime)
+CREW_WORKER_HEARTBEAT_FILE = os.getenv("CREW_WORKER_HEARTBEAT_FILE", "/tmp/crew_worker.heartbeat")
+
+
+def handle_jobs(jobs: list) -> tuple:
+    """Um lote do mesmo usuário (já coalescido) pelo fluxo do /process"""
+    from api_server import process_merged_message, queued_message_turn
+    from falachefe_crew.observability.structured_logging import begin_request, end_request
+    from falachefe_crew.observability.traffic_capture import capture_request
+    from falachefe_crew.resilience.request_deadline import hold_late_runs, request_deadline, wait_late_runs
+    from falachefe_crew.scheduling.message_coalescer import merge_payloads
+
+    batch = [job['payload'] for job in jobs]
+    inbound_ids = [job['inbound_id'] for job in jobs if job.get('inbound_id')]
+    # Deadline desde a chegada no ingress (tempo na fila incluído)
+    start_time = jobs[0]['enqueued_at']
+    # Mesmo request id do ingress: logs e traces de crew correlacionados
+    token = begin_request(jobs[-1].get('request_id'))
+    failed = True
+    try:
+        if len(batch) > 1:
+            print(f"🧩 Merged {len(batch)} queued messages from {batch[-1].get('phoneNumber', '')}", file=sys.stderr)
+        with capture_request(batch[-1]), request_deadline(start_time), hold_late_runs() as late_runs:
+            with queued_message_turn(batch, inbound_ids):
+                body = process_merged_message(merge_payloads(batch), start_time)
+            if late_runs:
+                # Fallback já publicado para o ingress; a partição só segue depois
+                # da resposta completa (ordem das mensagens do usuário)
+                publish_results(jobs, body, 200)
+                wait_late_runs(late_runs)
+        failed = False
+        return body, 200
+    finally:
+        end_request(token, failed)
+
+
+def publish_results(jobs: list, body: dict, status: int) -> None:
+    """Resposta dos jobs para o ingress antes do fim do lote (o CrewWorker publica de novo ao terminar)"""
+    for job in jobs:
+        get_job_queue().set_result(job['id'], body, status)
+
+
+def reply_dead_letter(jobs: list, error: str) -> tuple:
+    """Lote desistido: avisa o usuário (apenas WhatsApp) como o /process síncrono"""
+    from api_server import PROCESSING_ERROR_MESSAGE, build_process_error_response, send_to_uazapi
+
+    data = jobs[-1]['payload']
+    context = data.get('context') or {}
+    phone_number = data.get('phoneNumber', '')
+    if phone_number and context.get('source') != 'web-chat':
+        send_to_uazapi(phone_number, PROCESSING_ERROR_MESSAGE)
+    return build_process_error_response(RuntimeError(error), jobs[0]['enqueued_at']), 500
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Crew worker da fila de jobs do /process")
+    parser.add_argument("--stats", action="store_true", help="estatísticas da fila (JSON)")
+    parser.add_argument("--requeue-dead", action="store_true", help="reenfileira os jobs do dead-letter")
+    args = parser.parse_args()
+
+    if args.stats:
+        print(json.dumps(get_job_queue().stats(), indent=2))
+        return 0
+    if args.requeue_dead:
+        print(f"♻️ Requeued {get_job_queue().requeue_dead()} dead-letter job(s)", file=sys.stderr)
+        return 0
+
+    # Reaproveita configuração, crew singleton e regras de negócio do servidor Flask
+    from api_server import get_crew
+
+    print("⚙️  Pre-initializing CrewAI (this may take a minute)...", file=sys.stderr)
+    if get_crew() is None:
+        print("❌ CrewAI not initialized, refusing to consume jobs", file=sys.stderr)
+        return 1
+
+    worker = CrewWorker(
+        get_job_queue(),
+        handle_jobs,
+        on_dead_letter=reply_dead_letter,
+        concurrency=CREW_WORKER_CONCURRENCY,
+        heartbeat_file=CREW_WORKER_HEARTBEAT_FILE
+    )
+    # Deploy/scale-in: termina os lotes em andamento e devolve as partições
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
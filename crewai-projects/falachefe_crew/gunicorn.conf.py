@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Configuração do gunicorn para o api_server
+==========================================
+
+Carregada automaticamente pelo gunicorn (./gunicorn.conf.py no diretório de
+trabalho); flags na linha de comando têm precedência.
+
+- preload_app: o master importa o api_server (crew, agentes, ferramentas,
+  YAML) uma vez e os workers compartilham esse estado copy-on-write
+- GUNICORN_WORKERS: número fixo ou "auto" (limite de CPU/memória do container)
+- WORKER_MAX_PRIVATE_MB: worker acima do teto termina as requisições em
+  andamento (graceful_timeout) e o master sobe outro
+
+Ver src/falachefe_crew/runtime/worker_pool.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from falachefe_crew.runtime.worker_pool import (  # noqa: E402
+    WorkerMemoryGuard,
+    freeze_shared_heap,
+    process_memory,
+    resolve_worker_count,
+)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+workers = resolve_worker_count(os.getenv("GUNICORN_WORKERS", "auto"))
+# Acima das cotas das faixas tools + long: sempre sobra thread para a faixa quick
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+# Acima do REQUEST_DEADLINE_SECONDS (100s): a requisição responde antes de o worker ser morto
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# Tempo para um worker reciclado terminar os crews em andamento
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "120"))
+# Rede de segurança além do teto de memória (0 = desligado)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+_memory_guard = WorkerMemoryGuard()
+
+
+def when_ready(server):
+    """Master pronto (app pré-carregado), antes do fork dos workers"""
+    if preload_app:
+        freeze_shared_heap()
+        memory = process_memory()
+        server.log.info(
+            "📦 Preloaded app: %.0f MB in master, shared copy-on-write by %s workers × %s threads",
+            memory["rss"] / 1024 / 1024, workers, threads
+        )
+
+
+def post_request(worker, req, environ, resp):
+    private = _memory_guard.exceeded()
+    if private is not None and worker.alive:
+        worker.log.warning(
+            "♻️ Worker %s private memory %.0f MB over WORKER_MAX_PRIVATE_MB, recycling after in-flight requests",
+            worker.pid, private / 1024 / 1024
+        )
+        worker.alive = False
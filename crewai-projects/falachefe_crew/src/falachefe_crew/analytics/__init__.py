@@ -0,0 +1,5 @@
+"""
+Análises financeiras locais do Falachefe
+Cálculos vetorizados sobre o histórico do fluxo de caixa (sem LLM)
+"""
+
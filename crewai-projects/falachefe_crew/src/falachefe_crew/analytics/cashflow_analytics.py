@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Motor de análise do fluxo de caixa
+==================================
+
+Carrega o histórico de cashflow_transactions do usuário UMA vez, em
+arrays NumPy (datas, valores com sinal, códigos de categoria), e calcula
+tudo de forma vetorizada:
+
+- saldo de qualquer período ("current_month", "last_3_months", "2025-Q1",
+  "2025-03", "2025", "2025-01-01:2025-02-15", ...)
+- ranking de categorias (np.bincount por código)
+- séries mensais, médias móveis, burn rate e runway
+
+Só os últimos ANALYTICS_HISTORY_MONTHS meses vêm em colunas; o saldo de
+tudo que ficou de fora chega pronto da API (opening_balance), então saldos
+acumulados, runway e projeção não dependem da janela. Totais de períodos
+que começam antes de history_start são parciais (covers / history_note).
+
+O frame fica em cache por usuário (ANALYTICS_CACHE_TTL_SECONDS). Gravações
+chamam invalidate_cashflow_frame(), que incrementa uma versão no KV store
+compartilhado; todos os workers recarregam na próxima consulta.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from ..resilience.dependency_guard import get_guard
+from ..storage.kv_store import get_kv_store, kv_key
+from .financial_digest import mark_digest_stale
+
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+ANALYTICS_CACHE_MAX_USERS = int(os.getenv("ANALYTICS_CACHE_MAX_USERS", "2000"))
+ANALYTICS_HISTORY_MONTHS = int(os.getenv("ANALYTICS_HISTORY_MONTHS", "24"))
+
+_LAST_N = re.compile(r"^last_(\d{1,3})_(days|months)$")
+_QUARTER = re.compile(r"^(\d{4})-q([1-4])$")
+_MONTH = re.compile(r"^(\d{4})-(\d{2})$")
+_YEAR = re.compile(r"^(\d{4})$")
+_RANGE = re.compile(r"^(\d{4}-\d{2}-\d{2}):(\d{4}-\d{2}-\d{2})$")
+
+
+# ============================================
+# PERÍODOS
+# ============================================
+
+def month_start(day: date, months_back: int = 0) -> date:
+    month_index = day.year * 12 + day.month - 1 - months_back
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def month_end(day: date) -> date:
+    return month_start(day, -1) - timedelta(days=1)
+
+
+def resolve_period(period: Optional[str], today: Optional[date] = None) -> Tuple[date, date]:
+    """
+    Converte uma expressão de período em (início, fim), ambos inclusivos.
+
+    Aceita: current_month (padrão), last_month, current_year, all,
+    last_N_days, last_N_months (inclui o mês corrente), YYYY-MM, YYYY-QN,
+    YYYY e YYYY-MM-DD:YYYY-MM-DD.
+
+    Raises:
+        ValueError: expressão não reconhecida
+    """
+    today = today or datetime.now().date()
+    expression = (period or "current_month").strip().lower()
+
+    if expression in ("current_month", "mes_atual", "this_month"):
+        return month_start(today), today
+    if expression in ("last_month", "mes_passado", "previous_month"):
+        start = month_start(today, 1)
+        return start, month_end(start)
+    if expression in ("current_year", "ano_atual", "this_year"):
+        return date(today.year, 1, 1), today
+    if expression in ("all", "tudo"):
+        return date(1900, 1, 1), today
+
+    match = _LAST_N.match(expression)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        if unit == "days":
+            return today - timedelta(days=amount - 1), today
+        return month_start(today, amount - 1), today
+
+    match = _MONTH.match(expression)
+    if match:
+        start = date(int(match.group(1)), int(match.group(2)), 1)
+        return start, month_end(start)
+
+    match = _QUARTER.match(expression)
+    if match:
+        start = date(int(match.group(1)), (int(match.group(2)) - 1) * 3 + 1, 1)
+        return start, month_end(month_start(start, -2))
+
+    match = _YEAR.match(expression)
+    if match:
+        return date(int(match.group(1)), 1, 1), date(int(match.group(1)), 12, 31)
+
+    match = _RANGE.match(expression)
+    if match:
+        start, end = (datetime.strptime(value, "%Y-%m-%d").date() for value in match.groups())
+        if start > end:
+            raise ValueError(f"Período inválido: início depois do fim ({period})")
+        return start, end
+
+    raise ValueError(
+        f"Período não reconhecido: {period!r}. Use current_month, last_month, last_3_months, "
+        "last_30_days, 2025-03, 2025-Q1, 2025 ou 2025-01-01:2025-02-15"
+    )
+
+
+def rolling_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Média móvel simples; as primeiras window-1 posições usam a janela disponível"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values
+    cumulative = np.cumsum(np.insert(values, 0, 0.0))
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return (cumulative[1:] - cumulative[np.arange(1, len(values) + 1) - counts]) / counts
+
+
+# ============================================
+# FRAME COLUNAR
+# ============================================
+
+class CashflowFrame:
+    """Histórico do usuário em colunas NumPy (ordenado por data)"""
+
+    def __init__(self, dates: np.ndarray, signed_amounts: np.ndarray,
+                 category_codes: np.ndarray, categories: List[str],
+                 opening_balance: float = 0.0, prior_count: int = 0,
+                 history_start: Optional[date] = None, truncated: bool = False):
+        self.dates = dates                    # datetime64[D]
+        self.signed_amounts = signed_amounts  # float64: entrada > 0, saída < 0
+        self.category_codes = category_codes  # int64: índice em categories
+        self.categories = categories
+        self.opening_balance = opening_balance  # saldo das transações fora das colunas
+        self.prior_count = prior_count          # quantas transações ficaram fora
+        self.history_start = history_start      # primeiro dia com histórico completo
+        self.truncated = truncated              # API cortou a janela no teto de linhas
+
+    @classmethod
+    def from_columns(cls, dates: List[str], types: List[str], amounts: List[float],
+                     categories: List[str], **history) -> "CashflowFrame":
+        date_array = np.array(dates, dtype="datetime64[D]")
+        amount_array = np.abs(np.array(amounts, dtype=np.float64))
+        is_entrada = np.array(types, dtype=object) == "entrada"
+        signed = np.where(is_entrada, amount_array, -amount_array)
+
+        names, codes = np.unique(
+            np.array([(c or "outros").strip().lower() for c in categories], dtype=object).astype(str),
+            return_inverse=True
+        )
+
+        order = np.argsort(date_array, kind="stable")
+        return cls(date_array[order], signed[order], codes[order].astype(np.int64), [str(n) for n in names], **history)
+
+    @classmethod
+    def empty(cls) -> "CashflowFrame":
+        return cls.from_columns([], [], [], [])
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def _window(self, start: Optional[date], end: Optional[date]) -> slice:
+        # Datas ordenadas: searchsorted é O(log n) e devolve uma fatia contígua
+        low = 0 if start is None else np.searchsorted(self.dates, np.datetime64(start, "D"), side="left")
+        high = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(end, "D"), side="right")
+        return slice(int(low), int(high))
+
+    # ============================================
+    # AGREGAÇÕES
+    # ============================================
+
+    def totals(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, float]:
+        amounts = self.signed_amounts[self._window(start, end)]
+        entradas = float(amounts[amounts > 0].sum())
+        saidas = float(np.abs(amounts[amounts < 0]).sum())
+        return {
+            "entradas": round(entradas, 2),
+            "saidas": round(saidas, 2),
+            "saldo": round(entradas - saidas, 2),
+            "total": int(len(amounts)),
+        }
+
+    def balance(self, until: Optional[date] = None) -> float:
+        """Saldo acumulado de todas as transações registradas até a data (inclui opening_balance)"""
+        return round(self.opening_balance + float(self.signed_amounts[self._window(None, until)].sum()), 2)
+
+    def covers(self, start: date) -> bool:
+        """True se entradas/saídas a partir de start estão todas nas colunas"""
+        return self.prior_count == 0 or self.history_start is None or start >= self.history_start
+
+    def history_note(self, start: date) -> str:
+        """Aviso para as ferramentas quando o período começa antes do histórico carregado"""
+        if self.covers(start):
+            return ""
+        return (
+            f"⚠️ Entradas e saídas consideradas a partir de {self.history_start.strftime('%d/%m/%Y')} "
+            f"({self.prior_count} transações anteriores entram só no saldo acumulado)"
+        )
+
+    def category_breakdown(self, start: Optional[date] = None, end: Optional[date] = None,
+                           transaction_type: str = "saida") -> List[Tuple[str, float, float]]:
+        """[(categoria, valor, percentual)] ordenado por valor decrescente"""
+        window = self._window(start, end)
+        amounts = self.signed_amounts[window]
+        codes = self.category_codes[window]
+        selected = amounts > 0 if transaction_type == "entrada" else amounts < 0
+
+        sums = np.bincount(codes[selected], weights=np.abs(amounts[selected]), minlength=len(self.categories))
+        total = sums.sum()
+        if total <= 0:
+            return []
+
+        order = np.argsort(-sums)
+        return [
+            (self.categories[i], round(float(sums[i]), 2), round(float(sums[i] / total * 100), 1))
+            for i in order if sums[i] > 0
+        ]
+
+    def monthly_totals(self, first_month: date, months: int) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(rótulos YYYY-MM, entradas por mês, saídas por mês) a partir de first_month"""
+        start = np.datetime64(month_start(first_month), "M")
+        month_index = (self.dates.astype("datetime64[M]") - start).astype(np.int64)
+        inside = (month_index >= 0) & (month_index < months)
+
+        amounts = self.signed_amounts[inside]
+        index = month_index[inside]
+        entradas = np.bincount(index, weights=np.where(amounts > 0, amounts, 0.0), minlength=months)
+        saidas = np.bincount(index, weights=np.where(amounts < 0, -amounts, 0.0), minlength=months)
+
+        labels = [str(start + i) for i in range(months)]
+        return labels, entradas[:months], saidas[:months]
+
+    def daily_net(self, start: date, end: date) -> np.ndarray:
+        """Saldo líquido por dia (entradas - saídas), um valor por dia de start a end"""
+        window = self._window(start, end)
+        days = (self.dates[window] - np.datetime64(start, "D")).astype(np.int64)
+        length = (end - start).days + 1
+        return np.bincount(days, weights=self.signed_amounts[window], minlength=length)[:length]
+
+    # ============================================
+    # INDICADORES
+    # ============================================
+
+    def burn_rate(self, today: Optional[date] = None, months: int = 3) -> float:
+        """Consumo médio mensal de caixa (saídas - entradas) nos últimos meses completos; 0 se lucrativo"""
+        today = today or datetime.now().date()
+        _, entradas, saidas = self.monthly_totals(month_start(today, months), months)
+        return round(max(float((saidas - entradas).mean()) if months else 0.0, 0.0), 2)
+
+    def runway_months(self, today: Optional[date] = None, months: int = 3) -> Optional[float]:
+        """Meses até zerar o caixa no ritmo atual; None se não há consumo de caixa"""
+        burn = self.burn_rate(today, months)
+        if burn <= 0:
+            return None
+        return round(max(self.balance(today), 0.0) / burn, 1)
+
+    def summary(self, start: date, end: date, today: Optional[date] = None,
+                trend_months: int = 6) -> dict:
+        """Resumo completo usado pelas ferramentas do financial_expert"""
+        today = today or datetime.now().date()
+        labels, entradas, saidas = self.monthly_totals(month_start(today, trend_months - 1), trend_months)
+        net = entradas - saidas
+
+        previous_start = start - (end - start) - timedelta(days=1)
+        return {
+            "period": self.totals(start, end),
+            "previous_period": self.totals(previous_start, start - timedelta(days=1)),
+            "opening_balance": self.balance(start - timedelta(days=1)),
+            "closing_balance": self.balance(end),
+            "top_entradas": self.category_breakdown(start, end, "entrada")[:3],
+            "top_saidas": self.category_breakdown(start, end, "saida")[:3],
+            "months": labels,
+            "monthly_net": [round(float(v), 2) for v in net],
+            "rolling_net_3m": [round(float(v), 2) for v in rolling_average(net, 3)],
+            "burn_rate": self.burn_rate(today),
+            "runway_months": self.runway_months(today),
+            "history_note": self.history_note(previous_start),
+        }
+
+
+# ============================================
+# CARGA E CACHE POR USUÁRIO
+# ============================================
+
+def load_cashflow_frame(user_id: str, history_months: int = ANALYTICS_HISTORY_MONTHS) -> CashflowFrame:
+    """Uma única chamada à API traz o histórico em formato colunar e o saldo anterior a ele"""
+    from ..tools.cashflow_tools import API_BASE_URL, CREWAI_SERVICE_TOKEN
+
+    start = month_start(datetime.now().date(), history_months)
+    response = get_guard("falachefe_api").call(
+        lambda timeout: requests.get(
+            f"{API_BASE_URL}/api/financial/crewai/transactions",
+            params={"userId": user_id, "startDate": start.strftime("%Y-%m-%d")},
+            headers={"Content-Type": "application/json", "x-crewai-token": CREWAI_SERVICE_TOKEN},
+            timeout=timeout
+        ),
+        is_failure=lambda r: r.status_code >= 500
+    )
+    response.raise_for_status()
+
+    payload = response.json()
+    data = payload.get("data", {})
+    history_start = payload.get("historyStart")
+    if payload.get("truncated"):
+        print(f"⚠️ Cashflow history for {user_id} truncated at {len(data.get('dates', []))} rows "
+              f"(complete from {history_start})", file=sys.stderr)
+    return CashflowFrame.from_columns(
+        data.get("dates", []), data.get("types", []), data.get("amounts", []), data.get("categories", []),
+        opening_balance=float(payload.get("openingBalance") or 0.0),
+        prior_count=int(payload.get("priorCount") or 0),
+        history_start=datetime.strptime(history_start, "%Y-%m-%d").date() if history_start else start,
+        truncated=bool(payload.get("truncated")),
+    )
+
+
+_frames: Dict[str, Tuple[float, Optional[str], CashflowFrame]] = {}
+_frames_lock = threading.Lock()
+
+
+def _frame_version(user_id: str) -> Optional[str]:
+    try:
+        return get_kv_store().get(kv_key("cashflow_version", user_id))
+    except Exception as e:
+        print(f"⚠️ Cashflow version lookup failed: {e}", file=sys.stderr)
+        return None
+
+
+def get_cashflow_frame(user_id: str) -> CashflowFrame:
+    """Frame do usuário (cache por TTL + versão compartilhada)"""
+    version = _frame_version(user_id)
+    now = time.monotonic()
+
+    with _frames_lock:
+        cached = _frames.get(user_id)
+    if cached and cached[1] == version and now - cached[0] < ANALYTICS_CACHE_TTL_SECONDS:
+        return cached[2]
+
+    frame = load_cashflow_frame(user_id)
+    with _frames_lock:
+        if len(_frames) >= ANALYTICS_CACHE_MAX_USERS:
+            _frames.pop(min(_frames, key=lambda key: _frames[key][0]))
+        _frames[user_id] = (now, version, frame)
+    print(f"📊 Cashflow frame loaded for {user_id}: {len(frame)} transactions", file=sys.stderr)
+    return frame
+
+
+def invalidate_cashflow_frame(user_id: str) -> None:
+    """Chamar após gravar transações: força recarga em todos os workers (frame e digest)"""
+    with _frames_lock:
+        _frames.pop(user_id, None)
+    mark_digest_stale(user_id)
+    try:
+        get_kv_store().incr(kv_key("cashflow_version", user_id), ttl=ANALYTICS_CACHE_TTL_SECONDS * 2)
+    except Exception as e:
+        print(f"⚠️ Cashflow version bump failed: {e}", file=sys.stderr)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Projeção de fluxo de caixa
+==========================
+
+Responde "vou ter dinheiro para pagar a folha mês que vem?" com números
+reproduzíveis em vez de aritmética improvisada pelo LLM.
+
+Modelo (tudo vetorizado sobre o CashflowFrame em cache):
+
+1. Recorrentes: categoria + tipo com até 2 lançamentos/mês, presente em
+   pelo menos 60% dos últimos meses completos e com valor mensal estável
+   (aluguel, folha, pró-labore). Projetados no dia médio em que ocorrem.
+2. Base sazonal: o restante (não recorrente) vira uma média por dia da
+   semana dos últimos FORECAST_BASELINE_DAYS dias; as entradas são
+   ajustadas pelo peso do mesmo mês no ano anterior quando há histórico.
+3. Saldo projetado dia a dia = saldo atual + soma acumulada.
+
+O resultado fica em cache junto do frame (WeakKeyDictionary): quando o
+frame é recarregado/invalidado, a projeção é recalculada.
+"""
+
+import os
+import calendar
+import threading
+import weakref
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .cashflow_analytics import CashflowFrame, month_start
+
+FORECAST_LOOKBACK_MONTHS = int(os.getenv("FORECAST_LOOKBACK_MONTHS", "6"))
+FORECAST_BASELINE_DAYS = int(os.getenv("FORECAST_BASELINE_DAYS", "90"))
+FORECAST_MAX_WEEKS = 26
+
+# Recorrente: presente em >= 60% dos meses, variação mensal <= 35% e até
+# 2 lançamentos/mês (vendas diárias ficam na base por dia da semana)
+RECURRING_MIN_PRESENCE = 0.6
+RECURRING_MIN_MONTHS = 3
+RECURRING_MAX_CV = 0.35
+RECURRING_MAX_PER_MONTH = 2
+# Limites do ajuste sazonal das entradas
+SEASONAL_FACTOR_RANGE = (0.5, 2.0)
+
+_forecasts: "weakref.WeakKeyDictionary[CashflowFrame, Dict[tuple, dict]]" = weakref.WeakKeyDictionary()
+_forecasts_lock = threading.Lock()
+
+
+def detect_recurring(frame: CashflowFrame, today: date,
+                     lookback_months: int = FORECAST_LOOKBACK_MONTHS) -> List[dict]:
+    """
+    Lançamentos recorrentes por categoria/tipo nos últimos meses completos.
+
+    Returns:
+        [{"category", "transaction_type", "amount", "day", "months"}] por valor decrescente
+    """
+    if len(frame) == 0 or lookback_months <= 0:
+        return []
+
+    first_month = np.datetime64(month_start(today, lookback_months), "M")
+    month_index = (frame.dates.astype("datetime64[M]") - first_month).astype(np.int64)
+    inside = (month_index >= 0) & (month_index < lookback_months)
+    if not inside.any():
+        return []
+
+    amounts = frame.signed_amounts[inside]
+    months = month_index[inside]
+    days = (frame.dates[inside] - frame.dates[inside].astype("datetime64[M]")).astype(np.int64) + 1
+    # Grupo = categoria x tipo (par: saída, ímpar: entrada)
+    groups = frame.category_codes[inside] * 2 + (amounts > 0)
+    n_groups = len(frame.categories) * 2
+
+    cells = groups * lookback_months + months
+    monthly = np.bincount(cells, weights=np.abs(amounts), minlength=n_groups * lookback_months)
+    monthly = monthly.reshape(n_groups, lookback_months)
+
+    present = (monthly > 0).sum(axis=1)
+    counts = np.bincount(groups, minlength=n_groups)
+    per_month = np.divide(counts, present, out=np.zeros(n_groups), where=present > 0)
+    mean = np.divide(monthly.sum(axis=1), present, out=np.zeros(n_groups), where=present > 0)
+    # Desvio padrão só entre os meses em que o lançamento ocorreu
+    squared = np.where(monthly > 0, (monthly - mean[:, None]) ** 2, 0.0).sum(axis=1)
+    std = np.sqrt(np.divide(squared, present, out=np.zeros(n_groups), where=present > 0))
+    cv = np.divide(std, mean, out=np.full(n_groups, np.inf), where=mean > 0)
+
+    weighted_day = np.bincount(groups, weights=np.abs(amounts) * days, minlength=n_groups)
+    group_total = np.bincount(groups, weights=np.abs(amounts), minlength=n_groups)
+    typical_day = np.divide(weighted_day, group_total, out=np.ones(n_groups), where=group_total > 0)
+
+    min_months = max(RECURRING_MIN_MONTHS, int(np.ceil(lookback_months * RECURRING_MIN_PRESENCE)))
+    recurring = np.flatnonzero(
+        (present >= min_months) & (cv <= RECURRING_MAX_CV) & (per_month <= RECURRING_MAX_PER_MONTH)
+    )
+
+    result = [
+        {
+            "category": frame.categories[g // 2],
+            "transaction_type": "entrada" if g % 2 else "saida",
+            "amount": round(float(mean[g]), 2),
+            "day": int(round(typical_day[g])),
+            "months": int(present[g]),
+            "group": int(g),
+        }
+        for g in recurring
+    ]
+    return sorted(result, key=lambda item: -item["amount"])
+
+
+def _seasonal_inflow_factors(frame: CashflowFrame, today: date, non_recurring: np.ndarray) -> np.ndarray:
+    """Peso de cada mês do ano (1..12) nas entradas dos últimos 12 meses completos; 1.0 sem histórico"""
+    factors = np.ones(13)
+    first = month_start(today, 12)
+    if len(frame) == 0 or frame.dates[0] > np.datetime64(first, "D"):
+        return factors
+
+    first_month = np.datetime64(first, "M")
+    month_index = (frame.dates.astype("datetime64[M]") - first_month).astype(np.int64)
+    inside = (month_index >= 0) & (month_index < 12) & non_recurring & (frame.signed_amounts > 0)
+    inflows = np.bincount(month_index[inside], weights=frame.signed_amounts[inside], minlength=12)[:12]
+    average = inflows.mean()
+    if average <= 0:
+        return factors
+
+    calendar_months = (first.month - 1 + np.arange(12)) % 12 + 1
+    factors[calendar_months] = np.clip(inflows / average, *SEASONAL_FACTOR_RANGE)
+    return factors
+
+
+def forecast_cashflow(frame: CashflowFrame, weeks: int = 4, today: Optional[date] = None) -> dict:
+    """
+    Saldo projetado por dia para as próximas `weeks` semanas.
+
+    Returns:
+        dict com start_balance, dates, balance (np.ndarray), daily_net,
+        recurring, min_balance/min_date, first_negative_date, end_balance,
+        projected_entradas/projected_saidas
+    """
+    today = today or datetime.now().date()
+    weeks = max(1, min(int(weeks), FORECAST_MAX_WEEKS))
+    key = (weeks, today)
+
+    with _forecasts_lock:
+        cached = _forecasts.get(frame, {}).get(key)
+    if cached is not None:
+        return cached
+
+    result = _compute_forecast(frame, weeks, today)
+    with _forecasts_lock:
+        _forecasts.setdefault(frame, {})[key] = result
+    return result
+
+
+def _compute_forecast(frame: CashflowFrame, weeks: int, today: date) -> dict:
+    horizon = weeks * 7
+    future = np.datetime64(today, "D") + np.arange(1, horizon + 1)
+    recurring = detect_recurring(frame, today)
+
+    # 1. Lançamentos recorrentes nos próximos meses
+    recurring_flow = np.zeros(horizon)
+    current_month = month_start(today)
+    group_ids = frame.category_codes * 2 + (frame.signed_amounts > 0)
+    this_month = slice(
+        int(np.searchsorted(frame.dates, np.datetime64(current_month, "D"), side="left")),
+        int(np.searchsorted(frame.dates, np.datetime64(today, "D"), side="right"))
+    )
+
+    for item in recurring:
+        sign = 1.0 if item["transaction_type"] == "entrada" else -1.0
+        already_paid = np.abs(frame.signed_amounts[this_month][group_ids[this_month] == item["group"]]).sum()
+        for months_ahead in range(0, weeks // 4 + 2):
+            month = month_start(today, -months_ahead)
+            if months_ahead == 0 and already_paid >= item["amount"] * 0.5:
+                continue
+            day = min(item["day"], calendar.monthrange(month.year, month.month)[1])
+            offset = (date(month.year, month.month, day) - today).days - 1
+            if months_ahead == 0 and offset < 0:
+                # Dia típico já passou e ainda não foi lançado: considera amanhã
+                offset = 0
+            if 0 <= offset < horizon:
+                recurring_flow[offset] += sign * item["amount"]
+
+    # 2. Base sazonal do que não é recorrente
+    recurring_groups = np.array([item["group"] for item in recurring], dtype=np.int64)
+    non_recurring = ~np.isin(group_ids, recurring_groups)
+    baseline_start = today - timedelta(days=FORECAST_BASELINE_DAYS - 1)
+    window = slice(
+        int(np.searchsorted(frame.dates, np.datetime64(baseline_start, "D"), side="left")),
+        int(np.searchsorted(frame.dates, np.datetime64(today, "D"), side="right"))
+    )
+    amounts = np.where(non_recurring[window], frame.signed_amounts[window], 0.0)
+    # 1970-01-01 foi quinta-feira: (dias + 3) % 7 → segunda = 0
+    weekdays = (frame.dates[window].astype(np.int64) + 3) % 7
+    baseline_days = np.datetime64(baseline_start, "D") + np.arange(FORECAST_BASELINE_DAYS)
+    observed_days = np.bincount((baseline_days.astype(np.int64) + 3) % 7, minlength=7)
+    inflow_by_weekday = np.bincount(weekdays, weights=np.clip(amounts, 0, None), minlength=7) / np.maximum(observed_days, 1)
+    outflow_by_weekday = np.bincount(weekdays, weights=np.clip(-amounts, 0, None), minlength=7) / np.maximum(observed_days, 1)
+
+    factors = _seasonal_inflow_factors(frame, today, non_recurring)
+    future_weekdays = (future.astype(np.int64) + 3) % 7
+    future_months = future.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    baseline_in = inflow_by_weekday[future_weekdays] * factors[future_months]
+    baseline_out = outflow_by_weekday[future_weekdays]
+
+    # 3. Saldo projetado
+    daily_net = recurring_flow + baseline_in - baseline_out
+    start_balance = frame.balance(today)
+    balance = start_balance + np.cumsum(daily_net)
+
+    min_index = int(np.argmin(balance))
+    negative = np.flatnonzero(balance < 0)
+    return {
+        "today": today,
+        "weeks": weeks,
+        "start_balance": round(start_balance, 2),
+        "dates": future,
+        "daily_net": daily_net,
+        "balance": balance,
+        "recurring": recurring,
+        "projected_entradas": round(float(np.clip(recurring_flow, 0, None).sum() + baseline_in.sum()), 2),
+        "projected_saidas": round(float(np.clip(-recurring_flow, 0, None).sum() + baseline_out.sum()), 2),
+        "min_balance": round(float(balance[min_index]), 2),
+        "min_date": future[min_index].astype(object),
+        "first_negative_date": future[negative[0]].astype(object) if len(negative) else None,
+        "end_balance": round(float(balance[-1]), 2),
+    }
+
+
+def projected_balance_on(forecast: dict, target: date) -> Optional[float]:
+    """Saldo projetado no fim do dia `target` (None fora do horizonte)"""
+    offset = (target - forecast["today"]).days - 1
+    if offset < 0:
+        return forecast["start_balance"]
+    if offset >= len(forecast["balance"]):
+        return None
+    return round(float(forecast["balance"][offset]), 2)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Resumos financeiros pré-calculados (digests)
+============================================
+
+O status financeiro enviado ao prompt era recalculado a cada mensagem a
+partir das últimas transações. Agora um job noturno no Postgres
+(supabase_financial_digests.sql → refresh_financial_digests via pg_cron)
+calcula o digest de todos os usuários em lote; aqui ele é lido com um
+único SELECT e mantido em cache no KV store compartilhado.
+
+Quando o usuário grava transações, mark_digest_stale() marca o digest como
+desatualizado; a próxima leitura recalcula apenas aquele usuário
+(refresh_financial_digests(user_id)) antes de ler.
+
+Rodar o recálculo completo manualmente:
+    python -m falachefe_crew.analytics.financial_digest
+"""
+
+import os
+import sys
+import json
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import requests
+
+from ..resilience.dependency_guard import get_guard
+from ..storage.kv_store import get_kv_store, kv_key
+
+DIGEST_CACHE_TTL_SECONDS = float(os.getenv("DIGEST_CACHE_TTL_SECONDS", "900"))
+# Digest mais antigo que isso é ignorado (job noturno falhou)
+DIGEST_MAX_AGE_HOURS = float(os.getenv("DIGEST_MAX_AGE_HOURS", "36"))
+DIGEST_STALE_TTL_SECONDS = 2 * 24 * 3600
+
+
+def supabase_rest() -> Tuple[str, Optional[dict]]:
+    """(url, headers) do PostgREST ou (url, None) se a chave não estiver configurada"""
+    supabase_url = os.getenv("SUPABASE_URL", "https://zpdartuyaergbxmbmtur.supabase.co")
+    supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY", "")
+    if not supabase_key:
+        return supabase_url, None
+    return supabase_url, {
+        "apikey": supabase_key,
+        "Authorization": f"Bearer {supabase_key}",
+        "Content-Type": "application/json"
+    }
+
+
+def digest_url(supabase_url: str, user_id: str) -> str:
+    return f"{supabase_url}/rest/v1/financial_digests?user_id=eq.{user_id}&select=digest,computed_at"
+
+
+def refresh_url(supabase_url: str) -> str:
+    return f"{supabase_url}/rest/v1/rpc/refresh_financial_digests"
+
+
+def digest_from_rows(rows: list) -> Optional[dict]:
+    """Linha de financial_digests → digest com computed_at; None se ausente ou velho demais"""
+    if not rows:
+        return None
+    digest = dict(rows[0]["digest"])
+    computed_at = datetime.fromisoformat(rows[0]["computed_at"].replace("Z", "+00:00"))
+    age_hours = (datetime.now(timezone.utc) - computed_at).total_seconds() / 3600
+    if age_hours > DIGEST_MAX_AGE_HOURS:
+        print(f"⚠️ Financial digest is {age_hours:.0f}h old, ignoring", file=sys.stderr)
+        return None
+    digest["computed_at"] = computed_at.isoformat()
+    return digest
+
+
+# ============================================
+# CACHE (KV STORE)
+# ============================================
+
+def cached_digest(user_id: str) -> Optional[dict]:
+    try:
+        value = get_kv_store().get(kv_key("digest", user_id))
+        return json.loads(value) if value else None
+    except Exception as e:
+        print(f"⚠️ Digest cache read failed: {e}", file=sys.stderr)
+        return None
+
+
+def store_digest(user_id: str, digest: dict) -> None:
+    try:
+        get_kv_store().set(kv_key("digest", user_id), json.dumps(digest, ensure_ascii=False), ttl=DIGEST_CACHE_TTL_SECONDS)
+    except Exception as e:
+        print(f"⚠️ Digest cache write failed: {e}", file=sys.stderr)
+
+
+def is_digest_stale(user_id: str) -> bool:
+    try:
+        return get_kv_store().get(kv_key("digest_stale", user_id)) is not None
+    except Exception:
+        return False
+
+
+def clear_digest_stale(user_id: str) -> None:
+    try:
+        get_kv_store().delete(kv_key("digest_stale", user_id))
+    except Exception as e:
+        print(f"⚠️ Digest stale flag clear failed: {e}", file=sys.stderr)
+
+
+def mark_digest_stale(user_id: str) -> None:
+    """Chamar após gravar transações do usuário"""
+    try:
+        store = get_kv_store()
+        store.delete(kv_key("digest", user_id))
+        store.set(kv_key("digest_stale", user_id), "1", ttl=DIGEST_STALE_TTL_SECONDS)
+    except Exception as e:
+        print(f"⚠️ Digest invalidation failed: {e}", file=sys.stderr)
+
+
+# ============================================
+# LEITURA / RECÁLCULO
+# ============================================
+
+def refresh_financial_digests(user_id: Optional[str] = None) -> int:
+    """Recalcula o digest de um usuário (ou de todos); retorna linhas gravadas"""
+    supabase_url, headers = supabase_rest()
+    if not headers:
+        return 0
+    response = get_guard("supabase").call(
+        lambda timeout: requests.post(
+            refresh_url(supabase_url),
+            json={"p_user_id": user_id},
+            headers=headers,
+            timeout=timeout
+        ),
+        is_failure=lambda r: r.status_code >= 500
+    )
+    response.raise_for_status()
+    return int(response.json() or 0)
+
+
+def get_financial_digest(user_id: str) -> Optional[dict]:
+    """Digest do usuário (cache → tabela); None se não houver digest válido"""
+    stale = is_digest_stale(user_id)
+    if not stale:
+        digest = cached_digest(user_id)
+        if digest is not None:
+            return digest
+
+    supabase_url, headers = supabase_rest()
+    if not headers:
+        return None
+
+    try:
+        if stale:
+            refresh_financial_digests(user_id)
+            clear_digest_stale(user_id)
+
+        response = get_guard("supabase").call(
+            lambda timeout: requests.get(digest_url(supabase_url, user_id), headers=headers, timeout=timeout),
+            is_failure=lambda r: r.status_code >= 500
+        )
+        if response.status_code != 200:
+            return None
+        digest = digest_from_rows(response.json())
+    except Exception as e:
+        print(f"⚠️ Financial digest lookup failed: {e}", file=sys.stderr)
+        return None
+
+    if digest is not None:
+        store_digest(user_id, digest)
+    return digest
+
+
+def format_financial_digest(digest: dict) -> str:
+    """Texto do status financeiro para o prompt (mesmo papel de summarize_financial_transactions)"""
+    if not digest.get("total_transacoes"):
+        return "Nenhuma transação financeira registrada ainda. Cliente está começando a usar o sistema."
+
+    computed_at = datetime.fromisoformat(digest["computed_at"]).astimezone()
+    trend = digest["resultado_30d"] - digest["resultado_30d_anterior"]
+    trend_label = "melhorando" if trend > 0 else "piorando" if trend < 0 else "estável"
+
+    text = f"""Resumo Financeiro (atualizado em {computed_at.strftime('%d/%m %H:%M')}):
+- Total Entradas: R$ {digest['entradas_total']:.2f}
+- Total Saídas: R$ {digest['saidas_total']:.2f}
+- Saldo Atual: R$ {digest['saldo']:.2f}
+- Mês atual: R$ {digest['entradas_mes']:.2f} de entradas / R$ {digest['saidas_mes']:.2f} de saídas
+- Resultado 30 dias: R$ {digest['resultado_30d']:.2f} (anterior: R$ {digest['resultado_30d_anterior']:.2f}, {trend_label})
+- Total de Transações: {digest['total_transacoes']}"""
+
+    if digest.get("top_saidas"):
+        text += "\n\nMaiores Gastos (90 dias):\n" + "\n".join(
+            f"💸 {item['category']}: R$ {item['amount']:.2f}" for item in digest["top_saidas"]
+        )
+    if digest.get("anomalias"):
+        text += "\n\nMovimentações Fora do Padrão (30 dias):\n" + "\n".join(format_anomaly(item) for item in digest["anomalias"])
+    return text
+
+
+def format_anomaly(item: dict) -> str:
+    emoji = "💰" if item["type"] == "entrada" else "💸"
+    day = datetime.strptime(item["date"][:10], "%Y-%m-%d").strftime("%d/%m")
+    return f"⚠️ {emoji} R$ {item['amount']:.2f} em {item['category']} ({day}) - {item['description']}"
+
+
+if __name__ == "__main__":
+    print(f"✅ {refresh_financial_digests()} digests recalculated", file=sys.stderr)
@@ -0,0 +1,5 @@
+"""
+Caches de respostas e chamadas ao LLM do Falachefe
+Evitam rodar crews e prompts idênticos ou equivalentes mais de uma vez
+"""
+
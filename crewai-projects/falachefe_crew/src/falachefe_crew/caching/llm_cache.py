@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Cache de chamadas ao LLM (nível de prompt)
+==========================================
+
+Os crews repetem prompts idênticos com frequência: retries do QStash,
+o mesmo agente respondendo a mesma pergunta, o orquestrador reclassificando
+a mesma mensagem. CachedLLM é um crewai.LLM que responde do cache quando
+modelo + mensagens + parâmetros são exatamente iguais.
+
+Backends (LLM_CACHE_BACKEND):
+- auto (padrão): Redis se o KV store compartilhado for Redis, senão disco
+- redis: KV store compartilhado, expiração por TTL
+- disk: SQLite local (LLM_CACHE_PATH), evicção LRU por LLM_CACHE_MAX_ENTRIES
+- off: desliga o cache
+
+Agentes com ferramentas usam cached_llm(..., enabled=False): a resposta do
+LLM decide chamar ferramentas com efeito (registrar transação, enviar
+mensagem) e depende de dados que mudam. Por segurança, chamadas com tools
+nunca são cacheadas mesmo com o cache ligado.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional
+
+from crewai import LLM
+
+from ..storage.kv_store import get_kv_store, kv_key
+from ..resilience.execution_budget import current_budget
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "auto").lower()
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/tmp/falachefe_llm_cache.sqlite3")
+
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini")
+
+# Parâmetros que mudam a resposta e entram na chave
+_KEY_PARAMS = ("temperature", "top_p", "max_tokens", "max_completion_tokens", "stop",
+               "presence_penalty", "frequency_penalty", "seed", "response_format")
+
+
+class KVLLMCacheBackend:
+    """Cache no KV store compartilhado (Redis); evicção por TTL"""
+
+    name = "redis"
+
+    def __init__(self, store=None, ttl: float = LLM_CACHE_TTL_SECONDS):
+        self.store = store or get_kv_store()
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[str]:
+        return self.store.get(kv_key("llmcache", key))
+
+    def set(self, key: str, value: str) -> None:
+        self.store.set(kv_key("llmcache", key), value, ttl=self.ttl)
+
+
+class SqliteLLMCacheBackend:
+    """Cache em disco (SQLite); evicção LRU por número de entradas e TTL"""
+
+    name = "disk"
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttl: float = LLM_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._writes += 1
+            # Evicção em lote a cada 100 gravações (evita COUNT(*) por chamada)
+            if self._writes % 100 == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "bypass": 0}
+# Incrementos vêm de várias threads de crew (gthread / executores do ASGI)
+_stats_lock = threading.Lock()
+
+
+def _count(outcome: str) -> None:
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def get_llm_cache():
+    """Backend configurado (singleton por processo) ou None se desligado"""
+    global _backend
+    if LLM_CACHE_BACKEND == "off":
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+
+def _create_backend():
+    if LLM_CACHE_BACKEND == "redis" or (LLM_CACHE_BACKEND == "auto" and get_kv_store().backend == "redis"):
+        return KVLLMCacheBackend()
+    return SqliteLLMCacheBackend()
+
+
+def llm_cache_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def llm_cache_key(model: str, messages: Any, params: dict) -> str:
+    """sha256 de modelo + mensagens + parâmetros relevantes (JSON canônico)"""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedLLM(LLM):
+    """
+    crewai.LLM com cache exato de respostas (apenas chamadas sem ferramentas).
+
+    Também aplica o orçamento de execução ativo (resilience.execution_budget),
+    por isso agentes com ferramentas usam CachedLLM com cache_enabled=False.
+    """
+
+    cache_enabled = True
+
+    def _cache_params(self) -> dict:
+        return {
+            name: getattr(self, name)
+            for name in _KEY_PARAMS
+            if getattr(self, name, None) is not None
+        }
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        budget = current_budget()
+        if budget is not None:
+            if isinstance(messages, str):
+                messages = [{"role": "user", "content": messages}]
+            forced_answer, messages = budget.before_llm_call(messages)
+            if forced_answer is not None:
+                return forced_answer
+
+        result = self._cached_call(messages, tools, callbacks, available_functions, **kwargs)
+
+        if budget is not None:
+            budget.after_llm_call(messages, result)
+        return result
+
+    def _cached_call(self, messages, tools, callbacks, available_functions, **kwargs):
+        cache = get_llm_cache() if self.cache_enabled else None
+        if cache is None or tools or available_functions:
+            _count("bypass")
+            return super().call(messages, tools=tools, callbacks=callbacks,
+                                available_functions=available_functions, **kwargs)
+
+        key = llm_cache_key(self.model, messages, self._cache_params())
+        try:
+            cached = cache.get(key)
+        except Exception as e:
+            print(f"⚠️ LLM cache read failed: {e}", file=sys.stderr)
+            cached = None
+
+        if cached is not None:
+            _count("hits")
+            print(f"⚡ LLM cache hit ({self.model})", file=sys.stderr)
+            return cached
+
+        _count("misses")
+        result = super().call(messages, tools=tools, callbacks=callbacks,
+                              available_functions=available_functions, **kwargs)
+
+        if isinstance(result, str) and result.strip():
+            try:
+                cache.set(key, result)
+            except Exception as e:
+                print(f"⚠️ LLM cache write failed: {e}", file=sys.stderr)
+        return result
+
+
+def cached_llm(model: Optional[str] = None, enabled: bool = True, **kwargs) -> LLM:
+    """
+    LLM para um agente/task.
+
+    Args:
+        model: modelo (padrão: OPENAI_MODEL_NAME ou gpt-4o-mini)
+        enabled: False para tasks que usam ferramentas (sem cache, mantém o orçamento)
+    """
+    llm = CachedLLM(model=model or DEFAULT_MODEL, **kwargs)
+    llm.cache_enabled = enabled
+    return llm
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Cache semântico de respostas dos especialistas
+==============================================
+
+Perguntas genéricas ("como formalizar uma contratação?", "como divulgar no
+Instagram?") chegam com frequência e, sem cache, cada uma roda um crew
+completo com várias iterações do LLM.
+
+Chave do cache:
+- especialista (marketing_sales_expert, hr_expert)
+- perfil grosso da empresa (setor + porte)
+- embedding da pergunta (similaridade de cosseno >= SEMANTIC_CACHE_THRESHOLD)
+
+Proteções:
+- financial_expert nunca é cacheado (a resposta usa o status financeiro real do usuário)
+- perguntas com números (valores, datas, telefones) não são cacheadas
+- respostas que citam o nome da empresa ou do usuário (qualquer palavra do
+  nome com 3+ letras, ex: "João" de "João Silva") não são gravadas
+
+O embedding da pergunta calculado no lookup (miss) é reaproveitado pelo
+store_answer da mesma pergunta: um miss custa uma chamada de embedding.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+
+from ..storage.kv_store import get_kv_store, kv_key
+from ..resilience.dependency_guard import get_guard
+from ..observability.usage_ledger import EMBEDDING, record_openai_usage
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "200"))
+SEMANTIC_CACHE_EMBEDDING_MODEL = os.getenv("SEMANTIC_CACHE_EMBEDDING_MODEL", "text-embedding-3-small")
+# Embeddings reduzidos: suficientes para similaridade e leves para guardar no Redis
+SEMANTIC_CACHE_EMBEDDING_DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_EMBEDDING_DIMENSIONS", "256"))
+
+# Especialistas com respostas genéricas (não dependem de dados do usuário)
+CACHEABLE_SPECIALISTS = {
+    'marketing_expert': 'marketing_sales_expert',
+    'sales_expert': 'marketing_sales_expert',
+    'marketing_sales_expert': 'marketing_sales_expert',
+    'hr_expert': 'hr_expert',
+}
+
+_DIGITS = re.compile(r"\d")
+MIN_QUESTION_WORDS = 3
+MAX_QUESTION_CHARS = 300
+# Valores padrão do perfil (não identificam ninguém)
+GENERIC_PROFILE_VALUES = {"cliente", "empresa", "nao especificado", "empresa nao cadastrada",
+                          "empresa nao identificada", "erro ao buscar dados"}
+# Palavras de nomes que não identificam ninguém (tipo societário, conectivos)
+GENERIC_NAME_TOKENS = {"ltda", "eireli", "dos", "das", "cia"} | {
+    token for value in GENERIC_PROFILE_VALUES for token in value.split()
+}
+MIN_NAME_TOKEN_CHARS = 3
+# Embeddings de lookups sem hit aguardando o store_answer da mesma pergunta
+PENDING_EMBEDDINGS_MAX = 256
+
+
+def normalize_text(text: str) -> str:
+    """minúsculas, sem acentos, sem pontuação, espaços únicos"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class SemanticResponseCache:
+    """Cache de respostas por (especialista, setor, porte) + similaridade da pergunta"""
+
+    def __init__(
+        self,
+        store=None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        self.store = store or get_kv_store()
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.counters = {"exact": 0, "semantic": 0, "miss": 0}
+        self._pending_embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.counters[outcome] += 1
+
+    @staticmethod
+    def is_cacheable(specialist: str, question: str) -> bool:
+        """Apenas perguntas genéricas para especialistas sem dados do usuário"""
+        if not SEMANTIC_CACHE_ENABLED or specialist not in CACHEABLE_SPECIALISTS:
+            return False
+        if _DIGITS.search(question) or len(question) > MAX_QUESTION_CHARS:
+            return False
+        return len(normalize_text(question).split()) >= MIN_QUESTION_WORDS
+
+    @staticmethod
+    def _bucket(specialist: str, company_data: dict) -> str:
+        profile = "|".join([
+            CACHEABLE_SPECIALISTS[specialist],
+            normalize_text(company_data.get('company_sector') or ''),
+            normalize_text(company_data.get('company_size') or ''),
+        ])
+        return hashlib.sha256(profile.encode()).hexdigest()[:16]
+
+    def _exact_key(self, bucket: str, question: str) -> str:
+        digest = hashlib.sha256(normalize_text(question).encode()).hexdigest()[:24]
+        return kv_key("semcache", bucket, "exact", digest)
+
+    def _entries_key(self, bucket: str) -> str:
+        return kv_key("semcache", bucket, "entries")
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        import openai
+
+        try:
+            started = time.time()
+            response = get_guard("openai").call(
+                lambda timeout: openai.embeddings.create(
+                    model=SEMANTIC_CACHE_EMBEDDING_MODEL,
+                    input=normalize_text(text),
+                    dimensions=SEMANTIC_CACHE_EMBEDDING_DIMENSIONS,
+                    timeout=timeout
+                )
+            )
+            record_openai_usage(EMBEDDING, SEMANTIC_CACHE_EMBEDDING_MODEL, response, time.time() - started,
+                                task="semantic_cache")
+            return [round(x, 5) for x in response.data[0].embedding]
+        except Exception as e:
+            print(f"⚠️ Semantic cache embedding failed: {e}", file=sys.stderr)
+            return None
+
+    def _question_embedding(self, question: str, keep: bool) -> Optional[List[float]]:
+        """Embedding da pergunta; keep=True guarda para o store_answer, keep=False consome o guardado"""
+        key = normalize_text(question)
+        with self._lock:
+            embedding = self._pending_embeddings.pop(key, None)
+        if embedding is None:
+            embedding = self._embed(question)
+        if keep and embedding is not None:
+            with self._lock:
+                self._pending_embeddings[key] = embedding
+                while len(self._pending_embeddings) > PENDING_EMBEDDINGS_MAX:
+                    self._pending_embeddings.popitem(last=False)
+        return embedding
+
+    def lookup(self, specialist: str, question: str, company_data: dict) -> Optional[dict]:
+        """
+        Procura resposta em cache.
+
+        Returns:
+            {"answer", "type": "exact"|"semantic", "similarity", "age_seconds"} ou None
+        """
+        if not self.is_cacheable(specialist, question):
+            return None
+
+        bucket = self._bucket(specialist, company_data)
+
+        # 1. Pergunta idêntica (após normalização): sem chamada de embedding
+        cached = self.store.get(self._exact_key(bucket, question))
+        if cached:
+            entry = json.loads(cached)
+            self._count("exact")
+            return self._hit(entry, "exact", 1.0)
+
+        # 2. Pergunta equivalente: maior similaridade dentro do bucket
+        entries = self.store.lrange(self._entries_key(bucket))
+        if not entries:
+            self._count("miss")
+            return None
+
+        embedding = self._question_embedding(question, keep=True)
+        if embedding is None:
+            self._count("miss")
+            return None
+
+        now = time.time()
+        best, best_score = None, 0.0
+        for raw in entries:
+            entry = json.loads(raw)
+            if now - entry["created_at"] > self.ttl:
+                continue
+            score = cosine_similarity(embedding, entry["embedding"])
+            if score > best_score:
+                best, best_score = entry, score
+
+        if best is None or best_score < self.threshold:
+            self._count("miss")
+            return None
+
+        with self._lock:
+            self._pending_embeddings.pop(normalize_text(question), None)
+        self._count("semantic")
+        return self._hit(best, "semantic", best_score)
+
+    @staticmethod
+    def _hit(entry: dict, hit_type: str, similarity: float) -> dict:
+        return {
+            "answer": entry["answer"],
+            "type": hit_type,
+            "similarity": round(similarity, 4),
+            "age_seconds": int(time.time() - entry["created_at"]),
+        }
+
+    @staticmethod
+    def is_personalized(answer: str, company_data: dict) -> bool:
+        """True se a resposta cita alguma palavra (3+ letras) do nome da empresa ou do usuário"""
+        answer_words = set(normalize_text(answer).split())
+        for field in ('company_name', 'user_name'):
+            value = normalize_text(company_data.get(field) or '')
+            if value in GENERIC_PROFILE_VALUES:
+                continue
+            for token in value.split():
+                if len(token) >= MIN_NAME_TOKEN_CHARS and token not in GENERIC_NAME_TOKENS and token in answer_words:
+                    return True
+        return False
+
+    def render_prometheus_metrics(self) -> str:
+        with self._lock:
+            counters = dict(self.counters)
+        lines = [
+            "",
+            "# HELP falachefe_semantic_cache_lookups_total Consultas ao cache semântico por resultado",
+            "# TYPE falachefe_semantic_cache_lookups_total counter",
+        ]
+        lines += [
+            f'falachefe_semantic_cache_lookups_total{{outcome="{outcome}"}} {count}'
+            for outcome, count in counters.items()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def store_answer(self, specialist: str, question: str, company_data: dict, answer: str) -> bool:
+        """Grava a resposta se ela for genérica o bastante para outros usuários"""
+        if not answer or not self.is_cacheable(specialist, question):
+            return False
+
+        # Resposta personalizada (cita empresa ou pessoa) não pode ser reaproveitada
+        if self.is_personalized(answer, company_data):
+            with self._lock:
+                self._pending_embeddings.pop(normalize_text(question), None)
+            return False
+
+        embedding = self._question_embedding(question, keep=False)
+        if embedding is None:
+            return False
+
+        bucket = self._bucket(specialist, company_data)
+        entry = {
+            "question": question,
+            "answer": answer,
+            "embedding": embedding,
+            "created_at": time.time(),
+        }
+        exact_entry = {k: v for k, v in entry.items() if k != "embedding"}
+        self.store.set(self._exact_key(bucket, question), json.dumps(exact_entry), ttl=self.ttl)
+        self.store.rpush(self._entries_key(bucket), json.dumps(entry), ttl=self.ttl, max_len=self.max_entries)
+        return True
+
+
+_cache: Optional[SemanticResponseCache] = None
+
+
+def get_semantic_cache() -> SemanticResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = SemanticResponseCache()
+    return _cache
+
+
+def render_prometheus_metrics() -> str:
+    return get_semantic_cache().render_prometheus_metrics()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Memoização de ferramentas dentro de uma execução do crew
+========================================================
+
+Durante um kickoff, os agentes chamam as mesmas ferramentas de leitura
+(saldo, perfil, detalhes do chat) várias vezes com os mesmos argumentos.
+Cada repetição é uma ida à rede e mais tokens para reler o mesmo resultado.
+
+- @memoized_tool (ferramentas de leitura): o resultado fica guardado por
+  nome da ferramenta + argumentos normalizados até o fim da execução
+- @invalidates_tool_memo (ferramentas de escrita): qualquer chamada limpa
+  tudo, para que um saldo consultado depois de registrar uma transação
+  venha atualizado
+
+O escopo é um ContextVar ativado por tool_memo_scope() em volta do
+kickoff; fora dele as ferramentas rodam normalmente, sem memoização.
+Só resultados de sucesso são guardados: textos com ❌/⚠️ e JSON com
+success: false (is_failed_tool_output) rodam de novo na próxima chamada.
+"""
+
+import sys
+import json
+import functools
+import threading
+import contextlib
+import contextvars
+from typing import Dict, Optional
+
+ERROR_PREFIXES = ("❌", "⚠️")
+
+
+def is_failed_tool_output(result) -> bool:
+    """Falha no formato das ferramentas do Falachefe: '❌ ...'/'⚠️ ...' ou JSON com success: false"""
+    if not isinstance(result, str):
+        return True
+    text = result.strip()
+    if not text or text.startswith(ERROR_PREFIXES):
+        return True
+    try:
+        return json.loads(text).get("success") is False
+    except (ValueError, AttributeError):
+        return False
+
+
+class ToolMemo:
+    """Resultados de ferramentas de leitura de uma execução"""
+
+    def __init__(self):
+        self._results: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def store(self, key: str, result: str) -> None:
+        with self._lock:
+            self._results[key] = result
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._results:
+                self.invalidations += 1
+            self._results.clear()
+
+
+_current_memo: contextvars.ContextVar = contextvars.ContextVar("falachefe_tool_memo", default=None)
+
+
+def current_tool_memo() -> Optional[ToolMemo]:
+    return _current_memo.get()
+
+
+@contextlib.contextmanager
+def tool_memo_scope(label: str = "crew"):
+    """Ativa a memoização de ferramentas durante o bloco (ex: em volta de crew.kickoff)"""
+    memo = ToolMemo()
+    token = _current_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _current_memo.reset(token)
+        if memo.hits or memo.invalidations:
+            print(f"🧠 [{label}] Tool memo: {memo.hits} hits, {memo.misses} misses, {memo.invalidations} invalidations", file=sys.stderr)
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def memo_key(tool_name: str, args: tuple, kwargs: dict) -> str:
+    """Nome + argumentos normalizados (espaços nas pontas e argumentos None ignorados)"""
+    arguments = _normalize({"args": list(args), **kwargs})
+    return tool_name + ":" + json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def memoized_tool(run_method):
+    """Decorator para BaseTool._run de ferramentas SOMENTE de leitura"""
+    @functools.wraps(run_method)
+    def wrapper(self, *args, **kwargs):
+        memo = current_tool_memo()
+        if memo is None:
+            return run_method(self, *args, **kwargs)
+
+        key = memo_key(self.name, args, kwargs)
+        cached = memo.get(key)
+        if cached is not None:
+            print(f"🧠 Tool memo hit: '{self.name}'", file=sys.stderr)
+            return cached
+
+        result = run_method(self, *args, **kwargs)
+        if not is_failed_tool_output(result):
+            memo.store(key, result)
+        return result
+    return wrapper
+
+
+def invalidates_tool_memo(run_method):
+    """Decorator para BaseTool._run de ferramentas com escrita: limpa a memoização da execução"""
+    @functools.wraps(run_method)
+    def wrapper(self, *args, **kwargs):
+        memo = current_tool_memo()
+        try:
+            return run_method(self, *args, **kwargs)
+        finally:
+            if memo is not None:
+                memo.clear()
+    return wrapper
@@ -5,11 +5,13 @@ from crewai.memory import LongTermMemory
 from typing import List
 
 # Importar ferramentas customizadas de fluxo de caixa
+from .caching.llm_cache import cached_llm
 from .tools.cashflow_tools import (
     GetCashflowBalanceTool,
     GetCashflowCategoriesTool,
     AddCashflowTransactionTool,
     GetCashflowSummaryTool,
+    ForecastCashflowTool,
 )
 
 # Importar ferramentas de integração com uazapi (WhatsApp)
@@ -72,6 +74,7 @@ class FalachefeCrew():
         - Consultar categorias de custos/receitas
         - Adicionar transações
         - Gerar resumos completos
+        - Projetar o saldo das próximas semanas
         """
         return Agent(
             config=self.agents_config['financial_expert'], # type: ignore[index]
@@ -82,6 +85,7 @@ class FalachefeCrew():
                 GetCashflowCategoriesTool(),
                 AddCashflowTransactionTool(),
                 GetCashflowSummaryTool(),
+                ForecastCashflowTool(),
             ],
             max_iter=15,  # Limita o número de iterações do agente
             allow_delegation=False,  # Impede que o agente delegue para outros
@@ -105,6 +109,7 @@ class FalachefeCrew():
             memory=True,  # Habilita memória individual do agente
             max_iter=15,
             allow_delegation=False,
+            llm=cached_llm(),  # Sem ferramentas: prompts idênticos respondidos do cache
         )
     
     @agent
@@ -119,6 +124,7 @@ class FalachefeCrew():
             memory=True,  # Habilita memória individual do agente
             max_iter=15,
             allow_delegation=False,
+            llm=cached_llm(),  # Sem ferramentas: prompts idênticos respondidos do cache
         )
     
     # ============================================
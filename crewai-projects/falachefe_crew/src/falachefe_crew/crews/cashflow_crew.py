@@ -8,6 +8,8 @@ from crewai.project import CrewBase, agent, crew, task
 from typing import List
 
 # Importar ferramentas
+from ..caching.llm_cache import cached_llm
+from ..routing.model_router import select_model
 from ..tools.cashflow_tools import (
     GetCashflowBalanceTool,
     GetCashflowCategoriesTool,
@@ -56,7 +58,7 @@ class CashflowCrew:
             allow_delegation=True,
             verbose=True,
             max_iter=10,
-            llm="gpt-4o",  # Usar modelo mais robusto para manager
+            llm=select_model(task="cashflow_manager"),  # Tier definido em config/model_routing.yaml
         )
     
     @agent
@@ -78,6 +80,7 @@ class CashflowCrew:
             allow_delegation=False,
             verbose=True,
             max_iter=5,
+            llm=cached_llm(),  # Sem ferramentas: pode usar cache
         )
     
     @agent
@@ -144,6 +147,7 @@ class CashflowCrew:
             allow_delegation=False,
             verbose=True,
             max_iter=5,
+            llm=cached_llm(),  # Sem ferramentas: pode usar cache
         )
     
     # ============================================
@@ -212,7 +216,7 @@ class CashflowCrew:
             agents=specialist_agents,    # Apenas especialistas
             tasks=self.tasks,             # Task principal
             process=Process.hierarchical, # Manager delega automaticamente
-            manager_llm="gpt-4o",         # LLM para o manager automático
+            manager_llm=select_model(task="cashflow_manager"),  # LLM para o manager automático
             verbose=True,
         )
 
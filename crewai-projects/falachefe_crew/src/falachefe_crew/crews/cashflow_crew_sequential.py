@@ -8,6 +8,8 @@ from typing import Dict, Any
 from datetime import datetime, timedelta
 
 # Importar ferramentas
+from ..caching.llm_cache import cached_llm
+from ..routing.model_router import select_model
 from ..tools.cashflow_tools import (
     GetCashflowBalanceTool,
     GetCashflowCategoriesTool,
@@ -37,7 +39,7 @@ class CashflowCrewSequential:
             backstory="Você é especialista em ensinar sobre fluxo de caixa para pequenos empresários.",
             allow_delegation=False,
             verbose=True,
-            llm="gpt-4o-mini"
+            llm=cached_llm(select_model(specialist="cashflow_consultor"))  # Sem ferramentas: pode usar cache
         )
         
         self.registrador = Agent(
@@ -49,7 +51,7 @@ class CashflowCrewSequential:
             allow_delegation=False,
             verbose=True,
             tools=[AddCashflowTransactionTool()],
-            llm="gpt-4o-mini"
+            llm=cached_llm(select_model(specialist="cashflow_registrador"), enabled=False)
         )
         
         self.analista = Agent(
@@ -63,7 +65,7 @@ class CashflowCrewSequential:
                 GetCashflowCategoriesTool(),
                 GetCashflowSummaryTool(),
             ],
-            llm="gpt-4o-mini"
+            llm=cached_llm(select_model(specialist="cashflow_analista"), enabled=False)
         )
     
     # ============================================
@@ -0,0 +1,5 @@
+"""
+Ingestão de dados em lote do Falachefe
+Importa planilhas e extratos bancários para o fluxo de caixa
+"""
+
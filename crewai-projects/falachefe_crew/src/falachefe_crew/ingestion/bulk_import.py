@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Importação em lote de transações (planilha CSV / extrato OFX)
+=============================================================
+
+Registrar um extrato de 300 linhas pelo chat significaria 300 execuções
+do financial_expert. O BulkImporter consome as transações do
+statement_parser em streaming e:
+
+1. valida e deduplica (mesmo FITID, ou mesma data + valor + descrição +
+   ordem entre as linhas iguais do arquivo: dois "PIX RECEBIDO R$ 50,00"
+   no mesmo dia são duas transações); a mesma chave vai para a API como
+   idempotencyKey, então reimportar o mesmo extrato não duplica lançamentos
+2. categoriza por palavra-chave; o que sobrar vai em UMA chamada ao
+   gpt-4o-mini por lote (fallback "outros" se o LLM falhar)
+3. grava cada lote com uma única chamada a /api/financial/crewai/batch
+4. informa o progresso ao usuário pelo WhatsApp (callback notify)
+
+Memória constante: só o lote corrente e as chaves de deduplicação ficam
+em memória, independente do tamanho do arquivo.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+
+from ..analytics.cashflow_analytics import invalidate_cashflow_frame
+from ..resilience.dependency_guard import get_guard, DependencyUnavailableError
+from ..routing.cashflow_command import CATEGORY_LABELS, categorize_description, format_brl
+from ..tools.cashflow_tools import API_BASE_URL, CREWAI_SERVICE_TOKEN
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "200"))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "10000"))
+IMPORT_LLM_CATEGORIZATION = os.getenv("IMPORT_LLM_CATEGORIZATION", "true").lower() == "true"
+# Intervalo mínimo entre mensagens de progresso (evita spam no WhatsApp)
+IMPORT_PROGRESS_INTERVAL_SECONDS = float(os.getenv("IMPORT_PROGRESS_INTERVAL_SECONDS", "20"))
+
+FALLBACK_CATEGORY = "outros"
+MAX_REPORTED_ERRORS = 5
+
+CATEGORIZATION_PROMPT = (
+    "Classifique cada transação de um extrato bancário de pequena empresa em UMA categoria: "
+    + ", ".join(list(CATEGORY_LABELS) + [FALLBACK_CATEGORY])
+    + ".\nResponda APENAS com um JSON no formato {\"categorias\": [\"categoria1\", ...]} "
+    "na mesma ordem das transações."
+)
+
+
+class BulkImporter:
+    """Importa um arquivo de transações para o fluxo de caixa de um usuário"""
+
+    def __init__(
+        self,
+        user_id: str,
+        notify: Optional[Callable[[str], None]] = None,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        source: str = "import"
+    ):
+        self.user_id = user_id
+        self.notify = notify or (lambda text: None)
+        self.batch_size = batch_size
+        self.source = source
+
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.errors: List[str] = []
+        self.totals = {"entrada": 0.0, "saida": 0.0}
+
+        self._seen = set()
+        # Linhas sem FITID já vistas por conteúdo (ordinal da próxima igual)
+        self._occurrences: Dict[str, int] = {}
+        self._last_progress = time.monotonic()
+
+    # ============================================
+    # VALIDAÇÃO / CATEGORIZAÇÃO
+    # ============================================
+
+    def _reject(self, line, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"linha {line}: {error}")
+
+    def _dedup_key(self, transaction: dict) -> str:
+        """
+        FITID; sem ele, data + valor + tipo + descrição e a ordem da linha
+        entre as iguais do arquivo (calculada uma vez por transação).
+        """
+        if "dedup_key" in transaction:
+            return transaction["dedup_key"]
+        if transaction.get("external_id"):
+            key = f"fitid:{transaction['external_id']}"
+        else:
+            key = "|".join([
+                transaction["date"], f"{transaction['amount']:.2f}", transaction["transaction_type"],
+                transaction["description"].lower()
+            ])
+            occurrence = self._occurrences.get(key, 0) + 1
+            self._occurrences[key] = occurrence
+            # Primeira ocorrência sem sufixo: mesma chave das importações anteriores
+            if occurrence > 1:
+                key = f"{key}|{occurrence}"
+        transaction["dedup_key"] = key
+        return key
+
+    def _is_duplicate(self, transaction: dict) -> bool:
+        """FITID repetido no arquivo (linhas iguais sem FITID são transações distintas)"""
+        key = self._dedup_key(transaction)
+        if key in self._seen:
+            return True
+        self._seen.add(key)
+        return False
+
+    def idempotency_key(self, transaction: dict) -> str:
+        """Chave estável entre importações do mesmo extrato (categoria fica de fora: pode vir do LLM)"""
+        raw = f"{self.user_id}|import|{self._dedup_key(transaction)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def categorize(self, batch: List[dict]) -> None:
+        """Completa a categoria das transações do lote (in-place)"""
+        pending = []
+        for transaction in batch:
+            category = transaction.get("category")
+            if category:
+                transaction["category"] = category.strip().lower()
+                continue
+            transaction["category"] = categorize_description(transaction["description"])
+            if transaction["category"] is None:
+                pending.append(transaction)
+
+        if pending and IMPORT_LLM_CATEGORIZATION:
+            categories = categorize_with_llm(pending)
+            for transaction, category in zip(pending, categories):
+                transaction["category"] = category
+
+        for transaction in pending:
+            transaction["category"] = transaction["category"] or FALLBACK_CATEGORY
+
+    # ============================================
+    # GRAVAÇÃO
+    # ============================================
+
+    def _payload(self, transaction: dict) -> dict:
+        return {
+            "type": transaction["transaction_type"],
+            "amount": transaction["amount"],
+            "description": transaction["description"] or f"Transação de {transaction['transaction_type']}",
+            "category": transaction["category"],
+            "date": transaction["date"],
+            "metadata": {
+                "source": self.source,
+                "line": transaction["line"],
+                "externalId": transaction.get("external_id"),
+            },
+            "idempotencyKey": self.idempotency_key(transaction),
+        }
+
+    def flush(self, batch: List[dict]) -> None:
+        """Categoriza e grava um lote com uma única chamada à API"""
+        if not batch:
+            return
+
+        self.categorize(batch)
+        response = get_guard("falachefe_api").call(
+            lambda timeout: requests.post(
+                f"{API_BASE_URL}/api/financial/crewai/batch",
+                json={"userId": self.user_id, "transactions": [self._payload(t) for t in batch]},
+                headers={"Content-Type": "application/json", "x-crewai-token": CREWAI_SERVICE_TOKEN},
+                timeout=timeout
+            ),
+            is_failure=lambda r: r.status_code >= 500
+        )
+
+        if response.status_code not in (200, 201, 400):
+            raise RuntimeError(f"Batch insert failed: HTTP {response.status_code}")
+
+        result = response.json()
+        skipped_indexes = set(result.get("duplicates", []))
+        self.duplicates += len(skipped_indexes)
+        for item in result.get("rejected", []):
+            skipped_indexes.add(item.get("index"))
+            self._reject(batch[item.get("index", 0)]["line"], item.get("error", "rejeitada pela API"))
+
+        self.inserted += result.get("inserted", 0)
+        if result.get("inserted"):
+            invalidate_cashflow_frame(self.user_id)
+        for index, transaction in enumerate(batch):
+            if index not in skipped_indexes:
+                self.totals[transaction["transaction_type"]] += transaction["amount"]
+
+        print(f"📥 Import batch for {self.user_id}: +{result.get('inserted', 0)} (total {self.inserted})", file=sys.stderr)
+
+    def _maybe_report_progress(self) -> None:
+        now = time.monotonic()
+        if now - self._last_progress >= IMPORT_PROGRESS_INTERVAL_SECONDS:
+            self._last_progress = now
+            self.notify(f"⏳ Importando... {self.inserted} transações registradas até agora.")
+
+    # ============================================
+    # EXECUÇÃO
+    # ============================================
+
+    def run(self, transactions: Iterable[dict]) -> dict:
+        """Consome as transações em streaming; retorna o resumo da importação"""
+        batch: List[dict] = []
+        processed = 0
+
+        try:
+            for transaction in transactions:
+                if "error" in transaction:
+                    self._reject(transaction["line"], transaction["error"])
+                    continue
+
+                processed += 1
+                if processed > IMPORT_MAX_ROWS:
+                    self._reject(transaction["line"], f"limite de {IMPORT_MAX_ROWS} transações por arquivo")
+                    break
+
+                if self._is_duplicate(transaction):
+                    self.duplicates += 1
+                    continue
+
+                batch.append(transaction)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+                    self._maybe_report_progress()
+
+            self.flush(batch)
+        except DependencyUnavailableError:
+            return self._finish(failed="o sistema financeiro está temporariamente indisponível")
+        except Exception as e:
+            print(f"❌ Import failed for {self.user_id}: {e}", file=sys.stderr)
+            return self._finish(failed="ocorreu um erro inesperado")
+
+        return self._finish()
+
+    def summary(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "errors": list(self.errors),
+            "totals": dict(self.totals),
+        }
+
+    def _finish(self, failed: Optional[str] = None) -> dict:
+        summary = self.summary()
+        summary["success"] = failed is None
+        self.notify(format_import_summary(summary, failed))
+        return summary
+
+
+def categorize_with_llm(transactions: List[dict]) -> List[Optional[str]]:
+    """Uma chamada ao LLM para o lote; categorias desconhecidas viram None"""
+    import openai
+
+    lines = "\n".join(
+        f"{i + 1}. {t['transaction_type']} {format_brl(t['amount'])} - {t['description'][:80]}"
+        for i, t in enumerate(transactions)
+    )
+    valid = set(CATEGORY_LABELS) | {FALLBACK_CATEGORY}
+
+    try:
+        response = get_guard("openai").call(
+            lambda timeout: openai.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": CATEGORIZATION_PROMPT},
+                    {"role": "user", "content": lines}
+                ],
+                temperature=0,
+                response_format={"type": "json_object"},
+                timeout=timeout
+            )
+        )
+        categories = json.loads(response.choices[0].message.content).get("categorias", [])
+    except Exception as e:
+        print(f"⚠️ LLM categorization failed, using '{FALLBACK_CATEGORY}': {e}", file=sys.stderr)
+        return [None] * len(transactions)
+
+    return [
+        category if category in valid else None
+        for category in (list(categories) + [None] * len(transactions))[:len(transactions)]
+    ]
+
+
+def format_import_summary(summary: dict, failed: Optional[str] = None) -> str:
+    """Mensagem final enviada ao usuário pelo WhatsApp"""
+    if failed and summary["inserted"] == 0:
+        text = f"❌ Não consegui importar seu arquivo: {failed}. Nenhuma transação foi registrada."
+    else:
+        text = (
+            f"{'⚠️ Importação interrompida' if failed else '✅ Importação concluída'}!\n\n"
+            f"📥 {summary['inserted']} transações registradas\n"
+            f"💰 Entradas: {format_brl(summary['totals']['entrada'])}\n"
+            f"💸 Saídas: {format_brl(summary['totals']['saida'])}"
+        )
+        if summary["duplicates"]:
+            text += f"\n🔁 {summary['duplicates']} linhas repetidas ignoradas"
+        if failed:
+            text += f"\n\nMotivo da interrupção: {failed}. As transações acima já foram salvas."
+
+    if summary["rejected"]:
+        text += f"\n\n⚠️ {summary['rejected']} linhas não puderam ser lidas:\n" + "\n".join(
+            f"• {error}" for error in summary["errors"]
+        )
+    return text
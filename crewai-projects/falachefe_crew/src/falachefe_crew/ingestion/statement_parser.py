@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Parser de extratos e planilhas (CSV / OFX) em streaming
+=======================================================
+
+Lê linha a linha (nunca o arquivo inteiro em memória) e produz uma
+transação normalizada por lançamento:
+
+    {"line", "date" (YYYY-MM-DD), "amount" (positivo), "transaction_type"
+     ("entrada"|"saida"), "description", "category" (ou None), "external_id"}
+
+Linhas inválidas produzem {"line", "error"} para o relatório final.
+
+CSV: separador , ou ; detectado no cabeçalho; colunas reconhecidas por nome
+(data, descrição/histórico, valor, tipo, categoria, crédito/débito).
+OFX: blocos <STMTTRN> (SGML 1.x ou XML 2.x, com ou sem quebras de linha).
+"""
+
+import csv
+import re
+import unicodedata
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+# Nome normalizado da coluna → campo
+CSV_COLUMN_ALIASES = {
+    "date": ("data", "date", "data lancamento", "data do lancamento", "data movimento", "dt"),
+    "description": ("descricao", "description", "historico", "lancamento", "memo", "detalhes", "estabelecimento"),
+    "amount": ("valor", "amount", "value", "valor r$", "valor (r$)", "quantia"),
+    "credit": ("credito", "entrada", "entradas", "credit"),
+    "debit": ("debito", "saida", "saidas", "debit"),
+    "type": ("tipo", "type", "natureza"),
+    "category": ("categoria", "category"),
+}
+
+_DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d", "%d-%m-%Y", "%Y%m%d")
+_OFX_TAG = re.compile(r"<(/?)([A-Z0-9.]+)>([^<]*)", re.IGNORECASE)
+
+
+def _normalize_header(value: str) -> str:
+    value = unicodedata.normalize("NFKD", (value or "").strip().lower())
+    return "".join(c for c in value if not unicodedata.combining(c))
+
+
+def parse_date(value: str) -> Optional[str]:
+    value = (value or "").strip()
+    value = value[:10] if ("/" in value or "-" in value) else value[:8]
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def parse_money(value: str) -> Optional[float]:
+    """'1.234,56' | '1,234.56' | '-45,90' | '1234.56' | 'R$ (300,00)' → float com sinal"""
+    text = (value or "").strip().replace("R$", "").replace(" ", "")
+    if not text:
+        return None
+    negative = text.startswith("-") or (text.startswith("(") and text.endswith(")")) or text.endswith("-")
+    text = text.strip("()-+")
+    if "," in text and "." in text:
+        # Com os dois separadores o último é o decimal (1.234,56 ou 1,234.56)
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    elif "," in text:
+        text = text.replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", text):
+        text = text.replace(".", "")
+    try:
+        amount = float(text)
+    except ValueError:
+        return None
+    return -amount if negative else amount
+
+
+def detect_format(first_line: str, file_name: str = "") -> str:
+    """'ofx' ou 'csv' a partir da extensão ou da primeira linha"""
+    name = (file_name or "").lower()
+    if name.endswith((".ofx", ".qfx")):
+        return "ofx"
+    if name.endswith(".csv"):
+        return "csv"
+    head = (first_line or "").lstrip("﻿").strip().upper()
+    return "ofx" if head.startswith(("OFXHEADER", "<?XML", "<OFX")) else "csv"
+
+
+# ============================================
+# CSV
+# ============================================
+
+def _map_columns(header: list) -> Dict[str, int]:
+    columns = {}
+    for index, name in enumerate(header):
+        normalized = _normalize_header(name)
+        for field, aliases in CSV_COLUMN_ALIASES.items():
+            if normalized in aliases and field not in columns:
+                columns[field] = index
+    return columns
+
+
+def _type_from_column(value: str) -> Optional[str]:
+    normalized = _normalize_header(value)
+    if normalized in ("entrada", "receita", "credito", "c", "credit"):
+        return "entrada"
+    if normalized in ("saida", "despesa", "debito", "d", "debit"):
+        return "saida"
+    return None
+
+
+def iter_csv_transactions(lines: Iterable[str]) -> Iterator[dict]:
+    lines = iter(lines)
+    header_line = next(lines, "").lstrip("﻿")
+    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+    header = next(csv.reader([header_line], delimiter=delimiter))
+    columns = _map_columns(header)
+
+    if "date" not in columns or not ({"amount"} <= columns.keys() or {"credit", "debit"} & columns.keys()):
+        yield {"line": 1, "error": f"Cabeçalho não reconhecido: {header_line.strip()[:120]}"}
+        return
+
+    def cell(row: list, field: str) -> str:
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ""
+
+    for line_number, row in enumerate(csv.reader(lines, delimiter=delimiter), start=2):
+        if not any(value.strip() for value in row):
+            continue
+
+        transaction_date = parse_date(cell(row, "date"))
+        if not transaction_date:
+            yield {"line": line_number, "error": f"Data inválida: {cell(row, 'date')!r}"}
+            continue
+
+        if "amount" in columns:
+            amount = parse_money(cell(row, "amount"))
+        else:
+            credit = parse_money(cell(row, "credit")) or 0.0
+            debit = parse_money(cell(row, "debit")) or 0.0
+            amount = abs(credit) - abs(debit) if (credit or debit) else None
+
+        if amount is None or amount == 0:
+            yield {"line": line_number, "error": f"Valor inválido: {cell(row, 'amount') or cell(row, 'credit') or cell(row, 'debit')!r}"}
+            continue
+
+        transaction_type = _type_from_column(cell(row, "type")) or ("entrada" if amount > 0 else "saida")
+
+        yield {
+            "line": line_number,
+            "date": transaction_date,
+            "amount": round(abs(amount), 2),
+            "transaction_type": transaction_type,
+            "description": cell(row, "description")[:255],
+            "category": cell(row, "category") or None,
+            "external_id": None,
+        }
+
+
+# ============================================
+# OFX
+# ============================================
+
+def iter_ofx_transactions(lines: Iterable[str]) -> Iterator[dict]:
+    current: Optional[dict] = None
+    index = 0
+
+    for line in lines:
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            value = value.strip()
+
+            if tag == "STMTTRN" and not closing:
+                current = {}
+                continue
+            if tag == "STMTTRN" and closing:
+                index += 1
+                if current is not None:
+                    yield _ofx_transaction(index, current)
+                current = None
+                continue
+            if current is not None and not closing and value:
+                current[tag] = value
+
+
+def _ofx_transaction(index: int, fields: dict) -> dict:
+    transaction_date = parse_date(fields.get("DTPOSTED", "")[:8])
+    amount = parse_money(fields.get("TRNAMT", "").replace(",", "."))
+
+    if not transaction_date:
+        return {"line": index, "error": f"DTPOSTED inválido: {fields.get('DTPOSTED')!r}"}
+    if amount is None or amount == 0:
+        return {"line": index, "error": f"TRNAMT inválido: {fields.get('TRNAMT')!r}"}
+
+    description = " - ".join(v for v in (fields.get("NAME"), fields.get("MEMO")) if v)
+    return {
+        "line": index,
+        "date": transaction_date,
+        "amount": round(abs(amount), 2),
+        "transaction_type": "entrada" if amount > 0 else "saida",
+        "description": description[:255],
+        "category": None,
+        "external_id": fields.get("FITID"),
+    }
+
+
+def iter_statement_transactions(lines: Iterable[str], file_name: str = "", fmt: Optional[str] = None) -> Iterator[dict]:
+    """Detecta o formato pela primeira linha e produz as transações em streaming"""
+    lines = iter(lines)
+    first_line = next(lines, "")
+    fmt = fmt or detect_format(first_line, file_name)
+
+    def chained():
+        yield first_line
+        yield from lines
+
+    if fmt == "ofx":
+        return iter_ofx_transactions(chained())
+    return iter_csv_transactions(chained())
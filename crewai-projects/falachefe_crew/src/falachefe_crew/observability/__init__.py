@@ -0,0 +1,4 @@
+"""
+Observabilidade do Falachefe
+Captura de tráfego do /process, ledger de uso (tokens/custo) de LLM e logging estruturado
+"""
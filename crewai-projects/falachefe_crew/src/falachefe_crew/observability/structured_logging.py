@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Logging estruturado, amostrado e assíncrono
+===========================================
+
+Cada /process imprimia dezenas de linhas com emoji direto no stderr (escrita
+síncrona no pipe do gunicorn) e os crews rodavam com verbose=True, jogando
+o raciocínio inteiro dos agentes no stdout. Nos nós mais carregados o I/O
+de log aparece no tempo de resposta.
+
+configure_logging() (chamado uma vez por worker):
+
+- JSON por linha (LOG_FORMAT=json) com ts, level, msg, request_id e pid
+- Os print(..., file=sys.stderr) existentes viram registros de log: o
+  nível vem do emoji (❌ → ERROR, ⚠️ → WARNING, resto INFO)
+- Fila não bloqueante: a requisição só enfileira; uma thread escreve.
+  Fila cheia descarta (contado no /metrics) em vez de travar a requisição
+- Amostragem por nível (LOG_SAMPLE_RATES="DEBUG=0,INFO=0.2"): a decisão é
+  por request_id, então uma requisição amostrada aparece completa.
+  WARNING e ERROR são mantidos por padrão
+- request_id por requisição (header X-Request-Id ou gerado) em todos os
+  registros e na resposta
+
+Verbose dos crews (CREW_VERBOSE):
+- true: saída do CrewAI no stdout, como antes (desenvolvimento)
+- false (padrão): a saída de cada crew vai para um buffer em memória da
+  requisição; se a requisição falhar (HTTP 5xx) o trace entra num ring
+  buffer com os últimos CREW_TRACE_BUFFER_SIZE traces (/debug/crew-traces).
+  CREW_TRACE_BUFFER_SIZE=0 desliga o verbose de vez.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import hashlib
+import logging
+import threading
+import contextlib
+import contextvars
+import logging.handlers
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Ex: "DEBUG=0,INFO=0.2" (níveis ausentes = 1.0)
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_CAPTURE_PRINTS = os.getenv("LOG_CAPTURE_PRINTS", "true").lower() == "true"
+
+CREW_VERBOSE = os.getenv("CREW_VERBOSE", "false").lower() == "true"
+CREW_TRACE_BUFFER_SIZE = int(os.getenv("CREW_TRACE_BUFFER_SIZE", "20"))
+CREW_TRACE_MAX_CHARS = int(os.getenv("CREW_TRACE_MAX_CHARS", "50000"))
+
+REQUEST_ID_HEADER = "X-Request-Id"
+LOGGER_NAME = "falachefe"
+
+# Primeiro caractere da linha → nível (prints existentes)
+_EMOJI_LEVELS = (
+    ("❌", logging.ERROR),
+    ("⚠️", logging.WARNING),
+    ("🚦", logging.WARNING),
+)
+
+
+def parse_sample_rates(spec: str) -> Dict[int, float]:
+    """"DEBUG=0,INFO=0.2" → {10: 0.0, 20: 0.2}"""
+    rates = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        name, value = part.split("=", 1)
+        level = logging.getLevelName(name.strip().upper())
+        if isinstance(level, int):
+            rates[level] = min(max(float(value), 0.0), 1.0)
+    return rates
+
+
+# ============================================
+# CONTEXTO DA REQUISIÇÃO
+# ============================================
+
+class RequestLogContext:
+    """request_id + traces de crew da requisição (guardados se ela falhar)"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.crew_traces: List[dict] = []
+
+
+_request_context: contextvars.ContextVar = contextvars.ContextVar("log_request_context", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_request_id() -> Optional[str]:
+    context = _request_context.get()
+    return context.request_id if context else None
+
+
+def begin_request(request_id: Optional[str] = None):
+    """Abre o contexto da requisição; retorna o token para end_request"""
+    context = RequestLogContext(request_id or new_request_id())
+    return _request_context.set(context)
+
+
+def end_request(token, failed: bool) -> None:
+    """Fecha o contexto; requisição com falha guarda os traces de crew no ring buffer"""
+    context = _request_context.get()
+    if failed and context is not None:
+        for trace in context.crew_traces:
+            keep_failed_trace(trace)
+    _request_context.reset(token)
+
+
+# ============================================
+# FILTROS E FORMATO
+# ============================================
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id()
+        return True
+
+
+class LevelSampler(logging.Filter):
+    """Mantém a fração configurada de cada nível (por request_id quando houver)"""
+
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0:
+            return True
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            # Mesma decisão para todos os registros da requisição
+            bucket = int(hashlib.sha1(f"{record.levelno}:{request_id}".encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+        else:
+            bucket = random.random()
+        if bucket < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "pid": record.process,
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta em vez de bloquear quando a fila enche"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# ============================================
+# PRINTS E STDOUT DOS CREWS
+# ============================================
+
+class PrintToLogStream(io.TextIOBase):
+    """
+    Substitui sys.stderr: cada linha impressa vira um registro de log.
+
+    Linhas são montadas por thread (print escreve texto e "\\n" separados).
+    A thread do listener escreve direto no stderr original (sem recursão).
+    """
+
+    def __init__(self, logger: logging.Logger, original):
+        self.logger = logger
+        self.original = original
+        self.listener_thread: Optional[threading.Thread] = None
+        self._local = threading.local()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if threading.current_thread() is self.listener_thread:
+            return self.original.write(text)
+        pending = getattr(self._local, "pending", "") + text
+        *lines, rest = pending.split("\n")
+        self._local.pending = rest
+        for line in lines:
+            if line.strip():
+                self.logger.log(line_level(line), line.rstrip())
+        return len(text)
+
+    def flush(self) -> None:
+        pending = getattr(self._local, "pending", "")
+        if pending.strip():
+            self._local.pending = ""
+            self.logger.log(line_level(pending), pending.rstrip())
+
+    def isatty(self) -> bool:
+        return False
+
+    def fileno(self) -> int:
+        return self.original.fileno()
+
+
+def line_level(line: str) -> int:
+    stripped = line.lstrip()
+    for prefix, level in _EMOJI_LEVELS:
+        if stripped.startswith(prefix):
+            return level
+    return logging.INFO
+
+
+class CrewTraceStream(io.TextIOBase):
+    """Substitui sys.stdout: dentro de crew_trace() escreve no buffer do trace"""
+
+    def __init__(self, original):
+        self.original = original
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        trace = _current_trace.get()
+        if trace is None:
+            return self.original.write(text)
+        return trace.write(text)
+
+    def flush(self) -> None:
+        if _current_trace.get() is None:
+            self.original.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+    def fileno(self) -> int:
+        return self.original.fileno()
+
+
+class CrewTrace:
+    """Saída verbose de uma execução de crew (limitada a CREW_TRACE_MAX_CHARS)"""
+
+    def __init__(self, label: str, max_chars: int = CREW_TRACE_MAX_CHARS):
+        self.label = label
+        self.max_chars = max_chars
+        self.started = time.time()
+        self.chars = 0
+        self.truncated = False
+        self._parts: List[str] = []
+
+    def write(self, text: str) -> int:
+        remaining = self.max_chars - self.chars
+        if remaining <= 0:
+            self.truncated = True
+        else:
+            chunk = text[:remaining]
+            self._parts.append(chunk)
+            self.chars += len(chunk)
+            self.truncated = self.truncated or len(chunk) < len(text)
+        return len(text)
+
+    def to_dict(self, request_id: Optional[str], error: Optional[str] = None) -> dict:
+        return {
+            "request_id": request_id,
+            "label": self.label,
+            "started_at": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "duration_ms": int((time.time() - self.started) * 1000),
+            "error": error,
+            "truncated": self.truncated,
+            "output": "".join(self._parts),
+        }
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("crew_trace", default=None)
+_failed_traces: deque = deque(maxlen=max(CREW_TRACE_BUFFER_SIZE, 1))
+_failed_traces_lock = threading.Lock()
+
+
+def crew_verbose() -> bool:
+    """verbose dos agentes/crews: ligado no modo stdout ou quando há ring buffer"""
+    return CREW_VERBOSE or CREW_TRACE_BUFFER_SIZE > 0
+
+
+@contextlib.contextmanager
+def crew_trace(label: str):
+    """
+    Captura a saída verbose do crew no bloco (no-op com CREW_VERBOSE=true).
+
+    Exceção no bloco guarda o trace na hora; sem exceção ele fica com a
+    requisição e só é guardado se a requisição terminar com falha.
+    """
+    if CREW_VERBOSE or CREW_TRACE_BUFFER_SIZE <= 0:
+        yield None
+        return
+
+    trace = CrewTrace(label)
+    token = _current_trace.set(trace)
+    request = _request_context.get()
+    request_id = request.request_id if request else None
+    try:
+        yield trace
+    except BaseException as e:
+        _current_trace.reset(token)
+        keep_failed_trace(trace.to_dict(request_id, f"{type(e).__name__}: {e}"))
+        raise
+    _current_trace.reset(token)
+    if request is not None:
+        request.crew_traces.append(trace.to_dict(request_id))
+
+
+def keep_failed_trace(trace: dict) -> None:
+    with _failed_traces_lock:
+        _failed_traces.append(trace)
+    logging.getLogger(LOGGER_NAME).error(
+        f"❌ Crew trace kept for failed request ({trace['label']}, {len(trace['output'])} chars)",
+        extra={"fields": {"crew_trace": trace["label"], "trace_request_id": trace["request_id"]}}
+    )
+
+
+def failed_crew_traces() -> List[dict]:
+    """Últimos traces de requisições com falha (mais recente primeiro)"""
+    with _failed_traces_lock:
+        return list(reversed(_failed_traces))
+
+
+# ============================================
+# CONFIGURAÇÃO
+# ============================================
+
+_configured = False
+_configure_lock = threading.Lock()
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_sampler: Optional[LevelSampler] = None
+
+
+def configure_logging() -> None:
+    """Instala fila + listener, formato, amostragem e redirecionamento (idempotente)"""
+    global _configured, _queue_handler, _listener, _sampler
+    with _configure_lock:
+        if _configured:
+            return
+        _configured = True
+
+        original_stderr = sys.__stderr__ or sys.stderr
+        output = logging.StreamHandler(original_stderr)
+        if LOG_FORMAT == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(message)s"))
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(RequestContextFilter())
+        _sampler = LevelSampler(parse_sample_rates(LOG_SAMPLE_RATES))
+        _queue_handler.addFilter(_sampler)
+
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(LOG_LEVEL)
+        logger.addHandler(_queue_handler)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+        # Workers do gunicorn com preload nascem por fork do master já configurado
+        os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+        if LOG_CAPTURE_PRINTS:
+            stream = PrintToLogStream(logger, original_stderr)
+            stream.listener_thread = _listener._thread
+            sys.stderr = stream
+        if not CREW_VERBOSE and CREW_TRACE_BUFFER_SIZE > 0:
+            sys.stdout = CrewTraceStream(sys.stdout)
+
+
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_after_fork() -> None:
+    """
+    No processo filho a thread do listener não existe mais e a fila pode ter
+    sido copiada com o lock tomado: fila e listener novos.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _queue_handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(
+        _queue_handler.queue, *_listener.handlers, respect_handler_level=True
+    )
+    _listener.start()
+    if isinstance(sys.stderr, PrintToLogStream):
+        sys.stderr.listener_thread = _listener._thread
+
+
+def render_prometheus_metrics() -> str:
+    if _queue_handler is None:
+        return ""
+    return f"""
+# HELP falachefe_log_records_dropped_total Registros de log descartados (fila cheia)
+# TYPE falachefe_log_records_dropped_total counter
+falachefe_log_records_dropped_total {_queue_handler.dropped}
+
+# HELP falachefe_log_records_sampled_out_total Registros de log descartados pela amostragem
+# TYPE falachefe_log_records_sampled_out_total counter
+falachefe_log_records_sampled_out_total {_sampler.sampled_out if _sampler else 0}
+
+# HELP falachefe_crew_traces_kept Traces de crew de requisições com falha no ring buffer
+# TYPE falachefe_crew_traces_kept gauge
+falachefe_crew_traces_kept {len(_failed_traces)}
+"""
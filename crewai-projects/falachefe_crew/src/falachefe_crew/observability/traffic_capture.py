@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Captura de tráfego do /process
+==============================
+
+Grava cada mensagem processada (anonimizada), a classificação e o tempo de
+cada etapa em JSONL comprimido, para reproduzir um dia de produção contra
+outra versão do servidor (benchmarks/replay_capture.py) e dimensionar
+workers/threads do gunicorn com dados reais.
+
+Uma linha por requisição:
+    {"captured_at": 1767614400.12, "worker": 12, "kind": "financial_task",
+     "classification": {...}, "path": "crew", "status": "ok", "total_ms": 8123,
+     "stages": {"classify": 812, "profile": 95, "crew": 6900, ...},
+     "payload": {...}}
+
+Anonimização (antes de gravar):
+- userId, phoneNumber, conversationId, messageId → HMAC-SHA256 com
+  TRAFFIC_CAPTURE_SALT (o mesmo usuário vira sempre o mesmo id anônimo,
+  preservando rajadas e coalescência no replay)
+- nomes removidos; e-mails, CPF/CNPJ e telefones no texto substituídos
+
+A gravação é feita por uma thread em background: a requisição só enfileira
+o registro (descartado se a fila estiver cheia). Cada lote é um membro gzip
+completo, então o arquivo continua legível mesmo se o worker morrer.
+Um arquivo por worker e por dia em TRAFFIC_CAPTURE_DIR.
+"""
+
+import os
+import re
+import sys
+import gzip
+import hmac
+import json
+import time
+import queue
+import atexit
+import random
+import socket
+import hashlib
+import threading
+import contextlib
+import contextvars
+from datetime import datetime, timezone
+from typing import Optional
+
+TRAFFIC_CAPTURE_ENABLED = os.getenv("TRAFFIC_CAPTURE_ENABLED", "false").lower() == "true"
+TRAFFIC_CAPTURE_DIR = os.getenv("TRAFFIC_CAPTURE_DIR", "/tmp/falachefe-traffic")
+# Fração das requisições gravadas (1.0 = todas)
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))
+TRAFFIC_CAPTURE_SALT = os.getenv("TRAFFIC_CAPTURE_SALT", "")
+TRAFFIC_CAPTURE_QUEUE_SIZE = int(os.getenv("TRAFFIC_CAPTURE_QUEUE_SIZE", "10000"))
+TRAFFIC_CAPTURE_FLUSH_SECONDS = float(os.getenv("TRAFFIC_CAPTURE_FLUSH_SECONDS", "5"))
+TRAFFIC_CAPTURE_BATCH_SIZE = 500
+
+# Campos de context mantidos (o resto pode conter dados pessoais)
+CONTEXT_FIELDS = ("source", "messageType", "isNewUser", "timestamp")
+ANONYMIZED_FIELDS = ("userId", "phoneNumber", "conversationId", "messageId")
+
+# Ordem importa: CNPJ/CPF antes de telefone (mesmos dígitos)
+_SCRUB_PATTERNS = (
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "<email>"),
+    (re.compile(r"\b\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}\b"), "<cnpj>"),
+    (re.compile(r"\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b"), "<cpf>"),
+)
+_PHONE_PATTERN = re.compile(r"\+?\(?\d[\d ().-]{7,}\d")
+# Telefone com DDD tem 10+ dígitos; valores como "1.200.000,00" têm menos
+PHONE_MIN_DIGITS = 10
+
+
+# ============================================
+# ANONIMIZAÇÃO
+# ============================================
+
+def capture_salt() -> bytes:
+    """
+    Segredo do HMAC (igual em todos os workers para o mesmo usuário ter o mesmo id).
+
+    Sem TRAFFIC_CAPTURE_SALT deriva da service role key do Supabase; sem
+    nenhuma das duas usa um valor aleatório por processo.
+    """
+    if TRAFFIC_CAPTURE_SALT:
+        return TRAFFIC_CAPTURE_SALT.encode("utf-8")
+    secret = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+    if secret:
+        return hashlib.sha256(f"traffic-capture|{secret}".encode("utf-8")).digest()
+    print("⚠️ TRAFFIC_CAPTURE_SALT not set - anonymized ids will differ between workers", file=sys.stderr)
+    return os.urandom(32)
+
+
+def anonymize_id(value, salt: bytes) -> str:
+    if not value:
+        return ""
+    digest = hmac.new(salt, str(value).encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"anon-{digest[:16]}"
+
+
+def scrub_text(text: str) -> str:
+    """Remove e-mails, CPF/CNPJ e telefones; valores ("vendi 1.200") ficam"""
+    for pattern, placeholder in _SCRUB_PATTERNS:
+        text = pattern.sub(placeholder, text)
+    return _PHONE_PATTERN.sub(
+        lambda match: "<telefone>" if sum(c.isdigit() for c in match.group()) >= PHONE_MIN_DIGITS else match.group(),
+        text
+    )
+
+
+def anonymize_payload(data: dict, salt: bytes) -> dict:
+    """Payload de /process sem dados pessoais, ainda aceito pelo endpoint"""
+    context = data.get("context") or {}
+    payload = {"message": scrub_text(str(data.get("message", "")))}
+    for field in ANONYMIZED_FIELDS:
+        if data.get(field):
+            payload[field] = anonymize_id(data[field], salt)
+    payload["userName"] = "Usuário"
+    payload["context"] = {field: context[field] for field in CONTEXT_FIELDS if field in context}
+    if context.get("conversationId"):
+        payload["context"]["conversationId"] = anonymize_id(context["conversationId"], salt)
+    return payload
+
+
+# ============================================
+# GRAVAÇÃO EM BACKGROUND
+# ============================================
+
+class TrafficRecorder:
+    """Fila + thread que grava lotes em JSONL.gz (um arquivo por worker e por dia)"""
+
+    def __init__(
+        self,
+        directory: str = TRAFFIC_CAPTURE_DIR,
+        queue_size: int = TRAFFIC_CAPTURE_QUEUE_SIZE,
+        flush_seconds: float = TRAFFIC_CAPTURE_FLUSH_SECONDS,
+        salt: Optional[bytes] = None
+    ):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.salt = salt or capture_salt()
+        self.recorded = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="traffic-capture", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def path_for(self, moment: float) -> str:
+        day = datetime.fromtimestamp(moment, timezone.utc).strftime("%Y%m%d")
+        return os.path.join(self.directory, f"traffic-{day}-{socket.gethostname()}-{os.getpid()}.jsonl.gz")
+
+    def record(self, entry: dict) -> None:
+        """Enfileira sem bloquear a requisição"""
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Grava o que estiver na fila (chamado também no encerramento do processo)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write(batch)
+
+    def _loop(self) -> None:
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < TRAFFIC_CAPTURE_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: list) -> None:
+        if not batch:
+            return
+        by_path = {}
+        for entry in batch:
+            entry["payload"] = anonymize_payload(entry["payload"], self.salt)
+            by_path.setdefault(self.path_for(entry["captured_at"]), []).append(entry)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # flush() no encerramento pode concorrer com a thread
+            with self._write_lock:
+                for path, entries in by_path.items():
+                    # Modo append: cada lote vira um membro gzip independente
+                    with gzip.open(path, "at", encoding="utf-8") as f:
+                        for entry in entries:
+                            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self.recorded += len(batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            print(f"⚠️ Traffic capture write failed ({len(batch)} records lost): {e}", file=sys.stderr)
+
+
+_recorder: Optional[TrafficRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> TrafficRecorder:
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TrafficRecorder()
+            print(f"🎙️ Traffic capture enabled → {_recorder.directory} (sample rate {TRAFFIC_CAPTURE_SAMPLE_RATE})", file=sys.stderr)
+    return _recorder
+
+
+# ============================================
+# CAPTURA POR REQUISIÇÃO
+# ============================================
+
+class CapturedRequest:
+    """Registro de uma requisição em andamento (etapas preenchidas via capture_stage)"""
+
+    def __init__(self, data: dict):
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.payload = data
+        self.stages = {}
+        self.classification = None
+        self.path = None
+
+    def to_entry(self, status: str, error_type: Optional[str] = None) -> dict:
+        classification = self.classification or {}
+        entry = {
+            "captured_at": round(self.started_at, 4),
+            "worker": os.getpid(),
+            "kind": classification.get("type", "unknown"),
+            "classification": {
+                key: classification[key] for key in ("type", "specialist", "confidence") if key in classification
+            },
+            "path": self.path,
+            "status": status,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "stages": {stage: round(ms, 1) for stage, ms in self.stages.items()},
+            "payload": self.payload,
+        }
+        if error_type:
+            entry["error_type"] = error_type
+        return entry
+
+
+_current_capture: contextvars.ContextVar = contextvars.ContextVar("traffic_capture", default=None)
+
+
+@contextlib.contextmanager
+def capture_request(data: dict):
+    """
+    Captura a requisição do /process (no-op se desligado ou fora da amostra).
+
+    `data` é o payload original recebido (antes de coalescer), que é o que o
+    replay reenvia.
+    """
+    if not TRAFFIC_CAPTURE_ENABLED or random.random() >= TRAFFIC_CAPTURE_SAMPLE_RATE:
+        yield None
+        return
+
+    captured = CapturedRequest(data)
+    token = _current_capture.set(captured)
+    try:
+        yield captured
+    except BaseException as e:
+        get_recorder().record(captured.to_entry("error", type(e).__name__))
+        raise
+    else:
+        get_recorder().record(captured.to_entry("ok"))
+    finally:
+        _current_capture.reset(token)
+
+
+@contextlib.contextmanager
+def capture_stage(name: str):
+    """Soma o tempo do bloco na etapa `name` da requisição capturada"""
+    captured = _current_capture.get()
+    if captured is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        captured.stages[name] = captured.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def note_capture(classification: Optional[dict] = None, path: Optional[str] = None) -> None:
+    """Classificação e caminho tomado (fast_path, semantic_cache, crew, coalesced)"""
+    captured = _current_capture.get()
+    if captured is None:
+        return
+    if classification is not None:
+        captured.classification = classification
+    if path is not None:
+        captured.path = path
+
+
+def render_prometheus_metrics() -> str:
+    """Registros gravados/descartados por este worker"""
+    if _recorder is None:
+        return ""
+    return f"""
+# HELP falachefe_traffic_capture_recorded_total Requisições gravadas pela captura de tráfego
+# TYPE falachefe_traffic_capture_recorded_total counter
+falachefe_traffic_capture_recorded_total {_recorder.recorded}
+
+# HELP falachefe_traffic_capture_dropped_total Registros descartados (fila cheia ou erro de escrita)
+# TYPE falachefe_traffic_capture_dropped_total counter
+falachefe_traffic_capture_dropped_total {_recorder.dropped}
+"""
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Ledger de uso de LLM (tokens, latência e custo)
+===============================================
+
+Cada chamada paga ao OpenAI vira uma linha no ledger:
+
+- crew:       execução de crew (tokens do CrewOutput), com especialista,
+              task de tasks.yaml e tier do roteador de modelos
+- classifier: classificação de intenção do /process
+- embedding:  embeddings do cache semântico
+
+Custo estimado com os preços de config/model_routing.yaml (tiers + pricing).
+
+As linhas são agregadas em memória para o /metrics (por tipo de chamada,
+especialista, task e modelo) e gravadas em lote na tabela llm_usage do
+Supabase (supabase_llm_usage.sql) por uma thread em background; as views
+da migração agregam por mensagem, usuário, especialista e dia.
+
+Dentro de usage_scope() (uma mensagem do /process) as chamadas ganham
+message_id/user_id/conversation_id e o total da mensagem é logado no fim.
+"""
+
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+import contextlib
+import contextvars
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import requests
+
+from ..analytics.financial_digest import supabase_rest
+from ..resilience.dependency_guard import get_guard
+
+USAGE_LEDGER_ENABLED = os.getenv("USAGE_LEDGER_ENABLED", "true").lower() == "true"
+USAGE_LEDGER_TABLE = os.getenv("USAGE_LEDGER_TABLE", "llm_usage")
+USAGE_LEDGER_FLUSH_SECONDS = float(os.getenv("USAGE_LEDGER_FLUSH_SECONDS", "10"))
+USAGE_LEDGER_BATCH_SIZE = int(os.getenv("USAGE_LEDGER_BATCH_SIZE", "200"))
+USAGE_LEDGER_QUEUE_SIZE = int(os.getenv("USAGE_LEDGER_QUEUE_SIZE", "5000"))
+
+CREW = "crew"
+CLASSIFIER = "classifier"
+EMBEDDING = "embedding"
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Custo em USD pelos preços por 1M tokens do model_routing.yaml (0 se desconhecido)"""
+    from ..routing.model_router import get_model_router
+
+    try:
+        price = get_model_router().model_price(model)
+    except Exception as e:
+        print(f"⚠️ Model pricing unavailable: {e}", file=sys.stderr)
+        return 0.0
+    return (
+        prompt_tokens * price.get("cost_per_1m_input", 0)
+        + completion_tokens * price.get("cost_per_1m_output", 0)
+    ) / 1_000_000
+
+
+# ============================================
+# ESCOPO DA MENSAGEM
+# ============================================
+
+class MessageUsage:
+    """Totais de uma mensagem (as chamadas podem vir de threads do executor)"""
+
+    def __init__(self, message_id: Optional[str], user_id: Optional[str], conversation_id: Optional[str]):
+        self.message_id = message_id
+        self.user_id = user_id
+        self.conversation_id = conversation_id
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.latency = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, entry: dict) -> None:
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += entry["prompt_tokens"]
+            self.completion_tokens += entry["completion_tokens"]
+            self.cost_usd += entry["cost_usd"]
+            self.latency += entry["latency_ms"] / 1000
+
+
+_current_usage: contextvars.ContextVar = contextvars.ContextVar("usage_ledger_message", default=None)
+
+
+@contextlib.contextmanager
+def usage_scope(message_id: Optional[str], user_id: Optional[str], conversation_id: Optional[str] = None):
+    """Atribui as chamadas do bloco à mensagem e loga o total ao sair"""
+    usage = MessageUsage(message_id, user_id, conversation_id)
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+        if usage.calls:
+            print(
+                f"💰 LLM usage: {usage.calls} calls, {usage.prompt_tokens}+{usage.completion_tokens} tokens, "
+                f"${usage.cost_usd:.4f}, {usage.latency:.1f}s",
+                file=sys.stderr
+            )
+
+
+# ============================================
+# LEDGER
+# ============================================
+
+class UsageLedger:
+    """Agregados para o /metrics + fila gravada em lote no Supabase"""
+
+    def __init__(
+        self,
+        table: str = USAGE_LEDGER_TABLE,
+        flush_seconds: float = USAGE_LEDGER_FLUSH_SECONDS,
+        batch_size: int = USAGE_LEDGER_BATCH_SIZE,
+        queue_size: int = USAGE_LEDGER_QUEUE_SIZE
+    ):
+        self.table = table
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._totals: Dict[tuple, Dict[str, float]] = {}
+        self._rows = {"flushed": 0, "failed": 0, "dropped": 0}
+        self._thread: Optional[threading.Thread] = None
+        self._warned_unconfigured = False
+
+    def record(self, entry: dict) -> None:
+        key = (entry["call_type"], entry["specialist"] or "none", entry["task"] or "none", entry["model"])
+        with self._lock:
+            totals = self._totals.setdefault(key, {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "latency_sum": 0.0
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += entry["prompt_tokens"]
+            totals["completion_tokens"] += entry["completion_tokens"]
+            totals["cost_usd"] += entry["cost_usd"]
+            totals["latency_sum"] += entry["latency_ms"] / 1000
+
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self._rows["dropped"] += 1
+
+    def _ensure_thread(self) -> None:
+        # Iniciada na primeira chamada (depois do fork dos workers do gunicorn)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="usage-ledger", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self) -> None:
+        """Grava a fila em lotes de batch_size"""
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _write(self, batch: list) -> None:
+        supabase_url, headers = supabase_rest()
+        if not headers:
+            if not self._warned_unconfigured:
+                self._warned_unconfigured = True
+                print("⚠️ SUPABASE_SERVICE_ROLE_KEY not configured, LLM usage kept only in /metrics", file=sys.stderr)
+            with self._lock:
+                self._rows["dropped"] += len(batch)
+            return
+        try:
+            response = get_guard("supabase").call(
+                lambda timeout: requests.post(
+                    f"{supabase_url}/rest/v1/{self.table}",
+                    json=batch,
+                    headers={**headers, "Prefer": "return=minimal"},
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
+            )
+            ok = response.status_code in (200, 201, 204)
+            if not ok:
+                print(f"⚠️ LLM usage flush failed: {response.status_code} - {response.text[:200]}", file=sys.stderr)
+        except Exception as e:
+            ok = False
+            print(f"⚠️ LLM usage flush failed: {e}", file=sys.stderr)
+        with self._lock:
+            self._rows["flushed" if ok else "failed"] += len(batch)
+
+    def render_prometheus_metrics(self) -> str:
+        with self._lock:
+            totals = {key: dict(value) for key, value in self._totals.items()}
+            rows = dict(self._rows)
+
+        def labels(key: tuple) -> str:
+            call_type, specialist, task, model = key
+            return f'call_type="{call_type}",specialist="{specialist}",task="{task}",model="{model}"'
+
+        lines = [
+            "",
+            "# HELP falachefe_llm_usage_calls_total Chamadas pagas ao LLM por tipo/especialista/task/modelo",
+            "# TYPE falachefe_llm_usage_calls_total counter",
+        ]
+        for key, s in totals.items():
+            lines.append(f"falachefe_llm_usage_calls_total{{{labels(key)}}} {s['calls']}")
+        lines += [
+            "# HELP falachefe_llm_usage_tokens_total Tokens por tipo/especialista/task/modelo",
+            "# TYPE falachefe_llm_usage_tokens_total counter",
+        ]
+        for key, s in totals.items():
+            for kind in ("prompt", "completion"):
+                lines.append(f'falachefe_llm_usage_tokens_total{{{labels(key)},kind="{kind}"}} {s[kind + "_tokens"]}')
+        lines += [
+            "# HELP falachefe_llm_usage_cost_usd_total Custo estimado (USD) por tipo/especialista/task/modelo",
+            "# TYPE falachefe_llm_usage_cost_usd_total counter",
+        ]
+        for key, s in totals.items():
+            lines.append(f"falachefe_llm_usage_cost_usd_total{{{labels(key)}}} {s['cost_usd']:.6f}")
+        lines += [
+            "# HELP falachefe_llm_usage_latency_seconds_sum Tempo total das chamadas por tipo/especialista/task/modelo",
+            "# TYPE falachefe_llm_usage_latency_seconds_sum counter",
+        ]
+        for key, s in totals.items():
+            lines.append(f"falachefe_llm_usage_latency_seconds_sum{{{labels(key)}}} {s['latency_sum']:.3f}")
+        lines += [
+            "# HELP falachefe_llm_usage_ledger_rows_total Linhas do ledger por destino (flushed, failed, dropped)",
+            "# TYPE falachefe_llm_usage_ledger_rows_total counter",
+        ]
+        for outcome, count in rows.items():
+            lines.append(f'falachefe_llm_usage_ledger_rows_total{{outcome="{outcome}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+_ledger: Optional[UsageLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger() -> UsageLedger:
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = UsageLedger()
+    return _ledger
+
+
+def record_llm_usage(
+    call_type: str,
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    latency: float,
+    specialist: Optional[str] = None,
+    task: Optional[str] = None,
+    tier: Optional[str] = None
+) -> Optional[dict]:
+    """Registra uma chamada (latency em segundos); nunca levanta exceção"""
+    if not USAGE_LEDGER_ENABLED:
+        return None
+    try:
+        now = datetime.now(timezone.utc)
+        usage = _current_usage.get()
+        prompt_tokens = int(prompt_tokens or 0)
+        completion_tokens = int(completion_tokens or 0)
+        entry = {
+            "created_at": now.isoformat(),
+            "day": now.date().isoformat(),
+            "message_id": usage.message_id if usage else None,
+            "user_id": usage.user_id if usage else None,
+            "conversation_id": usage.conversation_id if usage else None,
+            "call_type": call_type,
+            "specialist": specialist,
+            "task": task,
+            "model": model,
+            "tier": tier,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": round(estimate_cost(model, prompt_tokens, completion_tokens), 8),
+            "latency_ms": int(latency * 1000),
+        }
+        if usage is not None:
+            usage.add(entry)
+        get_usage_ledger().record(entry)
+        return entry
+    except Exception as e:
+        print(f"⚠️ LLM usage record failed: {e}", file=sys.stderr)
+        return None
+
+
+def record_openai_usage(call_type: str, model: str, response: Any, latency: float, **labels) -> Optional[dict]:
+    """Atalho para respostas do SDK da OpenAI (response.usage); rotula pelo modelo pedido"""
+    usage = getattr(response, "usage", None)
+    return record_llm_usage(
+        call_type,
+        model,
+        getattr(usage, "prompt_tokens", 0),
+        getattr(usage, "completion_tokens", 0),
+        latency,
+        **labels
+    )
+
+
+def render_prometheus_metrics() -> str:
+    if _ledger is None:
+        return ""
+    return _ledger.render_prometheus_metrics()
@@ -16,11 +16,13 @@ from typing import Optional, Literal
 import json
 
 # Importar ferramentas
+from .caching.llm_cache import cached_llm
 from .tools.cashflow_tools import (
     GetCashflowBalanceTool,
     GetCashflowCategoriesTool,
     AddCashflowTransactionTool,
     GetCashflowSummaryTool,
+    ForecastCashflowTool,
 )
 
 from .tools.uazapi_tools import (
@@ -79,15 +81,13 @@ class FalachefeOrchestrationFlow(Flow[OrchestrationState]):
             Você identifica rapidamente qual especialista (Financeiro, Marketing, Vendas ou RH) 
             é mais adequado para cada demanda.""",
             allow_delegation=False,
-            verbose=True
+            verbose=True,
+            llm=cached_llm()
         )
         
         # Task de análise
         analysis_task = Task(
-            description=f"""Analise esta demanda e decida qual especialista deve atender:
-
-Demanda: {self.state.user_request}
-Contexto: {self.state.user_context}
+            description=f"""Analise a demanda abaixo e decida qual especialista deve atender.
 
 Especialistas disponíveis:
 - financial: Fluxo de caixa, custos, precificação, análise financeira, DRE
@@ -100,7 +100,10 @@ Retorne APENAS um JSON neste formato exato:
     "specialist": "financial|marketing|sales|hr",
     "confidence": "high|medium|low",
     "reasoning": "Breve explicação da escolha"
-}}""",
+}}
+
+Demanda: {self.state.user_request}
+Contexto: {self.state.user_context}""",
             expected_output="JSON com a decisão do especialista",
             agent=orchestrator
         )
@@ -169,6 +172,7 @@ Retorne APENAS um JSON neste formato exato:
                 GetCashflowCategoriesTool(),
                 AddCashflowTransactionTool(),
                 GetCashflowSummaryTool(),
+                ForecastCashflowTool(),
             ]
         )
         
@@ -200,16 +204,16 @@ Foque em ações práticas que o empresário pode implementar.""",
             goal="Ajudar empresários com estratégias de marketing e presença online",
             backstory="""Você é especialista em marketing digital para pequenas empresas.
             Você cria estratégias econômicas e eficazes.""",
-            verbose=True
+            verbose=True,
+            llm=cached_llm()
         )
         
         task = Task(
             description=f"""Responda a esta demanda de marketing:
+Forneça uma resposta prática adequada para WhatsApp (máximo 800 caracteres).
 
 Pergunta: {self.state.user_request}
-Contexto: {self.state.user_context}
-
-Forneça uma resposta prática adequada para WhatsApp (máximo 800 caracteres).""",
+Contexto: {self.state.user_context}""",
             expected_output="Resposta clara sobre estratégia de marketing",
             agent=marketing_expert
         )
@@ -230,16 +234,16 @@ Forneça uma resposta prática adequada para WhatsApp (máximo 800 caracteres)."
             goal="Auxiliar empresários a estruturar processos de vendas",
             backstory="""Você é profissional de vendas com experiência em estruturação comercial.
             Você ajuda empresários a criarem processos de vendas escaláveis.""",
-            verbose=True
+            verbose=True,
+            llm=cached_llm()
         )
         
         task = Task(
             description=f"""Responda a esta demanda comercial:
+Forneça uma resposta prática adequada para WhatsApp (máximo 800 caracteres).
 
 Pergunta: {self.state.user_request}
-Contexto: {self.state.user_context}
-
-Forneça uma resposta prática adequada para WhatsApp (máximo 800 caracteres).""",
+Contexto: {self.state.user_context}""",
             expected_output="Resposta clara sobre processo de vendas",
             agent=sales_expert
         )
@@ -260,16 +264,16 @@ Forneça uma resposta prática adequada para WhatsApp (máximo 800 caracteres)."
             goal="Apoiar empresários com gestão de pessoas e questões trabalhistas",
             backstory="""Você é especialista em RH com conhecimento da legislação brasileira.
             Você fornece soluções práticas em conformidade com a lei.""",
-            verbose=True
+            verbose=True,
+            llm=cached_llm()
         )
         
         task = Task(
             description=f"""Responda a esta demanda de RH:
+Forneça uma resposta prática adequada para WhatsApp (máximo 800 caracteres).
 
 Pergunta: {self.state.user_request}
-Contexto: {self.state.user_context}
-
-Forneça uma resposta prática adequada para WhatsApp (máximo 800 caracteres).""",
+Contexto: {self.state.user_context}""",
             expected_output="Resposta clara sobre gestão de pessoas",
             agent=hr_expert
         )
@@ -0,0 +1,5 @@
+"""
+Camada de resiliência do Falachefe
+Protege o serviço contra dependências externas lentas ou fora do ar
+"""
+
@@ -0,0 +1,587 @@
+"""
+Dependency Guard - Proteção de dependências externas
+=====================================================
+
+Envolve chamadas para Supabase, OpenAI, UAZAPI e a API do Falachefe com:
+
+- Circuit breaker por dependência (closed → open → half_open)
+- Timeout adaptativo baseado no percentil de latência observado
+- Bulkhead limitando chamadas simultâneas por dependência (pool de threads
+  para call(); pool próprio, maior e com espera no event loop, para acall()
+  do servidor ASGI)
+- Fallback rápido quando a dependência está indisponível
+- Timeout limitado ao deadline da requisição (request_deadline)
+
+Uso:
+    guard = get_guard("supabase")
+    response = guard.call(
+        lambda timeout: requests.get(url, headers=headers, timeout=timeout),
+        is_failure=lambda r: r.status_code >= 500,
+        fallback=lambda exc: None,
+    )
+
+As métricas de todos os guards são expostas em /metrics via
+render_prometheus_metrics().
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from collections import deque
+from time import monotonic
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from .request_deadline import deadline_timeout
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# EXCEÇÕES
+# ============================================
+
+class DependencyUnavailableError(Exception):
+    """Dependência não pode ser chamada agora (circuito aberto ou bulkhead cheio)."""
+
+    def __init__(self, dependency: str, reason: str):
+        self.dependency = dependency
+        self.reason = reason
+        super().__init__(f"{dependency} indisponível: {reason}")
+
+
+class CircuitOpenError(DependencyUnavailableError):
+    """Circuito aberto - chamadas são rejeitadas sem tocar a rede."""
+
+    def __init__(self, dependency: str):
+        super().__init__(dependency, "circuit open")
+
+
+class BulkheadFullError(DependencyUnavailableError):
+    """Limite de chamadas simultâneas atingido para a dependência."""
+
+    def __init__(self, dependency: str):
+        super().__init__(dependency, "bulkhead full")
+
+
+class DeadlineExceededError(DependencyUnavailableError):
+    """Prazo da requisição esgotado - a chamada não é feita."""
+
+    def __init__(self, dependency: str):
+        super().__init__(dependency, "request deadline exceeded")
+
+
+# ============================================
+# CIRCUIT BREAKER
+# ============================================
+
+class CircuitBreaker:
+    """
+    Circuit breaker clássico com três estados.
+
+    - closed: chamadas passam; falhas consecutivas abrem o circuito
+    - open: chamadas rejeitadas até recovery_timeout expirar
+    - half_open: uma chamada de teste por vez; sucesso fecha, falha reabre
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Retorna True se a chamada pode seguir para a dependência."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN:
+                if monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            # HALF_OPEN: apenas uma chamada de teste por vez
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def cancel_probe(self) -> None:
+        """Libera a vaga de teste do half_open quando a chamada não chegou a ser feita."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f"⚡ Circuit {self.name} opened after {self._consecutive_failures} consecutive failures"
+                    )
+                self._state = self.OPEN
+                self._opened_at = monotonic()
+
+
+# ============================================
+# TIMEOUT ADAPTATIVO
+# ============================================
+
+class LatencyTracker:
+    """
+    Janela deslizante de latências bem-sucedidas.
+
+    O timeout sugerido é o percentil configurado multiplicado por uma margem,
+    limitado entre min_timeout e max_timeout. Enquanto não houver amostras
+    suficientes usa initial_timeout.
+    """
+
+    def __init__(
+        self,
+        initial_timeout: float,
+        min_timeout: float,
+        max_timeout: float,
+        percentile: float = 0.99,
+        multiplier: float = 2.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self._samples.append(latency)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def timeout(self) -> float:
+        with self._lock:
+            enough = len(self._samples) >= self.min_samples
+        if not enough:
+            return self.initial_timeout
+        observed = self.quantile(self.percentile) * self.multiplier
+        return max(self.min_timeout, min(self.max_timeout, observed))
+
+
+# ============================================
+# BULKHEAD
+# ============================================
+
+class Bulkhead:
+    """
+    Limita chamadas simultâneas; quem não consegue vaga em max_wait é rejeitado.
+
+    Chamadas síncronas (threads) e assíncronas (event loop do servidor ASGI)
+    usam pools separados: o assíncrono tem o próprio limite
+    (async_max_concurrent), dimensionado para as centenas de requisições em
+    andamento do ASGI, e espera a vaga sem bloquear o loop.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_wait: float = 0.1,
+        async_max_concurrent: Optional[int] = None,
+        async_max_wait: float = 2.0
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.async_max_concurrent = async_max_concurrent or max_concurrent
+        self.async_max_wait = async_max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        # asyncio.Semaphore pertence a um event loop: recriado se o loop mudar
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        self._async_loop = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    def _track(self, delta: int) -> None:
+        with self._lock:
+            self._in_flight += delta
+
+    def acquire(self) -> bool:
+        """Tenta ocupar uma vaga do pool de threads esperando até max_wait."""
+        if not self._semaphore.acquire(timeout=self.max_wait):
+            return False
+        self._track(1)
+        return True
+
+    def release(self) -> None:
+        self._track(-1)
+        self._semaphore.release()
+
+    def _loop_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_semaphore = asyncio.Semaphore(self.async_max_concurrent)
+            self._async_loop = loop
+        return self._async_semaphore
+
+    async def aacquire(self, max_wait: float) -> bool:
+        """Vaga do pool assíncrono, esperando até max_wait sem bloquear o event loop."""
+        semaphore = self._loop_semaphore()
+        if semaphore.locked():
+            try:
+                await asyncio.wait_for(semaphore.acquire(), max_wait)
+            except asyncio.TimeoutError:
+                return False
+        else:
+            await semaphore.acquire()
+        self._track(1)
+        return True
+
+    def arelease(self) -> None:
+        self._track(-1)
+        self._async_semaphore.release()
+
+
+# ============================================
+# GUARD
+# ============================================
+
+class DependencyGuard:
+    """
+    Combina circuit breaker, timeout adaptativo e bulkhead para uma dependência.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_timeout: float = 10.0,
+        min_timeout: float = 1.0,
+        max_timeout: float = 30.0,
+        max_concurrent: int = 4,
+        max_wait: float = 0.1,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        async_max_concurrent: Optional[int] = None,
+        async_max_wait: float = 2.0,
+    ):
+        self.name = name
+        self.breaker = CircuitBreaker(name, failure_threshold, recovery_timeout)
+        self.latency = LatencyTracker(initial_timeout, min_timeout, max_timeout)
+        self.bulkhead = Bulkhead(max_concurrent, max_wait, async_max_concurrent, async_max_wait)
+        self._counters: Dict[str, int] = {
+            "success": 0,
+            "failure": 0,
+            "rejected_circuit": 0,
+            "rejected_bulkhead": 0,
+            "rejected_deadline": 0,
+            "fallback": 0,
+        }
+        self._lock = threading.Lock()
+
+    def _incr(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def timeout(self) -> float:
+        """Timeout atual (segundos) a ser usado na próxima chamada."""
+        return self.latency.timeout()
+
+    def call(
+        self,
+        fn: Callable[[float], Any],
+        fallback: Optional[Callable[[Exception], Any]] = None,
+        is_failure: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Executa fn(timeout) protegida pelo guard.
+
+        Args:
+            fn: Função que recebe o timeout em segundos e faz a chamada externa
+            fallback: Chamado com a exceção quando a dependência falha ou é rejeitada.
+                Se ausente, a exceção é propagada.
+            is_failure: Predicado sobre o resultado (ex: HTTP 5xx) que conta como falha
+                para o circuit breaker, sem lançar exceção.
+        """
+        timeout = self.timeout()
+        capped_timeout = deadline_timeout(timeout)
+        if capped_timeout <= 0:
+            self._incr("rejected_deadline")
+            return self._fail(DeadlineExceededError(self.name), fallback)
+
+        if not self.breaker.allow_request():
+            self._incr("rejected_circuit")
+            return self._fail(CircuitOpenError(self.name), fallback)
+
+        if not self.bulkhead.acquire():
+            self._incr("rejected_bulkhead")
+            self.breaker.cancel_probe()
+            return self._fail(BulkheadFullError(self.name), fallback)
+
+        started = monotonic()
+        try:
+            result = fn(capped_timeout)
+        except Exception as e:
+            if capped_timeout < timeout:
+                # Timeout encurtado pelo deadline não é falha da dependência
+                self.breaker.cancel_probe()
+            else:
+                self.breaker.record_failure()
+            self._incr("failure")
+            logger.warning(f"⚠️ {self.name} call failed after {monotonic() - started:.2f}s: {e}")
+            return self._fail(e, fallback)
+        finally:
+            self.bulkhead.release()
+
+        if is_failure is not None and is_failure(result):
+            self.breaker.record_failure()
+            self._incr("failure")
+            return result
+
+        self.latency.record(monotonic() - started)
+        self.breaker.record_success()
+        self._incr("success")
+        return result
+
+    async def acall(
+        self,
+        fn: Callable[[float], Awaitable[Any]],
+        fallback: Optional[Callable[[Exception], Any]] = None,
+        is_failure: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Versão assíncrona de call(): fn(timeout) deve retornar um awaitable
+        (ex: chamada httpx.AsyncClient). A vaga vem do pool assíncrono do
+        bulkhead, esperada até async_max_wait (limitado ao deadline) sem
+        bloquear o event loop.
+        """
+        timeout = self.timeout()
+        capped_timeout = deadline_timeout(timeout)
+        if capped_timeout <= 0:
+            self._incr("rejected_deadline")
+            return self._fail(DeadlineExceededError(self.name), fallback)
+
+        if not self.breaker.allow_request():
+            self._incr("rejected_circuit")
+            return self._fail(CircuitOpenError(self.name), fallback)
+
+        if not await self.bulkhead.aacquire(deadline_timeout(self.bulkhead.async_max_wait)):
+            self._incr("rejected_bulkhead")
+            self.breaker.cancel_probe()
+            return self._fail(BulkheadFullError(self.name), fallback)
+
+        # Espera pela vaga conta no prazo da requisição
+        capped_timeout = deadline_timeout(timeout)
+        if capped_timeout <= 0:
+            self.bulkhead.arelease()
+            self._incr("rejected_deadline")
+            self.breaker.cancel_probe()
+            return self._fail(DeadlineExceededError(self.name), fallback)
+
+        started = monotonic()
+        try:
+            result = await fn(capped_timeout)
+        except Exception as e:
+            if capped_timeout < timeout:
+                # Timeout encurtado pelo deadline não é falha da dependência
+                self.breaker.cancel_probe()
+            else:
+                self.breaker.record_failure()
+            self._incr("failure")
+            logger.warning(f"⚠️ {self.name} call failed after {monotonic() - started:.2f}s: {e}")
+            return self._fail(e, fallback)
+        finally:
+            self.bulkhead.arelease()
+
+        if is_failure is not None and is_failure(result):
+            self.breaker.record_failure()
+            self._incr("failure")
+            return result
+
+        self.latency.record(monotonic() - started)
+        self.breaker.record_success()
+        self._incr("success")
+        return result
+
+    def _fail(self, error: Exception, fallback: Optional[Callable[[Exception], Any]]) -> Any:
+        if fallback is None:
+            raise error
+        self._incr("fallback")
+        return fallback(error)
+
+
+# ============================================
+# REGISTRO DE GUARDS
+# ============================================
+
+# Defaults por dependência (segundos / chamadas simultâneas)
+# Sobrescreva via env: GUARD_<NOME>_<PARAM>, ex: GUARD_SUPABASE_MAX_CONCURRENT=6
+# async_*: pool do servidor ASGI (acall), que tem centenas de requisições em
+# andamento no mesmo processo; max_concurrent vale para as threads (call)
+DEPENDENCY_DEFAULTS: Dict[str, Dict[str, float]] = {
+    "supabase": {
+        "initial_timeout": 5.0, "min_timeout": 1.0, "max_timeout": 10.0,
+        "max_concurrent": 4, "failure_threshold": 5, "recovery_timeout": 20.0,
+        "async_max_concurrent": 64, "async_max_wait": 2.0,
+    },
+    "openai": {
+        "initial_timeout": 20.0, "min_timeout": 5.0, "max_timeout": 60.0,
+        "max_concurrent": 8, "failure_threshold": 5, "recovery_timeout": 30.0,
+        "async_max_concurrent": 64, "async_max_wait": 5.0,
+    },
+    "uazapi": {
+        "initial_timeout": 10.0, "min_timeout": 2.0, "max_timeout": 30.0,
+        "max_concurrent": 4, "failure_threshold": 5, "recovery_timeout": 30.0,
+        "async_max_concurrent": 32, "async_max_wait": 2.0,
+    },
+    "falachefe_api": {
+        "initial_timeout": 10.0, "min_timeout": 2.0, "max_timeout": 30.0,
+        "max_concurrent": 4, "failure_threshold": 5, "recovery_timeout": 30.0,
+        "async_max_concurrent": 32, "async_max_wait": 2.0,
+    },
+}
+
+_guards: Dict[str, DependencyGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def _guard_config(name: str) -> Dict[str, float]:
+    config = dict(DEPENDENCY_DEFAULTS.get(name, DEPENDENCY_DEFAULTS["falachefe_api"]))
+    for param, default in config.items():
+        env_value = os.getenv(f"GUARD_{name.upper()}_{param.upper()}")
+        if env_value:
+            config[param] = type(default)(float(env_value))
+    return config
+
+
+def get_guard(name: str) -> DependencyGuard:
+    """Retorna o guard singleton (por processo) da dependência."""
+    guard = _guards.get(name)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(name)
+            if guard is None:
+                config = _guard_config(name)
+                guard = DependencyGuard(
+                    name,
+                    initial_timeout=config["initial_timeout"],
+                    min_timeout=config["min_timeout"],
+                    max_timeout=config["max_timeout"],
+                    max_concurrent=int(config["max_concurrent"]),
+                    failure_threshold=int(config["failure_threshold"]),
+                    recovery_timeout=config["recovery_timeout"],
+                    async_max_concurrent=int(config["async_max_concurrent"]),
+                    async_max_wait=config["async_max_wait"],
+                )
+                _guards[name] = guard
+    return guard
+
+
+# ============================================
+# MÉTRICAS PROMETHEUS
+# ============================================
+
+_STATE_VALUES = {
+    CircuitBreaker.CLOSED: 0,
+    CircuitBreaker.HALF_OPEN: 1,
+    CircuitBreaker.OPEN: 2,
+}
+
+
+def render_prometheus_metrics() -> str:
+    """Métricas de todas as dependências no formato texto do Prometheus."""
+    guards = [get_guard(name) for name in DEPENDENCY_DEFAULTS]
+
+    lines = [
+        "# HELP falachefe_dependency_circuit_state Estado do circuito (0=closed, 1=half_open, 2=open)",
+        "# TYPE falachefe_dependency_circuit_state gauge",
+    ]
+    for guard in guards:
+        lines.append(
+            f'falachefe_dependency_circuit_state{{dependency="{guard.name}"}} '
+            f'{_STATE_VALUES[guard.breaker.state]}'
+        )
+
+    lines += [
+        "",
+        "# HELP falachefe_dependency_calls_total Chamadas por resultado",
+        "# TYPE falachefe_dependency_calls_total counter",
+    ]
+    for guard in guards:
+        for outcome, value in guard.counters().items():
+            lines.append(
+                f'falachefe_dependency_calls_total{{dependency="{guard.name}",outcome="{outcome}"}} {value}'
+            )
+
+    lines += [
+        "",
+        "# HELP falachefe_dependency_timeout_seconds Timeout adaptativo atual",
+        "# TYPE falachefe_dependency_timeout_seconds gauge",
+    ]
+    for guard in guards:
+        lines.append(
+            f'falachefe_dependency_timeout_seconds{{dependency="{guard.name}"}} {guard.timeout():.3f}'
+        )
+
+    lines += [
+        "",
+        "# HELP falachefe_dependency_latency_seconds Latência observada por percentil",
+        "# TYPE falachefe_dependency_latency_seconds gauge",
+    ]
+    for guard in guards:
+        for q in (0.5, 0.95, 0.99):
+            value = guard.latency.quantile(q)
+            if value is not None:
+                lines.append(
+                    f'falachefe_dependency_latency_seconds{{dependency="{guard.name}",quantile="{q}"}} {value:.4f}'
+                )
+
+    lines += [
+        "",
+        "# HELP falachefe_dependency_in_flight Chamadas em andamento (bulkhead)",
+        "# TYPE falachefe_dependency_in_flight gauge",
+    ]
+    for guard in guards:
+        lines.append(
+            f'falachefe_dependency_in_flight{{dependency="{guard.name}"}} {guard.bulkhead.in_flight}'
+        )
+
+    return "\n".join(lines) + "\n"
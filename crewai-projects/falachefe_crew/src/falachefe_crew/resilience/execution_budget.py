@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Orçamento de execução por task
+==============================
+
+Loops de agente descontrolados (repetir a mesma ferramenta, continuar
+"pensando" depois de já ter enviado a mensagem) são os piores outliers de
+p99. Cada execução de task recebe um orçamento:
+
+- tempo (max_seconds) e tokens estimados (max_tokens): ao estourar, o agente
+  recebe UMA chamada extra instruída a responder já; se ainda assim não
+  terminar, a execução é encerrada com resposta padrão
+- chamadas idênticas de ferramenta (mesmo nome + mesmos argumentos) que já
+  deram certo: a repetição NÃO é executada, o agente recebe o resultado
+  anterior (chamadas com erro podem ser tentadas de novo)
+- ferramentas terminais (mensagem enviada): após sucesso, a próxima
+  chamada ao LLM é substituída pela resposta final com o resultado da
+  ferramenta (sem iterações extras). Só para tasks com uma única ação: em
+  financial_advice uma mensagem pode trazer várias transações ("vendi 200
+  no pix e paguei 80 de luz", lote coalescido), então registrar uma não
+  encerra a task (a repetição da mesma transação já é bloqueada acima)
+
+O orçamento ativo fica em um ContextVar; CachedLLM e as ferramentas com
+@budgeted_tool consultam o orçamento da execução corrente. Dentro de uma
+requisição com deadline (request_deadline), max_seconds é limitado ao
+tempo que resta para o crew.
+"""
+
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import contextlib
+import contextvars
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .request_deadline import crew_seconds_left
+
+# Padrões por task (sobrescrevíveis por env: BUDGET_<TASK>_<PARAM>)
+TASK_BUDGET_DEFAULTS = {
+    "default": {"max_seconds": 60, "max_tokens": 40000, "max_identical_tool_calls": 1},
+    "reception_and_triage": {"max_seconds": 30, "max_tokens": 20000, "max_identical_tool_calls": 1},
+    "financial_advice": {"max_seconds": 60, "max_tokens": 40000, "max_identical_tool_calls": 1},
+    "marketing_sales_plan": {"max_seconds": 90, "max_tokens": 60000, "max_identical_tool_calls": 1},
+    "hr_guidance": {"max_seconds": 60, "max_tokens": 40000, "max_identical_tool_calls": 1},
+    "format_and_send_response": {
+        "max_seconds": 30, "max_tokens": 20000, "max_identical_tool_calls": 1,
+        "terminal_tools": [
+            "Enviar Mensagem de Texto WhatsApp",
+            "Enviar Menu Interativo WhatsApp",
+            "Enviar Mídia WhatsApp",
+        ],
+    },
+}
+
+FORCE_FINAL_ANSWER_PROMPT = (
+    "Você atingiu o limite de tempo/processamento desta tarefa. "
+    "NÃO use mais ferramentas. Responda AGORA no formato:\n"
+    "Thought: Vou responder com o que já tenho.\nFinal Answer: <resposta final ao usuário>"
+)
+BUDGET_EXHAUSTED_ANSWER = (
+    "Desculpe, não consegui concluir sua solicitação agora. "
+    "Pode reformular ou tentar novamente em instantes?"
+)
+REPEATED_TOOL_CALL_NOTE = (
+    "\n\n(Esta ferramenta já foi executada com exatamente os mesmos dados nesta tarefa; "
+    "a chamada NÃO foi repetida. Use o resultado acima e finalize.)"
+)
+
+_outcomes: Dict[str, int] = {}
+_outcomes_lock = threading.Lock()
+
+
+def _count(outcome: str) -> None:
+    with _outcomes_lock:
+        _outcomes[outcome] = _outcomes.get(outcome, 0) + 1
+
+
+def estimate_tokens(payload) -> int:
+    """Estimativa barata (~4 caracteres por token em português)"""
+    if payload is None:
+        return 0
+    if not isinstance(payload, str):
+        payload = json.dumps(payload, ensure_ascii=False, default=str)
+    return len(payload) // 4 + 1
+
+
+def is_successful_tool_output(output: str) -> bool:
+    """Ferramentas do Falachefe retornam '✅ ...' ou JSON com success: true"""
+    text = (output or "").strip()
+    if text.startswith("✅"):
+        return True
+    try:
+        return json.loads(text).get("success") is True
+    except (ValueError, AttributeError):
+        return False
+
+
+class ExecutionBudget:
+    """Orçamento de uma execução de task"""
+
+    def __init__(
+        self,
+        task: str,
+        max_seconds: float = 60,
+        max_tokens: int = 40000,
+        max_identical_tool_calls: int = 1,
+        terminal_tools: Optional[List[str]] = None
+    ):
+        self.task = task
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_identical_tool_calls = max_identical_tool_calls
+        self.terminal_tools = set(terminal_tools or [])
+
+        self.started_at = time.monotonic()
+        self.tokens_used = 0
+        self.llm_calls = 0
+        self.terminal_output: Optional[str] = None
+        self.grace_used = False
+        # max_seconds encurtado pelo deadline da requisição
+        self.deadline_bound = False
+        self._tool_calls: Dict[str, Tuple[int, str]] = {}
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def exhausted_reason(self) -> Optional[str]:
+        if self.elapsed() > self.max_seconds:
+            return "deadline" if self.deadline_bound else "time"
+        if self.tokens_used > self.max_tokens:
+            return "tokens"
+        return None
+
+    # ============================================
+    # LLM
+    # ============================================
+
+    def before_llm_call(self, messages: list) -> Tuple[Optional[str], list]:
+        """
+        Returns:
+            (resposta_forçada, mensagens): se resposta_forçada não for None,
+            o LLM não deve ser chamado e ela é a resposta da chamada.
+        """
+        if self.terminal_output is not None:
+            _count("terminal_tool_exit")
+            print(f"🏁 [{self.task}] Terminal tool succeeded, finishing without more iterations", file=sys.stderr)
+            return f"Thought: A ação foi concluída com sucesso.\nFinal Answer: {self.terminal_output.strip()}", messages
+
+        reason = self.exhausted_reason()
+        if reason is None:
+            return None, messages
+
+        if not self.grace_used:
+            self.grace_used = True
+            _count(f"forced_final_{reason}")
+            print(f"⏱️ [{self.task}] Budget exceeded ({reason}: {self.elapsed():.1f}s, ~{self.tokens_used} tokens), forcing final answer", file=sys.stderr)
+            return None, list(messages) + [{"role": "user", "content": FORCE_FINAL_ANSWER_PROMPT}]
+
+        _count(f"aborted_{reason}")
+        print(f"🛑 [{self.task}] Budget exhausted after forced answer, aborting", file=sys.stderr)
+        return f"Thought: Limite atingido.\nFinal Answer: {BUDGET_EXHAUSTED_ANSWER}", messages
+
+    def after_llm_call(self, messages: list, result) -> None:
+        self.llm_calls += 1
+        self.tokens_used += estimate_tokens(messages) + estimate_tokens(result)
+
+    # ============================================
+    # FERRAMENTAS
+    # ============================================
+
+    def tool_call(self, tool_name: str, arguments: dict, run: Callable[[], str]) -> str:
+        signature = tool_name + ":" + json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str)
+        calls, previous = self._tool_calls.get(signature, (0, None))
+
+        if calls >= self.max_identical_tool_calls:
+            _count("repeated_tool_blocked")
+            print(f"🔁 [{self.task}] Blocked repeated call to '{tool_name}'", file=sys.stderr)
+            self._tool_calls[signature] = (calls + 1, previous)
+            return f"{previous}{REPEATED_TOOL_CALL_NOTE}"
+
+        output = run()
+        if not is_successful_tool_output(output):
+            # Falha (timeout, erro de API): o agente pode tentar de novo
+            return output
+        self._tool_calls[signature] = (calls + 1, output)
+
+        if tool_name in self.terminal_tools:
+            self.terminal_output = output
+        return output
+
+
+_current_budget: contextvars.ContextVar = contextvars.ContextVar("falachefe_execution_budget", default=None)
+
+
+def current_budget() -> Optional[ExecutionBudget]:
+    return _current_budget.get()
+
+
+def budget_for_task(task: str) -> ExecutionBudget:
+    """Orçamento da task com padrões + overrides de env"""
+    params = dict(TASK_BUDGET_DEFAULTS["default"])
+    params.update(TASK_BUDGET_DEFAULTS.get(task, {}))
+    for key in ("max_seconds", "max_tokens", "max_identical_tool_calls"):
+        env_value = os.getenv(f"BUDGET_{task.upper()}_{key.upper()}")
+        if env_value:
+            params[key] = type(params[key])(float(env_value))
+    budget = ExecutionBudget(task, **params)
+    seconds_left = crew_seconds_left()
+    if seconds_left is not None and seconds_left < budget.max_seconds:
+        budget.max_seconds = seconds_left
+        budget.deadline_bound = True
+    return budget
+
+
+@contextlib.contextmanager
+def execution_budget(task: str):
+    """Ativa o orçamento da task durante o bloco (ex: em volta de crew.kickoff)"""
+    budget = budget_for_task(task)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+        print(f"📏 [{task}] {budget.llm_calls} LLM calls, ~{budget.tokens_used} tokens, {budget.elapsed():.1f}s", file=sys.stderr)
+
+
+def budgeted_tool(run_method):
+    """
+    Decorator para BaseTool._run: aplica deduplicação e detecção de
+    ferramenta terminal quando houver orçamento ativo.
+    """
+    @functools.wraps(run_method)
+    def wrapper(self, *args, **kwargs):
+        budget = current_budget()
+        if budget is None:
+            return run_method(self, *args, **kwargs)
+        arguments = {"args": list(args), **kwargs} if args else kwargs
+        return budget.tool_call(self.name, arguments, lambda: run_method(self, *args, **kwargs))
+    return wrapper
+
+
+def render_prometheus_metrics() -> str:
+    with _outcomes_lock:
+        outcomes = dict(_outcomes)
+    lines = [
+        "",
+        "# HELP falachefe_execution_budget_events_total Intervenções do orçamento de execução",
+        "# TYPE falachefe_execution_budget_events_total counter",
+    ]
+    for outcome, count in sorted(outcomes.items()):
+        lines.append(f'falachefe_execution_budget_events_total{{event="{outcome}"}} {count}')
+    return "\n".join(lines) + "\n"
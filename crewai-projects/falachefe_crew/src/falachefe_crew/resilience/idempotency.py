@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Idempotência de gravações
+=========================
+
+Retries do agente, reentregas do QStash e webhooks duplicados da UAZAPI
+geravam transações repetidas no fluxo de caixa. Cada gravação agora tem
+uma chave determinística:
+
+    sha256(usuário, tipo, valor, categoria, data, id da mensagem de origem)
+
+- Antes do POST, a chave é reservada no KV store compartilhado (SET NX).
+  Se já existe resultado, ele é devolvido sem gravar de novo.
+- A mesma chave vai para a API (idempotencyKey), que faz
+  INSERT ... ON CONFLICT DO NOTHING: mesmo com o KV vazio (reinício,
+  Redis fora) a linha não é duplicada.
+
+O id da mensagem de origem fica em um ContextVar definido pelo api_server
+em volta do processamento (source_message_scope). Sem mensagem de origem
+(scripts, testes), não há deduplicação: duas vendas iguais no mesmo dia
+são legítimas.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import contextlib
+import contextvars
+from typing import Callable, Optional
+
+from ..storage.kv_store import get_kv_store, kv_key
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# Reserva enquanto a gravação está em andamento (expira se o worker morrer)
+IDEMPOTENCY_PENDING_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_PENDING_TTL_SECONDS", "60"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+PENDING = "__pending__"
+IN_PROGRESS_MESSAGE = (
+    "⏳ Esta transação já está sendo registrada por outra solicitação. "
+    "NÃO tente registrar novamente."
+)
+
+_source_message: contextvars.ContextVar = contextvars.ContextVar("falachefe_source_message", default=None)
+
+
+@contextlib.contextmanager
+def source_message_scope(source_id: Optional[str]):
+    """Define a mensagem de origem das gravações feitas dentro do bloco"""
+    token = _source_message.set(source_id)
+    try:
+        yield
+    finally:
+        _source_message.reset(token)
+
+
+def current_source_message_id() -> Optional[str]:
+    return _source_message.get()
+
+
+def transaction_idempotency_key(user_id: str, transaction_type: str, amount: float, category: str,
+                                date: str, source_id: Optional[str] = None) -> Optional[str]:
+    """Chave determinística da transação; None sem mensagem de origem"""
+    source_id = source_id or current_source_message_id()
+    if not source_id:
+        return None
+    parts = [user_id, transaction_type, f"{float(amount):.2f}", (category or "").strip().lower(), date, source_id]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def idempotent_call(key: Optional[str], run: Callable[[], str], is_success: Callable[[str], bool]) -> str:
+    """
+    Executa run() no máximo uma vez por chave.
+
+    Resultados de sucesso ficam guardados por IDEMPOTENCY_TTL_SECONDS e são
+    devolvidos em chamadas repetidas; falhas liberam a chave para nova tentativa.
+    """
+    if key is None:
+        return run()
+
+    store = get_kv_store()
+    storage_key = kv_key("idempotency", key)
+
+    try:
+        claimed = store.set_nx(storage_key, PENDING, ttl=IDEMPOTENCY_PENDING_TTL_SECONDS)
+    except Exception as e:
+        # KV indisponível: a API ainda garante a unicidade pela idempotencyKey
+        print(f"⚠️ Idempotency store unavailable: {e}", file=sys.stderr)
+        return run()
+
+    if not claimed:
+        previous = _wait_for_result(store, storage_key)
+        if previous is not None:
+            print(f"🔁 Idempotent replay ({key[:12]})", file=sys.stderr)
+            return previous
+        return IN_PROGRESS_MESSAGE
+
+    try:
+        result = run()
+    except Exception:
+        store.delete_if_equals(storage_key, PENDING)
+        raise
+
+    if is_success(result):
+        store.set(storage_key, result, ttl=IDEMPOTENCY_TTL_SECONDS)
+    else:
+        store.delete_if_equals(storage_key, PENDING)
+    return result
+
+
+def _wait_for_result(store, storage_key: str) -> Optional[str]:
+    """Resultado já gravado, aguardando até IDEMPOTENCY_WAIT_SECONDS se ainda estiver pendente"""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        value = store.get(storage_key)
+        if value != PENDING:
+            return value
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.2)
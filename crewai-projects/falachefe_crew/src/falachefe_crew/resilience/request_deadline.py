@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Deadline da requisição
+======================
+
+O /process não tinha prazo total: o gunicorn mata o worker em
+GUNICORN_TIMEOUT segundos e o usuário fica sem resposta nenhuma. Cada
+mensagem agora tem um deadline (REQUEST_DEADLINE_SECONDS desde a chegada)
+guardado em um ContextVar e respeitado em todas as etapas:
+
+- dependency_guard: o timeout de cada chamada externa (classificação,
+  perfil, status financeiro, gravação, UAZAPI) é limitado ao tempo
+  restante; com o prazo esgotado a chamada nem sai (fallback do guard)
+- execution_budget: o max_seconds da task é limitado ao tempo do crew
+  (deadline − reserva de entrega − tempo para finalizar), então o agente
+  recebe a instrução de responder já antes do prazo
+- run_before_deadline(): se o crew ainda assim não terminar, a requisição
+  segue com uma resposta curta dentro do prazo e o crew continua em
+  segundo plano com um prazo próprio, estendido em
+  DEADLINE_LATE_RUN_SECONDS; a resposta completa é entregue quando ficar
+  pronta ou, passado esse prazo, a execução é abandonada
+
+DEADLINE_DELIVERY_RESERVE_SECONDS fica reservado para gravar e enviar a
+resposta depois do crew.
+
+Ordem das mensagens: quem segura a vez do usuário (lock de coalescência,
+ids de deduplicação, partição da fila) só a libera depois da entrega ou do
+abandono das execuções tardias do bloco (hold_late_runs,
+held_through_late_runs); senão a próxima mensagem seria respondida antes
+da resposta completa desta.
+"""
+
+import os
+import sys
+import time
+import threading
+import contextlib
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List, Optional, Tuple
+
+# Abaixo do GUNICORN_TIMEOUT (120s) e do timeout do QStash (0 = sem deadline)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "100"))
+# Reservado para gravar e enviar a resposta depois do crew
+DEADLINE_DELIVERY_RESERVE_SECONDS = float(os.getenv("DEADLINE_DELIVERY_RESERVE_SECONDS", "10"))
+# Tempo para a chamada extra em que o agente é instruído a finalizar
+DEADLINE_WRAP_UP_SECONDS = float(os.getenv("DEADLINE_WRAP_UP_SECONDS", "15"))
+# Prazo extra do crew que passou do deadline (depois do fallback) para terminar e entregar
+DEADLINE_LATE_RUN_SECONDS = float(os.getenv("DEADLINE_LATE_RUN_SECONDS", "60"))
+
+DEADLINE_FALLBACK_ANSWER = (
+    "Sua solicitação está levando um pouco mais de tempo do que o normal. "
+    "Já estou finalizando e te envio a resposta completa em seguida."
+)
+
+_counters = {"fallback": 0, "late_delivered": 0, "late_failed": 0, "late_abandoned": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(outcome: str) -> None:
+    with _counters_lock:
+        _counters[outcome] += 1
+
+
+class Deadline:
+    """Prazo absoluto da requisição (epoch, como o start_time do /process)"""
+
+    def __init__(
+        self,
+        seconds: float,
+        started_at: Optional[float] = None,
+        delivery_reserve: float = DEADLINE_DELIVERY_RESERVE_SECONDS
+    ):
+        self.expires_at = (started_at or time.time()) + seconds
+        self.delivery_reserve = delivery_reserve
+
+    def remaining(self) -> float:
+        """Segundos até o prazo final (gravação e envio incluídos)"""
+        return max(0.0, self.expires_at - time.time())
+
+    def work_remaining(self) -> float:
+        """Segundos até o fim do tempo de trabalho (antes da reserva de entrega)"""
+        return max(0.0, self.remaining() - self.delivery_reserve)
+
+    def copy(self) -> "Deadline":
+        return Deadline(0, self.expires_at, self.delivery_reserve)
+
+    def extend(self, seconds: float) -> None:
+        self.expires_at += seconds
+
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("falachefe_request_deadline", default=None)
+
+
+@contextlib.contextmanager
+def request_deadline(started_at: Optional[float] = None, seconds: float = REQUEST_DEADLINE_SECONDS):
+    """Deadline das etapas do bloco, contado desde started_at; seconds <= 0 desliga"""
+    token = _current_deadline.set(Deadline(seconds, started_at) if seconds > 0 else None)
+    try:
+        yield _current_deadline.get()
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def deadline_timeout(timeout: float) -> float:
+    """Timeout de uma chamada externa limitado ao prazo restante (sem deadline: inalterado)"""
+    deadline = current_deadline()
+    return timeout if deadline is None else min(timeout, deadline.remaining())
+
+
+def crew_seconds_left() -> Optional[float]:
+    """Tempo para o crew trabalhar antes de ser instruído a finalizar; None sem deadline"""
+    deadline = current_deadline()
+    if deadline is None:
+        return None
+    return max(0.0, deadline.work_remaining() - DEADLINE_WRAP_UP_SECONDS)
+
+
+class LateRun:
+    """Execução que passou do deadline: entrega a resposta completa até give_up_at ou é abandonada"""
+
+    def __init__(self, give_up_at: float):
+        self.give_up_at = give_up_at
+        self._lock = threading.Lock()
+        self._state = "running"
+        self._settled = threading.Event()
+
+    def _abandon(self) -> None:
+        # Chamado com self._lock; conta uma vez só
+        if self._state == "running":
+            self._state = "abandoned"
+            _count("late_abandoned")
+            print(f"⌛ Late run still unfinished {DEADLINE_LATE_RUN_SECONDS:.0f}s after the fallback, abandoning its answer", file=sys.stderr)
+
+    def start_delivery(self) -> bool:
+        """True se a resposta ainda pode ser entregue (False: execução abandonada)"""
+        with self._lock:
+            if self._state == "running" and time.time() > self.give_up_at:
+                self._abandon()
+            if self._state != "running":
+                return False
+            self._state = "delivering"
+            return True
+
+    def settle(self) -> None:
+        """Fim da execução tardia (entregue, falhou ou abandonada)"""
+        self._settled.set()
+
+    def wait(self) -> None:
+        """Espera a entrega até give_up_at; depois disso abandona (entrega em curso é esperada)"""
+        if self._settled.wait(max(0.0, self.give_up_at - time.time())):
+            return
+        with self._lock:
+            self._abandon()
+            delivering = self._state == "delivering"
+        if delivering:
+            self._settled.wait()
+
+
+_late_runs: contextvars.ContextVar = contextvars.ContextVar("falachefe_late_runs", default=None)
+
+
+@contextlib.contextmanager
+def hold_late_runs():
+    """Lista das execuções tardias iniciadas no bloco (blocos aninhados compartilham a mesma)"""
+    runs = _late_runs.get()
+    if runs is not None:
+        yield runs
+        return
+    runs = []
+    token = _late_runs.set(runs)
+    try:
+        yield runs
+    finally:
+        _late_runs.reset(token)
+
+
+def wait_late_runs(runs: List[LateRun]) -> None:
+    for run in runs:
+        run.wait()
+
+
+def after_late_runs(runs: List[LateRun], fn: Callable[[], Any]) -> None:
+    """fn() já, sem execuções tardias; senão em outra thread depois da entrega (ou abandono) de todas"""
+    if not runs:
+        fn()
+        return
+
+    def wait_then_run():
+        wait_late_runs(runs)
+        try:
+            fn()
+        except Exception as e:
+            print(f"⚠️ Release after late runs failed: {e}", file=sys.stderr)
+
+    threading.Thread(target=wait_then_run, name="late-run-hold", daemon=True).start()
+
+
+@contextlib.contextmanager
+def held_through_late_runs(manager):
+    """
+    manager ativo durante o bloco e, se o bloco deixou execuções tardias,
+    até a entrega (ou abandono) delas, sem atrasar a resposta da requisição.
+
+    A saída adiada roda em outra thread: manager não pode depender de
+    ContextVars (usar para locks e marcações no KV store).
+    """
+    value = manager.__enter__()
+    with hold_late_runs() as runs:
+        try:
+            yield value
+        except BaseException:
+            exc_info = sys.exc_info()
+            after_late_runs(runs, lambda: manager.__exit__(*exc_info))
+            raise
+    after_late_runs(runs, lambda: manager.__exit__(None, None, None))
+
+
+def run_before_deadline(fn: Callable[[], Any], on_late_result: Callable[[Any], None]) -> Tuple[bool, Any]:
+    """
+    Executa fn() esperando no máximo até o fim do tempo de trabalho.
+
+    Returns:
+        (True, resultado) se terminou a tempo (exceções de fn sobem);
+        (False, None) caso contrário - fn segue em outra thread com o prazo
+        estendido em DEADLINE_LATE_RUN_SECONDS e on_late_result(resultado)
+        é chamado se terminar dentro dele (registrada em hold_late_runs)
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return True, fn()
+
+    future: Future = Future()
+    context = contextvars.copy_context()
+    # Prazo próprio da execução: estendido se passar do deadline da requisição
+    run_deadline = deadline.copy()
+    context.run(_current_deadline.set, run_deadline)
+
+    def target():
+        try:
+            future.set_result(context.run(fn))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name="deadline-run", daemon=True).start()
+    try:
+        return True, future.result(timeout=deadline.work_remaining())
+    except FutureTimeoutError:
+        _count("fallback")
+        run_deadline.extend(DEADLINE_LATE_RUN_SECONDS)
+        late_run = LateRun(run_deadline.expires_at)
+        runs = _late_runs.get()
+        if runs is not None:
+            runs.append(late_run)
+        future.add_done_callback(lambda done: _deliver_late(done, context, on_late_result, late_run))
+        return False, None
+
+
+def _deliver_late(
+    future: Future,
+    context: contextvars.Context,
+    on_late_result: Callable[[Any], None],
+    late_run: LateRun
+) -> None:
+    try:
+        # Terminou (ou desistiu, ex: da vaga na faixa) depois do prazo estendido: abandonada
+        if not late_run.start_delivery():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"❌ Late run failed after deadline fallback: {error}", file=sys.stderr)
+            _count("late_failed")
+            return
+
+        def deliver():
+            # Entrega tardia já está fora do prazo da requisição
+            with request_deadline(seconds=0):
+                on_late_result(future.result())
+
+        try:
+            context.copy().run(deliver)
+            _count("late_delivered")
+        except Exception as e:
+            print(f"❌ Late delivery failed: {e}", file=sys.stderr)
+            _count("late_failed")
+    finally:
+        late_run.settle()
+
+
+def render_prometheus_metrics() -> str:
+    with _counters_lock:
+        counters = dict(_counters)
+    lines = [
+        "",
+        "# HELP falachefe_request_deadline_events_total Respostas de fallback no deadline e entregas tardias",
+        "# TYPE falachefe_request_deadline_events_total counter",
+    ]
+    for outcome, count in counters.items():
+        lines.append(f'falachefe_request_deadline_events_total{{event="{outcome}"}} {count}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,5 @@
+"""
+Roteamento do Falachefe
+Decide qual modelo (e, no futuro, qual fila/worker) atende cada mensagem
+"""
+
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Atalho para comandos estruturados de fluxo de caixa
+===================================================
+
+Mensagens como "recebi 500 de vendas hoje" ou "paguei R$ 1.200,00 de
+aluguel ontem" passavam pelo classificador + crew completo do
+financial_expert só para chamar AddCashflowTransactionTool uma vez.
+
+Aqui um parser local (sem LLM) extrai tipo, valor, data e categoria.
+Quando TODOS os campos são inequívocos, a transação é gravada direto pela
+ferramenta e a confirmação é montada por template. Qualquer ambiguidade
+(pergunta, dois valores, verbo de entrada e saída, categoria desconhecida)
+ou intenção diferente de registrar (negação, pedido para apagar/corrigir,
+oração condicional ou subordinada) devolve None e a mensagem segue o fluxo
+normal do crew.
+"""
+
+import re
+import unicodedata
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+# Verbos que definem o tipo da transação (texto sem acentos)
+ENTRADA_VERBS = (
+    "recebi", "recebemos", "vendi", "vendemos", "entrou", "entraram",
+    "ganhei", "ganhamos", "faturei", "faturamos",
+)
+SAIDA_VERBS = (
+    "paguei", "pagamos", "gastei", "gastamos", "comprei", "compramos",
+    "saiu", "sairam", "investi", "investimos",
+)
+
+# Palavra-chave → categoria (mesmos nomes usados pelo financial_expert)
+CATEGORY_KEYWORDS = {
+    "vendas": ("venda", "vendas", "vendi", "vendemos", "faturei", "faturamos", "faturamento"),
+    "servicos": ("servico", "servicos", "consultoria", "projeto"),
+    "aluguel": ("aluguel", "condominio"),
+    "salarios": ("salario", "salarios", "folha", "funcionario", "funcionarios", "13o", "ferias"),
+    "pro_labore": ("pro labore", "pro-labore", "prolabore"),
+    "fornecedores": ("fornecedor", "fornecedores", "mercadoria", "mercadorias", "estoque", "materia prima"),
+    "marketing": ("marketing", "anuncio", "anuncios", "propaganda", "instagram", "facebook", "google ads", "trafego"),
+    "impostos": ("imposto", "impostos", "guia do das", "das mei", "simples nacional", "iss", "icms", "inss"),
+    "contas_consumo": ("luz", "energia", "agua", "internet", "telefone", "celular", "gas"),
+    "transporte": ("gasolina", "combustivel", "uber", "frete", "estacionamento", "pedagio"),
+    "equipamentos": ("equipamento", "equipamentos", "maquina", "computador", "notebook", "ferramenta"),
+    "emprestimos": ("emprestimo", "financiamento", "parcela do banco"),
+}
+
+CATEGORY_LABELS = {
+    "vendas": "Vendas",
+    "servicos": "Serviços",
+    "aluguel": "Aluguel",
+    "salarios": "Salários",
+    "pro_labore": "Pró-labore",
+    "fornecedores": "Fornecedores",
+    "marketing": "Marketing",
+    "impostos": "Impostos",
+    "contas_consumo": "Contas de consumo",
+    "transporte": "Transporte",
+    "equipamentos": "Equipamentos",
+    "emprestimos": "Empréstimos",
+}
+
+# "não paguei", "ainda não recebi": o verbo aparece mas nada aconteceu
+NEGATION_WORDS = ("nao", "nunca", "jamais", "nem")
+# "apaga aquele gastei 50": o usuário quer mexer em uma transação existente
+CORRECTION_WORDS = (
+    "apaga", "apague", "apagar", "cancela", "cancele", "cancelar",
+    "corrige", "corrija", "corrigir", "estorna", "estorne", "estornar",
+    "exclui", "exclua", "excluir", "remove", "remova", "remover",
+    "desfaz", "desfaca", "desfazer", "errei", "errado", "errada",
+)
+# "quando eu vendi 300", "se eu gastar": contexto de outra pergunta ou hipótese
+SUBORDINATE_WORDS = ("quando", "se", "caso", "assim que", "depois que", "antes que", "enquanto")
+
+QUESTION_STARTS = ("como", "quanto", "quantos", "qual", "quais", "o que", "por que", "porque", "sera", "devo", "posso")
+
+# R$ 1.234,56 | 1234,56 | 1234.56 | 500 | 2 mil | 2k  (datas dd/mm são removidas antes)
+_AMOUNT = re.compile(
+    r"(?<![\w/])(?:r\$\s*)?(\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)(\s*(?:mil|k)\b)?(?![\w/])"
+)
+_DATE_DMY = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+_DATE_DAY = re.compile(r"\bdia (\d{1,2})\b")
+
+MAX_COMMAND_CHARS = 160
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c)).strip()
+
+
+def _has_word(text: str, words) -> bool:
+    return any(re.search(rf"\b{re.escape(word)}\b", text) for word in words)
+
+
+def parse_amount(token: str, multiplier: Optional[str] = None) -> float:
+    """'1.234,56' → 1234.56 | '45,90' → 45.9 | '1.500' → 1500 | '2' + 'mil' → 2000"""
+    if "," in token:
+        value = float(token.replace(".", "").replace(",", "."))
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", token):
+        value = float(token.replace(".", ""))
+    else:
+        value = float(token)
+    if multiplier and multiplier.strip() in ("mil", "k"):
+        value *= 1000
+    return value
+
+
+def _parse_date(text: str, today: date) -> Optional[date]:
+    """Data explícita da mensagem; hoje se nenhuma for citada, None se inválida"""
+    if re.search(r"\banteontem\b", text):
+        return today - timedelta(days=2)
+    if re.search(r"\bontem\b", text):
+        return today - timedelta(days=1)
+
+    match = _DATE_DMY.search(text)
+    if match:
+        day, month, year = match.groups()
+        year = int(year) if year else today.year
+        if year < 100:
+            year += 2000
+        try:
+            parsed = date(year, int(month), int(day))
+        except ValueError:
+            return None
+        return parsed if parsed <= today else None
+
+    match = _DATE_DAY.search(text)
+    if match:
+        try:
+            parsed = today.replace(day=int(match.group(1)))
+        except ValueError:
+            return None
+        return parsed if parsed <= today else None
+
+    return today
+
+
+def _parse_category(text: str) -> Optional[str]:
+    found = {category for category, words in CATEGORY_KEYWORDS.items() if _has_word(text, words)}
+    if len(found) == 1:
+        return found.pop()
+    # "vendi ... de serviço": o verbo de venda não conflita com a categoria citada
+    found.discard("vendas")
+    return found.pop() if len(found) == 1 else None
+
+
+def categorize_description(description: str) -> Optional[str]:
+    """Categoria por palavra-chave para textos livres (ex: histórico do extrato)"""
+    return _parse_category(_normalize(description or ""))
+
+
+def parse_cashflow_command(message: str, today: Optional[date] = None) -> Optional[dict]:
+    """
+    Extrai um comando de transação inequívoco.
+
+    Returns:
+        {"transaction_type", "amount", "category", "date" (YYYY-MM-DD), "description"}
+        ou None se a mensagem não for um comando claro
+    """
+    if not message or len(message) > MAX_COMMAND_CHARS or "?" in message:
+        return None
+
+    today = today or datetime.now().date()
+    text = _normalize(message)
+    if text.startswith(QUESTION_STARTS):
+        return None
+    if _has_word(text, NEGATION_WORDS + CORRECTION_WORDS + SUBORDINATE_WORDS):
+        return None
+
+    is_entrada = _has_word(text, ENTRADA_VERBS)
+    is_saida = _has_word(text, SAIDA_VERBS)
+    if is_entrada == is_saida:
+        return None
+
+    transaction_date = _parse_date(text, today)
+    if transaction_date is None:
+        return None
+
+    # Valor: exatamente um número fora de datas
+    without_dates = _DATE_DAY.sub(" ", _DATE_DMY.sub(" ", text))
+    amounts = _AMOUNT.findall(without_dates)
+    if len(amounts) != 1:
+        return None
+    amount = parse_amount(*amounts[0])
+    if amount <= 0:
+        return None
+
+    category = _parse_category(text)
+    if category is None:
+        return None
+
+    return {
+        "transaction_type": "entrada" if is_entrada else "saida",
+        "amount": round(amount, 2),
+        "category": category,
+        "date": transaction_date.strftime("%Y-%m-%d"),
+        "description": message.strip(),
+    }
+
+
+def format_brl(amount: float) -> str:
+    """1234.5 → 'R$ 1.234,50'"""
+    return "R$ " + f"{amount:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def format_command_confirmation(command: dict) -> str:
+    """Confirmação enviada ao usuário após gravar a transação"""
+    is_entrada = command["transaction_type"] == "entrada"
+    transaction_date = datetime.strptime(command["date"], "%Y-%m-%d").strftime("%d/%m/%Y")
+    return (
+        f"✅ {'Entrada' if is_entrada else 'Saída'} registrada!\n\n"
+        f"{'💰' if is_entrada else '💸'} {format_brl(command['amount'])}\n"
+        f"📁 {CATEGORY_LABELS.get(command['category'], command['category'])}\n"
+        f"📅 {transaction_date}\n\n"
+        "Se algo estiver errado, é só me avisar. Quer ver o saldo atualizado?"
+    )
+
+
+def execute_cashflow_command(user_id: str, command: dict) -> tuple:
+    """
+    Grava a transação direto pela ferramenta (sem crew).
+
+    Returns:
+        (texto para o usuário, sucesso: bool)
+    """
+    from ..tools.cashflow_tools import AddCashflowTransactionTool
+    from ..resilience.execution_budget import is_successful_tool_output
+
+    output = AddCashflowTransactionTool()._run(
+        user_id=user_id,
+        transaction_type=command["transaction_type"],
+        amount=command["amount"],
+        category=command["category"],
+        description=command["description"],
+        date=command["date"],
+    )
+
+    if is_successful_tool_output(output):
+        return format_command_confirmation(command), True
+    return output.strip(), False
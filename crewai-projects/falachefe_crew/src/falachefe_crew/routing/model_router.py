@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Roteador de modelos por tier
+============================
+
+Escolhe o modelo de cada execução de crew a partir de uma tabela de regras
+(config/model_routing.yaml) considerando especialista, task, confiança da
+classificação e tamanho da mensagem.
+
+- A maior parte do tráfego roda no tier "fast" (gpt-4o-mini)
+- Se a resposta do tier barato falhar na validação, a execução é repetida
+  no próximo tier de escalation_order (apenas regras com escalate: true)
+- Latência, tokens e custo estimado por tier ficam expostos no /metrics
+  e cada execução vai para o ledger de uso (observability.usage_ledger)
+"""
+
+import os
+import sys
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+from ..observability.usage_ledger import CREW, record_llm_usage
+
+MODEL_ROUTING_CONFIG = os.getenv(
+    "MODEL_ROUTING_CONFIG",
+    os.path.join(os.path.dirname(__file__), "..", "config", "model_routing.yaml")
+)
+
+# Respostas que indicam que o agente não concluiu a task
+_FAILED_OUTPUT_MARKERS = (
+    "agent stopped due to iteration limit or time limit",
+    "i now can give a great answer",
+)
+MIN_VALID_RESPONSE_CHARS = 20
+
+
+class ModelChoice:
+    """Resultado do roteamento: tier inicial, modelo e se pode escalar"""
+
+    def __init__(self, tier: str, model: str, escalate: bool, rule_index: int,
+                 specialist: Optional[str] = None, task: Optional[str] = None):
+        self.tier = tier
+        self.model = model
+        self.escalate = escalate
+        self.rule_index = rule_index
+        self.specialist = specialist
+        self.task = task
+
+    def __repr__(self) -> str:
+        return f"ModelChoice(tier={self.tier!r}, model={self.model!r}, escalate={self.escalate})"
+
+
+def validate_response(text: str) -> bool:
+    """Validação mínima da resposta final de um crew"""
+    normalized = (text or "").strip().lower()
+    if len(normalized) < MIN_VALID_RESPONSE_CHARS:
+        return False
+    return not any(marker in normalized for marker in _FAILED_OUTPUT_MARKERS)
+
+
+class ModelRouter:
+    """Política de tiers + métricas por tier"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.tiers: Dict[str, dict] = {}
+        for name, tier in config.get("tiers", {}).items():
+            tier = dict(tier)
+            tier["model"] = os.getenv(f"MODEL_TIER_{name.upper()}", tier["model"])
+            self.tiers[name] = tier
+        self.escalation_order: List[str] = config.get("escalation_order") or list(self.tiers)
+        self.rules: List[dict] = config.get("rules", [])
+        # Preços de modelos fora dos tiers (classificador, embeddings)
+        self.pricing: Dict[str, dict] = config.get("pricing", {})
+
+        self._lock = threading.Lock()
+        self._stats: Dict[tuple, Dict[str, float]] = {}
+        self._escalations: Dict[tuple, int] = {}
+
+    @classmethod
+    def from_yaml(cls, path: str = MODEL_ROUTING_CONFIG) -> "ModelRouter":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(yaml.safe_load(f) or {})
+
+    # ============================================
+    # SELEÇÃO
+    # ============================================
+
+    @staticmethod
+    def _matches(rule: dict, specialist: Optional[str], task: Optional[str],
+                 confidence: Optional[float], message_chars: int) -> bool:
+        if "specialist" in rule and rule["specialist"] != specialist:
+            return False
+        if "task" in rule and rule["task"] != task:
+            return False
+        if confidence is not None:
+            if "min_confidence" in rule and confidence < rule["min_confidence"]:
+                return False
+            if "max_confidence" in rule and confidence > rule["max_confidence"]:
+                return False
+        elif "min_confidence" in rule or "max_confidence" in rule:
+            return False
+        if "min_message_chars" in rule and message_chars < rule["min_message_chars"]:
+            return False
+        if "max_message_chars" in rule and message_chars > rule["max_message_chars"]:
+            return False
+        return True
+
+    def select(self, specialist: Optional[str] = None, task: Optional[str] = None,
+               confidence: Optional[float] = None, message: str = "") -> ModelChoice:
+        """Primeira regra que casar define o tier; sem regra → primeiro tier da escalada"""
+        for index, rule in enumerate(self.rules):
+            if self._matches(rule, specialist, task, confidence, len(message or "")):
+                tier = rule["tier"]
+                return ModelChoice(tier, self.tiers[tier]["model"], bool(rule.get("escalate", False)), index,
+                                   specialist, task)
+
+        tier = self.escalation_order[0]
+        return ModelChoice(tier, self.tiers[tier]["model"], False, -1, specialist, task)
+
+    def next_tier(self, tier: str) -> Optional[str]:
+        if tier not in self.escalation_order:
+            return None
+        position = self.escalation_order.index(tier)
+        if position + 1 < len(self.escalation_order):
+            return self.escalation_order[position + 1]
+        return None
+
+    # ============================================
+    # EXECUÇÃO COM ESCALADA
+    # ============================================
+
+    def run(self, choice: ModelChoice, run_fn: Callable[[str], Any],
+            validate: Callable[[str], bool] = validate_response) -> str:
+        """
+        Executa run_fn(model) no tier escolhido, escalando se a validação falhar.
+
+        run_fn retorna o CrewOutput (ou string); o texto final é retornado.
+        """
+        tier = choice.tier
+        while True:
+            model = self.tiers[tier]["model"]
+            start = time.time()
+            result = run_fn(model)
+            text = str(result.raw) if hasattr(result, "raw") else str(result)
+            latency = time.time() - start
+            token_usage = getattr(result, "token_usage", None)
+            self.record(tier, model, latency, token_usage)
+            record_llm_usage(
+                CREW, model,
+                getattr(token_usage, "prompt_tokens", 0),
+                getattr(token_usage, "completion_tokens", 0),
+                latency,
+                specialist=choice.specialist,
+                task=choice.task,
+                tier=tier
+            )
+
+            next_tier = self.next_tier(tier)
+            if validate(text) or not choice.escalate or next_tier is None:
+                return text
+
+            print(f"⬆️ Response from {model} failed validation, escalating {tier} → {next_tier}", file=sys.stderr)
+            with self._lock:
+                self._escalations[(tier, next_tier)] = self._escalations.get((tier, next_tier), 0) + 1
+            tier = next_tier
+
+    # ============================================
+    # MÉTRICAS
+    # ============================================
+
+    def model_price(self, model: str) -> dict:
+        """
+        Preço por 1M tokens de `model` (tiers primeiro, depois pricing).
+
+        Aceita o nome com sufixo de versão devolvido pela API
+        (gpt-4o-mini-2024-07-18 → gpt-4o-mini).
+        """
+        prices = dict(self.pricing)
+        for tier in self.tiers.values():
+            prices[tier["model"]] = tier
+        if model in prices:
+            return prices[model]
+        candidates = [name for name in prices if model and model.startswith(name + "-")]
+        return prices[max(candidates, key=len)] if candidates else {}
+
+    def record(self, tier: str, model: str, latency: float, token_usage: Any = None) -> None:
+        prompt_tokens = getattr(token_usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(token_usage, "completion_tokens", 0) or 0
+        tier_config = self.tiers.get(tier, {})
+        cost = (
+            prompt_tokens * tier_config.get("cost_per_1m_input", 0)
+            + completion_tokens * tier_config.get("cost_per_1m_output", 0)
+        ) / 1_000_000
+
+        with self._lock:
+            stats = self._stats.setdefault((tier, model), {
+                "calls": 0, "latency_sum": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0
+            })
+            stats["calls"] += 1
+            stats["latency_sum"] += latency
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cost_usd"] += cost
+
+    def render_prometheus_metrics(self) -> str:
+        with self._lock:
+            stats = {key: dict(value) for key, value in self._stats.items()}
+            escalations = dict(self._escalations)
+
+        lines = [
+            "",
+            "# HELP falachefe_model_tier_calls_total Execuções de crew por tier/modelo",
+            "# TYPE falachefe_model_tier_calls_total counter",
+        ]
+        for (tier, model), s in stats.items():
+            lines.append(f'falachefe_model_tier_calls_total{{tier="{tier}",model="{model}"}} {s["calls"]}')
+        lines += [
+            "# HELP falachefe_model_tier_latency_seconds_sum Tempo total de execução por tier",
+            "# TYPE falachefe_model_tier_latency_seconds_sum counter",
+        ]
+        for (tier, model), s in stats.items():
+            lines.append(f'falachefe_model_tier_latency_seconds_sum{{tier="{tier}",model="{model}"}} {s["latency_sum"]:.3f}')
+        lines += [
+            "# HELP falachefe_model_tier_tokens_total Tokens consumidos por tier",
+            "# TYPE falachefe_model_tier_tokens_total counter",
+        ]
+        for (tier, model), s in stats.items():
+            for kind in ("prompt", "completion"):
+                lines.append(f'falachefe_model_tier_tokens_total{{tier="{tier}",model="{model}",kind="{kind}"}} {s[kind + "_tokens"]}')
+        lines += [
+            "# HELP falachefe_model_tier_cost_usd_total Custo estimado (USD) por tier",
+            "# TYPE falachefe_model_tier_cost_usd_total counter",
+        ]
+        for (tier, model), s in stats.items():
+            lines.append(f'falachefe_model_tier_cost_usd_total{{tier="{tier}",model="{model}"}} {s["cost_usd"]:.6f}')
+        lines += [
+            "# HELP falachefe_model_tier_escalations_total Escaladas para tier mais forte",
+            "# TYPE falachefe_model_tier_escalations_total counter",
+        ]
+        for (source, target), count in escalations.items():
+            lines.append(f'falachefe_model_tier_escalations_total{{from="{source}",to="{target}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter.from_yaml()
+    return _router
+
+
+def select_model(specialist: Optional[str] = None, task: Optional[str] = None,
+                 confidence: Optional[float] = None, message: str = "") -> str:
+    """Atalho: apenas o nome do modelo escolhido"""
+    return get_model_router().select(specialist, task, confidence, message).model
+
+
+def routed_agent(agent, model: str):
+    """
+    Cópia do agente usando `model`.
+
+    Os agentes do FalachefeCrew são memoizados e compartilhados entre threads;
+    alterar o llm do original afetaria requisições concorrentes.
+    """
+    from ..caching.llm_cache import cached_llm
+    from ..observability.structured_logging import crew_verbose
+
+    routed = agent.copy()
+    routed.llm = cached_llm(model, enabled=not agent.tools)
+    routed.verbose = crew_verbose()
+    return routed
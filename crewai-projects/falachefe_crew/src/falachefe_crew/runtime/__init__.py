@@ -0,0 +1,4 @@
+"""
+Runtime do Falachefe
+Topologia de processos do api_server (workers do gunicorn com estado pré-carregado)
+"""
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Workers do gunicorn com estado pré-carregado
+============================================
+
+Com preload (gunicorn.conf.py) o master importa o api_server uma vez:
+configs YAML, FalachefeCrew com agentes/tasks/ferramentas já instanciados
+e o roteador de modelos. Os workers nascem por fork e compartilham essas
+páginas copy-on-write em vez de cada um montar o próprio crew.
+
+- default_worker_count(): workers pelo limite de CPU e de memória do
+  container (cgroup v1/v2), GUNICORN_WORKERS sobrescreve
+- warm_crew_state(): instancia agentes e tasks no master antes do fork
+- freeze_shared_heap(): tira o heap pré-carregado do GC (gc.freeze) para
+  as coletas dos workers não sujarem as páginas compartilhadas
+- WorkerMemoryGuard: teto de memória privada por worker; acima dele o
+  worker termina as requisições em andamento e o master sobe outro
+"""
+
+import gc
+import os
+import sys
+import math
+import time
+from typing import Optional
+
+import psutil
+
+# Memória privada esperada por worker em regime (crew em execução, caches)
+WORKER_MEMORY_MB = int(os.getenv("WORKER_MEMORY_MB", "300"))
+# Fração da memória do container disponível para os processos do gunicorn
+WORKER_MEMORY_FRACTION = float(os.getenv("WORKER_MEMORY_FRACTION", "0.8"))
+# Teto de memória privada por worker (0 = sem reciclagem por memória)
+WORKER_MAX_PRIVATE_MB = int(os.getenv("WORKER_MAX_PRIVATE_MB", "1024"))
+WORKER_MEMORY_CHECK_SECONDS = float(os.getenv("WORKER_MEMORY_CHECK_SECONDS", "5"))
+# Agentes e tasks instanciados no import do api_server (compartilhados pelos workers)
+WARM_CREW_STATE = os.getenv("WARM_CREW_STATE", "true").lower() == "true"
+
+_MB = 1024 * 1024
+
+
+# ============================================
+# DIMENSIONAMENTO
+# ============================================
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def available_cpus() -> float:
+    """CPUs do processo (afinidade) limitadas pela quota do cgroup"""
+    try:
+        cpus: float = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    cpu_max = _read_first_line("/sys/fs/cgroup/cpu.max")  # cgroup v2: "<quota> <period>" ou "max <period>"
+    if cpu_max and not cpu_max.startswith("max"):
+        limit, period = cpu_max.split()[:2]
+        quota = int(limit) / int(period)
+    else:
+        limit = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")  # cgroup v1
+        period = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if limit and period and int(limit) > 0:
+            quota = int(limit) / int(period)
+
+    return min(cpus, quota) if quota else cpus
+
+
+def memory_limit_bytes() -> int:
+    """Memória do container (limite do cgroup) ou da máquina"""
+    total = psutil.virtual_memory().total
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value = _read_first_line(path)
+        if value and value.isdigit():
+            # cgroup v1 sem limite reporta um valor enorme
+            return min(int(value), total)
+    return total
+
+
+def default_worker_count(
+    cpus: Optional[float] = None,
+    memory_bytes: Optional[int] = None,
+    worker_memory_mb: int = WORKER_MEMORY_MB,
+    memory_fraction: float = WORKER_MEMORY_FRACTION
+) -> int:
+    """
+    min(2 × CPUs + 1, workers que cabem na memória).
+
+    O tráfego é dominado por espera de LLM (threads por worker); processos
+    extras cobrem o trabalho de CPU sob o GIL. Na conta de memória o master
+    (estado pré-carregado) ocupa o equivalente a um worker.
+    """
+    cpus = available_cpus() if cpus is None else cpus
+    memory_bytes = memory_limit_bytes() if memory_bytes is None else memory_bytes
+
+    by_cpu = 2 * max(1, math.ceil(cpus)) + 1
+    by_memory = int(memory_bytes * memory_fraction / (worker_memory_mb * _MB)) - 1
+    return max(1, min(by_cpu, by_memory))
+
+
+def resolve_worker_count(value: str) -> int:
+    """GUNICORN_WORKERS: número fixo ou "auto" """
+    if value and value.strip().lower() != "auto":
+        return max(1, int(value))
+    workers = default_worker_count()
+    print(
+        f"⚙️ Gunicorn workers: {workers} (auto: {available_cpus():g} CPUs, "
+        f"{memory_limit_bytes() / _MB:.0f} MB, ~{WORKER_MEMORY_MB} MB/worker)",
+        file=sys.stderr
+    )
+    return workers
+
+
+# ============================================
+# ESTADO COMPARTILHADO (MASTER)
+# ============================================
+
+def warm_crew_state(crew) -> int:
+    """
+    Instancia todos os agentes (com ferramentas) e tasks do crew.
+
+    Os métodos @agent/@task do CrewBase são memoizados: chamados no master,
+    os objetos ficam prontos e compartilhados em todos os workers.
+    """
+    from ..routing.model_router import get_model_router
+
+    get_model_router()
+    warmed = 0
+    for name in list(crew.agents_config) + list(crew.tasks_config):
+        method = getattr(crew, name, None)
+        if callable(method):
+            method()
+            warmed += 1
+    return warmed
+
+
+def freeze_shared_heap() -> None:
+    """Move os objetos já carregados para a geração permanente do GC"""
+    gc.collect()
+    gc.freeze()
+
+
+# ============================================
+# MEMÓRIA POR WORKER
+# ============================================
+
+def process_memory() -> dict:
+    """
+    Memória do processo atual em bytes.
+
+    private: páginas só deste processo (USS); shared: páginas ainda
+    compartilhadas com o master e outros workers (copy-on-write).
+    """
+    try:
+        values = {}
+        with open("/proc/self/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Private_Clean", "Private_Dirty"):
+                    values[key] = int(rest.split()[0]) * 1024
+        private = values["Private_Clean"] + values["Private_Dirty"]
+        return {"rss": values["Rss"], "private": private, "shared": values["Rss"] - private}
+    except (OSError, KeyError, ValueError):
+        rss = psutil.Process().memory_info().rss
+        return {"rss": rss, "private": rss, "shared": 0}
+
+
+class WorkerMemoryGuard:
+    """Verifica (no máximo a cada check_seconds) se o worker passou do teto"""
+
+    def __init__(self, max_private_mb: int = WORKER_MAX_PRIVATE_MB,
+                 check_seconds: float = WORKER_MEMORY_CHECK_SECONDS):
+        self.max_private_bytes = max_private_mb * _MB
+        self.check_seconds = check_seconds
+        self._last_check = 0.0
+
+    def exceeded(self) -> Optional[int]:
+        """Memória privada em bytes se passou do teto; None caso contrário"""
+        if self.max_private_bytes <= 0:
+            return None
+        now = time.monotonic()
+        if now - self._last_check < self.check_seconds:
+            return None
+        self._last_check = now
+        private = process_memory()["private"]
+        return private if private > self.max_private_bytes else None
+
+
+def render_prometheus_metrics() -> str:
+    memory = process_memory()
+    return f"""
+# HELP falachefe_worker_memory_bytes Memória do worker que atendeu o scrape (private = USS, shared = copy-on-write)
+# TYPE falachefe_worker_memory_bytes gauge
+falachefe_worker_memory_bytes{{kind="private"}} {memory['private']}
+falachefe_worker_memory_bytes{{kind="shared"}} {memory['shared']}
+
+# HELP falachefe_worker_memory_limit_bytes Teto de memória privada antes da reciclagem (0 = desligado)
+# TYPE falachefe_worker_memory_limit_bytes gauge
+falachefe_worker_memory_limit_bytes {max(WORKER_MAX_PRIVATE_MB, 0) * _MB}
+"""
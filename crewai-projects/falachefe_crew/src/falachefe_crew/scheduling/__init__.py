@@ -0,0 +1,5 @@
+"""
+Agendamento de trabalho do Falachefe
+Controla quando e em que ordem as mensagens dos usuários viram execuções de crew
+"""
+
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Fair share entre clientes
+=========================
+
+Um único usuário pesado ocupava todas as threads com pedidos longos em
+sequência no /process, e a latência de toda a base dependia dele.
+
+- Token buckets por usuário e por empresa (kv_store: Redis compartilhado
+  entre réplicas; em memória no processo sem REDIS_URL), cobrados uma vez
+  por lote coalescido, logo antes de processá-lo: uma rajada de 4 mensagens
+  curtas que vira um crew custa 1 token. Sem saldo o lote é descartado e o
+  usuário recebe o pedido para reenviar depois de N segundos (WhatsApp pela
+  UAZAPI, chat web na própria resposta); nada reentrega o /process, então
+  um 429 só perderia a mensagem em silêncio.
+- Weighted fair queuing nas faixas de prioridade: com a faixa cheia, a
+  vaga livre vai para o cliente com a menor tag de término virtual, não
+  para quem chegou primeiro. Quem tem dez crews esperando não passa na
+  frente de quem tem um; FAIR_SHARE_WEIGHTS dá peso maior a um cliente.
+
+Empresa: companyId do payload (raiz ou context); sem ele, o próprio
+usuário (cada cadastro do onboarding é uma empresa).
+"""
+
+import os
+import sys
+import time
+import heapq
+import itertools
+import threading
+import contextlib
+import contextvars
+from typing import Dict, Optional, Tuple
+
+from ..storage.kv_store import get_kv_store, kv_key
+
+FAIR_SHARE_ENABLED = os.getenv("FAIR_SHARE_ENABLED", "true").lower() == "true"
+# Mensagens por minuto (reposição) e rajada (capacidade) de cada bucket
+USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", "10"))
+USER_BURST = float(os.getenv("USER_BURST", "5"))
+COMPANY_RATE_PER_MINUTE = float(os.getenv("COMPANY_RATE_PER_MINUTE", "30"))
+COMPANY_BURST = float(os.getenv("COMPANY_BURST", "15"))
+# Pesos no fair queuing: "<companyId ou userId>=<peso>,..." (padrão 1)
+FAIR_SHARE_WEIGHTS = os.getenv("FAIR_SHARE_WEIGHTS", "")
+# Piso da espera pedida ao usuário antes de reenviar
+BUSY_MIN_RETRY_AFTER_SECONDS = int(os.getenv("BUSY_MIN_RETRY_AFTER_SECONDS", "5"))
+
+BUSY_MESSAGE = (
+    "Você enviou muitas mensagens em pouco tempo e não consegui processar a última. "
+    "Aguarde {seconds} segundos e envie novamente."
+)
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    weights = {}
+    for item in raw.split(","):
+        key, _, value = item.partition("=")
+        if key.strip() and value.strip():
+            weights[key.strip()] = max(float(value), 0.01)
+    return weights
+
+
+_weights = _parse_weights(FAIR_SHARE_WEIGHTS)
+
+
+# ============================================
+# CLIENTES
+# ============================================
+
+def tenant_keys(data: dict) -> Tuple[str, str]:
+    """(usuário, empresa) do payload do /process"""
+    context = data.get('context') or {}
+    user_key = str(data.get('userId') or data.get('phoneNumber', ''))
+    company_key = data.get('companyId') or context.get('companyId') or user_key
+    return user_key, str(company_key)
+
+
+def tenant_weight(user_key: str, company_key: str) -> float:
+    return _weights.get(company_key) or _weights.get(user_key) or 1.0
+
+
+_current_tenant: contextvars.ContextVar = contextvars.ContextVar("falachefe_tenant", default=None)
+
+
+@contextlib.contextmanager
+def tenant_scope(data: dict):
+    """Cliente (empresa + peso) das execuções de crew do bloco (fair queuing das faixas)"""
+    user_key, company_key = tenant_keys(data)
+    token = _current_tenant.set((company_key, tenant_weight(user_key, company_key)))
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def current_tenant() -> Tuple[str, float]:
+    """(empresa, peso) do escopo atual; fora de tenant_scope todos dividem um fluxo"""
+    return _current_tenant.get() or ("", 1.0)
+
+
+# ============================================
+# RATE LIMITING (TOKEN BUCKETS)
+# ============================================
+
+class RateLimiter:
+    """Buckets de usuário e empresa consumidos juntos (os dois ou nenhum)"""
+
+    def __init__(
+        self,
+        user_rate_per_minute: float = USER_RATE_PER_MINUTE,
+        user_burst: float = USER_BURST,
+        company_rate_per_minute: float = COMPANY_RATE_PER_MINUTE,
+        company_burst: float = COMPANY_BURST
+    ):
+        self.user_rate = user_rate_per_minute / 60
+        self.user_burst = user_burst
+        self.company_rate = company_rate_per_minute / 60
+        self.company_burst = company_burst
+        self._lock = threading.Lock()
+        self.counters = {"admitted": 0, "limited": 0, "error": 0}
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.counters[outcome] += 1
+
+    def check(self, data: dict) -> float:
+        """0 se o lote entra (consome 1 token); senão segundos até o cliente ter saldo"""
+        user_key, company_key = tenant_keys(data)
+        buckets = [(kv_key("ratelimit", "user", user_key), self.user_rate, self.user_burst)]
+        if company_key != user_key:
+            buckets.append((kv_key("ratelimit", "company", company_key), self.company_rate, self.company_burst))
+        try:
+            wait = get_kv_store().take_tokens(buckets)
+        except Exception as e:
+            # Redis fora: deixa passar (as faixas ainda limitam a concorrência)
+            print(f"⚠️ Rate limiter unavailable, admitting: {e}", file=sys.stderr)
+            self._count("error")
+            return 0.0
+        self._count("limited" if wait > 0 else "admitted")
+        return wait
+
+    def render_prometheus_metrics(self) -> str:
+        lines = [
+            "",
+            "# HELP falachefe_rate_limit_requests_total Lotes coalescidos por resultado do rate limit",
+            "# TYPE falachefe_rate_limit_requests_total counter",
+        ]
+        lines += [
+            f'falachefe_rate_limit_requests_total{{outcome="{outcome}"}} {count}'
+            for outcome, count in self.counters.items()
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def busy_retry_after(wait: float) -> int:
+    """Segundos inteiros que o usuário deve esperar antes de reenviar"""
+    return max(BUSY_MIN_RETRY_AFTER_SECONDS, int(wait + 0.999))
+
+
+def busy_message(wait: float) -> str:
+    """Aviso de lote descartado pelo rate limit, com o tempo para reenviar"""
+    return BUSY_MESSAGE.format(seconds=busy_retry_after(wait))
+
+
+# ============================================
+# WEIGHTED FAIR QUEUING
+# ============================================
+
+class FairQueue:
+    """
+    Vagas limitadas entregues por weighted fair queuing entre clientes.
+
+    Cada pedido recebe start = max(tempo virtual, última tag do cliente) e
+    finish = start + 1/peso; a vaga livre vai para o menor finish. O tempo
+    virtual avança com o start de quem entra, então cliente ocioso não
+    acumula crédito.
+    """
+
+    # Tags abaixo do tempo virtual não mudam nada; limpeza acima deste tamanho
+    _MAX_TAGS = 1024
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._cond = threading.Condition()
+        self._busy = 0
+        self._waiting: list = []  # heap de (finish, seq, start)
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._finish_tags: Dict[str, float] = {}
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def acquire(self, tenant: str, weight: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Espera a vez do cliente; False se o timeout passar antes"""
+        with self._cond:
+            previous = self._finish_tags.get(tenant)
+            start = max(self._virtual_time, previous or 0.0)
+            entry = (start + 1.0 / weight, next(self._seq), start)
+            self._finish_tags[tenant] = entry[0]
+            heapq.heappush(self._waiting, entry)
+
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._busy >= self.capacity or self._waiting[0] is not entry:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    if self._finish_tags.get(tenant) == entry[0]:
+                        if previous is None:
+                            del self._finish_tags[tenant]
+                        else:
+                            self._finish_tags[tenant] = previous
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._busy += 1
+            self._virtual_time = max(self._virtual_time, start)
+            if len(self._finish_tags) > self._MAX_TAGS:
+                self._finish_tags = {
+                    key: tag for key, tag in self._finish_tags.items() if tag > self._virtual_time
+                }
+            # O próximo da fila pode caber em outra vaga livre
+            self._cond.notify_all()
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            self._busy -= 1
+            self._cond.notify_all()
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+
+def check_rate_limit(data: dict) -> float:
+    """Atalho: 0 se o lote entra (ou FAIR_SHARE_ENABLED=false); senão a espera em segundos"""
+    if not FAIR_SHARE_ENABLED:
+        return 0.0
+    return get_rate_limiter().check(data)
+
+
+def render_prometheus_metrics() -> str:
+    return get_rate_limiter().render_prometheus_metrics()
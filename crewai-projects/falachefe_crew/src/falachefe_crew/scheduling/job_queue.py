@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+"""
+Fila de jobs do /process (escala horizontal)
+============================================
+
+Com PROCESS_MODE=queue o api_server vira ingress sem estado: valida a
+assinatura, o payload e a deduplicação, enfileira a mensagem e responde
+202. Nós crew_worker.py (quantas réplicas forem necessárias) consomem a
+fila e rodam o mesmo fluxo do /process síncrono.
+
+Redis Streams (REDIS_URL), com o prefixo do KV store:
+
+    jobs:<p>            partição p = hash(usuário) % JOB_QUEUE_PARTITIONS
+    jobs:lease:<p>      dono da partição (um consumidor por vez → ordem por usuário)
+    jobs:workers        heartbeat dos consumidores (sorted set)
+    jobs:dead           dead-letter
+    jobs:result:<id>    resposta do job (o chat web espera por ela)
+
+- Cada consumidor fica com até min(CREW_WORKER_CONCURRENCY,
+  ⌈partições / consumidores vivos⌉) partições e devolve as excedentes
+  quando entram réplicas novas (capacidade = réplicas × concorrência, até
+  o número de partições)
+- Entradas entregues a um consumidor sem heartbeat, ou paradas há mais de
+  JOB_VISIBILITY_TIMEOUT_SECONDS, são reassumidas pelo dono da partição
+  antes de qualquer entrada nova
+- Mensagens seguidas do mesmo usuário (WhatsApp) são coalescidas em um
+  único crew, como no modo síncrono
+- Jobs que falham JOB_MAX_ATTEMPTS vezes ou são reentregues mais de
+  JOB_MAX_DELIVERIES vezes (worker morrendo no meio) vão para o dead-letter
+- queue_stats(): lag, idade da entrada mais antiga e réplicas sugeridas
+  para o autoscaling (/metrics)
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import socket
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional
+
+from ..storage.kv_store import kv_key
+from .message_coalescer import COALESCE_WINDOW_SECONDS, should_coalesce
+
+JOB_QUEUE_PARTITIONS = int(os.getenv("JOB_QUEUE_PARTITIONS", "16"))
+JOB_QUEUE_GROUP = os.getenv("JOB_QUEUE_GROUP", "crew-workers")
+JOB_STREAM_MAXLEN = int(os.getenv("JOB_STREAM_MAXLEN", "100000"))
+JOB_DEAD_LETTER_MAXLEN = int(os.getenv("JOB_DEAD_LETTER_MAXLEN", "10000"))
+# Maior que o orçamento de um crew: entrada parada há mais tempo é reassumida
+JOB_VISIBILITY_TIMEOUT_SECONDS = float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "300"))
+JOB_MAX_DELIVERIES = int(os.getenv("JOB_MAX_DELIVERIES", "3"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))
+JOB_READ_COUNT = int(os.getenv("JOB_READ_COUNT", "5"))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "600"))
+CREW_WORKER_CONCURRENCY = int(os.getenv("CREW_WORKER_CONCURRENCY", "4"))
+# Jobs esperando por slot de consumidor a partir do qual sugerir mais réplicas
+JOB_TARGET_BACKLOG_PER_SLOT = float(os.getenv("JOB_TARGET_BACKLOG_PER_SLOT", "2"))
+JOB_STATS_CACHE_SECONDS = 5.0
+
+# Renova/libera a lease apenas se ainda for do consumidor
+_RENEW_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_DELETE_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _entry_order(entry_id: str) -> tuple:
+    millis, _, seq = entry_id.partition("-")
+    return int(millis), int(seq or 0)
+
+
+class JobQueue:
+    """Partições (streams), leases, resultados e dead-letter"""
+
+    WORKERS_KEY = kv_key("jobs", "workers")
+    DEAD_KEY = kv_key("jobs", "dead")
+
+    def __init__(self, redis_client, partitions: int = JOB_QUEUE_PARTITIONS, group: str = JOB_QUEUE_GROUP):
+        self.redis = redis_client
+        self.partitions = partitions
+        self.group = group
+        self._renew = redis_client.register_script(_RENEW_IF_OWNER)
+        self._release = redis_client.register_script(_DELETE_IF_OWNER)
+        self._groups_ready = False
+        self._stats_lock = threading.Lock()
+        self._stats_cache = (0.0, None)
+
+    @staticmethod
+    def stream_key(partition: int) -> str:
+        return kv_key("jobs", str(partition))
+
+    @staticmethod
+    def lease_key(partition: int) -> str:
+        return kv_key("jobs", "lease", str(partition))
+
+    @staticmethod
+    def result_key(job_id: str) -> str:
+        return kv_key("jobs", "result", job_id)
+
+    def partition_for(self, user_key: str) -> int:
+        """Hash estável (igual em todos os nós) → mesma partição para o mesmo usuário"""
+        digest = hashlib.sha1((user_key or "").encode("utf-8")).hexdigest()
+        return int(digest[:8], 16) % self.partitions
+
+    def ensure_groups(self, force: bool = False) -> None:
+        if self._groups_ready and not force:
+            return
+        from redis.exceptions import ResponseError
+
+        for partition in range(self.partitions):
+            try:
+                self.redis.xgroup_create(self.stream_key(partition), self.group, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+        self._groups_ready = True
+
+    # ============================================
+    # INGRESS
+    # ============================================
+
+    def enqueue(self, payload: dict, user_key: str, inbound_id: Optional[str] = None,
+                request_id: Optional[str] = None) -> dict:
+        self.ensure_groups()
+        partition = self.partition_for(user_key)
+        job = {
+            "id": uuid.uuid4().hex,
+            "partition": partition,
+            "user_key": user_key,
+            "inbound_id": inbound_id,
+            "request_id": request_id,
+            "enqueued_at": time.time(),
+            "payload": payload,
+        }
+        self.redis.xadd(
+            self.stream_key(partition), {"job": json.dumps(job, ensure_ascii=False)},
+            maxlen=JOB_STREAM_MAXLEN, approximate=True
+        )
+        return job
+
+    def set_result(self, job_id: str, body: dict, status: int) -> None:
+        self.redis.set(
+            self.result_key(job_id), json.dumps({"body": body, "status": status}, ensure_ascii=False),
+            px=int(JOB_RESULT_TTL_SECONDS * 1000)
+        )
+
+    def wait_result(self, job_id: str, timeout: float, poll_interval: float = 0.25) -> Optional[dict]:
+        """{"body", "status"} do job ou None se não terminou dentro de timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            raw = self.redis.get(self.result_key(job_id))
+            if raw:
+                return json.loads(raw)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    # ============================================
+    # LEASES E DEAD-LETTER
+    # ============================================
+
+    def acquire_lease(self, partition: int, consumer: str) -> bool:
+        return bool(self.redis.set(self.lease_key(partition), consumer, nx=True, px=int(JOB_LEASE_SECONDS * 1000)))
+
+    def renew_lease(self, partition: int, consumer: str) -> bool:
+        return bool(self._renew(keys=[self.lease_key(partition)], args=[consumer, int(JOB_LEASE_SECONDS * 1000)]))
+
+    def release_lease(self, partition: int, consumer: str) -> None:
+        self._release(keys=[self.lease_key(partition)], args=[consumer])
+
+    def live_consumers(self) -> List[str]:
+        return self.redis.zrangebyscore(self.WORKERS_KEY, time.time() - JOB_LEASE_SECONDS, "+inf")
+
+    def dead_letter(self, partition: int, entries: List[dict], error: str) -> None:
+        """Move as entradas para jobs:dead e confirma (XACK) na partição"""
+        pipe = self.redis.pipeline()
+        for entry in entries:
+            pipe.xadd(self.DEAD_KEY, {
+                "job": json.dumps(entry["job"], ensure_ascii=False),
+                "partition": str(partition),
+                "deliveries": str(entry["deliveries"]),
+                "error": error[:1000],
+                "failed_at": str(time.time()),
+            }, maxlen=JOB_DEAD_LETTER_MAXLEN, approximate=True)
+        pipe.xack(self.stream_key(partition), self.group, *[entry["entry_id"] for entry in entries])
+        pipe.execute()
+
+    def requeue_dead(self, limit: Optional[int] = None) -> int:
+        """Reenfileira jobs do dead-letter (após corrigir a causa); retorna quantos"""
+        requeued = 0
+        for entry_id, fields in self.redis.xrange(self.DEAD_KEY, count=limit):
+            job = json.loads(fields["job"])
+            self.enqueue(job["payload"], job["user_key"], job.get("inbound_id"), job.get("request_id"))
+            self.redis.xdel(self.DEAD_KEY, entry_id)
+            requeued += 1
+        return requeued
+
+    # ============================================
+    # SINAIS PARA AUTOSCALING
+    # ============================================
+
+    def stats(self) -> dict:
+        """Lag e idade da fila (cache de JOB_STATS_CACHE_SECONDS: /metrics não martela o Redis)"""
+        with self._stats_lock:
+            cached_at, cached = self._stats_cache
+            if cached is not None and time.monotonic() - cached_at < JOB_STATS_CACHE_SECONDS:
+                return cached
+        stats = self._collect_stats()
+        with self._stats_lock:
+            self._stats_cache = (time.monotonic(), stats)
+        return stats
+
+    def _collect_stats(self) -> dict:
+        from redis.exceptions import ResponseError
+
+        now = time.time()
+        backlog = in_flight = owned = 0
+        oldest: Optional[float] = None
+        for partition in range(self.partitions):
+            stream = self.stream_key(partition)
+            try:
+                groups = self.redis.xinfo_groups(stream)
+            except ResponseError:
+                continue  # partição ainda sem stream
+            info = next((group for group in groups if group["name"] == self.group), None)
+            if info is None:
+                continue
+            last_delivered = info["last-delivered-id"]
+            lag = info.get("lag")
+            if lag is None:
+                # Redis < 7 (ou lag indeterminado): conta as entradas não entregues
+                lag = len(self.redis.xrange(stream, f"({last_delivered}", "+", count=10000))
+            backlog += lag
+            in_flight += info["pending"]
+
+            first_ids = []
+            if info["pending"]:
+                first_ids.append(self.redis.xpending(stream, self.group)["min"])
+            if lag:
+                first = self.redis.xrange(stream, f"({last_delivered}", "+", count=1)
+                if first:
+                    first_ids.append(first[0][0])
+            for entry_id in first_ids:
+                enqueued = _entry_order(entry_id)[0] / 1000
+                oldest = enqueued if oldest is None else min(oldest, enqueued)
+            if self.redis.exists(self.lease_key(partition)):
+                owned += 1
+
+        slots = max(CREW_WORKER_CONCURRENCY, 1)
+        max_useful = math.ceil(self.partitions / slots)
+        desired = math.ceil((backlog + in_flight) / (slots * JOB_TARGET_BACKLOG_PER_SLOT))
+        return {
+            "partitions": self.partitions,
+            "partitions_owned": owned,
+            "backlog": backlog,
+            "in_flight": in_flight,
+            "oldest_age_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+            "consumers": len(self.live_consumers()),
+            "dead_letters": self.redis.xlen(self.DEAD_KEY),
+            "desired_workers": min(max(desired, 1), max_useful),
+        }
+
+    def render_prometheus_metrics(self) -> str:
+        try:
+            stats = self.stats()
+        except Exception as e:
+            print(f"⚠️ Job queue stats unavailable: {e}", file=sys.stderr)
+            return ""
+        return f"""
+# HELP falachefe_job_queue_backlog Jobs enfileirados ainda não entregues a um crew worker (lag)
+# TYPE falachefe_job_queue_backlog gauge
+falachefe_job_queue_backlog {stats['backlog']}
+
+# HELP falachefe_job_queue_in_flight Jobs entregues e ainda não confirmados
+# TYPE falachefe_job_queue_in_flight gauge
+falachefe_job_queue_in_flight {stats['in_flight']}
+
+# HELP falachefe_job_queue_oldest_age_seconds Idade do job mais antigo não confirmado
+# TYPE falachefe_job_queue_oldest_age_seconds gauge
+falachefe_job_queue_oldest_age_seconds {stats['oldest_age_seconds']}
+
+# HELP falachefe_job_queue_dead_letters Jobs no dead-letter
+# TYPE falachefe_job_queue_dead_letters gauge
+falachefe_job_queue_dead_letters {stats['dead_letters']}
+
+# HELP falachefe_job_queue_consumers Crew workers com heartbeat
+# TYPE falachefe_job_queue_consumers gauge
+falachefe_job_queue_consumers {stats['consumers']}
+
+# HELP falachefe_job_queue_partitions_owned Partições com dono (das {stats['partitions']})
+# TYPE falachefe_job_queue_partitions_owned gauge
+falachefe_job_queue_partitions_owned {stats['partitions_owned']}
+
+# HELP falachefe_job_queue_desired_workers Réplicas de crew worker sugeridas pelo backlog
+# TYPE falachefe_job_queue_desired_workers gauge
+falachefe_job_queue_desired_workers {stats['desired_workers']}
+"""
+
+
+# ============================================
+# CONSUMIDOR (crew_worker.py)
+# ============================================
+
+class CrewWorker:
+    """
+    Consumidor da fila: leases de partições e uma thread por partição.
+
+    handler(jobs) → (body, status) roda o /process para um lote do mesmo
+    usuário; on_dead_letter(jobs, error) → (body, status) avisa o usuário
+    quando o lote desiste.
+    """
+
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        handler: Callable[[List[dict]], tuple],
+        on_dead_letter: Optional[Callable[[List[dict], str], tuple]] = None,
+        concurrency: int = CREW_WORKER_CONCURRENCY,
+        heartbeat_file: Optional[str] = None
+    ):
+        self.queue = job_queue
+        self.redis = job_queue.redis
+        self.handler = handler
+        self.on_dead_letter = on_dead_letter
+        self.concurrency = concurrency
+        self.heartbeat_file = heartbeat_file
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._threads: Dict[int, threading.Thread] = {}
+        self._releasing: set = set()
+        self._lost: set = set()
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        """Para após os lotes em andamento (SIGTERM)"""
+        self._stopping.set()
+
+    def run(self) -> None:
+        self.queue.ensure_groups()
+        print(f"👷 Crew worker {self.consumer} started ({self.concurrency} partitions max)", file=sys.stderr)
+        while not self._stopping.is_set():
+            try:
+                self._rebalance()
+            except Exception as e:
+                print(f"⚠️ Job queue rebalance failed: {e}", file=sys.stderr)
+            self._stopping.wait(JOB_LEASE_SECONDS / 3)
+
+        with self._lock:
+            threads = list(self._threads.values())
+        for thread in threads:
+            thread.join()
+        try:
+            self.redis.zrem(JobQueue.WORKERS_KEY, self.consumer)
+        except Exception as e:
+            print(f"⚠️ Crew worker deregistration failed: {e}", file=sys.stderr)
+        print(f"👋 Crew worker {self.consumer} stopped", file=sys.stderr)
+
+    # ============================================
+    # LEASES
+    # ============================================
+
+    def _rebalance(self) -> None:
+        now = time.time()
+        self.redis.zadd(JobQueue.WORKERS_KEY, {self.consumer: now})
+        self.redis.zremrangebyscore(JobQueue.WORKERS_KEY, "-inf", now - JOB_LEASE_SECONDS)
+        live = max(len(self.queue.live_consumers()), 1)
+
+        with self._lock:
+            owned = [p for p in self._threads if p not in self._lost]
+        for partition in owned:
+            if not self.queue.renew_lease(partition, self.consumer):
+                print(f"⚠️ Lost lease of partition {partition}", file=sys.stderr)
+                with self._lock:
+                    self._lost.add(partition)
+
+        target = min(self.concurrency, math.ceil(self.queue.partitions / live))
+        with self._lock:
+            active = [p for p in self._threads if p not in self._lost and p not in self._releasing]
+            # Réplicas novas: devolve as excedentes (a thread termina o que já leu)
+            for partition in active[target:]:
+                self._releasing.add(partition)
+            active = active[:target]
+
+        if len(active) < target:
+            for partition in random.sample(range(self.queue.partitions), self.queue.partitions):
+                if len(active) >= target:
+                    break
+                with self._lock:
+                    if partition in self._threads:
+                        continue
+                if self.queue.acquire_lease(partition, self.consumer):
+                    self._start_partition(partition)
+                    active.append(partition)
+
+        if self.heartbeat_file:
+            with open(self.heartbeat_file, "w") as f:
+                f.write(str(now))
+
+    def _start_partition(self, partition: int) -> None:
+        thread = threading.Thread(target=self._consume, args=(partition,), name=f"job-partition-{partition}", daemon=True)
+        with self._lock:
+            self._threads[partition] = thread
+        thread.start()
+
+    # ============================================
+    # CONSUMO DE UMA PARTIÇÃO
+    # ============================================
+
+    def _consume(self, partition: int) -> None:
+        buffer: List[dict] = []
+        try:
+            while True:
+                with self._lock:
+                    lost = partition in self._lost
+                    draining = partition in self._releasing
+                if lost or self._stopping.is_set() or (draining and not buffer):
+                    return
+                try:
+                    if not draining:
+                        if not self._reclaim(partition, buffer):
+                            # Entradas de outro consumidor ainda dentro da visibilidade: esperar (ordem)
+                            self._stopping.wait(1)
+                            continue
+                        if not buffer:
+                            buffer.extend(self._read(partition, block_ms=2000))
+                    if buffer:
+                        self._process(partition, self._take_batch(partition, buffer, draining))
+                except Exception as e:
+                    if "NOGROUP" in str(e):
+                        self.queue.ensure_groups(force=True)
+                    print(f"⚠️ Job partition {partition} loop failed: {e}", file=sys.stderr)
+                    self._stopping.wait(1)
+        finally:
+            with self._lock:
+                lost = partition in self._lost
+                self._threads.pop(partition, None)
+                self._releasing.discard(partition)
+                self._lost.discard(partition)
+            if not lost:
+                try:
+                    self.queue.release_lease(partition, self.consumer)
+                except Exception as e:
+                    print(f"⚠️ Lease release failed (partition {partition}): {e}", file=sys.stderr)
+
+    def _read(self, partition: int, block_ms: Optional[int] = None) -> List[dict]:
+        response = self.redis.xreadgroup(
+            self.queue.group, self.consumer, {self.queue.stream_key(partition): ">"},
+            count=JOB_READ_COUNT, block=block_ms
+        )
+        return [
+            {"entry_id": entry_id, "job": json.loads(fields["job"]), "deliveries": 1}
+            for _stream, items in response or []
+            for entry_id, fields in items
+        ]
+
+    def _reclaim(self, partition: int, buffer: List[dict]) -> bool:
+        """
+        Reassume entradas pendentes da partição: de consumidores sem heartbeat
+        na hora, dos demais (e as próprias fora do buffer) após a visibilidade.
+
+        Returns:
+            False se ainda há entradas de outro consumidor que não podem ser
+            reassumidas (a partição espera para não furar a ordem)
+        """
+        stream = self.queue.stream_key(partition)
+        summary = self.redis.xpending(stream, self.queue.group)
+        if not summary["pending"]:
+            return True
+
+        alive = set(self.queue.live_consumers())
+        buffered = {entry["entry_id"] for entry in buffer}
+        visibility_ms = int(JOB_VISIBILITY_TIMEOUT_SECONDS * 1000)
+        waiting = False
+        reclaimed: List[dict] = []
+        for consumer in summary["consumers"]:
+            name = consumer["name"]
+            min_idle = 0 if name not in alive else visibility_ms
+            pending = self.redis.xpending_range(
+                stream, self.queue.group, min="-", max="+", count=1000, consumername=name, idle=min_idle
+            )
+            pending = [entry for entry in pending if entry["message_id"] not in buffered]
+            if name != self.consumer and len(pending) < int(consumer["pending"]):
+                waiting = True
+            if not pending:
+                continue
+            deliveries = {entry["message_id"]: entry["times_delivered"] + 1 for entry in pending}
+            claimed = self.redis.xclaim(
+                stream, self.queue.group, self.consumer, min_idle_time=min_idle, message_ids=list(deliveries)
+            )
+            for entry_id, fields in claimed:
+                if fields:
+                    reclaimed.append({
+                        "entry_id": entry_id, "job": json.loads(fields["job"]), "deliveries": deliveries[entry_id]
+                    })
+            if name != self.consumer and name not in alive and len(pending) == int(consumer["pending"]):
+                self.redis.xgroup_delconsumer(stream, self.queue.group, name)
+
+        if reclaimed:
+            poison = [entry for entry in reclaimed if entry["deliveries"] > JOB_MAX_DELIVERIES]
+            if poison:
+                print(f"☠️ {len(poison)} job(s) redelivered more than {JOB_MAX_DELIVERIES} times → dead-letter", file=sys.stderr)
+                self._give_up(partition, poison, f"redelivered more than {JOB_MAX_DELIVERIES} times")
+            retry = [entry for entry in reclaimed if entry["deliveries"] <= JOB_MAX_DELIVERIES]
+            if retry:
+                print(f"♻️ Reclaimed {len(retry)} job(s) in partition {partition}", file=sys.stderr)
+            buffer.extend(retry)
+            buffer.sort(key=lambda entry: _entry_order(entry["entry_id"]))
+        return not waiting
+
+    def _take_batch(self, partition: int, buffer: List[dict], draining: bool) -> List[dict]:
+        """
+        Primeira entrada do buffer + as seguintes do mesmo usuário (WhatsApp),
+        esperando a janela de coalescência contada a partir do enfileiramento.
+        """
+        first = buffer[0]
+        batch = [first]
+        if should_coalesce(first["job"]["payload"]):
+            wait = first["job"]["enqueued_at"] + COALESCE_WINDOW_SECONDS - time.time()
+            if wait > 0 and not draining:
+                self._stopping.wait(wait)
+                buffer.extend(self._read(partition))
+            for entry in buffer[1:]:
+                if entry["job"]["user_key"] != first["job"]["user_key"]:
+                    continue
+                if not should_coalesce(entry["job"]["payload"]):
+                    break
+                batch.append(entry)
+        for entry in batch:
+            buffer.remove(entry)
+        return batch
+
+    def _process(self, partition: int, batch: List[dict]) -> None:
+        jobs = [entry["job"] for entry in batch]
+        error = None
+        for attempt in range(1, JOB_MAX_ATTEMPTS + 1):
+            try:
+                body, status = self.handler(jobs)
+                break
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"❌ Job {jobs[-1]['id']} failed (attempt {attempt}/{JOB_MAX_ATTEMPTS}): {error}", file=sys.stderr)
+                if attempt < JOB_MAX_ATTEMPTS:
+                    self._stopping.wait(2 ** attempt)
+        else:
+            self._give_up(partition, batch, error)
+            return
+
+        for job in jobs:
+            self.queue.set_result(job["id"], body, status)
+        self.redis.xack(self.queue.stream_key(partition), self.queue.group, *[entry["entry_id"] for entry in batch])
+
+    def _give_up(self, partition: int, batch: List[dict], error: str) -> None:
+        jobs = [entry["job"] for entry in batch]
+        body, status = {"success": False, "error": error}, 500
+        if self.on_dead_letter:
+            try:
+                body, status = self.on_dead_letter(jobs, error)
+            except Exception as e:
+                print(f"⚠️ Dead-letter callback failed: {e}", file=sys.stderr)
+        for job in jobs:
+            self.queue.set_result(job["id"], body, status)
+        self.queue.dead_letter(partition, batch, error)
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Fila compartilhada (singleton por processo); exige REDIS_URL"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                redis_url = os.getenv("REDIS_URL")
+                if not redis_url:
+                    raise RuntimeError("REDIS_URL not configured (required by the job queue)")
+                import redis
+
+                # Timeout acima do bloqueio do XREADGROUP (2s)
+                _queue = JobQueue(redis.Redis.from_url(redis_url, decode_responses=True, socket_timeout=10))
+    return _queue
+
+
+def render_prometheus_metrics() -> str:
+    try:
+        return get_job_queue().render_prometheus_metrics()
+    except Exception as e:
+        print(f"⚠️ Job queue metrics unavailable: {e}", file=sys.stderr)
+        return ""
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Coalescência de mensagens por usuário
+=====================================
+
+No WhatsApp o usuário costuma mandar 3-4 mensagens curtas seguidas
+("oi", "vendi 200", "no pix"). Cada uma chega como um /process separado e,
+sem coordenação, gera um crew por mensagem, às vezes fora de ordem e com
+respostas contraditórias.
+
+Fluxo de cada requisição:
+1. submit: a mensagem entra no buffer do usuário e recebe um ticket
+2. espera a janela de debounce (COALESCE_WINDOW_SECONDS)
+3. se chegou mensagem mais nova, esta requisição encerra sem rodar crew
+   (a mais nova responde por todas)
+4. a última adquire o lock do usuário (um crew por usuário por vez),
+   drena o buffer em ordem de chegada e roda um único crew
+
+O buffer guarda também o id de deduplicação de cada mensagem (inbound_dedup):
+quem drena o lote responde por todas e marca (ou libera) os ids de todas.
+
+Com Redis (REDIS_URL) o buffer e o lock valem entre workers e réplicas;
+sem Redis valem apenas dentro do processo.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import contextlib
+from typing import List, Optional, Tuple
+
+from ..storage.kv_store import get_kv_store, kv_key
+
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+COALESCE_WINDOW_SECONDS = float(os.getenv("COALESCE_WINDOW_SECONDS", "1.5"))
+# Maior que o timeout do gunicorn (120s) e que REQUEST_DEADLINE_SECONDS + DEADLINE_LATE_RUN_SECONDS
+# (160s, crew tardio segura o lock até entregar) para o lock não expirar com crew em execução
+COALESCE_LOCK_TTL_SECONDS = float(os.getenv("COALESCE_LOCK_TTL_SECONDS", "180"))
+COALESCE_LOCK_WAIT_SECONDS = float(os.getenv("COALESCE_LOCK_WAIT_SECONDS", "110"))
+COALESCE_POLL_SECONDS = 0.1
+
+
+class MessageCoalescer:
+    """Buffer + lock por usuário sobre o KV store compartilhado"""
+
+    def __init__(
+        self,
+        store=None,
+        window: float = COALESCE_WINDOW_SECONDS,
+        lock_ttl: float = COALESCE_LOCK_TTL_SECONDS,
+        lock_wait: float = COALESCE_LOCK_WAIT_SECONDS,
+        poll_interval: float = COALESCE_POLL_SECONDS
+    ):
+        self.store = store or get_kv_store()
+        self.window = window
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.poll_interval = poll_interval
+
+    # Chaves no store
+    def _buffer_key(self, user_key: str) -> str:
+        return kv_key("coalesce", user_key, "buffer")
+
+    def _ticket_key(self, user_key: str) -> str:
+        return kv_key("coalesce", user_key, "ticket")
+
+    def _lock_key(self, user_key: str) -> str:
+        return kv_key("coalesce", user_key, "lock")
+
+    def submit(self, user_key: str, payload: dict, inbound_id: Optional[str] = None) -> int:
+        """Adiciona a mensagem (e seu id de deduplicação) ao buffer e retorna o ticket (ordem de chegada)"""
+        ttl = self.window + self.lock_ttl
+        entry = json.dumps({"payload": payload, "inboundId": inbound_id})
+        self.store.rpush(self._buffer_key(user_key), entry, ttl=ttl)
+        return self.store.incr(self._ticket_key(user_key), ttl=ttl)
+
+    def is_latest(self, user_key: str, ticket: int) -> bool:
+        """True se nenhuma mensagem mais nova chegou depois deste ticket"""
+        current = self.store.get(self._ticket_key(user_key))
+        return current is None or int(current) <= ticket
+
+    def try_lock(self, user_key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if self.store.set_nx(self._lock_key(user_key), token, ttl=self.lock_ttl):
+            return token
+        return None
+
+    def release(self, user_key: str, token: Optional[str]) -> None:
+        if token:
+            self.store.delete_if_equals(self._lock_key(user_key), token)
+
+    def drain(self, user_key: str) -> Tuple[List[dict], List[str]]:
+        """Retira todas as mensagens pendentes, na ordem de chegada: (payloads, ids de deduplicação)"""
+        entries = [json.loads(item) for item in self.store.pop_all(self._buffer_key(user_key))]
+        payloads = [entry["payload"] for entry in entries]
+        inbound_ids = [entry["inboundId"] for entry in entries if entry.get("inboundId")]
+        return payloads, inbound_ids
+
+    def acquire(self, user_key: str) -> Optional[str]:
+        """Espera o lock do usuário (até lock_wait); None se não conseguir"""
+        deadline = time.monotonic() + self.lock_wait
+        while True:
+            token = self.try_lock(user_key)
+            if token or time.monotonic() >= deadline:
+                return token
+            time.sleep(self.poll_interval)
+
+    async def aacquire(self, user_key: str) -> Optional[str]:
+        """Versão assíncrona de acquire (KV store síncrono fora do event loop)"""
+        deadline = time.monotonic() + self.lock_wait
+        while True:
+            token = await asyncio.to_thread(self.try_lock, user_key)
+            if token or time.monotonic() >= deadline:
+                return token
+            await asyncio.sleep(self.poll_interval)
+
+    def _take_turn(self, user_key: str, token: Optional[str]) -> Optional[Tuple[List[dict], List[str]]]:
+        if not token:
+            print(f"⚠️ Coalesce lock wait expired for {user_key}, processing without lock", file=sys.stderr)
+        batch, inbound_ids = self.drain(user_key)
+        if not batch:
+            # Outra requisição já drenou e respondeu por esta mensagem
+            self.release(user_key, token)
+            return None
+        if len(batch) > 1:
+            print(f"🧩 Coalesced {len(batch)} messages for {user_key}", file=sys.stderr)
+        return batch, inbound_ids
+
+    @contextlib.contextmanager
+    def turn(self, user_key: str, payload: dict, inbound_id: Optional[str] = None):
+        """
+        Vez do usuário de rodar o crew.
+
+        Produz (payloads a responder em ordem de chegada, ids de deduplicação
+        deles) com o lock mantido durante o bloco, ou None se outra
+        requisição responderá (e cuidará do inbound_id desta).
+        """
+        ticket = self.submit(user_key, payload, inbound_id)
+        time.sleep(self.window)
+
+        if not self.is_latest(user_key, ticket):
+            yield None
+            return
+
+        token = self.acquire(user_key)
+        batch = self._take_turn(user_key, token)
+        if batch is None:
+            yield None
+            return
+        try:
+            yield batch
+        finally:
+            self.release(user_key, token)
+
+    @contextlib.asynccontextmanager
+    async def aturn(self, user_key: str, payload: dict, inbound_id: Optional[str] = None):
+        """Versão assíncrona de turn (para o asgi_server); com Redis cada chamada ao store é I/O bloqueante"""
+        ticket = await asyncio.to_thread(self.submit, user_key, payload, inbound_id)
+        await asyncio.sleep(self.window)
+
+        if not await asyncio.to_thread(self.is_latest, user_key, ticket):
+            yield None
+            return
+
+        token = await self.aacquire(user_key)
+        batch = await asyncio.to_thread(self._take_turn, user_key, token)
+        if batch is None:
+            yield None
+            return
+        try:
+            yield batch
+        finally:
+            await asyncio.to_thread(self.release, user_key, token)
+
+
+def merge_payloads(batch: List[dict]) -> dict:
+    """
+    Junta as mensagens do lote em um único payload.
+
+    Usa o payload mais recente como base (contexto atual) e concatena os
+    textos em ordem de chegada.
+    """
+    merged = dict(batch[-1])
+    merged['message'] = "\n".join(p.get('message', '') for p in batch if p.get('message'))
+    if len(batch) > 1:
+        merged['coalescedCount'] = len(batch)
+    return merged
+
+
+_coalescer: Optional[MessageCoalescer] = None
+
+
+def get_coalescer() -> MessageCoalescer:
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = MessageCoalescer()
+    return _coalescer
+
+
+def should_coalesce(data: dict) -> bool:
+    """Apenas WhatsApp: o chat web espera a resposta no próprio HTTP response"""
+    context = data.get('context') or {}
+    return COALESCE_ENABLED and context.get('source') != 'web-chat'
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Faixas de prioridade para execuções de crew
+===========================================
+
+Saudações da Ana (segundos) disputavam as mesmas threads que planos de
+marketing de 60s: em horário comercial as mensagens curtas ficavam atrás
+das longas (head-of-line) e puxavam o p95 para cima.
+
+Logo depois da classificação (que escolhe a task e portanto a faixa), a
+mensagem ocupa uma vaga na faixa durante perfil, status financeiro, cache
+semântico e crew, com cota própria de execuções simultâneas por processo:
+
+- quick: recepção/triagem (sem cota por padrão, nunca espera)
+- tools: financial_expert (ferramentas que leem/gravam o fluxo de caixa)
+- long:  planos longos (marketing/vendas, RH)
+
+Faixa cheia: a mensagem espera a vez (nada reentrega o /process, então
+rejeitar perderia a mensagem). A espera conta no deadline da requisição:
+passado o prazo o usuário recebe a resposta de fallback e a mensagem
+continua esperando a vaga em segundo plano (request_deadline), mas só até
+o prazo estendido da execução tardia (slot(time_left=...)): depois disso a
+resposta seria abandonada, então a mensagem desiste da vaga
+(LaneTimeoutError) em vez de rodar o crew para ninguém. O servidor ASGI
+usa também um executor por faixa.
+
+Com as cotas de tools + long abaixo de GUNICORN_THREADS sempre sobra
+thread para a faixa quick.
+
+Com a faixa cheia a ordem de entrada é por weighted fair queuing entre
+clientes (fair_share.FairQueue), não por ordem de chegada.
+"""
+
+import os
+import sys
+import time
+import threading
+import contextlib
+from typing import Callable, Dict, Optional
+
+from .fair_share import FairQueue, current_tenant
+
+QUICK = "quick"
+TOOLS = "tools"
+LONG = "long"
+LANES = (QUICK, TOOLS, LONG)
+
+# Cota de execuções simultâneas por processo (0 = sem limite)
+LANE_QUICK_CONCURRENCY = int(os.getenv("LANE_QUICK_CONCURRENCY", "0"))
+LANE_TOOLS_CONCURRENCY = int(os.getenv("LANE_TOOLS_CONCURRENCY", "3"))
+LANE_LONG_CONCURRENCY = int(os.getenv("LANE_LONG_CONCURRENCY", "2"))
+
+# Task de tasks.yaml → faixa (task desconhecida vai para long)
+LANE_BY_TASK = {
+    "reception_and_triage": QUICK,
+    "financial_advice": TOOLS,
+    "marketing_sales_plan": LONG,
+    "hr_guidance": LONG,
+}
+
+
+def lane_for_task(task_name: Optional[str]) -> str:
+    """Faixa da task; None (resposta padrão, sem crew) é quick"""
+    if task_name is None:
+        return QUICK
+    return LANE_BY_TASK.get(task_name, LONG)
+
+
+class LaneTimeoutError(Exception):
+    """O prazo acabou antes de a mensagem conseguir uma vaga na faixa"""
+
+
+class Lane:
+    """Vagas da faixa (fair queuing por cliente) + métricas de espera e execução"""
+
+    def __init__(self, name: str, max_concurrent: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self._queue = FairQueue(max_concurrent) if max_concurrent > 0 else None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.timed_out = 0
+        self.wait_seconds_sum = 0.0
+        self.run_seconds_sum = 0.0
+
+    def acquire(self, time_left: Optional[Callable[[], float]] = None) -> float:
+        """
+        Espera e ocupa uma vaga; retorna o tempo de espera.
+
+        time_left: segundos restantes para esperar, relido a cada espera
+        vencida (o prazo pode ser estendido enquanto a mensagem espera).
+
+        Raises:
+            LaneTimeoutError: o prazo acabou antes da vaga (ou junto com ela)
+        """
+        start = time.monotonic()
+        if self._queue is not None:
+            tenant, weight = current_tenant()
+            with self._lock:
+                self.waiting += 1
+            try:
+                while not self._queue.acquire(tenant, weight, None if time_left is None else time_left()):
+                    if time_left() <= 0:
+                        self._timeout()
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        if time_left is not None and time_left() <= 0:
+            if self._queue is not None:
+                self._queue.release()
+            self._timeout()
+        waited = time.monotonic() - start
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+            self.wait_seconds_sum += waited
+        return waited
+
+    def _timeout(self) -> None:
+        with self._lock:
+            self.timed_out += 1
+        raise LaneTimeoutError(f"Lane {self.name}: deadline passed while waiting for a slot")
+
+    def release(self, run_seconds: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.run_seconds_sum += run_seconds
+        if self._queue is not None:
+            self._queue.release()
+
+
+class PriorityLanes:
+    """As três faixas do processo"""
+
+    def __init__(self, concurrency: Optional[Dict[str, int]] = None):
+        concurrency = concurrency or {
+            QUICK: LANE_QUICK_CONCURRENCY,
+            TOOLS: LANE_TOOLS_CONCURRENCY,
+            LONG: LANE_LONG_CONCURRENCY,
+        }
+        self.lanes: Dict[str, Lane] = {name: Lane(name, concurrency.get(name, 0)) for name in LANES}
+
+    @contextlib.contextmanager
+    def slot(self, lane_name: str, time_left: Optional[Callable[[], float]] = None):
+        lane = self.lanes[lane_name]
+        waited = lane.acquire(time_left)
+        if waited >= 0.5:
+            print(f"🛣️ Lane {lane_name}: waited {waited:.1f}s for a slot", file=sys.stderr)
+        start = time.monotonic()
+        try:
+            yield lane
+        finally:
+            lane.release(time.monotonic() - start)
+
+    def render_prometheus_metrics(self) -> str:
+        lanes = list(self.lanes.values())
+        lines = [
+            "",
+            "# HELP falachefe_lane_concurrency_limit Cota de crews simultâneos por faixa (0 = sem limite)",
+            "# TYPE falachefe_lane_concurrency_limit gauge",
+        ]
+        lines += [f'falachefe_lane_concurrency_limit{{lane="{lane.name}"}} {lane.max_concurrent}' for lane in lanes]
+        lines += [
+            "# HELP falachefe_lane_in_flight Mensagens ocupando vaga por faixa",
+            "# TYPE falachefe_lane_in_flight gauge",
+        ]
+        lines += [f'falachefe_lane_in_flight{{lane="{lane.name}"}} {lane.in_flight}' for lane in lanes]
+        lines += [
+            "# HELP falachefe_lane_waiting Mensagens esperando vaga por faixa",
+            "# TYPE falachefe_lane_waiting gauge",
+        ]
+        lines += [f'falachefe_lane_waiting{{lane="{lane.name}"}} {lane.waiting}' for lane in lanes]
+        lines += [
+            "# HELP falachefe_lane_requests_total Mensagens admitidas por faixa",
+            "# TYPE falachefe_lane_requests_total counter",
+        ]
+        lines += [f'falachefe_lane_requests_total{{lane="{lane.name}"}} {lane.admitted}' for lane in lanes]
+        lines += [
+            "# HELP falachefe_lane_timeouts_total Mensagens que desistiram da vaga no fim do prazo por faixa",
+            "# TYPE falachefe_lane_timeouts_total counter",
+        ]
+        lines += [f'falachefe_lane_timeouts_total{{lane="{lane.name}"}} {lane.timed_out}' for lane in lanes]
+        lines += [
+            "# HELP falachefe_lane_wait_seconds_sum Tempo total esperando vaga por faixa",
+            "# TYPE falachefe_lane_wait_seconds_sum counter",
+        ]
+        lines += [f'falachefe_lane_wait_seconds_sum{{lane="{lane.name}"}} {lane.wait_seconds_sum:.3f}' for lane in lanes]
+        lines += [
+            "# HELP falachefe_lane_run_seconds_sum Tempo total de execução por faixa",
+            "# TYPE falachefe_lane_run_seconds_sum counter",
+        ]
+        lines += [f'falachefe_lane_run_seconds_sum{{lane="{lane.name}"}} {lane.run_seconds_sum:.3f}' for lane in lanes]
+        return "\n".join(lines) + "\n"
+
+
+_lanes: Optional[PriorityLanes] = None
+_lanes_lock = threading.Lock()
+
+
+def get_priority_lanes() -> PriorityLanes:
+    global _lanes
+    if _lanes is None:
+        with _lanes_lock:
+            if _lanes is None:
+                _lanes = PriorityLanes()
+    return _lanes
+
+
+def lane_slot(lane_name: str, time_left: Optional[Callable[[], float]] = None):
+    """Atalho: vaga na faixa do processo (context manager)"""
+    return get_priority_lanes().slot(lane_name, time_left)
+
+
+def render_prometheus_metrics() -> str:
+    return get_priority_lanes().render_prometheus_metrics()
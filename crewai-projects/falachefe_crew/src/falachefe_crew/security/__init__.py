@@ -0,0 +1,5 @@
+"""
+Segurança das requisições de entrada do Falachefe
+Verificação de assinatura do QStash, proteção contra reentregas e
+validação das URLs de arquivos baixados (SSRF)
+"""
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Validação de URLs de arquivos baixados pelo servidor
+====================================================
+
+O /import baixa o arquivo de `fileUrl` informado no payload. Sem
+validação, qualquer URL vira uma requisição feita de dentro da rede do
+servidor (SSRF): metadados da nuvem (169.254.169.254), Redis, serviços
+internos do docker-compose.
+
+Regras:
+- apenas https
+- host na lista IMPORT_ALLOWED_HOSTS (ou subdomínio); padrão: hosts da
+  UAZAPI (mídia do WhatsApp) e do Supabase (storage)
+- todos os endereços resolvidos são públicos (sem rede privada, loopback,
+  link-local ou reservados), verificado no momento do download
+- sem redirecionamentos (o destino do redirect não passaria pelas regras)
+"""
+
+import os
+import socket
+import ipaddress
+from typing import Iterable, List, Optional
+from urllib.parse import urlparse
+
+
+def _host_of(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+
+def _default_allowed_hosts() -> List[str]:
+    hosts = [
+        _host_of(os.getenv("UAZAPI_BASE_URL", "https://falachefe.uazapi.com")),
+        _host_of(os.getenv("SUPABASE_URL", "https://zpdartuyaergbxmbmtur.supabase.co")),
+    ]
+    return [host for host in hosts if host]
+
+
+# Hosts permitidos, separados por vírgula (subdomínios incluídos)
+IMPORT_ALLOWED_HOSTS = [
+    host.strip().lower()
+    for host in os.getenv("IMPORT_ALLOWED_HOSTS", ",".join(_default_allowed_hosts())).split(",")
+    if host.strip()
+]
+
+
+class UnsafeFileUrlError(ValueError):
+    """URL de arquivo fora das regras de download"""
+
+
+def file_url_error(url: str, allowed_hosts: Optional[Iterable[str]] = None) -> Optional[str]:
+    """Motivo da recusa da URL (esquema e host), ou None se permitida; não consulta DNS"""
+    parsed = urlparse(url or "")
+    if parsed.scheme != "https":
+        return "fileUrl must use https"
+    host = (parsed.hostname or "").lower()
+    allowed = IMPORT_ALLOWED_HOSTS if allowed_hosts is None else list(allowed_hosts)
+    if not host or not any(host == entry or host.endswith("." + entry) for entry in allowed):
+        return "fileUrl host is not allowed"
+    return None
+
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def ensure_public_host(url: str) -> None:
+    """Resolve o host da URL e recusa se algum endereço não for público"""
+    parsed = urlparse(url)
+    try:
+        infos = socket.getaddrinfo(parsed.hostname, parsed.port or 443, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise UnsafeFileUrlError(f"Cannot resolve {parsed.hostname}: {e}")
+    addresses = {info[4][0] for info in infos}
+    if not addresses or not all(is_public_address(address) for address in addresses):
+        raise UnsafeFileUrlError(f"{parsed.hostname} resolves to a non-public address")
+
+
+def check_file_url(url: str, allowed_hosts: Optional[Iterable[str]] = None) -> None:
+    """Regras completas (esquema, host e endereços); UnsafeFileUrlError se recusada"""
+    error = file_url_error(url, allowed_hosts)
+    if error:
+        raise UnsafeFileUrlError(error)
+    ensure_public_host(url)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Deduplicação de mensagens recebidas
+===================================
+
+A UAZAPI às vezes dispara o mesmo webhook duas vezes (e uma entrega pelo
+QStash, se usada, pode se repetir). Cada cópia rodava o crew inteiro de
+novo (tokens + worker) e mandava uma segunda resposta no WhatsApp.
+
+Antes de qualquer chamada a LLM, o id da mensagem é reservado no KV store
+compartilhado:
+
+    inbound:<id> = "processing"  (TTL curto: libera se o worker morrer)
+    inbound:<id> = "done"        (TTL longo, após responder)
+
+Falhas liberam o id: nenhum retry automático depende disso, mas uma nova
+cópia da mesma mensagem (webhook repetido, reenvio) volta a ser processada
+em vez de ficar bloqueada até o TTL.
+"""
+
+import os
+import sys
+from typing import Mapping, Optional
+
+from ..storage.kv_store import get_kv_store, kv_key
+
+INBOUND_DEDUP_TTL_SECONDS = float(os.getenv("INBOUND_DEDUP_TTL_SECONDS", str(24 * 3600)))
+INBOUND_PROCESSING_TTL_SECONDS = float(os.getenv("INBOUND_PROCESSING_TTL_SECONDS", "600"))
+
+PROCESSING = "processing"
+DONE = "done"
+
+
+def inbound_message_id(data: dict, headers: Mapping) -> Optional[str]:
+    """messageId da UAZAPI (repete em webhooks duplicados) ou id da entrega no QStash"""
+    message_id = (data or {}).get('messageId')
+    if message_id:
+        return f"msg:{message_id}"
+    delivery_id = headers.get('Upstash-Message-Id')
+    if delivery_id:
+        return f"qstash:{delivery_id}"
+    return None
+
+
+def claim_inbound_message(message_id: Optional[str]) -> Optional[str]:
+    """
+    Reserva a mensagem para processamento.
+
+    Returns:
+        None se a reserva foi feita (processar); "processing"/"done" se é duplicada
+    """
+    if not message_id:
+        return None
+    try:
+        store = get_kv_store()
+        key = kv_key("inbound", message_id)
+        if store.set_nx(key, PROCESSING, ttl=INBOUND_PROCESSING_TTL_SECONDS):
+            return None
+        return store.get(key) or PROCESSING
+    except Exception as e:
+        # Sem KV, processa (preferível a descartar mensagens)
+        print(f"⚠️ Inbound dedup unavailable: {e}", file=sys.stderr)
+        return None
+
+
+def complete_inbound_message(message_id: Optional[str]) -> None:
+    if not message_id:
+        return
+    try:
+        get_kv_store().set(kv_key("inbound", message_id), DONE, ttl=INBOUND_DEDUP_TTL_SECONDS)
+    except Exception as e:
+        print(f"⚠️ Inbound dedup write failed: {e}", file=sys.stderr)
+
+
+def release_inbound_message(message_id: Optional[str]) -> None:
+    if not message_id:
+        return
+    try:
+        get_kv_store().delete_if_equals(kv_key("inbound", message_id), PROCESSING)
+    except Exception as e:
+        print(f"⚠️ Inbound dedup release failed: {e}", file=sys.stderr)
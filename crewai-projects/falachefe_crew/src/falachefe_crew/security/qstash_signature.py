@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Verificação de assinatura do QStash
+===================================
+
+O QStash assina cada entrega com um JWT (HS256) no header Upstash-Signature,
+usando a chave de assinatura atual ou a próxima (rotação de chaves).
+Ref: https://upstash.com/docs/qstash/features/security
+
+Claims verificados:
+- iss == "Upstash"
+- exp / nbf (com tolerância de relógio)
+- body == base64url(sha256(corpo da requisição))
+- sub == URL de destino (apenas se `url` for informada: atrás de proxy a
+  URL vista pelo servidor difere da publicada no QStash)
+
+Implementado com hmac/hashlib da biblioteca padrão (sem dependência de JWT).
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import base64
+import hashlib
+from typing import Iterable, Optional
+
+QSTASH_CLOCK_TOLERANCE_SECONDS = int(os.getenv("QSTASH_CLOCK_TOLERANCE_SECONDS", "60"))
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def verify_qstash_jwt(token: Optional[str], body: bytes, signing_keys: Iterable[str],
+                      url: Optional[str] = None, now: Optional[float] = None) -> bool:
+    """True se o JWT for válido para o corpo recebido com alguma das chaves"""
+    if not token:
+        return False
+
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+        signature = _b64url_decode(signature_segment)
+        header = json.loads(_b64url_decode(header_segment))
+        claims = json.loads(_b64url_decode(payload_segment))
+    except (ValueError, TypeError):
+        print("⚠️ QStash signature: malformed JWT", file=sys.stderr)
+        return False
+    # JSON válido mas não objeto (ex: "[]") ou exp/nbf não numéricos
+    if not isinstance(header, dict) or not isinstance(claims, dict) or not all(
+        isinstance(claims.get(name, 0), (int, float)) for name in ("exp", "nbf")
+    ):
+        print("⚠️ QStash signature: malformed JWT", file=sys.stderr)
+        return False
+
+    if header.get("alg") != "HS256":
+        print(f"⚠️ QStash signature: unexpected alg {header.get('alg')}", file=sys.stderr)
+        return False
+
+    signed = f"{header_segment}.{payload_segment}".encode("ascii")
+    if not any(
+        hmac.compare_digest(hmac.new(key.encode("utf-8"), signed, hashlib.sha256).digest(), signature)
+        for key in signing_keys if key
+    ):
+        print("⚠️ QStash signature: invalid signature", file=sys.stderr)
+        return False
+
+    now = time.time() if now is None else now
+    if claims.get("iss") != "Upstash":
+        print("⚠️ QStash signature: invalid issuer", file=sys.stderr)
+        return False
+    if now > claims.get("exp", 0) + QSTASH_CLOCK_TOLERANCE_SECONDS:
+        print("⚠️ QStash signature: token expired", file=sys.stderr)
+        return False
+    if now + QSTASH_CLOCK_TOLERANCE_SECONDS < claims.get("nbf", 0):
+        print("⚠️ QStash signature: token not yet valid", file=sys.stderr)
+        return False
+
+    if url and claims.get("sub") != url:
+        print(f"⚠️ QStash signature: unexpected subject {claims.get('sub')}", file=sys.stderr)
+        return False
+
+    # O QStash envia o hash com ou sem padding; compara sem
+    body_hash = _b64url_encode(hashlib.sha256(body or b"").digest())
+    if not hmac.compare_digest(str(claims.get("body", "")).rstrip("="), body_hash):
+        print("⚠️ QStash signature: body hash mismatch", file=sys.stderr)
+        return False
+
+    return True
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Key-Value Store compartilhado
+=============================
+
+Estado curto compartilhado entre workers (locks, buffers, contadores, caches).
+
+- Com REDIS_URL configurado e redis-py instalado: usa Redis (compartilhado
+  entre processos e réplicas).
+- Sem Redis: usa um store em memória (válido apenas dentro do processo).
+
+Todos os valores são strings; quem chama serializa (ex: JSON).
+
+take_tokens(): token buckets (rate limiting) verificados e consumidos de
+forma atômica, no Redis por script Lua com o relógio do próprio Redis.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+KV_KEY_PREFIX = os.getenv("KV_KEY_PREFIX", "falachefe:")
+
+
+class InMemoryKVStore:
+    """
+    Store em memória com TTL, thread-safe.
+
+    Usado em desenvolvimento e quando o Redis não está disponível.
+    Não compartilha estado entre workers do gunicorn.
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, object] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._values
+
+    def _touch(self, key: str, ttl: Optional[float]) -> None:
+        if ttl:
+            self._expires[key] = time.monotonic() + ttl
+        else:
+            self._expires.pop(key, None)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if not self._alive(key):
+                return None
+            value = self._values[key]
+            return value if isinstance(value, str) else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._values[key] = value
+            self._touch(key, ttl)
+
+    def set_nx(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Define o valor apenas se a chave não existir (usado para locks)"""
+        with self._lock:
+            if self._alive(key):
+                return False
+            self._values[key] = value
+            self._touch(key, ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+
+    def delete_if_equals(self, key: str, value: str) -> bool:
+        """Remove a chave apenas se o valor atual for `value` (liberar lock próprio)"""
+        with self._lock:
+            if self._alive(key) and self._values[key] == value:
+                del self._values[key]
+                self._expires.pop(key, None)
+                return True
+            return False
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            current = int(self._values[key]) if self._alive(key) else 0
+            current += 1
+            self._values[key] = str(current)
+            self._touch(key, ttl)
+            return current
+
+    def rpush(self, key: str, value: str, ttl: Optional[float] = None, max_len: Optional[int] = None) -> int:
+        """Adiciona ao fim da lista; com max_len descarta os itens mais antigos"""
+        with self._lock:
+            items = self._values[key] if self._alive(key) else []
+            if not isinstance(items, list):
+                items = []
+            items.append(value)
+            if max_len and len(items) > max_len:
+                del items[:len(items) - max_len]
+            self._values[key] = items
+            self._touch(key, ttl)
+            return len(items)
+
+    def lrange(self, key: str) -> List[str]:
+        """Todos os itens da lista, sem remover"""
+        with self._lock:
+            if not self._alive(key):
+                return []
+            items = self._values[key]
+            return list(items) if isinstance(items, list) else []
+
+    def pop_all(self, key: str) -> List[str]:
+        """Retorna e remove todos os itens da lista, na ordem de inserção"""
+        with self._lock:
+            if not self._alive(key):
+                return []
+            items = self._values.pop(key)
+            self._expires.pop(key, None)
+            return list(items) if isinstance(items, list) else []
+
+    def take_tokens(self, buckets: Sequence[Tuple[str, float, float]], cost: float = 1) -> float:
+        """
+        Consome `cost` de todos os buckets (key, tokens/s, capacidade) ou de nenhum.
+
+        Retorna 0 se consumiu; senão os segundos até o bucket mais vazio ter saldo.
+        """
+        with self._lock:
+            now = time.monotonic()
+            levels = []
+            wait = 0.0
+            for key, rate, burst in buckets:
+                tokens, updated_at = burst, now
+                if self._alive(key):
+                    tokens, updated_at = (float(v) for v in self._values[key].split("|"))
+                tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+                levels.append(tokens)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+            if wait > 0:
+                return wait
+            for (key, rate, burst), tokens in zip(buckets, levels):
+                self._values[key] = f"{tokens - cost}|{now}"
+                self._touch(key, burst / rate + 1)
+            return 0.0
+
+
+class RedisKVStore:
+    """Store em Redis, compartilhado entre workers e réplicas"""
+
+    backend = "redis"
+
+    # Lua: DEL apenas se o valor bater (evita liberar lock de outro worker)
+    _DELETE_IF_EQUALS = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    # Lua: token buckets com o relógio do Redis (mesmo saldo para todas as réplicas);
+    # consome de todos ou de nenhum. Retorna a espera como string (Lua trunca números)
+    _TAKE_TOKENS = """
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local cost = tonumber(ARGV[1])
+    local levels = {}
+    local wait = 0
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[i * 2])
+        local burst = tonumber(ARGV[i * 2 + 1])
+        local state = redis.call('HMGET', key, 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or burst
+        local updated_at = tonumber(state[2]) or now
+        tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+        levels[i] = tokens
+        if tokens < cost then
+            wait = math.max(wait, (cost - tokens) / rate)
+        end
+    end
+    if wait > 0 then
+        return tostring(wait)
+    end
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[i * 2])
+        local burst = tonumber(ARGV[i * 2 + 1])
+        redis.call('HSET', key, 'tokens', tostring(levels[i] - cost), 'ts', tostring(now))
+        redis.call('PEXPIRE', key, math.ceil((burst / rate + 1) * 1000))
+    end
+    return '0'
+    """
+
+    def __init__(self, url: str):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, decode_responses=True, socket_timeout=2)
+        self._delete_if_equals = self._redis.register_script(self._DELETE_IF_EQUALS)
+        self._take_tokens = self._redis.register_script(self._TAKE_TOKENS)
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> Optional[int]:
+        return int(ttl * 1000) if ttl else None
+
+    def get(self, key: str) -> Optional[str]:
+        return self._redis.get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self._redis.set(key, value, px=self._px(ttl))
+
+    def set_nx(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        return bool(self._redis.set(key, value, px=self._px(ttl), nx=True))
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(key)
+
+    def delete_if_equals(self, key: str, value: str) -> bool:
+        return bool(self._delete_if_equals(keys=[key], args=[value]))
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        pipe = self._redis.pipeline()
+        pipe.incr(key)
+        if ttl:
+            pipe.pexpire(key, self._px(ttl))
+        return int(pipe.execute()[0])
+
+    def rpush(self, key: str, value: str, ttl: Optional[float] = None, max_len: Optional[int] = None) -> int:
+        pipe = self._redis.pipeline()
+        pipe.rpush(key, value)
+        if max_len:
+            pipe.ltrim(key, -max_len, -1)
+        if ttl:
+            pipe.pexpire(key, self._px(ttl))
+        length = int(pipe.execute()[0])
+        return min(length, max_len) if max_len else length
+
+    def lrange(self, key: str) -> List[str]:
+        return self._redis.lrange(key, 0, -1)
+
+    def pop_all(self, key: str) -> List[str]:
+        pipe = self._redis.pipeline()  # MULTI/EXEC: leitura e remoção atômicas
+        pipe.lrange(key, 0, -1)
+        pipe.delete(key)
+        return pipe.execute()[0]
+
+    def take_tokens(self, buckets: Sequence[Tuple[str, float, float]], cost: float = 1) -> float:
+        args: List[float] = [cost]
+        for _, rate, burst in buckets:
+            args += [rate, burst]
+        return float(self._take_tokens(keys=[key for key, _, _ in buckets], args=args))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_kv_store():
+    """
+    Retorna o store compartilhado (singleton por processo).
+
+    Redis quando REDIS_URL estiver configurado; memória caso contrário.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _create_store()
+    return _store
+
+
+def _create_store():
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        try:
+            store = RedisKVStore(redis_url)
+            store._redis.ping()
+            logger.info("KV store: Redis")
+            return store
+        except ImportError:
+            logger.warning("REDIS_URL configurado mas redis-py não está instalado; usando memória")
+        except Exception as e:
+            logger.warning(f"Redis indisponível ({e}); usando memória")
+    return InMemoryKVStore()
+
+
+def kv_key(*parts: str) -> str:
+    """Monta uma chave com o prefixo do serviço: falachefe:<a>:<b>"""
+    return KV_KEY_PREFIX + ":".join(str(p) for p in parts)
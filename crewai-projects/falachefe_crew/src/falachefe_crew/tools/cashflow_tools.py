@@ -11,15 +11,55 @@ import json
 import requests
 import os
 
+from ..caching.tool_memo import invalidates_tool_memo, memoized_tool
+from ..resilience.dependency_guard import get_guard, DependencyUnavailableError
+from ..resilience.execution_budget import budgeted_tool, is_successful_tool_output
+from ..resilience.idempotency import idempotent_call, transaction_idempotency_key
+from ..analytics.cashflow_analytics import get_cashflow_frame, invalidate_cashflow_frame, resolve_period
+from ..analytics.financial_digest import format_anomaly, get_financial_digest
+from ..analytics.cashflow_forecast import FORECAST_MAX_WEEKS, forecast_cashflow, projected_balance_on
+
 # ============================================
 # CONFIGURAÇÃO DA API
 # ============================================
 
 # URL base da API do Falachefe (pode ser configurada via variável de ambiente)
 API_BASE_URL = os.getenv("FALACHEFE_API_URL", "https://falachefe.app.br")
-API_TIMEOUT = 30  # segundos
+API_TIMEOUT = 30  # segundos (limite máximo; o timeout efetivo é adaptativo via get_guard("falachefe_api"))
 CREWAI_SERVICE_TOKEN = os.getenv("CREWAI_SERVICE_TOKEN", "")  # Token de serviço para autenticação
 
+# Expressões de período aceitas pelas ferramentas de consulta
+PERIOD_HELP = (
+    "'current_month', 'last_month', 'last_3_months', 'last_30_days', "
+    "'2025-01', '2025-Q1', '2025' ou '2025-01-01:2025-02-15'"
+)
+
+
+def build_summary_alerts(summary: dict) -> List[str]:
+    """Alertas objetivos calculados a partir do resumo (sem LLM)"""
+    alerts = []
+    current, previous = summary["period"], summary["previous_period"]
+    
+    if summary["runway_months"] is not None:
+        alerts.append(
+            f"⚠️ Consumo de caixa de R$ {summary['burn_rate']:,.2f}/mês nos últimos 3 meses; "
+            f"no ritmo atual o saldo dura ~{summary['runway_months']:.1f} meses"
+        )
+    elif any(summary["monthly_net"]):
+        alerts.append("✅ Sem consumo de caixa nos últimos 3 meses - entradas cobriram as saídas")
+    
+    if previous["saidas"] > 0 and current["saidas"] > previous["saidas"] * 1.15:
+        alerts.append(f"⚠️ Saídas {(current['saidas'] / previous['saidas'] - 1) * 100:.0f}% maiores que no período anterior")
+    if current["saldo"] < 0:
+        alerts.append("⚠️ Resultado negativo no período: saídas maiores que entradas")
+    if summary["closing_balance"] < 0:
+        alerts.append("🚨 Saldo acumulado negativo")
+    if summary.get("history_note"):
+        alerts.append(summary["history_note"])
+    
+    return alerts or ["✅ Nenhum alerta para o período"]
+
+
 # ============================================
 # SCHEMAS DE INPUT (Pydantic Models)
 # ============================================
@@ -27,13 +67,13 @@ CREWAI_SERVICE_TOKEN = os.getenv("CREWAI_SERVICE_TOKEN", "")  # Token de serviç
 class GetCashflowBalanceInput(BaseModel):
     """Input para consultar saldo do fluxo de caixa."""
     user_id: str = Field(..., description="ID do usuário/empresa")
-    period: Optional[str] = Field(None, description="Período a consultar (ex: '2025-01', 'current_month')")
+    period: Optional[str] = Field(None, description=f"Período a consultar: {PERIOD_HELP}")
 
 
 class GetCashflowCategoriesInput(BaseModel):
     """Input para consultar categorias de custos."""
     user_id: str = Field(..., description="ID do usuário/empresa")
-    period: str = Field(..., description="Período a analisar (ex: '2025-01', 'current_month')")
+    period: str = Field(..., description=f"Período a analisar: {PERIOD_HELP}")
     transaction_type: Optional[str] = Field("saida", description="Tipo de transação: 'entrada' ou 'saida'")
 
 
@@ -50,7 +90,15 @@ class AddCashflowTransactionInput(BaseModel):
 class GetCashflowSummaryInput(BaseModel):
     """Input para obter resumo completo do fluxo de caixa."""
     user_id: str = Field(..., description="ID do usuário/empresa")
-    period: str = Field(..., description="Período a analisar (ex: '2025-01', 'last_3_months')")
+    period: str = Field(..., description=f"Período a analisar: {PERIOD_HELP}")
+
+
+class ForecastCashflowInput(BaseModel):
+    """Input para projetar o fluxo de caixa."""
+    user_id: str = Field(..., description="ID do usuário/empresa")
+    weeks: int = Field(4, description=f"Semanas a projetar (1 a {FORECAST_MAX_WEEKS})")
+    required_amount: Optional[float] = Field(None, description="Valor que o usuário precisa pagar (ex: folha de pagamento)")
+    required_date: Optional[str] = Field(None, description="Data do pagamento (formato: YYYY-MM-DD)")
 
 
 # ============================================
@@ -74,84 +122,49 @@ class GetCashflowBalanceTool(BaseTool):
     )
     args_schema: Type[BaseModel] = GetCashflowBalanceInput
 
+    @memoized_tool
     def _run(self, user_id: str, period: Optional[str] = None) -> str:
         """
         Implementação da consulta de saldo.
         
-        Faz uma requisição GET para a API do Falachefe para buscar do banco PostgreSQL.
+        Usa o histórico colunar em cache (analytics.cashflow_analytics):
+        uma chamada à API por usuário a cada ANALYTICS_CACHE_TTL_SECONDS.
         """
         try:
-            # Calcular datas baseado no período
-            end_date = datetime.now()
-            
-            if period == "current_month":
-                start_date = end_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            elif period and period.count('-') == 1:  # Formato: "2025-01"
-                year, month = map(int, period.split('-'))
-                start_date = datetime(year, month, 1)
-                # Último dia do mês
-                if month == 12:
-                    end_date = datetime(year + 1, 1, 1)
-                else:
-                    end_date = datetime(year, month + 1, 1)
-            else:
-                # Padrão: último mês
-                start_date = (end_date.replace(day=1) - timedelta(days=1)).replace(day=1)
-            
-            # Fazer requisição GET para a API
-            api_url = f"{API_BASE_URL}/api/financial/crewai"
-            params = {
-                "userId": user_id,
-                "startDate": start_date.strftime("%Y-%m-%d"),
-                "endDate": end_date.strftime("%Y-%m-%d")
-            }
-            
-            headers = {
-                "Content-Type": "application/json",
-                "x-crewai-token": CREWAI_SERVICE_TOKEN
-            }
-            
-            print(f"📤 Consultando saldo na API: {api_url}")
-            print(f"   Params: {params}")
-            
-            response = requests.get(
-                api_url,
-                params=params,
-                headers=headers,
-                timeout=API_TIMEOUT
-            )
-            
-            if response.status_code != 200:
-                error_detail = response.json().get('error', 'Erro desconhecido')
-                return f"❌ Erro ao consultar saldo: {error_detail} (Status: {response.status_code})"
-            
-            # Parsear resposta da API
-            result = response.json()
-            data = result.get('data', {})
-            summary = data.get('summary', {})
+            start_date, end_date = resolve_period(period)
+            frame = get_cashflow_frame(user_id)
+            summary = frame.totals(start_date, end_date)
             
             # Formatar resposta para o agente
             response_text = f"""
 Saldo do Fluxo de Caixa - {period or 'current_month'}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-💰 Entradas:  R$ {summary.get('entradas', 0):,.2f}
-💸 Saídas:    R$ {summary.get('saidas', 0):,.2f}
+💰 Entradas:  R$ {summary['entradas']:,.2f}
+💸 Saídas:    R$ {summary['saidas']:,.2f}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-📊 Saldo:     R$ {summary.get('saldo', 0):,.2f}
+📊 Saldo:     R$ {summary['saldo']:,.2f}
 
-📈 Total de transações: {summary.get('total', 0)}
+📈 Total de transações: {summary['total']}
 🗓️  Período: {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}
-💾 Fonte: PostgreSQL (financial_data)
+🏦 Saldo acumulado até {end_date.strftime('%d/%m/%Y')}: R$ {frame.balance(end_date):,.2f}
+💾 Fonte: PostgreSQL (cashflow_transactions)
             """.strip()
+            note = frame.history_note(start_date)
+            if note:
+                response_text += f"\n{note}"
             
             print(f"✅ Saldo consultado com sucesso")
             
             return response_text
             
+        except ValueError as e:
+            return f"❌ {str(e)}"
         except requests.exceptions.ConnectionError:
             return f"❌ Erro de conexão: Não foi possível conectar à API em {API_BASE_URL}. Verifique se o servidor está rodando."
         except requests.exceptions.Timeout:
             return f"❌ Timeout: A API não respondeu em {API_TIMEOUT} segundos."
+        except DependencyUnavailableError:
+            return "⚠️ Consulta de saldo temporariamente indisponível. Tente novamente em alguns instantes."
         except Exception as e:
             return f"❌ Erro ao consultar saldo: {str(e)}"
 
@@ -174,6 +187,7 @@ class GetCashflowCategoriesTool(BaseTool):
     )
     args_schema: Type[BaseModel] = GetCashflowCategoriesInput
 
+    @memoized_tool
     def _run(
         self, 
         user_id: str, 
@@ -183,26 +197,19 @@ class GetCashflowCategoriesTool(BaseTool):
         """
         Implementação da consulta de categorias.
         
-        Em produção, isso faria uma query no banco:
-        SELECT category, SUM(amount) as total FROM cashflow_transactions 
-        WHERE user_id = ? AND period = ? AND type = ?
-        GROUP BY category ORDER BY total DESC
+        Agregação vetorizada (np.bincount por categoria) sobre o histórico em cache.
         """
         try:
-            # EXEMPLO - Em produção, substituir por query real
             tipo_label = "Custos" if transaction_type == "saida" else "Receitas"
             
-            # Simulação de dados do banco
-            categories = [
-                {"name": "Fornecedores", "amount": 12000.00, "percentage": 36.9},
-                {"name": "Salários", "amount": 8000.00, "percentage": 24.6},
-                {"name": "Aluguel", "amount": 3500.00, "percentage": 10.8},
-                {"name": "Contas (água, luz, internet)", "amount": 2500.00, "percentage": 7.7},
-                {"name": "Marketing", "amount": 2000.00, "percentage": 6.2},
-                {"name": "Outros", "amount": 4500.00, "percentage": 13.8},
-            ]
+            start_date, end_date = resolve_period(period)
+            frame = get_cashflow_frame(user_id)
+            categories = frame.category_breakdown(start_date, end_date, transaction_type)
             
-            total = sum(c["amount"] for c in categories)
+            if not categories:
+                return f"Nenhuma transação de {tipo_label.lower()} registrada em {period} ({start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')})."
+            
+            total = sum(amount for _, amount, _ in categories)
             
             # Formatar resposta
             response = f"""
@@ -210,19 +217,26 @@ Principais Categorias de {tipo_label} - {period}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 """
-            for i, cat in enumerate(categories, 1):
-                bar = "█" * int(cat["percentage"] / 5)
-                response += f"{i}. {cat['name']}\n"
-                response += f"   R$ {cat['amount']:,.2f} ({cat['percentage']:.1f}%)\n"
+            for i, (name, amount, percentage) in enumerate(categories, 1):
+                bar = "█" * int(percentage / 5)
+                response += f"{i}. {name}\n"
+                response += f"   R$ {amount:,.2f} ({percentage:.1f}%)\n"
                 response += f"   {bar}\n\n"
             
             response += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
             response += f"Total: R$ {total:,.2f}"
+            note = frame.history_note(start_date)
+            if note:
+                response += f"\n{note}"
             
             return response
             
+        except ValueError as e:
+            return f"❌ {str(e)}"
+        except DependencyUnavailableError:
+            return "⚠️ Consulta de categorias temporariamente indisponível. Tente novamente em alguns instantes."
         except Exception as e:
-            return f"Erro ao consultar categorias: {str(e)}"
+            return f"❌ Erro ao consultar categorias: {str(e)}"
 
 
 class AddCashflowTransactionTool(BaseTool):
@@ -242,6 +256,8 @@ class AddCashflowTransactionTool(BaseTool):
     )
     args_schema: Type[BaseModel] = AddCashflowTransactionInput
 
+    @invalidates_tool_memo
+    @budgeted_tool
     def _run(
         self,
         user_id: str,
@@ -254,11 +270,29 @@ class AddCashflowTransactionTool(BaseTool):
         """
         Implementação do registro de transação.
         
-        Faz uma requisição POST para a API do Falachefe para salvar no banco PostgreSQL.
+        Idempotente por mensagem de origem: retries do agente e reentregas da
+        mesma mensagem devolvem o registro já feito em vez de duplicá-lo.
         """
+        transaction_date = date or datetime.now().strftime("%Y-%m-%d")
+        idempotency_key = transaction_idempotency_key(user_id, transaction_type, amount, category, transaction_date)
+        return idempotent_call(
+            idempotency_key,
+            lambda: self._record(user_id, transaction_type, amount, category, description, transaction_date, idempotency_key),
+            is_successful_tool_output
+        )
+
+    def _record(
+        self,
+        user_id: str,
+        transaction_type: str,
+        amount: float,
+        category: str,
+        description: Optional[str],
+        transaction_date: str,
+        idempotency_key: Optional[str]
+    ) -> str:
+        """Faz uma requisição POST para a API do Falachefe para salvar no banco PostgreSQL."""
         try:
-            transaction_date = date or datetime.now().strftime("%Y-%m-%d")
-            
             # Preparar dados para enviar à API
             payload = {
                 "userId": user_id,
@@ -273,6 +307,8 @@ class AddCashflowTransactionTool(BaseTool):
                     "timestamp": datetime.now().isoformat()
                 }
             }
+            if idempotency_key:
+                payload["idempotencyKey"] = idempotency_key
             
             # Fazer requisição POST para a API
             api_url = f"{API_BASE_URL}/api/financial/crewai"
@@ -281,15 +317,20 @@ class AddCashflowTransactionTool(BaseTool):
                 "Content-Type": "application/json",
                 "x-crewai-token": CREWAI_SERVICE_TOKEN
             }
+            if idempotency_key:
+                headers["Idempotency-Key"] = idempotency_key
             
             print(f"📤 Enviando transação para API: {api_url}")
             print(f"   Dados: {json.dumps(payload, indent=2)}")
             
-            response = requests.post(
-                api_url,
-                json=payload,
-                headers=headers,
-                timeout=API_TIMEOUT
+            response = get_guard("falachefe_api").call(
+                lambda timeout: requests.post(
+                    api_url,
+                    json=payload,
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
             
             # Verificar resposta
@@ -319,7 +360,13 @@ class AddCashflowTransactionTool(BaseTool):
             response_text += f"\n🆔 ID da transação: {transaction.get('id', 'N/A')}"
             response_text += f"\n💾 Salvo em: PostgreSQL (financial_data)"
             
+            if result.get('duplicate'):
+                # A API já tinha esta transação (mesma chave de idempotência)
+                print(f"🔁 Transação já registrada anteriormente: {transaction.get('id')}")
+                return response_text
+            
             print(f"✅ Transação registrada com sucesso: {transaction.get('id')}")
+            invalidate_cashflow_frame(user_id)
             
             return response_text
             
@@ -327,6 +374,8 @@ class AddCashflowTransactionTool(BaseTool):
             return f"❌ Erro de conexão: Não foi possível conectar à API em {API_BASE_URL}. Verifique se o servidor está rodando."
         except requests.exceptions.Timeout:
             return f"❌ Timeout: A API não respondeu em {API_TIMEOUT} segundos."
+        except DependencyUnavailableError:
+            return "⚠️ Registro temporariamente indisponível. A transação NÃO foi salva; tente novamente em alguns instantes."
         except Exception as e:
             return f"❌ Erro ao registrar transação: {str(e)}"
 
@@ -349,68 +398,159 @@ class GetCashflowSummaryTool(BaseTool):
     )
     args_schema: Type[BaseModel] = GetCashflowSummaryInput
 
+    @memoized_tool
     def _run(self, user_id: str, period: str) -> str:
         """
         Implementação do resumo completo.
         
-        Em produção, faria múltiplas queries para agregar dados.
+        Todos os indicadores saem do mesmo frame em cache (uma chamada à API).
         """
         try:
-            # EXEMPLO - Em produção, fazer queries reais
-            summary = {
-                "period": period,
-                "saldo_inicial": 8000.00,
-                "total_entradas": 45000.00,
-                "total_saidas": 32500.00,
-                "saldo_final": 20500.00,
-                "variacao": "+156.25%",
-                "top_categorias_entrada": [
-                    {"name": "Vendas", "amount": 40000.00},
-                    {"name": "Serviços", "amount": 5000.00}
-                ],
-                "top_categorias_saida": [
-                    {"name": "Fornecedores", "amount": 12000.00},
-                    {"name": "Salários", "amount": 8000.00},
-                    {"name": "Aluguel", "amount": 3500.00}
-                ],
-                "alertas": [
-                    "⚠️ Custos com fornecedores aumentaram 15% em relação ao mês anterior",
-                    "✅ Saldo positivo e crescente - boa saúde financeira"
-                ]
-            }
+            start_date, end_date = resolve_period(period)
+            summary = get_cashflow_frame(user_id).summary(start_date, end_date)
+            current = summary["period"]
+            previous = summary["previous_period"]
+            
+            if previous["saldo"]:
+                variacao = f"{(current['saldo'] - previous['saldo']) / abs(previous['saldo']) * 100:+.2f}%"
+            else:
+                variacao = "sem base de comparação"
             
             # Formatar resposta detalhada
             response = f"""
 📊 RESUMO COMPLETO DO FLUXO DE CAIXA
-Período: {summary['period']}
+Período: {period} ({start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')})
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 💰 RESUMO FINANCEIRO
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Saldo Inicial:     R$ {summary['saldo_inicial']:,.2f}
-(+) Entradas:      R$ {summary['total_entradas']:,.2f}
-(-) Saídas:        R$ {summary['total_saidas']:,.2f}
+Saldo Inicial:     R$ {summary['opening_balance']:,.2f}
+(+) Entradas:      R$ {current['entradas']:,.2f}
+(-) Saídas:        R$ {current['saidas']:,.2f}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Saldo Final:       R$ {summary['saldo_final']:,.2f}
-Variação:          {summary['variacao']}
+Saldo Final:       R$ {summary['closing_balance']:,.2f}
+Variação:          {variacao} (resultado vs. período anterior)
 
 📈 PRINCIPAIS ENTRADAS
 """
-            for cat in summary['top_categorias_entrada']:
-                response += f"  • {cat['name']}: R$ {cat['amount']:,.2f}\n"
+            for name, amount, _ in summary['top_entradas'] or [("nenhuma", 0.0, 0.0)]:
+                response += f"  • {name}: R$ {amount:,.2f}\n"
             
             response += f"\n📉 PRINCIPAIS SAÍDAS\n"
-            for cat in summary['top_categorias_saida']:
-                response += f"  • {cat['name']}: R$ {cat['amount']:,.2f}\n"
+            for name, amount, _ in summary['top_saidas'] or [("nenhuma", 0.0, 0.0)]:
+                response += f"  • {name}: R$ {amount:,.2f}\n"
+            
+            response += f"\n📆 RESULTADO MENSAL (média móvel 3 meses)\n"
+            for month, net, rolling in zip(summary['months'], summary['monthly_net'], summary['rolling_net_3m']):
+                response += f"  {month}: R$ {net:,.2f} (média: R$ {rolling:,.2f})\n"
             
             response += f"\n🚨 ALERTAS E OBSERVAÇÕES\n"
-            for alerta in summary['alertas']:
+            for alerta in build_summary_alerts(summary):
                 response += f"  {alerta}\n"
             
+            # Anomalias do digest noturno (lançamentos fora do padrão da categoria)
+            digest = get_financial_digest(user_id)
+            for item in (digest or {}).get("anomalias", []):
+                response += f"  {format_anomaly(item)}\n"
+            
+            return response
+            
+        except ValueError as e:
+            return f"❌ {str(e)}"
+        except DependencyUnavailableError:
+            return "⚠️ Resumo temporariamente indisponível. Tente novamente em alguns instantes."
+        except Exception as e:
+            return f"❌ Erro ao gerar resumo: {str(e)}"
+
+
+class ForecastCashflowTool(BaseTool):
+    """
+    Ferramenta para projetar o saldo do fluxo de caixa nas próximas semanas.
+    
+    Permite que o agente responda perguntas como:
+    - "Vou ter dinheiro para pagar a folha mês que vem?"
+    - "Como vai estar meu caixa daqui a 2 meses?"
+    - "Consigo pagar um boleto de R$ 5.000 no dia 20?"
+    
+    Os números vêm de um cálculo determinístico (analytics.cashflow_forecast),
+    não de estimativa do LLM.
+    """
+    name: str = "Projetar Fluxo de Caixa"
+    description: str = (
+        "Projeta o saldo do fluxo de caixa dia a dia para as próximas semanas, "
+        "considerando despesas/receitas recorrentes (aluguel, folha, pró-labore) e a média "
+        "de vendas e gastos do histórico. Informe required_amount e required_date para "
+        "verificar se haverá saldo para um pagamento. Use quando o usuário perguntar sobre "
+        "o futuro do caixa, se vai conseguir pagar algo ou quanto terá disponível."
+    )
+    args_schema: Type[BaseModel] = ForecastCashflowInput
+
+    @memoized_tool
+    def _run(
+        self,
+        user_id: str,
+        weeks: int = 4,
+        required_amount: Optional[float] = None,
+        required_date: Optional[str] = None
+    ) -> str:
+        """Implementação da projeção (frame em cache + projeção em cache)."""
+        try:
+            target = datetime.strptime(required_date, "%Y-%m-%d").date() if required_date else None
+            if target:
+                # Garante que a data pedida esteja dentro do horizonte
+                weeks = max(weeks, (target - datetime.now().date()).days // 7 + 1)
+            
+            forecast = forecast_cashflow(get_cashflow_frame(user_id), weeks)
+            
+            response = f"""
+🔮 PROJEÇÃO DO FLUXO DE CAIXA - próximas {forecast['weeks']} semanas
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Saldo atual:            R$ {forecast['start_balance']:,.2f}
+(+) Entradas previstas: R$ {forecast['projected_entradas']:,.2f}
+(-) Saídas previstas:   R$ {forecast['projected_saidas']:,.2f}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Saldo projetado final:  R$ {forecast['end_balance']:,.2f}
+Menor saldo previsto:   R$ {forecast['min_balance']:,.2f} em {forecast['min_date'].strftime('%d/%m/%Y')}
+
+📅 SALDO POR SEMANA
+"""
+            for week in range(forecast['weeks']):
+                index = week * 7 + 6
+                response += f"  {forecast['dates'][index].astype(object).strftime('%d/%m')}: R$ {forecast['balance'][index]:,.2f}\n"
+            
+            response += "\n🔁 COMPROMISSOS RECORRENTES DETECTADOS\n"
+            if forecast['recurring']:
+                for item in forecast['recurring']:
+                    emoji = "💰" if item['transaction_type'] == "entrada" else "💸"
+                    response += f"  {emoji} {item['category']}: R$ {item['amount']:,.2f} por volta do dia {item['day']}\n"
+            else:
+                response += "  Nenhum (histórico insuficiente ou sem padrão mensal)\n"
+            
+            if forecast['first_negative_date']:
+                response += f"\n🚨 Caixa fica NEGATIVO a partir de {forecast['first_negative_date'].strftime('%d/%m/%Y')}\n"
+            
+            if required_amount and target and projected_balance_on(forecast, target) is None:
+                response += f"\n💳 {target.strftime('%d/%m/%Y')} está além do horizonte máximo de {FORECAST_MAX_WEEKS} semanas.\n"
+            elif required_amount:
+                available = projected_balance_on(forecast, target) if target else forecast['min_balance']
+                when = target.strftime('%d/%m/%Y') if target else "no pior dia do período"
+                verdict = "✅ SIM" if available >= required_amount else "⚠️ NÃO"
+                response += (
+                    f"\n💳 Pagamento de R$ {required_amount:,.2f} ({when}): {verdict}\n"
+                    f"   Saldo projetado antes do pagamento: R$ {available:,.2f}\n"
+                )
+                if available < required_amount:
+                    response += f"   Faltariam R$ {required_amount - available:,.2f}\n"
+            
+            response += "\nℹ️ Projeção baseada apenas nas transações registradas no Falachefe."
             return response
             
+        except ValueError as e:
+            return f"❌ Data inválida (use YYYY-MM-DD): {str(e)}"
+        except DependencyUnavailableError:
+            return "⚠️ Projeção temporariamente indisponível. Tente novamente em alguns instantes."
         except Exception as e:
-            return f"Erro ao gerar resumo: {str(e)}"
+            return f"❌ Erro ao projetar fluxo de caixa: {str(e)}"
 
 
 # ============================================
@@ -423,6 +563,7 @@ ALL_CASHFLOW_TOOLS = [
     GetCashflowCategoriesTool(),
     AddCashflowTransactionTool(),
     GetCashflowSummaryTool(),
+    ForecastCashflowTool(),
 ]
 
 __all__ = [
@@ -430,6 +571,7 @@ __all__ = [
     'GetCashflowCategoriesTool',
     'AddCashflowTransactionTool',
     'GetCashflowSummaryTool',
+    'ForecastCashflowTool',
     'ALL_CASHFLOW_TOOLS',
 ]
 
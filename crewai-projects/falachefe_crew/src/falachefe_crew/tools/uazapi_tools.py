@@ -11,13 +11,17 @@ import requests
 import os
 from datetime import datetime
 
+from ..caching.tool_memo import invalidates_tool_memo, memoized_tool
+from ..resilience.dependency_guard import get_guard
+from ..resilience.execution_budget import budgeted_tool
+
 # ============================================
 # CONFIGURAÇÃO DA API UAZAPI
 # ============================================
 
 UAZAPI_BASE_URL = os.getenv("UAZAPI_BASE_URL", "https://free.uazapi.com")
 UAZAPI_TOKEN = os.getenv("UAZAPI_TOKEN", "")
-API_TIMEOUT = 30  # segundos
+API_TIMEOUT = 30  # segundos (limite máximo; o timeout efetivo é adaptativo via get_guard("uazapi"))
 
 # ============================================
 # SCHEMAS DE INPUT (Pydantic Models)
@@ -84,6 +88,7 @@ class SendTextMessageTool(BaseTool):
     )
     args_schema: Type[BaseModel] = SendTextMessageInput
 
+    @budgeted_tool
     def _run(
         self,
         number: str,
@@ -119,11 +124,14 @@ class SendTextMessageTool(BaseTool):
             }
 
             # Enviar requisição
-            response = requests.post(
-                f"{UAZAPI_BASE_URL}/send/text",
-                json=payload,
-                headers=headers,
-                timeout=API_TIMEOUT
+            response = get_guard("uazapi").call(
+                lambda timeout: requests.post(
+                    f"{UAZAPI_BASE_URL}/send/text",
+                    json=payload,
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
 
             # Processar resposta
@@ -180,6 +188,7 @@ class SendMenuMessageTool(BaseTool):
     )
     args_schema: Type[BaseModel] = SendMenuMessageInput
 
+    @budgeted_tool
     def _run(
         self,
         number: str,
@@ -221,11 +230,14 @@ class SendMenuMessageTool(BaseTool):
             }
 
             # Enviar requisição
-            response = requests.post(
-                f"{UAZAPI_BASE_URL}/send/menu",
-                json=payload,
-                headers=headers,
-                timeout=API_TIMEOUT
+            response = get_guard("uazapi").call(
+                lambda timeout: requests.post(
+                    f"{UAZAPI_BASE_URL}/send/menu",
+                    json=payload,
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
 
             if response.status_code == 200:
@@ -269,6 +281,7 @@ class SendMediaMessageTool(BaseTool):
     )
     args_schema: Type[BaseModel] = SendMediaMessageInput
 
+    @budgeted_tool
     def _run(
         self,
         number: str,
@@ -308,11 +321,14 @@ class SendMediaMessageTool(BaseTool):
             }
 
             # Enviar requisição
-            response = requests.post(
-                f"{UAZAPI_BASE_URL}/send/media",
-                json=payload,
-                headers=headers,
-                timeout=API_TIMEOUT
+            response = get_guard("uazapi").call(
+                lambda timeout: requests.post(
+                    f"{UAZAPI_BASE_URL}/send/media",
+                    json=payload,
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
 
             if response.status_code == 200:
@@ -362,6 +378,7 @@ class GetChatDetailsTool(BaseTool):
     )
     args_schema: Type[BaseModel] = GetChatDetailsInput
 
+    @memoized_tool
     def _run(self, number: str) -> str:
         """
         Busca detalhes completos de um chat/contato
@@ -383,11 +400,14 @@ class GetChatDetailsTool(BaseTool):
             }
 
             # Buscar detalhes
-            response = requests.post(
-                f"{UAZAPI_BASE_URL}/chat/details",
-                json=payload,
-                headers=headers,
-                timeout=API_TIMEOUT
+            response = get_guard("uazapi").call(
+                lambda timeout: requests.post(
+                    f"{UAZAPI_BASE_URL}/chat/details",
+                    json=payload,
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
 
             if response.status_code == 200:
@@ -458,6 +478,8 @@ class UpdateLeadInfoTool(BaseTool):
     )
     args_schema: Type[BaseModel] = UpdateLeadInfoInput
 
+    @invalidates_tool_memo
+    @budgeted_tool
     def _run(
         self,
         number: str,
@@ -498,11 +520,14 @@ class UpdateLeadInfoTool(BaseTool):
             }
 
             # Atualizar lead
-            response = requests.post(
-                f"{UAZAPI_BASE_URL}/chat/editLead",
-                json=payload,
-                headers=headers,
-                timeout=API_TIMEOUT
+            response = get_guard("uazapi").call(
+                lambda timeout: requests.post(
+                    f"{UAZAPI_BASE_URL}/chat/editLead",
+                    json=payload,
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
 
             if response.status_code == 200:
@@ -9,6 +9,10 @@ from pydantic import BaseModel, Field
 import os
 import requests
 
+from ..caching.tool_memo import invalidates_tool_memo, memoized_tool
+from ..resilience.dependency_guard import get_guard
+from ..resilience.execution_budget import budgeted_tool
+
 
 class GetUserProfileInput(BaseModel):
     """Input para GetUserProfileTool"""
@@ -24,6 +28,7 @@ class GetUserProfileTool(BaseTool):
     )
     args_schema: Type[BaseModel] = GetUserProfileInput
 
+    @memoized_tool
     def _run(self, user_id: str) -> str:
         """Busca perfil do usuário no Supabase"""
         try:
@@ -40,10 +45,14 @@ class GetUserProfileTool(BaseTool):
             }
             
             # Buscar dados do user_onboarding
-            response = requests.get(
-                f"{supabase_url}/rest/v1/user_onboarding",
-                params={"user_id": f"eq.{user_id}", "select": "*"},
-                headers=headers
+            response = get_guard("supabase").call(
+                lambda timeout: requests.get(
+                    f"{supabase_url}/rest/v1/user_onboarding",
+                    params={"user_id": f"eq.{user_id}", "select": "*"},
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
             
             if response.status_code != 200:
@@ -92,6 +101,7 @@ class GetCompanyDataTool(BaseTool):
     )
     args_schema: Type[BaseModel] = GetCompanyDataInput
 
+    @memoized_tool
     def _run(self, company_id: str) -> str:
         """Busca dados da empresa no Supabase"""
         try:
@@ -108,10 +118,14 @@ class GetCompanyDataTool(BaseTool):
             }
             
             # Buscar dados da empresa
-            response = requests.get(
-                f"{supabase_url}/rest/v1/companies",
-                params={"id": f"eq.{company_id}", "select": "*"},
-                headers=headers
+            response = get_guard("supabase").call(
+                lambda timeout: requests.get(
+                    f"{supabase_url}/rest/v1/companies",
+                    params={"id": f"eq.{company_id}", "select": "*"},
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
             
             if response.status_code != 200:
@@ -170,6 +184,8 @@ class UpdateUserPreferencesTool(BaseTool):
     )
     args_schema: Type[BaseModel] = UpdateUserPreferencesInput
 
+    @invalidates_tool_memo
+    @budgeted_tool
     def _run(self, user_id: str, preferences: Dict[str, Any]) -> str:
         """Atualiza preferências do usuário"""
         try:
@@ -187,10 +203,14 @@ class UpdateUserPreferencesTool(BaseTool):
             }
             
             # Buscar configurações atuais
-            get_response = requests.get(
-                f"{supabase_url}/rest/v1/user_onboarding",
-                params={"user_id": f"eq.{user_id}", "select": "preferences"},
-                headers=headers
+            get_response = get_guard("supabase").call(
+                lambda timeout: requests.get(
+                    f"{supabase_url}/rest/v1/user_onboarding",
+                    params={"user_id": f"eq.{user_id}", "select": "preferences"},
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
             
             current_prefs = {}
@@ -201,11 +221,15 @@ class UpdateUserPreferencesTool(BaseTool):
             updated_prefs = {**current_prefs, **preferences}
             
             # Atualizar no banco
-            response = requests.patch(
-                f"{supabase_url}/rest/v1/user_onboarding",
-                params={"user_id": f"eq.{user_id}"},
-                json={"preferences": updated_prefs},
-                headers=headers
+            response = get_guard("supabase").call(
+                lambda timeout: requests.patch(
+                    f"{supabase_url}/rest/v1/user_onboarding",
+                    params={"user_id": f"eq.{user_id}"},
+                    json={"preferences": updated_prefs},
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
             
             if response.status_code in [200, 204]:
@@ -235,6 +259,8 @@ class UpdateUserProfileTool(BaseTool):
     )
     args_schema: Type[BaseModel] = UpdateUserProfileInput
 
+    @invalidates_tool_memo
+    @budgeted_tool
     def _run(self, user_id: str, updates: Dict[str, Any]) -> str:
         """Atualiza perfil do usuário"""
         try:
@@ -259,11 +285,15 @@ class UpdateUserProfileTool(BaseTool):
                 return "❌ Nenhum campo válido para atualizar"
             
             # Atualizar no banco
-            response = requests.patch(
-                f"{supabase_url}/rest/v1/user_onboarding",
-                params={"user_id": f"eq.{user_id}"},
-                json=filtered_updates,
-                headers=headers
+            response = get_guard("supabase").call(
+                lambda timeout: requests.patch(
+                    f"{supabase_url}/rest/v1/user_onboarding",
+                    params={"user_id": f"eq.{user_id}"},
+                    json=filtered_updates,
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
             
             if response.status_code in [200, 204]:
@@ -293,6 +323,8 @@ class UpdateCompanyDataTool(BaseTool):
     )
     args_schema: Type[BaseModel] = UpdateCompanyDataInput
 
+    @invalidates_tool_memo
+    @budgeted_tool
     def _run(self, company_id: str, updates: Dict[str, Any]) -> str:
         """Atualiza dados da empresa"""
         try:
@@ -317,11 +349,15 @@ class UpdateCompanyDataTool(BaseTool):
                 return "❌ Nenhum campo válido para atualizar"
             
             # Atualizar no banco
-            response = requests.patch(
-                f"{supabase_url}/rest/v1/companies",
-                params={"id": f"eq.{company_id}"},
-                json=filtered_updates,
-                headers=headers
+            response = get_guard("supabase").call(
+                lambda timeout: requests.patch(
+                    f"{supabase_url}/rest/v1/companies",
+                    params={"id": f"eq.{company_id}"},
+                    json=filtered_updates,
+                    headers=headers,
+                    timeout=timeout
+                ),
+                is_failure=lambda r: r.status_code >= 500
             )
             
             if response.status_code in [200, 204]:
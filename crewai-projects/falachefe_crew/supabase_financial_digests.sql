@@ -0,0 +1,145 @@
+-- ================================================
+-- Resumos financeiros pré-calculados (digests)
+-- ================================================
+--
+-- Executar no Supabase SQL Editor.
+--
+-- Em vez de recalcular o status financeiro a cada mensagem, um job noturno
+-- (pg_cron) calcula o resumo de TODOS os usuários com consultas set-based
+-- sobre cashflow_transactions e grava uma linha por usuário em
+-- financial_digests. O api_server lê o digest com um único SELECT.
+--
+-- Após gravações, o api_server chama refresh_financial_digests(user_id)
+-- para recalcular apenas o usuário afetado.
+--
+
+-- 1. Tabela de digests (uma linha por usuário)
+CREATE TABLE IF NOT EXISTS financial_digests (
+  user_id varchar(100) PRIMARY KEY,
+  digest jsonb NOT NULL,
+  computed_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- 2. Função de cálculo em lote (NULL = todos os usuários)
+CREATE OR REPLACE FUNCTION refresh_financial_digests(p_user_id varchar DEFAULT NULL)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  v_count integer;
+BEGIN
+  WITH tx AS (
+    SELECT
+      user_id,
+      type,
+      amount::numeric AS amount,
+      category,
+      description,
+      date::date AS date
+    FROM cashflow_transactions
+    WHERE p_user_id IS NULL OR user_id = p_user_id
+  ),
+  totals AS (
+    SELECT
+      user_id,
+      COALESCE(SUM(amount) FILTER (WHERE type = 'entrada'), 0) AS entradas_total,
+      COALESCE(SUM(amount) FILTER (WHERE type = 'saida'), 0) AS saidas_total,
+      COALESCE(SUM(amount) FILTER (WHERE type = 'entrada' AND date >= date_trunc('month', current_date)), 0) AS entradas_mes,
+      COALESCE(SUM(amount) FILTER (WHERE type = 'saida' AND date >= date_trunc('month', current_date)), 0) AS saidas_mes,
+      COALESCE(SUM(CASE WHEN type = 'entrada' THEN amount ELSE -amount END)
+        FILTER (WHERE date > current_date - 30), 0) AS resultado_30d,
+      COALESCE(SUM(CASE WHEN type = 'entrada' THEN amount ELSE -amount END)
+        FILTER (WHERE date <= current_date - 30 AND date > current_date - 60), 0) AS resultado_30d_anterior,
+      COUNT(*) AS total_transacoes,
+      MAX(date) AS ultima_transacao
+    FROM tx
+    GROUP BY user_id
+  ),
+  category_totals AS (
+    SELECT
+      user_id,
+      category,
+      SUM(amount) AS total,
+      ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY SUM(amount) DESC) AS position
+    FROM tx
+    WHERE type = 'saida' AND date > current_date - 90
+    GROUP BY user_id, category
+  ),
+  top_categories AS (
+    SELECT
+      user_id,
+      jsonb_agg(jsonb_build_object('category', category, 'amount', round(total, 2)) ORDER BY total DESC) AS top_saidas
+    FROM category_totals
+    WHERE position <= 3
+    GROUP BY user_id
+  ),
+  -- Anomalia: lançamento dos últimos 30 dias acima de média + 3 desvios da própria categoria (180 dias)
+  category_stats AS (
+    SELECT user_id, category, type, AVG(amount) AS mean, STDDEV_SAMP(amount) AS sd, COUNT(*) AS n
+    FROM tx
+    WHERE date > current_date - 180
+    GROUP BY user_id, category, type
+  ),
+  outliers AS (
+    SELECT
+      t.user_id, t.date, t.category, t.type, t.amount, t.description,
+      ROW_NUMBER() OVER (PARTITION BY t.user_id ORDER BY t.amount DESC) AS position
+    FROM tx t
+    JOIN category_stats s USING (user_id, category, type)
+    WHERE t.date > current_date - 30
+      AND s.n >= 5
+      AND s.sd > 0
+      AND t.amount > s.mean + 3 * s.sd
+  ),
+  anomalies AS (
+    SELECT
+      user_id,
+      jsonb_agg(jsonb_build_object(
+        'date', date, 'category', category, 'type', type,
+        'amount', round(amount, 2), 'description', left(description, 60)
+      ) ORDER BY amount DESC) AS items
+    FROM outliers
+    WHERE position <= 5
+    GROUP BY user_id
+  )
+  INSERT INTO financial_digests (user_id, digest, computed_at)
+  SELECT
+    t.user_id,
+    jsonb_build_object(
+      'entradas_total', round(t.entradas_total, 2),
+      'saidas_total', round(t.saidas_total, 2),
+      'saldo', round(t.entradas_total - t.saidas_total, 2),
+      'entradas_mes', round(t.entradas_mes, 2),
+      'saidas_mes', round(t.saidas_mes, 2),
+      'resultado_30d', round(t.resultado_30d, 2),
+      'resultado_30d_anterior', round(t.resultado_30d_anterior, 2),
+      'total_transacoes', t.total_transacoes,
+      'ultima_transacao', t.ultima_transacao,
+      'top_saidas', COALESCE(c.top_saidas, '[]'::jsonb),
+      'anomalias', COALESCE(a.items, '[]'::jsonb)
+    ),
+    now()
+  FROM totals t
+  LEFT JOIN top_categories c USING (user_id)
+  LEFT JOIN anomalies a USING (user_id)
+  ON CONFLICT (user_id) DO UPDATE
+    SET digest = EXCLUDED.digest,
+        computed_at = EXCLUDED.computed_at;
+
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$;
+
+-- 3. Agendar recálculo noturno (03:00 BRT = 06:00 UTC)
+CREATE EXTENSION IF NOT EXISTS pg_cron;
+
+SELECT cron.schedule(
+  'refresh-financial-digests',
+  '0 6 * * *',
+  $$SELECT refresh_financial_digests()$$
+);
+
+-- 4. Primeira carga
+SELECT refresh_financial_digests();
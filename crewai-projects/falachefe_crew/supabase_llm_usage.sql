@@ -0,0 +1,92 @@
+-- ================================================
+-- Ledger de uso de LLM (tokens, latência e custo)
+-- ================================================
+--
+-- Executar no Supabase SQL Editor.
+--
+-- O api_server grava uma linha por chamada paga ao OpenAI (execução de
+-- crew, classificador, embeddings), em lotes, via PostgREST
+-- (falachefe_crew/observability/usage_ledger.py). As views abaixo agregam
+-- por mensagem, por usuário/dia e por especialista/task/dia.
+--
+
+-- 1. Tabela (uma linha por chamada)
+CREATE TABLE IF NOT EXISTS llm_usage (
+  id bigserial PRIMARY KEY,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  day date NOT NULL DEFAULT current_date,
+  message_id varchar(255),
+  user_id varchar(100),
+  conversation_id varchar(255),
+  call_type varchar(20) NOT NULL,        -- crew | classifier | embedding
+  specialist varchar(50),                -- financial_expert, reception_agent, ...
+  task varchar(100),                     -- task de tasks.yaml (financial_advice, ...)
+  model varchar(100) NOT NULL,
+  tier varchar(20),                      -- tier do model_routing.yaml (crews)
+  prompt_tokens integer NOT NULL DEFAULT 0,
+  completion_tokens integer NOT NULL DEFAULT 0,
+  total_tokens integer GENERATED ALWAYS AS (prompt_tokens + completion_tokens) STORED,
+  cost_usd numeric(14, 8) NOT NULL DEFAULT 0,
+  latency_ms integer NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_usage_day ON llm_usage (day);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_user_day ON llm_usage (user_id, day);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_message ON llm_usage (message_id) WHERE message_id IS NOT NULL;
+
+-- 2. Por mensagem (custo de responder cada mensagem do WhatsApp/chat web)
+CREATE OR REPLACE VIEW llm_usage_by_message AS
+SELECT
+  message_id,
+  user_id,
+  conversation_id,
+  MIN(created_at) AS started_at,
+  COUNT(*) AS calls,
+  SUM(prompt_tokens) AS prompt_tokens,
+  SUM(completion_tokens) AS completion_tokens,
+  SUM(cost_usd) AS cost_usd,
+  SUM(latency_ms) AS latency_ms,
+  string_agg(DISTINCT specialist, ',') AS specialists
+FROM llm_usage
+WHERE message_id IS NOT NULL
+GROUP BY message_id, user_id, conversation_id;
+
+-- 3. Por usuário e dia
+CREATE OR REPLACE VIEW llm_usage_daily_by_user AS
+SELECT
+  day,
+  user_id,
+  COUNT(DISTINCT message_id) AS messages,
+  COUNT(*) AS calls,
+  SUM(prompt_tokens) AS prompt_tokens,
+  SUM(completion_tokens) AS completion_tokens,
+  SUM(cost_usd) AS cost_usd
+FROM llm_usage
+GROUP BY day, user_id;
+
+-- 4. Por especialista/task e dia (quais tasks de tasks.yaml gastam mais)
+CREATE OR REPLACE VIEW llm_usage_daily_by_task AS
+SELECT
+  day,
+  call_type,
+  COALESCE(specialist, 'none') AS specialist,
+  COALESCE(task, 'none') AS task,
+  model,
+  COUNT(*) AS calls,
+  SUM(prompt_tokens) AS prompt_tokens,
+  SUM(completion_tokens) AS completion_tokens,
+  SUM(cost_usd) AS cost_usd,
+  AVG(latency_ms)::integer AS avg_latency_ms,
+  percentile_cont(0.95) WITHIN GROUP (ORDER BY latency_ms)::integer AS p95_latency_ms
+FROM llm_usage
+GROUP BY day, call_type, COALESCE(specialist, 'none'), COALESCE(task, 'none'), model;
+
+-- 5. Acesso apenas pela service role (api_server)
+ALTER TABLE llm_usage ENABLE ROW LEVEL SECURITY;
+
+-- Exemplo: tasks mais caras dos últimos 7 dias
+-- SELECT specialist, task, SUM(cost_usd) AS cost, SUM(calls) AS calls, MAX(p95_latency_ms) AS p95_ms
+-- FROM llm_usage_daily_by_task
+-- WHERE day > current_date - 7
+-- GROUP BY specialist, task
+-- ORDER BY cost DESC;
@@ -0,0 +1,22 @@
+-- ================================================
+-- Idempotência de cashflow_transactions
+-- ================================================
+--
+-- Executar no Supabase SQL Editor ANTES de publicar a versão das rotas
+-- /api/financial/crewai e /api/financial/crewai/batch que enviam
+-- idempotency_key.
+--
+-- Retries do agente, reentregas do QStash e reimportações de extratos
+-- enviam a mesma chave; o INSERT ... ON CONFLICT DO NOTHING usa o índice
+-- abaixo para não duplicar a transação. Linhas antigas (sem chave) não
+-- participam do índice.
+--
+
+-- 1. Coluna da chave
+ALTER TABLE cashflow_transactions
+  ADD COLUMN IF NOT EXISTS idempotency_key varchar(64);
+
+-- 2. Unicidade por usuário (índice parcial, alvo do ON CONFLICT)
+CREATE UNIQUE INDEX IF NOT EXISTS cashflow_transactions_user_idempotency_key
+  ON cashflow_transactions (user_id, idempotency_key)
+  WHERE idempotency_key IS NOT NULL;
@@ -0,0 +1,11 @@
+import pytest
+
+from falachefe_crew.storage import kv_store
+
+
+@pytest.fixture
+def memory_store(monkeypatch):
+    """KV store em memória novo para o teste (get_kv_store() passa a retorná-lo)"""
+    store = kv_store.InMemoryKVStore()
+    monkeypatch.setattr(kv_store, "_store", store)
+    return store
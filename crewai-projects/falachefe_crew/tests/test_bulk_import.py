@@ -0,0 +1,74 @@
+"""Importação em lote: linhas iguais no mesmo extrato são transações distintas"""
+
+import pytest
+
+bulk_import = pytest.importorskip("falachefe_crew.ingestion.bulk_import", reason="bulk_import precisa de crewai (cashflow_tools)")
+
+from falachefe_crew.ingestion.statement_parser import iter_statement_transactions
+
+STATEMENT = [
+    "Data;Descrição;Valor",
+    "01/10/2025;PIX RECEBIDO;50,00",
+    "01/10/2025;PIX RECEBIDO;50,00",
+    "01/10/2025;TARIFA;-12,00",
+]
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, result):
+        self._result = result
+
+    def json(self):
+        return self._result
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Endpoint de lote com idempotencyKey única por usuário (como o ON CONFLICT da API)"""
+    stored = {}
+
+    def post(url, json, headers, timeout):
+        inserted, duplicates = 0, []
+        for index, transaction in enumerate(json["transactions"]):
+            if transaction["idempotencyKey"] in stored:
+                duplicates.append(index)
+            else:
+                stored[transaction["idempotencyKey"]] = transaction
+                inserted += 1
+        return FakeResponse({"inserted": inserted, "duplicates": duplicates})
+
+    monkeypatch.setattr(bulk_import.requests, "post", post)
+    monkeypatch.setattr(bulk_import, "IMPORT_LLM_CATEGORIZATION", False)
+    monkeypatch.setattr(bulk_import, "invalidate_cashflow_frame", lambda user_id: None)
+    return stored
+
+
+def run_import(lines):
+    return bulk_import.BulkImporter("u1").run(iter_statement_transactions(lines, "extrato.csv"))
+
+
+def test_identical_lines_in_one_statement_are_all_imported(api):
+    summary = run_import(STATEMENT)
+
+    assert summary["inserted"] == 3 and summary["duplicates"] == 0
+    assert summary["totals"]["entrada"] == 100.0
+
+
+def test_reimporting_the_statement_inserts_nothing(api):
+    run_import(STATEMENT)
+
+    summary = run_import(STATEMENT)
+
+    assert summary["inserted"] == 0 and summary["duplicates"] == 3
+    assert len(api) == 3
+
+
+def test_repeated_fitid_is_a_duplicate(api):
+    importer = bulk_import.BulkImporter("u1")
+    transaction = {"date": "2025-10-01", "amount": 50.0, "transaction_type": "entrada",
+                   "description": "PIX", "external_id": "abc", "line": 1}
+
+    assert not importer._is_duplicate(dict(transaction))
+    assert importer._is_duplicate(dict(transaction, line=2))
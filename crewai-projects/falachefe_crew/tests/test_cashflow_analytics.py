@@ -0,0 +1,84 @@
+"""Frame do fluxo de caixa: saldo anterior à janela carregada e aviso de histórico parcial"""
+
+from datetime import date
+
+import pytest
+
+from falachefe_crew.analytics import cashflow_analytics
+from falachefe_crew.analytics.cashflow_analytics import CashflowFrame
+from falachefe_crew.analytics.cashflow_forecast import forecast_cashflow
+
+TODAY = date(2026, 10, 15)
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def api_payload(monkeypatch):
+    """Histórico de 24 meses com R$ 10.000 acumulados antes da janela"""
+    payload = {
+        "success": True,
+        "data": {
+            "dates": ["2026-07-05", "2026-08-05", "2026-09-05", "2026-10-05"],
+            "types": ["saida"] * 4,
+            "amounts": [1000.0] * 4,
+            "categories": ["aluguel"] * 4,
+        },
+        "truncated": False,
+        "historyStart": "2024-10-01",
+        "openingBalance": 10000.0,
+        "priorCount": 40,
+    }
+    monkeypatch.setattr(
+        cashflow_analytics.requests, "get", lambda url, params, headers, timeout: FakeResponse(payload)
+    )
+    return payload
+
+
+def test_balance_includes_history_before_the_window(api_payload):
+    frame = cashflow_analytics.load_cashflow_frame("u1")
+
+    assert frame.balance(TODAY) == 6000.0
+    assert frame.balance(date(2026, 8, 31)) == 8000.0
+    assert frame.summary(date(2026, 10, 1), TODAY, today=TODAY)["opening_balance"] == 7000.0
+    # Consumo de R$ 1.000/mês: 6 meses de caixa, não zero
+    assert frame.runway_months(TODAY) == 6.0
+    assert forecast_cashflow(frame, 1, today=TODAY)["start_balance"] == 6000.0
+
+
+def test_periods_before_the_window_are_flagged(api_payload):
+    frame = cashflow_analytics.load_cashflow_frame("u1")
+
+    assert frame.covers(date(2026, 1, 1))
+    assert frame.history_note(date(2026, 1, 1)) == ""
+    note = frame.history_note(date(1900, 1, 1))
+    assert "01/10/2024" in note and "40 transações" in note
+    assert frame.summary(date(1900, 1, 1), TODAY, today=TODAY)["history_note"] == note
+
+
+def test_truncated_history_starts_after_the_cut(api_payload):
+    api_payload.update(truncated=True, historyStart="2026-08-06")
+    frame = cashflow_analytics.load_cashflow_frame("u1")
+
+    assert frame.truncated
+    assert not frame.covers(date(2026, 8, 1))
+    assert frame.covers(date(2026, 9, 1))
+
+
+def test_frame_without_history_outside_the_window_covers_everything():
+    frame = CashflowFrame.from_columns(["2026-10-01"], ["entrada"], [500.0], ["vendas"])
+
+    assert frame.balance(TODAY) == 500.0
+    assert frame.covers(date(1900, 1, 1))
+    assert CashflowFrame.empty().balance() == 0.0
@@ -0,0 +1,55 @@
+"""Parser local de comandos de fluxo de caixa (atalho sem crew)"""
+
+from datetime import date
+
+import pytest
+
+from falachefe_crew.routing.cashflow_command import parse_cashflow_command
+
+TODAY = date(2025, 10, 20)
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("recebi 500 de vendas hoje", ("entrada", 500.0, "vendas", "2025-10-20")),
+    ("paguei R$ 1.200,00 de aluguel ontem", ("saida", 1200.0, "aluguel", "2025-10-19")),
+    ("gastei 45,90 de gasolina", ("saida", 45.9, "transporte", "2025-10-20")),
+    ("vendi 2 mil no dia 15", ("entrada", 2000.0, "vendas", "2025-10-15")),
+    ("comprei 300 de mercadoria em 10/10", ("saida", 300.0, "fornecedores", "2025-10-10")),
+])
+def test_parses_unambiguous_commands(message, expected):
+    command = parse_cashflow_command(message, today=TODAY)
+
+    assert command is not None
+    assert (command["transaction_type"], command["amount"], command["category"], command["date"]) == expected
+    assert command["description"] == message
+
+
+@pytest.mark.parametrize("message", [
+    # Negação: nada aconteceu
+    "não paguei 500 de aluguel",
+    "ainda não recebi 500 das vendas",
+    "nunca gastei 200 de marketing",
+    # Pedido para apagar/corrigir uma transação existente
+    "apaga aquele gastei 50 de gasolina",
+    "cancela o paguei 300 de aluguel",
+    "corrige o recebi 500 de vendas de hoje",
+    "estorna o gastei 80 de uber",
+    # Oração subordinada ou hipótese
+    "quando eu vendi 300",
+    "se eu gastei 100 de luz",
+    "caso eu pague 1.000 de aluguel",
+])
+def test_rejects_messages_that_are_not_new_transactions(message):
+    assert parse_cashflow_command(message, today=TODAY) is None
+
+
+@pytest.mark.parametrize("message", [
+    "quanto gastei de gasolina?",
+    "recebi 500 e paguei 200 de aluguel",
+    "recebi 500 e 300 de vendas",
+    "paguei 500",
+    "paguei 500 de aluguel no dia 30",
+    "recebi " + "500 de vendas " * 20,
+])
+def test_rejects_ambiguous_messages(message):
+    assert parse_cashflow_command(message, today=TODAY) is None
@@ -0,0 +1,36 @@
+"""Resposta do classificador LLM: confidence numérica antes do roteamento de modelo"""
+
+import json
+
+import pytest
+
+api_server = pytest.importorskip("api_server", reason="api_server precisa de crewai e das dependências da API")
+
+from falachefe_crew.routing.model_router import ModelRouter
+
+
+def classifier_output(confidence):
+    return json.dumps({"type": "financial_task", "specialist": "financial_expert", "confidence": confidence})
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (0.9, 0.9),
+    ("0.9", 0.9),
+    ("alta", None),
+    (None, None),
+    ("nan", None),
+    ([0.9], None),
+])
+def test_confidence_is_coerced_to_float(raw, expected):
+    classification = api_server.parse_classification_response(classifier_output(raw))
+    assert classification["confidence"] == expected
+
+
+def test_string_confidence_routes_without_error():
+    router = ModelRouter({
+        "tiers": {"strong": {"model": "gpt-4o"}, "cheap": {"model": "gpt-4o-mini"}},
+        "rules": [{"specialist": "financial_expert", "min_confidence": 0.8, "tier": "cheap"}],
+    })
+    for raw, tier in (("0.9", "cheap"), ("talvez", "strong")):
+        classification = api_server.parse_classification_response(classifier_output(raw))
+        assert router.select("financial_expert", None, classification["confidence"]).tier == tier
@@ -0,0 +1,59 @@
+"""Dependency guard: bulkhead assíncrono espera a vaga (pool próprio do ASGI)"""
+
+import asyncio
+
+from falachefe_crew.resilience.dependency_guard import BulkheadFullError, DependencyGuard
+
+
+def make_guard(**kwargs):
+    return DependencyGuard("test", max_concurrent=1, **kwargs)
+
+
+def test_async_calls_wait_for_a_slot_instead_of_failing():
+    guard = make_guard(async_max_concurrent=2, async_max_wait=1.0)
+    peak = {"now": 0, "max": 0}
+
+    async def fetch(timeout):
+        peak["now"] += 1
+        peak["max"] = max(peak["max"], peak["now"])
+        await asyncio.sleep(0.05)
+        peak["now"] -= 1
+        return "ok"
+
+    async def main():
+        return await asyncio.gather(*[guard.acall(fetch) for _ in range(10)])
+
+    assert asyncio.run(main()) == ["ok"] * 10
+    assert peak["max"] == 2
+    assert guard.counters()["rejected_bulkhead"] == 0
+    assert guard.bulkhead.in_flight == 0
+
+
+def test_async_call_rejected_after_max_wait():
+    guard = make_guard(async_max_concurrent=1, async_max_wait=0.05)
+
+    async def slow(timeout):
+        await asyncio.sleep(0.3)
+        return "slow"
+
+    async def main():
+        return await asyncio.gather(guard.acall(slow), guard.acall(slow, fallback=lambda e: e))
+
+    first, second = asyncio.run(main())
+    assert first == "slow"
+    assert isinstance(second, BulkheadFullError)
+    assert guard.counters()["rejected_bulkhead"] == 1
+
+
+def test_async_pool_is_separate_from_thread_pool():
+    guard = make_guard(async_max_concurrent=4)
+
+    async def fetch(timeout):
+        return "ok"
+
+    assert guard.bulkhead.acquire()
+    try:
+        # Pool de threads cheio não afeta o event loop
+        assert asyncio.run(guard.acall(fetch)) == "ok"
+    finally:
+        guard.bulkhead.release()
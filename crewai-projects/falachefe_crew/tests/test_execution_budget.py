@@ -0,0 +1,61 @@
+"""Deduplicação de chamadas de ferramenta e ferramentas terminais no orçamento de execução"""
+
+from falachefe_crew.resilience.execution_budget import ExecutionBudget, REPEATED_TOOL_CALL_NOTE, budget_for_task
+
+
+def make_runner(*outputs):
+    calls = []
+
+    def run():
+        calls.append(1)
+        return outputs[min(len(calls), len(outputs)) - 1]
+    return run, calls
+
+
+def test_repeated_successful_call_is_not_executed_again():
+    budget = ExecutionBudget("financial_advice")
+    run, calls = make_runner("✅ Saldo: R$ 500,00")
+
+    first = budget.tool_call("Consultar Saldo", {"user_id": "u1"}, run)
+    second = budget.tool_call("Consultar Saldo", {"user_id": "u1"}, run)
+
+    assert first == "✅ Saldo: R$ 500,00"
+    assert second == first + REPEATED_TOOL_CALL_NOTE
+    assert len(calls) == 1
+
+
+def test_failed_call_can_be_retried():
+    budget = ExecutionBudget("financial_advice")
+    run, calls = make_runner("❌ Erro: timeout na API", '{"success": true, "id": 1}')
+
+    assert budget.tool_call("Consultar Saldo", {"user_id": "u1"}, run).startswith("❌")
+    assert budget.tool_call("Consultar Saldo", {"user_id": "u1"}, run) == '{"success": true, "id": 1}'
+    assert len(calls) == 2
+
+
+def test_terminal_tool_only_ends_task_after_success():
+    budget = ExecutionBudget("format_and_send_response", terminal_tools=["Enviar Mensagem de Texto WhatsApp"])
+    run, _ = make_runner("❌ Erro ao enviar", "✅ Mensagem enviada")
+
+    budget.tool_call("Enviar Mensagem de Texto WhatsApp", {"text": "oi"}, run)
+    assert budget.terminal_output is None
+
+    budget.tool_call("Enviar Mensagem de Texto WhatsApp", {"text": "oi"}, run)
+    assert budget.terminal_output == "✅ Mensagem enviada"
+    forced, _ = budget.before_llm_call([])
+    assert forced.endswith("Final Answer: ✅ Mensagem enviada")
+
+
+def test_financial_advice_records_every_transaction_in_one_run():
+    budget = budget_for_task("financial_advice")
+    run, calls = make_runner("✅ Transação registrada: entrada R$ 200,00", "✅ Transação registrada: saída R$ 80,00")
+    messages = [{"role": "user", "content": "vendi 200 no pix e paguei 80 de luz"}]
+
+    budget.tool_call("Adicionar Transação ao Fluxo de Caixa", {"type": "entrada", "amount": 200}, run)
+    # O agente segue para a segunda transação (sem resposta final forçada)
+    assert budget.before_llm_call(messages) == (None, messages)
+    budget.tool_call("Adicionar Transação ao Fluxo de Caixa", {"type": "saida", "amount": 80}, run)
+    assert budget.before_llm_call(messages) == (None, messages)
+
+    assert len(calls) == 2
+    assert budget.terminal_output is None
@@ -0,0 +1,138 @@
+"""Fair share: token buckets por lote e weighted fair queuing das faixas"""
+
+import threading
+import time
+
+import pytest
+
+from falachefe_crew.scheduling.fair_share import (
+    FairQueue,
+    RateLimiter,
+    busy_message,
+    busy_retry_after,
+    tenant_keys,
+)
+from falachefe_crew.storage.kv_store import InMemoryKVStore
+
+
+# ============================================
+# TOKEN BUCKETS
+# ============================================
+
+def test_take_tokens_consumes_all_buckets_or_none():
+    store = InMemoryKVStore()
+    user = ("u", 1.0, 2)
+    company = ("c", 1.0, 1)
+
+    assert store.take_tokens([user, company]) == 0
+    # Empresa sem saldo: o usuário também não é cobrado
+    assert store.take_tokens([user, company]) > 0
+    assert store.take_tokens([user]) == 0
+    assert store.take_tokens([user]) > 0
+
+
+def test_take_tokens_wait_matches_refill_rate():
+    store = InMemoryKVStore()
+    bucket = ("u", 0.5, 1)
+
+    assert store.take_tokens([bucket]) == 0
+    assert store.take_tokens([bucket]) == pytest.approx(2.0, abs=0.05)
+
+
+def test_rate_limiter_charges_user_and_company(memory_store):
+    limiter = RateLimiter(user_rate_per_minute=60, user_burst=2, company_rate_per_minute=60, company_burst=3)
+    alice = {"userId": "alice", "companyId": "acme"}
+    bob = {"userId": "bob", "context": {"companyId": "acme"}}
+
+    assert limiter.check(alice) == 0
+    assert limiter.check(alice) == 0
+    assert limiter.check(alice) > 0
+    assert limiter.check(bob) == 0
+    # Empresa esgotada (3 tokens) limita também quem ainda tem saldo próprio
+    assert limiter.check(bob) > 0
+    assert limiter.counters == {"admitted": 3, "limited": 2, "error": 0}
+
+
+def test_rate_limiter_admits_when_store_fails(monkeypatch, memory_store):
+    def broken(*args, **kwargs):
+        raise ConnectionError("redis down")
+    monkeypatch.setattr(memory_store, "take_tokens", broken)
+    limiter = RateLimiter()
+
+    assert limiter.check({"userId": "alice"}) == 0
+    assert limiter.counters["error"] == 1
+
+
+def test_tenant_keys_fall_back_to_user():
+    assert tenant_keys({"userId": "u1"}) == ("u1", "u1")
+    assert tenant_keys({"phoneNumber": "5511"}) == ("5511", "5511")
+    assert tenant_keys({"userId": "u1", "context": {"companyId": "c1"}}) == ("u1", "c1")
+
+
+def test_busy_message_asks_to_resend_after_whole_seconds():
+    assert busy_retry_after(0.2) == 5
+    assert busy_retry_after(12.1) == 13
+    assert "13 segundos" in busy_message(12.1)
+
+
+# ============================================
+# WEIGHTED FAIR QUEUING
+# ============================================
+
+def enqueue_waiters(queue, tenants):
+    """Um waiter por cliente, na ordem dada; retorna (threads, ordem de entrada)"""
+    order = []
+    threads = []
+    for tenant, weight in tenants:
+        def wait(tenant=tenant, weight=weight):
+            assert queue.acquire(tenant, weight, timeout=5)
+            order.append(tenant)
+            queue.release()
+        thread = threading.Thread(target=wait)
+        thread.start()
+        threads.append(thread)
+        # Garante a ordem de chegada na fila
+        deadline = time.monotonic() + 2
+        while queue.waiting < len(threads) and time.monotonic() < deadline:
+            time.sleep(0.005)
+    return threads, order
+
+
+def test_fair_queue_interleaves_heavy_and_light_clients():
+    queue = FairQueue(1)
+    assert queue.acquire("heavy")
+
+    threads, order = enqueue_waiters(queue, [("heavy", 1.0)] * 3 + [("light", 1.0)])
+    queue.release()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # O cliente leve não espera as três execuções do pesado
+    assert order.index("light") <= 1
+    assert len(order) == 4
+
+
+def test_fair_queue_respects_weights():
+    queue = FairQueue(1)
+    assert queue.acquire("blocker")
+
+    threads, order = enqueue_waiters(queue, [("a", 1.0)] * 3 + [("b", 3.0)] * 3)
+    queue.release()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order[:3].count("b") >= 2
+
+
+def test_fair_queue_timeout_rolls_back_the_finish_tag():
+    queue = FairQueue(1)
+    assert queue.acquire("holder")
+
+    assert not queue.acquire("late", timeout=0.05)
+    assert queue.waiting == 0
+    assert "late" not in queue._finish_tags
+
+    queue.release()
+    # A desistência não deixa crédito nem débito: entra de imediato
+    assert queue.acquire("late", timeout=0.05)
+    queue.release()
@@ -0,0 +1,60 @@
+"""Validação de fileUrl do /import (SSRF)"""
+
+import pytest
+
+from falachefe_crew.security.file_url import (
+    UnsafeFileUrlError,
+    check_file_url,
+    file_url_error,
+    is_public_address,
+)
+
+ALLOWED = ["falachefe.uazapi.com", "example.supabase.co"]
+
+
+@pytest.mark.parametrize("url", [
+    "https://falachefe.uazapi.com/files/extrato.ofx",
+    "https://media.falachefe.uazapi.com/abc.csv",
+    "https://example.supabase.co/storage/v1/object/sign/imports/extrato.csv?token=x",
+])
+def test_allowed_hosts(url):
+    assert file_url_error(url, ALLOWED) is None
+
+
+@pytest.mark.parametrize("url", [
+    "http://falachefe.uazapi.com/files/extrato.ofx",
+    "file:///etc/passwd",
+    "https://169.254.169.254/latest/meta-data/",
+    "https://redis:6379/",
+    "https://evilfalachefe.uazapi.com.attacker.net/x.csv",
+    "https://notfalachefe.uazapi.com/x.csv",
+    "https:///x.csv",
+    "",
+])
+def test_rejected_urls(url):
+    assert file_url_error(url, ALLOWED) is not None
+
+
+@pytest.mark.parametrize("address, public", [
+    ("8.8.8.8", True),
+    ("2606:4700:4700::1111", True),
+    ("10.0.0.5", False),
+    ("172.17.0.2", False),
+    ("192.168.1.1", False),
+    ("127.0.0.1", False),
+    ("169.254.169.254", False),
+    ("0.0.0.0", False),
+    ("::1", False),
+    ("fe80::1", False),
+    ("fd00::1", False),
+    ("::ffff:127.0.0.1", False),
+    ("224.0.0.1", False),
+])
+def test_is_public_address(address, public):
+    assert is_public_address(address) is public
+
+
+def test_allowed_host_resolving_to_private_address_is_rejected():
+    # Literal IP na lista: regra de host passa, a de endereço recusa
+    with pytest.raises(UnsafeFileUrlError):
+        check_file_url("https://127.0.0.1/extrato.csv", ["127.0.0.1"])
@@ -0,0 +1,38 @@
+"""Deduplicação de mensagens recebidas"""
+
+from falachefe_crew.security.inbound_dedup import (
+    DONE,
+    PROCESSING,
+    claim_inbound_message,
+    complete_inbound_message,
+    inbound_message_id,
+    release_inbound_message,
+)
+
+
+def test_inbound_message_id_prefers_uazapi_message_id():
+    assert inbound_message_id({"messageId": "ABC"}, {"Upstash-Message-Id": "q1"}) == "msg:ABC"
+    assert inbound_message_id({}, {"Upstash-Message-Id": "q1"}) == "qstash:q1"
+    assert inbound_message_id({}, {}) is None
+
+
+def test_copy_while_processing_and_after_done(memory_store):
+    assert claim_inbound_message("msg:1") is None
+    assert claim_inbound_message("msg:1") == PROCESSING
+
+    complete_inbound_message("msg:1")
+    assert claim_inbound_message("msg:1") == DONE
+    # Id respondido não é liberado por engano
+    release_inbound_message("msg:1")
+    assert claim_inbound_message("msg:1") == DONE
+
+
+def test_released_id_can_be_claimed_again(memory_store):
+    assert claim_inbound_message("msg:2") is None
+    release_inbound_message("msg:2")
+    assert claim_inbound_message("msg:2") is None
+
+
+def test_messages_without_id_are_always_processed(memory_store):
+    assert claim_inbound_message(None) is None
+    assert claim_inbound_message(None) is None
@@ -0,0 +1,69 @@
+"""Coalescência por usuário: lote drenado leva os ids de deduplicação de todas as mensagens"""
+
+import asyncio
+
+from falachefe_crew.scheduling.message_coalescer import MessageCoalescer, merge_payloads
+from falachefe_crew.storage.kv_store import InMemoryKVStore
+
+
+def make_coalescer():
+    return MessageCoalescer(store=InMemoryKVStore(), window=0, lock_ttl=5, lock_wait=0.2, poll_interval=0.01)
+
+
+def test_drain_returns_payloads_and_inbound_ids_in_order():
+    coalescer = make_coalescer()
+    coalescer.submit("u1", {"message": "oi"}, "msg:1")
+    coalescer.submit("u1", {"message": "vendi 200"}, None)
+    coalescer.submit("u1", {"message": "no pix"}, "msg:3")
+
+    payloads, inbound_ids = coalescer.drain("u1")
+
+    assert [p["message"] for p in payloads] == ["oi", "vendi 200", "no pix"]
+    assert inbound_ids == ["msg:1", "msg:3"]
+    assert coalescer.drain("u1") == ([], [])
+
+
+def test_turn_yields_batch_with_ids_of_merged_messages():
+    coalescer = make_coalescer()
+    coalescer.submit("u1", {"message": "oi"}, "msg:1")
+
+    with coalescer.turn("u1", {"message": "vendi 200"}, "msg:2") as turn:
+        batch, inbound_ids = turn
+        assert merge_payloads(batch)["message"] == "oi\nvendi 200"
+        assert inbound_ids == ["msg:1", "msg:2"]
+        # Lock do usuário mantido durante o bloco
+        assert coalescer.try_lock("u1") is None
+
+    assert coalescer.try_lock("u1") is not None
+
+
+def test_turn_only_carries_messages_not_drained_yet():
+    coalescer = make_coalescer()
+    coalescer.submit("u1", {"message": "oi"}, "msg:1")
+    coalescer.drain("u1")
+
+    with coalescer.turn("u1", {"message": "tarde"}, "msg:2") as turn:
+        assert turn == ([{"message": "tarde"}], ["msg:2"])
+    with coalescer.turn("u2", {"message": "x"}) as turn:
+        assert turn == ([{"message": "x"}], [])
+
+
+def test_older_request_yields_none_when_newer_message_arrived():
+    coalescer = make_coalescer()
+    ticket = coalescer.submit("u1", {"message": "oi"}, "msg:1")
+    coalescer.submit("u1", {"message": "vendi"}, "msg:2")
+
+    assert not coalescer.is_latest("u1", ticket)
+
+
+def test_aturn_matches_turn():
+    coalescer = make_coalescer()
+    coalescer.submit("u1", {"message": "oi"}, "msg:1")
+
+    async def run():
+        async with coalescer.aturn("u1", {"message": "vendi 200"}, "msg:2") as turn:
+            return turn
+
+    batch, inbound_ids = asyncio.run(run())
+    assert [p["message"] for p in batch] == ["oi", "vendi 200"]
+    assert inbound_ids == ["msg:1", "msg:2"]
@@ -0,0 +1,55 @@
+"""Vez do usuário no /process: crew tardio segura o lock de coalescência e os ids até entregar"""
+
+import time
+
+import pytest
+
+api_server = pytest.importorskip("api_server", reason="api_server precisa de crewai e das dependências da API")
+
+from falachefe_crew.resilience import request_deadline as rd
+from falachefe_crew.scheduling import message_coalescer
+from falachefe_crew.security.inbound_dedup import DONE, PROCESSING, claim_inbound_message
+
+
+@pytest.fixture
+def coalescer(monkeypatch, memory_store):
+    coalescer = message_coalescer.MessageCoalescer(memory_store, window=0.01)
+    monkeypatch.setattr(message_coalescer, "_coalescer", coalescer)
+    monkeypatch.setattr(rd, "DEADLINE_LATE_RUN_SECONDS", 0.5)
+    return coalescer
+
+
+def whatsapp(message):
+    return {"message": message, "userId": "u1", "phoneNumber": "5511999990000", "context": {}}
+
+
+def test_late_crew_keeps_the_turn_until_its_answer_is_delivered(coalescer, memory_store):
+    lock_key = coalescer._lock_key("u1")
+    seen = []
+
+    def slow_crew():
+        time.sleep(0.3)
+        return "full answer"
+
+    def deliver(answer):
+        seen.append((answer, memory_store.get(lock_key) is not None))
+
+    claim_inbound_message("m1")
+    token = rd._current_deadline.set(rd.Deadline(0.3, delivery_reserve=0.1))
+    try:
+        with api_server.message_turn(whatsapp("quanto vendi?"), "m1") as batch:
+            assert batch
+            assert rd.run_before_deadline(slow_crew, on_late_result=deliver) == (False, None)
+    finally:
+        rd._current_deadline.reset(token)
+
+    # Fallback respondido; a próxima mensagem do usuário ainda espera a vez
+    assert memory_store.get(lock_key) is not None
+    assert claim_inbound_message("m1") == PROCESSING
+
+    deadline = time.monotonic() + 2
+    while memory_store.get(lock_key) is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert seen == [("full answer", True)]
+    assert memory_store.get(lock_key) is None
+    assert claim_inbound_message("m1") == DONE
@@ -0,0 +1,117 @@
+"""Faixas de prioridade: faixa cheia espera a vaga (sem rejeição) até o fim do prazo"""
+
+import threading
+import time
+
+import pytest
+
+from falachefe_crew.resilience import request_deadline as rd
+from falachefe_crew.scheduling.priority_lanes import (
+    LONG,
+    QUICK,
+    TOOLS,
+    LaneTimeoutError,
+    PriorityLanes,
+    lane_for_task,
+)
+
+
+def test_lane_for_task():
+    assert lane_for_task("reception_and_triage") == QUICK
+    assert lane_for_task("financial_advice") == TOOLS
+    assert lane_for_task("marketing_sales_plan") == LONG
+    assert lane_for_task(None) == QUICK
+    assert lane_for_task("unknown_task") == LONG
+
+
+def test_full_lane_waits_for_a_slot_instead_of_rejecting():
+    lanes = PriorityLanes({QUICK: 0, TOOLS: 1, LONG: 1})
+    order = []
+
+    def second():
+        with lanes.slot(TOOLS):
+            order.append("second")
+
+    with lanes.slot(TOOLS):
+        thread = threading.Thread(target=second)
+        thread.start()
+        time.sleep(0.1)
+        assert lanes.lanes[TOOLS].waiting == 1
+        order.append("first")
+    thread.join(timeout=2)
+
+    assert order == ["first", "second"]
+    assert lanes.lanes[TOOLS].admitted == 2
+    assert lanes.lanes[TOOLS].in_flight == 0
+
+
+def test_unlimited_lane_never_waits():
+    lanes = PriorityLanes({QUICK: 0, TOOLS: 1, LONG: 1})
+    with lanes.slot(QUICK), lanes.slot(QUICK), lanes.slot(QUICK):
+        assert lanes.lanes[QUICK].in_flight == 3
+
+
+def test_wait_gives_up_when_time_runs_out():
+    lanes = PriorityLanes({QUICK: 0, TOOLS: 1, LONG: 1})
+    expires_at = time.monotonic() + 0.1
+
+    with lanes.slot(TOOLS):
+        with pytest.raises(LaneTimeoutError):
+            with lanes.slot(TOOLS, lambda: max(0.0, expires_at - time.monotonic())):
+                pytest.fail("work ran after the deadline")
+
+    tools = lanes.lanes[TOOLS]
+    assert (tools.timed_out, tools.waiting, tools.in_flight, tools.admitted) == (1, 0, 0, 1)
+    # A vaga não vazou
+    with lanes.slot(TOOLS, lambda: 1.0):
+        assert tools.in_flight == 1
+
+
+def test_wait_follows_an_extended_deadline():
+    lanes = PriorityLanes({QUICK: 0, TOOLS: 1, LONG: 1})
+    deadline = {"expires_at": time.monotonic() + 0.1}
+    admitted = []
+
+    def waiter():
+        with lanes.slot(TOOLS, lambda: max(0.0, deadline["expires_at"] - time.monotonic())):
+            admitted.append("waiter")
+
+    with lanes.slot(TOOLS):
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.05)
+        deadline["expires_at"] += 1.0
+        time.sleep(0.15)
+    thread.join(timeout=2)
+
+    assert admitted == ["waiter"]
+    assert lanes.lanes[TOOLS].timed_out == 0
+
+
+def test_late_run_stops_waiting_for_the_lane_when_abandoned(monkeypatch):
+    """Como run_in_lane_before_deadline: a espera usa o prazo estendido da execução tardia"""
+    monkeypatch.setattr(rd, "DEADLINE_LATE_RUN_SECONDS", 0.3)
+    lanes = PriorityLanes({QUICK: 0, TOOLS: 1, LONG: 1})
+    ran = []
+
+    def in_lane():
+        with lanes.slot(TOOLS, rd.current_deadline().remaining):
+            ran.append("work")
+
+    with rd._counters_lock:
+        before = dict(rd._counters)
+    token = rd._current_deadline.set(rd.Deadline(0.2, delivery_reserve=0.1))
+    try:
+        with lanes.slot(TOOLS):
+            with rd.hold_late_runs() as runs:
+                assert rd.run_before_deadline(in_lane, on_late_result=ran.append) == (False, None)
+            rd.wait_late_runs(runs)
+            time.sleep(0.05)
+    finally:
+        rd._current_deadline.reset(token)
+
+    assert ran == []
+    assert lanes.lanes[TOOLS].timed_out == 1
+    with rd._counters_lock:
+        assert rd._counters["late_abandoned"] == before["late_abandoned"] + 1
+        assert rd._counters["late_failed"] == before["late_failed"]
@@ -0,0 +1,66 @@
+"""Rate limit do /process: cobrado por lote coalescido, com pedido de reenvio ao usuário"""
+
+import time
+
+import pytest
+
+api_server = pytest.importorskip("api_server", reason="api_server precisa de crewai e das dependências da API")
+
+from falachefe_crew.scheduling import fair_share
+from falachefe_crew.scheduling.message_coalescer import merge_payloads
+
+
+@pytest.fixture
+def limiter(monkeypatch, memory_store):
+    limiter = fair_share.RateLimiter(user_rate_per_minute=1, user_burst=1)
+    monkeypatch.setattr(fair_share, "_limiter", limiter)
+    monkeypatch.setattr(fair_share, "FAIR_SHARE_ENABLED", True)
+    return limiter
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr(api_server, "send_to_uazapi", lambda phone, text: sent.append((phone, text)) or {"success": True})
+    monkeypatch.setattr(api_server, "save_agent_message", lambda **kwargs: None)
+    monkeypatch.setattr(api_server, "try_cashflow_fast_path", lambda *args: ("✅ Registrado", {
+        "type": "cashflow_command", "specialist": "financial_expert", "confidence": 1.0,
+    }))
+    return sent
+
+
+def whatsapp(message):
+    return {"message": message, "userId": "u1", "phoneNumber": "5511999990000", "context": {}}
+
+
+def test_coalesced_batch_costs_one_token(limiter, sent):
+    batch = [whatsapp("oi"), whatsapp("vendi 200"), whatsapp("no pix")]
+
+    body = api_server.process_merged_message(merge_payloads(batch), time.time())
+
+    assert body["success"] and "rate_limited" not in body
+    assert limiter.counters["admitted"] == 1
+
+
+def test_rate_limited_whatsapp_batch_asks_user_to_resend(limiter, sent):
+    api_server.process_merged_message(whatsapp("recebi 500 de vendas"), time.time())
+
+    body = api_server.process_merged_message(whatsapp("paguei 100 de luz"), time.time())
+
+    assert body["rate_limited"] is True and body["success"] is True
+    assert body["metadata"]["retry_after_seconds"] >= fair_share.BUSY_MIN_RETRY_AFTER_SECONDS
+    assert sent[-1] == ("5511999990000", body["response"])
+    assert "envie novamente" in body["response"]
+
+
+def test_rate_limited_web_chat_gets_notice_in_response(limiter, sent):
+    web = dict(whatsapp("oi"), context={"source": "web-chat"})
+    api_server.process_merged_message(web, time.time())
+    sent.clear()
+
+    body = api_server.process_merged_message(web, time.time())
+
+    assert body["rate_limited"] is True
+    assert body["source"] == "web-chat"
+    assert "envie novamente" in body["response"]
+    assert sent == []
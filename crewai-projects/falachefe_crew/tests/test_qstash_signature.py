@@ -0,0 +1,89 @@
+"""Verificação do JWT do QStash (HS256 com a biblioteca padrão)"""
+
+import base64
+import hashlib
+import hmac
+import json
+
+import pytest
+
+from falachefe_crew.security.qstash_signature import verify_qstash_jwt
+
+KEY = "sig_current"
+NEXT_KEY = "sig_next"
+BODY = b'{"message": "oi"}'
+URL = "https://api.falachefe.app.br/process"
+NOW = 1_760_000_000
+
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def body_hash(body: bytes = BODY) -> str:
+    return b64url(hashlib.sha256(body).digest())
+
+
+def make_token(claims=None, header=None, key: str = KEY) -> str:
+    header = {"alg": "HS256", "typ": "JWT"} if header is None else header
+    claims = {
+        "iss": "Upstash", "sub": URL, "exp": NOW + 300, "nbf": NOW, "body": body_hash(),
+    } if claims is None else claims
+    signed = f"{b64url(json.dumps(header).encode())}.{b64url(json.dumps(claims).encode())}"
+    signature = hmac.new(key.encode(), signed.encode("ascii"), hashlib.sha256).digest()
+    return f"{signed}.{b64url(signature)}"
+
+
+def verify(token, body: bytes = BODY, url=URL):
+    return verify_qstash_jwt(token, body, [KEY, NEXT_KEY], url=url, now=NOW)
+
+
+def test_valid_token():
+    assert verify(make_token())
+
+
+def test_next_signing_key_is_accepted():
+    assert verify(make_token(key=NEXT_KEY))
+
+
+def test_body_hash_with_padding_is_accepted():
+    claims = {"iss": "Upstash", "sub": URL, "exp": NOW + 300, "nbf": NOW, "body": body_hash() + "="}
+    assert verify(make_token(claims))
+
+
+@pytest.mark.parametrize("token", [
+    None,
+    "",
+    "abc",
+    "a.b.c",
+    make_token(key="wrong"),
+    make_token(header={"alg": "none"}),
+])
+def test_invalid_tokens(token):
+    assert not verify(token)
+
+
+@pytest.mark.parametrize("header, claims", [
+    ([], None),
+    ("HS256", None),
+    (None, []),
+    (None, 123),
+    (None, {"iss": "Upstash", "sub": URL, "exp": "soon", "nbf": NOW, "body": body_hash()}),
+    (None, {"iss": "Upstash", "sub": URL, "exp": NOW + 300, "nbf": [NOW], "body": body_hash()}),
+])
+def test_non_object_header_or_claims_are_rejected(header, claims):
+    assert not verify(make_token(claims=claims, header=header))
+
+
+def test_tampered_body_is_rejected():
+    assert not verify(make_token(), body=b'{"message": "outra"}')
+
+
+def test_wrong_issuer_subject_and_expiry():
+    base = {"iss": "Upstash", "sub": URL, "exp": NOW + 300, "nbf": NOW, "body": body_hash()}
+    assert not verify(make_token({**base, "iss": "Other"}))
+    assert not verify(make_token({**base, "sub": "https://evil.example/process"}))
+    assert not verify(make_token({**base, "exp": NOW - 3600}))
+    assert not verify(make_token({**base, "nbf": NOW + 3600}))
+    # Sem url esperada (atrás de proxy) o sub não é comparado
+    assert verify(make_token({**base, "sub": "https://internal/process"}), url=None)
@@ -0,0 +1,136 @@
+"""Deadline da requisição: fallback, prazo estendido do crew tardio e vez mantida até a entrega"""
+
+import contextlib
+import threading
+import time
+
+import pytest
+
+from falachefe_crew.resilience import request_deadline as rd
+
+
+@pytest.fixture
+def short_deadline(monkeypatch):
+    """Deadline com 0.2s de trabalho (reserva de 0.1s) e 0.5s extras para o crew tardio"""
+    monkeypatch.setattr(rd, "DEADLINE_LATE_RUN_SECONDS", 0.5)
+    token = rd._current_deadline.set(rd.Deadline(0.3, delivery_reserve=0.1))
+    yield
+    rd._current_deadline.reset(token)
+
+
+def counters():
+    with rd._counters_lock:
+        return dict(rd._counters)
+
+
+def test_finished_run_returns_result(short_deadline):
+    assert rd.run_before_deadline(lambda: "ok", on_late_result=pytest.fail) == (True, "ok")
+
+
+def test_without_deadline_runs_inline():
+    assert rd.current_deadline() is None
+    assert rd.run_before_deadline(threading.current_thread, on_late_result=pytest.fail) == (True, threading.current_thread())
+
+
+def test_late_run_gets_extended_deadline_and_delivers(short_deadline):
+    seen = {}
+    delivered = []
+
+    def slow():
+        time.sleep(0.35)
+        # Passou do deadline da requisição: chamadas externas ainda têm prazo
+        seen["timeout"] = rd.deadline_timeout(30)
+        return "full answer"
+
+    before = counters()
+    with rd.hold_late_runs() as runs:
+        assert rd.run_before_deadline(slow, on_late_result=delivered.append) == (False, None)
+    assert len(runs) == 1
+
+    rd.wait_late_runs(runs)
+
+    assert delivered == ["full answer"]
+    assert seen["timeout"] > 0
+    assert counters()["late_delivered"] == before["late_delivered"] + 1
+    # O prazo da requisição não foi estendido, só o da execução tardia
+    assert rd.current_deadline().remaining() < 0.1
+
+
+def test_late_run_past_extension_is_abandoned(short_deadline):
+    delivered = []
+    release = threading.Event()
+
+    before = counters()
+    with rd.hold_late_runs() as runs:
+        finished, _ = rd.run_before_deadline(lambda: release.wait(5) and "too late", on_late_result=delivered.append)
+    assert not finished
+
+    rd.wait_late_runs(runs)
+    assert counters()["late_abandoned"] == before["late_abandoned"] + 1
+
+    release.set()
+    time.sleep(0.05)
+    assert delivered == []
+    assert counters()["late_abandoned"] == before["late_abandoned"] + 1
+
+
+def test_failed_late_run_settles(short_deadline):
+    def slow_failure():
+        time.sleep(0.25)
+        raise RuntimeError("crew failed")
+
+    before = counters()
+    with rd.hold_late_runs() as runs:
+        rd.run_before_deadline(slow_failure, on_late_result=pytest.fail)
+    started = time.monotonic()
+    rd.wait_late_runs(runs)
+
+    assert time.monotonic() - started < 0.4
+    assert counters()["late_failed"] == before["late_failed"] + 1
+
+
+def test_held_manager_exits_after_late_delivery(short_deadline):
+    events = []
+
+    @contextlib.contextmanager
+    def turn():
+        yield "turn"
+        events.append("released")
+
+    def slow():
+        time.sleep(0.3)
+        return "full answer"
+
+    with rd.held_through_late_runs(turn()) as value:
+        assert value == "turn"
+        finished, _ = rd.run_before_deadline(slow, on_late_result=lambda answer: events.append(answer))
+        assert not finished
+    # Resposta de fallback sai sem esperar; a vez só é liberada depois da entrega
+    assert events == []
+
+    deadline = time.monotonic() + 2
+    while "released" not in events and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert events == ["full answer", "released"]
+
+
+def test_held_manager_exits_immediately_without_late_runs(short_deadline):
+    events = []
+
+    @contextlib.contextmanager
+    def turn():
+        try:
+            yield
+        except RuntimeError:
+            events.append("released on error")
+            raise
+        events.append("released")
+
+    with rd.held_through_late_runs(turn()):
+        rd.run_before_deadline(lambda: None, on_late_result=pytest.fail)
+    assert events == ["released"]
+
+    with pytest.raises(RuntimeError):
+        with rd.held_through_late_runs(turn()):
+            raise RuntimeError("boom")
+    assert events == ["released", "released on error"]
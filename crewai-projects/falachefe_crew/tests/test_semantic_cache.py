@@ -0,0 +1,66 @@
+"""Cache semântico: respostas personalizadas não são gravadas; um embedding por miss"""
+
+import pytest
+
+from falachefe_crew.caching import semantic_cache
+from falachefe_crew.caching.semantic_cache import SemanticResponseCache
+
+QUESTION = "como divulgar minha loja no instagram"
+PROFILE = {"company_name": "Padaria Pão Dourado Ltda", "user_name": "João Silva",
+           "company_sector": "alimentacao", "company_size": "micro"}
+
+
+@pytest.fixture
+def cache(monkeypatch, memory_store):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_ENABLED", True)
+    cache = SemanticResponseCache(memory_store)
+    cache.embed_calls = []
+
+    def fake_embed(text):
+        cache.embed_calls.append(text)
+        return [1.0, 0.0, 0.5]
+
+    monkeypatch.setattr(cache, "_embed", fake_embed)
+    return cache
+
+
+@pytest.mark.parametrize("answer", [
+    "João, poste fotos dos pães todo dia.",
+    "Mostre o balcão da Dourado nos stories.",
+    "Use o nome SILVA nas hashtags.",
+])
+def test_answer_citing_part_of_a_name_is_not_stored(cache, answer):
+    assert cache.store_answer("marketing_expert", QUESTION, PROFILE, answer) is False
+    assert cache.embed_calls == []
+
+
+def test_generic_answer_is_stored_and_served(cache):
+    answer = "Poste fotos dos produtos todo dia e responda os comentários."
+    assert cache.store_answer("marketing_expert", QUESTION, PROFILE, answer)
+
+    hit = cache.lookup("marketing_expert", QUESTION, dict(PROFILE, company_name="Outra", user_name="Maria"))
+    assert hit["answer"] == answer and hit["type"] == "exact"
+
+
+def test_legal_suffix_and_connectors_do_not_block_caching(cache):
+    answer = "Cadastre a empresa Ltda no Google e poste fotos dos produtos."
+    assert cache.store_answer("marketing_expert", QUESTION, PROFILE, answer)
+
+
+def test_miss_embeds_the_question_once(cache):
+    cache.store_answer("marketing_expert", "como atrair clientes novos pelo instagram", PROFILE, "Faça sorteios.")
+    cache.embed_calls.clear()
+    other = dict(PROFILE, company_sector="alimentacao")
+
+    # Similaridade 1.0 com o embedding falso: força miss com limiar acima de 1
+    cache.threshold = 1.01
+    assert cache.lookup("marketing_expert", QUESTION, other) is None
+    assert cache.store_answer("marketing_expert", QUESTION, other, "Poste vídeos curtos com frequência.")
+
+    assert cache.embed_calls == [QUESTION]
+    assert cache.counters["miss"] == 1
+
+
+def test_metrics_export_counters(cache):
+    cache.lookup("marketing_expert", QUESTION, PROFILE)
+    assert 'falachefe_semantic_cache_lookups_total{outcome="miss"} 1' in cache.render_prometheus_metrics()
@@ -0,0 +1,49 @@
+"""Parser de extratos: valores em formato brasileiro e americano"""
+
+import pytest
+
+from falachefe_crew.ingestion.statement_parser import iter_statement_transactions, parse_money
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.234,56", 1234.56),
+    ("1,234.56", 1234.56),
+    ("1.234.567,89", 1234567.89),
+    ("1,234,567.89", 1234567.89),
+    ("1234.56", 1234.56),
+    ("-45,90", -45.9),
+    ("R$ (300,00)", -300.0),
+    ("150,00-", -150.0),
+    ("1.500", 1500.0),
+    ("", None),
+    ("abc", None),
+])
+def test_parse_money(value, expected):
+    assert parse_money(value) == expected
+
+
+def test_csv_with_us_formatted_amounts():
+    lines = [
+        "Date,Description,Amount",
+        '2025-10-01,Client payment,"1,234.56"',
+        '2025-10-02,Office rent,"-2,000.00"',
+    ]
+
+    transactions = list(iter_statement_transactions(lines, "extrato.csv"))
+
+    assert [(t["amount"], t["transaction_type"]) for t in transactions] == [(1234.56, "entrada"), (2000.0, "saida")]
+
+
+def test_csv_with_brazilian_amounts_and_semicolon():
+    lines = [
+        "Data;Histórico;Valor",
+        "01/10/2025;PIX recebido;1.234,56",
+        "02/10/2025;Aluguel;-2.000,00",
+    ]
+
+    transactions = list(iter_statement_transactions(lines, "extrato.csv"))
+
+    assert [(t["date"], t["amount"], t["transaction_type"]) for t in transactions] == [
+        ("2025-10-01", 1234.56, "entrada"),
+        ("2025-10-02", 2000.0, "saida"),
+    ]
@@ -0,0 +1,70 @@
+"""Memoização de ferramentas: só resultados de sucesso ficam guardados na execução"""
+
+import json
+
+import pytest
+
+from falachefe_crew.caching.tool_memo import is_failed_tool_output, memoized_tool, tool_memo_scope
+
+
+class FakeTool:
+    name = "fake"
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.calls = 0
+
+    @memoized_tool
+    def _run(self, user_id):
+        self.calls += 1
+        return self.outputs.pop(0)
+
+
+@pytest.mark.parametrize("output", [
+    "❌ Erro ao consultar categorias: timeout",
+    "⚠️ Resumo temporariamente indisponível",
+    json.dumps({"success": False, "error": "Token da uazapi não configurado"}),
+    "",
+    None,
+])
+def test_failures_are_not_memoized(output):
+    assert is_failed_tool_output(output)
+
+    tool = FakeTool([output, "Saldo: R$ 10,00"])
+    with tool_memo_scope("test"):
+        assert tool._run("u1") == output
+        assert tool._run("u1") == "Saldo: R$ 10,00"
+        assert tool._run("u1") == "Saldo: R$ 10,00"
+    assert tool.calls == 2
+
+
+def test_success_outputs_are_memoized():
+    assert not is_failed_tool_output("Saldo do Fluxo de Caixa - current_month")
+    assert not is_failed_tool_output(json.dumps({"success": True, "wa_name": "Ana"}))
+
+    tool = FakeTool(["Saldo: R$ 10,00"])
+    with tool_memo_scope("test"):
+        assert tool._run("u1") == tool._run(" u1 ")
+    assert tool.calls == 1
+
+
+def test_cashflow_tool_errors_are_retried(monkeypatch):
+    from falachefe_crew.analytics.cashflow_analytics import CashflowFrame
+    from falachefe_crew.tools import cashflow_tools
+
+    frames = [RuntimeError("connection reset"), CashflowFrame.from_columns(["2026-10-01"], ["saida"], [50.0], ["aluguel"])]
+
+    def get_frame(user_id):
+        frame = frames.pop(0)
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    monkeypatch.setattr(cashflow_tools, "get_cashflow_frame", get_frame)
+    tool = cashflow_tools.GetCashflowCategoriesTool()
+    with tool_memo_scope("test"):
+        failed = tool._run("u1", "2026-10")
+        retried = tool._run("u1", "2026-10")
+
+    assert failed.startswith("❌ Erro ao consultar categorias")
+    assert "aluguel" in retried
@@ -0,0 +1,196 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db } from '@/lib/db';
+import { sql } from 'drizzle-orm';
+
+// Limite de transações por chamada (o importador envia lotes de até 200)
+const MAX_BATCH_SIZE = 500;
+
+interface BatchTransactionInput {
+  type?: string;
+  amount?: number;
+  description?: string;
+  category?: string;
+  date?: string;
+  metadata?: Record<string, unknown>;
+  idempotencyKey?: string;
+}
+
+function validateTransaction(transaction: BatchTransactionInput): string | null {
+  if (!transaction.type || !['entrada', 'saida'].includes(transaction.type)) {
+    return 'type deve ser "entrada" ou "saida"';
+  }
+  if (!transaction.amount || typeof transaction.amount !== 'number' || transaction.amount <= 0) {
+    return 'amount deve ser número positivo';
+  }
+  if (!transaction.category) {
+    return 'category é obrigatória';
+  }
+  if (!transaction.date || !/^\d{4}-\d{2}-\d{2}$/.test(transaction.date)) {
+    return 'date deve estar no formato YYYY-MM-DD';
+  }
+  return null;
+}
+
+/**
+ * POST /api/financial/crewai/batch
+ * Importação em lote (planilhas/extratos): um único INSERT para várias transações
+ *
+ * Body: { userId, transactions: [{ type, amount, description, category, date, metadata, idempotencyKey }] }
+ * Linhas inválidas são rejeitadas individualmente; as válidas são gravadas.
+ * Linhas com idempotencyKey já gravada (reimportação do mesmo extrato) são
+ * ignoradas e devolvidas em duplicates.
+ */
+export async function POST(request: NextRequest) {
+  try {
+    // 1. VALIDAR AUTENTICAÇÃO
+    const token = request.headers.get('x-crewai-token');
+    const expectedToken = process.env.CREWAI_SERVICE_TOKEN;
+
+    if (!token || token !== expectedToken) {
+      return NextResponse.json(
+        { success: false, error: 'Token de autenticação inválido ou ausente' },
+        { status: 401 }
+      );
+    }
+
+    // 2. PARSEAR E VALIDAR BODY
+    const body = await request.json();
+    const { userId, transactions } = body as {
+      userId?: string;
+      transactions?: BatchTransactionInput[];
+    };
+
+    if (!userId) {
+      return NextResponse.json(
+        { success: false, error: 'userId é obrigatório' },
+        { status: 400 }
+      );
+    }
+
+    if (!Array.isArray(transactions) || transactions.length === 0) {
+      return NextResponse.json(
+        { success: false, error: 'transactions deve ser uma lista não vazia' },
+        { status: 400 }
+      );
+    }
+
+    if (transactions.length > MAX_BATCH_SIZE) {
+      return NextResponse.json(
+        { success: false, error: `Máximo de ${MAX_BATCH_SIZE} transações por lote` },
+        { status: 413 }
+      );
+    }
+
+    const rejected: { index: number; error: string }[] = [];
+    const valid: BatchTransactionInput[] = [];
+    const validIndexes: number[] = [];
+
+    transactions.forEach((transaction, index) => {
+      const error = validateTransaction(transaction);
+      if (error) {
+        rejected.push({ index, error });
+      } else {
+        valid.push(transaction);
+        validIndexes.push(index);
+      }
+    });
+
+    if (valid.length === 0) {
+      return NextResponse.json(
+        { success: false, inserted: 0, ids: [], duplicates: [], rejected, error: 'Nenhuma transação válida no lote' },
+        { status: 400 }
+      );
+    }
+
+    // 3. BUSCAR COMPANY_ID (opcional)
+    let companyId = null;
+
+    try {
+      const subscriptions = await db.execute<{ company_id: string }>(
+        sql`SELECT company_id 
+            FROM user_subscriptions 
+            WHERE user_id = ${userId} 
+              AND status = 'active' 
+            LIMIT 1`
+      );
+
+      if (subscriptions && subscriptions.length > 0) {
+        companyId = subscriptions[0].company_id;
+      }
+    } catch (error) {
+      console.warn('Não foi possível buscar company_id:', error);
+    }
+
+    // 4. INSERIR LOTE (um único INSERT multi-linha)
+    const values = valid.map((transaction) => sql`(
+            ${userId},
+            ${companyId},
+            ${transaction.type},
+            ${transaction.amount},
+            ${transaction.description || `Transação de ${transaction.type}`},
+            ${transaction.category},
+            ${transaction.date},
+            ${JSON.stringify(transaction.metadata || {})}::jsonb,
+            ${transaction.idempotencyKey || null}
+          )`);
+
+    const result = await db.execute<{ id: string; idempotency_key: string | null }>(
+      sql`INSERT INTO cashflow_transactions (
+            user_id,
+            company_id,
+            type,
+            amount,
+            description,
+            category,
+            date,
+            metadata,
+            idempotency_key
+          ) VALUES ${sql.join(values, sql`, `)}
+          ON CONFLICT (user_id, idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+          RETURNING id, idempotency_key`
+    );
+
+    const ids = result.map((row) => row.id);
+
+    // Índices (no lote recebido) das linhas ignoradas por já existirem
+    const insertedKeys = new Set(result.map((row) => row.idempotency_key));
+    const duplicates = valid
+      .map((transaction, position) => ({ transaction, index: validIndexes[position] }))
+      .filter(({ transaction }) => transaction.idempotencyKey && !insertedKeys.has(transaction.idempotencyKey))
+      .map(({ index }) => index);
+
+    // 5. LOGAR OPERAÇÃO
+    console.log('📥 Lote de transações importado:', {
+      userId,
+      companyId,
+      inserted: ids.length,
+      duplicates: duplicates.length,
+      rejected: rejected.length
+    });
+
+    // 6. RETORNAR RESULTADO
+    return NextResponse.json(
+      {
+        success: true,
+        inserted: ids.length,
+        ids,
+        duplicates,
+        rejected,
+        message: `${ids.length} transações importadas`
+      },
+      { status: 201 }
+    );
+
+  } catch (error) {
+    console.error('❌ Erro ao importar lote de transações:', error);
+
+    return NextResponse.json(
+      {
+        success: false,
+        error: 'Erro interno ao importar transações',
+        details: error instanceof Error ? error.message : 'Unknown error'
+      },
+      { status: 500 }
+    );
+  }
+}
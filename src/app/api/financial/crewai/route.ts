@@ -46,6 +46,10 @@ export async function POST(request: NextRequest) {
       metadata
     } = body;
     
+    // Chave de idempotência (body ou header): reenvio da mesma transação não duplica
+    const idempotencyKey: string | null =
+      body.idempotencyKey || request.headers.get('idempotency-key') || null;
+    
     // Validações
     if (!userId) {
       return NextResponse.json(
@@ -104,6 +108,8 @@ export async function POST(request: NextRequest) {
     }
 
     // 4. INSERIR TRANSAÇÃO NO BANCO
+    // ON CONFLICT: índice único parcial (user_id, idempotency_key)
+    // ver crewai-projects/falachefe_crew/supabase_migration_cashflow_idempotency.sql
     const result = await db.execute<{
       id: string;
       created_at: string;
@@ -116,7 +122,8 @@ export async function POST(request: NextRequest) {
             description,
             category,
             date,
-            metadata
+            metadata,
+            idempotency_key
           ) VALUES (
             ${userId},
             ${companyId},
@@ -125,11 +132,56 @@ export async function POST(request: NextRequest) {
             ${description || `Transação de ${type}`},
             ${category},
             ${transactionDate},
-            ${JSON.stringify(metadata || {})}::jsonb
+            ${JSON.stringify(metadata || {})}::jsonb,
+            ${idempotencyKey}
           )
+          ON CONFLICT (user_id, idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
           RETURNING id, created_at`
     );
 
+    if (result.length === 0) {
+      // Já registrada com a mesma chave: devolve a transação existente
+      const existing = await db.execute<{
+        id: string;
+        company_id: string | null;
+        type: string;
+        amount: string;
+        description: string;
+        category: string;
+        date: string;
+        created_at: string;
+      }>(
+        sql`SELECT id, company_id, type, amount, description, category,
+                   to_char(date::date, 'YYYY-MM-DD') AS date, created_at
+            FROM cashflow_transactions
+            WHERE user_id = ${userId} AND idempotency_key = ${idempotencyKey}
+            LIMIT 1`
+      );
+      const row = existing[0];
+
+      console.log('🔁 Transação duplicada ignorada:', { transactionId: row?.id, userId, idempotencyKey });
+
+      return NextResponse.json(
+        {
+          success: true,
+          duplicate: true,
+          data: row && {
+            id: row.id,
+            userId,
+            companyId: row.company_id,
+            type: row.type,
+            amount: Number(row.amount),
+            description: row.description,
+            category: row.category,
+            date: row.date,
+            createdAt: row.created_at
+          },
+          message: 'Transação já registrada anteriormente'
+        },
+        { status: 200 }
+      );
+    }
+
     const transaction = result[0];
 
     // 5. LOGAR OPERAÇÃO
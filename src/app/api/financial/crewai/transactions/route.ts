@@ -0,0 +1,128 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db } from '@/lib/db';
+import { sql } from 'drizzle-orm';
+
+// Teto de linhas por consulta (histórico de ~2 anos de uma pequena empresa)
+const MAX_ROWS = 50000;
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+/**
+ * GET /api/financial/crewai/transactions
+ * Histórico de transações em formato colunar para o módulo de analytics do CrewAI
+ *
+ * Query: userId, startDate (YYYY-MM-DD, opcional), endDate (YYYY-MM-DD, opcional)
+ * Retorna listas paralelas (dates, types, amounts, categories) em ordem cronológica,
+ * que o Python carrega direto em arrays NumPy.
+ *
+ * O saldo não depende da janela: openingBalance é o saldo de tudo que ficou fora
+ * das listas (antes de startDate ou cortado por MAX_ROWS) e priorCount quantas
+ * transações são. Se o teto for atingido, ficam as MAIS RECENTES e historyStart
+ * indica o primeiro dia com histórico completo.
+ */
+export async function GET(request: NextRequest) {
+  try {
+    // 1. VALIDAR AUTENTICAÇÃO
+    const token = request.headers.get('x-crewai-token');
+    const expectedToken = process.env.CREWAI_SERVICE_TOKEN;
+
+    if (!token || token !== expectedToken) {
+      return NextResponse.json(
+        { success: false, error: 'Token de autenticação inválido ou ausente' },
+        { status: 401 }
+      );
+    }
+
+    // 2. EXTRAIR QUERY PARAMS
+    const { searchParams } = new URL(request.url);
+    const userId = searchParams.get('userId');
+    const startDate = searchParams.get('startDate') || '1900-01-01';
+    const endDate = searchParams.get('endDate') || '2099-12-31';
+
+    if (!userId) {
+      return NextResponse.json(
+        { success: false, error: 'userId é obrigatório' },
+        { status: 400 }
+      );
+    }
+
+    if (!/^\d{4}-\d{2}-\d{2}$/.test(startDate) || !/^\d{4}-\d{2}-\d{2}$/.test(endDate)) {
+      return NextResponse.json(
+        { success: false, error: 'Datas devem estar no formato YYYY-MM-DD' },
+        { status: 400 }
+      );
+    }
+
+    // 3. CONSULTAR TRANSAÇÕES DO BANCO
+    const rows = await db.execute<{
+      date: string;
+      type: string;
+      amount: string;
+      category: string;
+    }>(
+      sql`SELECT to_char(date::date, 'YYYY-MM-DD') AS date, type, amount, category
+          FROM cashflow_transactions
+          WHERE user_id = ${userId}
+            AND date >= ${startDate}
+            AND date <= ${endDate}
+          ORDER BY date DESC
+          LIMIT ${MAX_ROWS + 1}`
+    );
+
+    // 4. SALDO DE TUDO ATÉ endDate (mesma regra de sinal do Python: |amount|)
+    const [totals] = await db.execute<{ balance: string; count: string }>(
+      sql`SELECT COALESCE(SUM(CASE WHEN type = 'entrada' THEN ABS(amount) ELSE -ABS(amount) END), 0) AS balance,
+                 COUNT(*) AS count
+          FROM cashflow_transactions
+          WHERE user_id = ${userId}
+            AND date <= ${endDate}`
+    );
+
+    // 5. MONTAR COLUNAS (mais recentes primeiro no SELECT, cronológico na resposta)
+    const truncated = rows.length > MAX_ROWS;
+    const loaded = Array.from(rows).slice(0, MAX_ROWS).reverse();
+
+    const dates: string[] = [];
+    const types: string[] = [];
+    const amounts: number[] = [];
+    const categories: string[] = [];
+
+    let loadedBalance = 0;
+
+    for (const row of loaded) {
+      dates.push(row.date);
+      types.push(row.type);
+      amounts.push(Number(row.amount));
+      categories.push(row.category);
+      loadedBalance += row.type === 'entrada' ? Math.abs(Number(row.amount)) : -Math.abs(Number(row.amount));
+    }
+
+    // Com corte, o dia mais antigo carregado pode estar incompleto
+    const historyStart = truncated
+      ? new Date(Date.parse(dates[0]) + DAY_MS).toISOString().slice(0, 10)
+      : startDate;
+
+    return NextResponse.json({
+      success: true,
+      data: { dates, types, amounts, categories },
+      count: dates.length,
+      truncated,
+      historyStart,
+      openingBalance: Math.round((Number(totals?.balance ?? 0) - loadedBalance) * 100) / 100,
+      priorCount: Number(totals?.count ?? 0) - dates.length,
+      period: { start: startDate, end: endDate }
+    });
+
+  } catch (error) {
+    console.error('❌ Erro ao consultar histórico de transações:', error);
+
+    return NextResponse.json(
+      {
+        success: false,
+        error: 'Erro ao consultar histórico de transações',
+        details: error instanceof Error ? error.message : 'Unknown error'
+      },
+      { status: 500 }
+    );
+  }
+}
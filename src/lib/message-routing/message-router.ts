@@ -406,6 +406,8 @@ export class MessageRouter {
       phoneNumber,  // ✅ Agora no nível raiz como CrewAI espera
       message: message.text || message.content || '',
       conversationId,
+      // ID da mensagem na UAZAPI: base das chaves de idempotência no CrewAI
+      messageId: message.messageid || message.id,
       context: {
         source: 'whatsapp',
         messageType: classification.contentType || message.messageType,